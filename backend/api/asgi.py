@@ -0,0 +1,342 @@
+"""ASGI application for the async serving mode."""
+import asyncio
+import contextvars
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from flask import Flask, Response
+
+from api.routes.chat import (
+    chat_busy_response,
+    format_sse,
+    json_reply,
+    prepare_send_message,
+    rate_limited_response,
+    stream_reply
+)
+from core.config import settings
+from core.dependencies import dependencies
+from core.locks import ChatLockTimeout
+from core.logging import get_logger
+from core.readiness import readiness
+from services.async_chat_service import AsyncChatService
+from services.rate_limiter import RateLimitExceeded, TokenBucketLimiter
+
+logger = get_logger(__name__)
+
+SEND_MESSAGE_PATH = re.compile(r"^/api/v1/chat/([^/]+)$")
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class AsyncChatApp:
+    """ASGI app serving chat turns natively and everything else via Flask.
+    
+    ``POST /api/v1/chat/<chat_id>`` (JSON and SSE) runs on the event loop,
+    so thousands of chats waiting on the model share a handful of threads.
+    The turn still goes through the Flask app's request hooks, error
+    handlers and profiling. The remaining routes are short repository
+    operations and are passed to the Flask app on a dedicated executor,
+    reusing its blueprints, error handlers and middleware unchanged; a
+    burst of them does not hold up the repository I/O of chat turns.
+    """
+    
+    def __init__(
+        self,
+        flask_app: Flask,
+        chat_service: AsyncChatService,
+        token_limiter: Optional[TokenBucketLimiter] = None,
+        flask_workers: int = settings.async_flask_workers
+    ):
+        """Initialize ASGI app.
+        
+        Args:
+            flask_app: Flask application serving the non-async routes
+            chat_service: Async chat service
+            token_limiter: Token budget limiter for message turns (optional)
+            flask_workers: Number of threads running the Flask routes
+        """
+        self.flask_app = flask_app
+        self.chat_service = chat_service
+        self.token_limiter = token_limiter
+        self.flask_executor = ThreadPoolExecutor(
+            max_workers=flask_workers,
+            thread_name_prefix="flask"
+        )
+        # Installed only when profiling is configured
+        self.profiling = flask_app.extensions.get("profiling")
+    
+    async def __call__(self, scope: Dict[str, Any], receive, send) -> None:
+        """Handle an ASGI connection."""
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        
+        body = await self._read_body(receive)
+        if body is None:
+            await self._send_json(send, 413, {"error": "Solicitud demasiado grande."})
+            return
+        
+        match = SEND_MESSAGE_PATH.match(scope["path"])
+        if match and scope["method"] == "POST":
+            await self._send_message(scope, send, match.group(1), body)
+        else:
+            await self._call_flask(scope, send, body)
+    
+    async def _lifespan(self, receive, send) -> None:
+        """Handle lifespan events, draining background work on shutdown."""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if settings.openai_prewarm:
+                    await dependencies.aprewarm()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                readiness.mark_draining()
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.chat_service.shutdown)
+                await loop.run_in_executor(None, self.flask_executor.shutdown)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        """Read the request body.
+        
+        Returns:
+            Body bytes or None if it exceeds the configured maximum
+        """
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > settings.max_request_body_bytes:
+                return None
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+    
+    async def _send_json(
+        self,
+        send,
+        status: int,
+        payload: Dict[str, Any]
+    ) -> None:
+        """Send a JSON response encoded like Flask's jsonify."""
+        body = (self.flask_app.json.dumps(payload) + "\n").encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+    
+    async def _send_message(
+        self,
+        scope: Dict[str, Any],
+        send,
+        chat_id: str,
+        body: bytes
+    ) -> None:
+        """Send a message to a chat (async counterpart of the Flask route).
+        
+        Profiled like a Flask request when the profiling middleware selects
+        it.
+        """
+        logger.debug("POST /api/v1/chat/%s (async)", chat_id)
+        environ = self._build_environ(scope, body)
+        finish_profile = self.profiling.begin(environ) if self.profiling else None
+        status = None
+        try:
+            status = await self._serve_turn(environ, send, chat_id)
+        finally:
+            if finish_profile:
+                finish_profile(status)
+    
+    async def _serve_turn(self, environ: Dict[str, Any], send, chat_id: str) -> int:
+        """Serve a send message request inside the Flask app.
+        
+        The turn runs in a request context of the Flask app, and its
+        before/after request hooks run as they do for the Flask view: the
+        per-day/per-hour limits, request metrics, CORS and the security
+        headers. Only the view itself is replaced by the awaited turn; the
+        hooks run on the Flask executor, since the limits write to shared
+        storage and must not block the streams of the event loop.
+        
+        Returns:
+            Response status code
+        """
+        app = self.flask_app
+        events = None
+        with app.request_context(environ):
+            try:
+                rv = await self._run_in_request(app.preprocess_request)
+                if rv is None:
+                    rv, events = await self._run_turn(chat_id)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = await self._run_in_request(app.finalize_request, rv)
+        try:
+            await self._send_response(send, response, events)
+        finally:
+            # Records the request metrics, like a WSGI server closing it
+            response.close()
+        return response.status_code
+    
+    async def _run_in_request(self, func, *args: Any) -> Any:
+        """Run a step of the current request on the Flask executor.
+        
+        Args:
+            func: Blocking callable needing the request context
+            *args: Positional arguments for ``func``
+            
+        Returns:
+            Result of ``func``
+        """
+        loop = asyncio.get_running_loop()
+        # Carries the request context pushed on the event loop
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.flask_executor, partial(context.run, func, *args)
+        )
+    
+    async def _run_turn(self, chat_id: str) -> Tuple[Response, Optional[AsyncIterator]]:
+        """Run a message turn for the current request.
+        
+        Returns:
+            Tuple of (response, async iterator of the turn's SSE events or
+            None for non-streamed responses)
+        """
+        turn, stream = prepare_send_message(chat_id, self.token_limiter)
+        try:
+            if stream:
+                events = await self.chat_service.stream_message_async(**turn)
+                return stream_reply(events, turn["budget"]), events
+            result = await self.chat_service.process_message_async(**turn)
+            return json_reply(result, turn["budget"]), None
+        except RateLimitExceeded as e:
+            return rate_limited_response(e), None
+        except ChatLockTimeout:
+            return chat_busy_response(), None
+    
+    @staticmethod
+    async def _send_response(
+        send,
+        response: Response,
+        events: Optional[AsyncIterator]
+    ) -> None:
+        """Send a finalized Flask response, streaming the turn's events."""
+        start = {
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in response.headers.items()
+            ]
+        }
+        if events is None:
+            await send(start)
+            await send({"type": "http.response.body", "body": response.get_data()})
+            return
+        
+        try:
+            await send(start)
+            async for event, data in events:
+                await send({
+                    "type": "http.response.body",
+                    "body": format_sse(event, data).encode("utf-8"),
+                    "more_body": True
+                })
+        finally:
+            # Releases the chat lock even if sending fails mid-stream
+            await events.aclose()
+        await send({"type": "http.response.body", "body": b""})
+    
+    @staticmethod
+    def _build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+        """Build a WSGI environ from an ASGI HTTP scope."""
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("127.0.0.1", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False
+        }
+        for raw_name, raw_value in scope["headers"]:
+            name = raw_name.decode("latin-1").upper().replace("-", "_")
+            if name == "CONTENT_LENGTH":
+                continue
+            if name != "CONTENT_TYPE":
+                name = f"HTTP_{name}"
+            value = raw_value.decode("latin-1")
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+        return environ
+    
+    def _run_wsgi(self, environ: Dict[str, Any]) -> Tuple[int, Headers, bytes]:
+        """Run the Flask app for one request (Flask executor thread).
+        
+        Returns:
+            Tuple of (status, headers, body)
+        """
+        response_start = {}
+        chunks = []
+        
+        def start_response(status, headers, *_):
+            response_start["status"] = int(status.split(" ", 1)[0])
+            response_start["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ]
+            return chunks.append
+        
+        result = self.flask_app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            close = getattr(result, "close", None)
+            if close:
+                close()
+        return response_start["status"], response_start["headers"], b"".join(chunks)
+    
+    async def _call_flask(self, scope: Dict[str, Any], send, body: bytes) -> None:
+        """Serve a request with the Flask app on the Flask executor.
+        
+        Responses are buffered; the only streaming endpoint (send message)
+        is served natively.
+        """
+        loop = asyncio.get_running_loop()
+        status, headers, response_body = await loop.run_in_executor(
+            self.flask_executor,
+            self._run_wsgi,
+            self._build_environ(scope, body)
+        )
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": response_body})
@@ -0,0 +1,69 @@
+"""Request metrics middleware."""
+import time
+
+from flask import Flask, g, request
+
+from core.metrics import (
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    http_requests_total
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def record_request(route: str, method: str, status: int, started: float) -> None:
+    """Record a finished request.
+    
+    Args:
+        route: Route template (e.g. ``/api/v1/chat/<chat_id>``), so label
+            cardinality does not grow with chat IDs
+        method: HTTP method
+        status: Response status code
+        started: perf_counter value when the request arrived
+    """
+    http_request_duration_seconds.observe((route, method), time.perf_counter() - started)
+    http_requests_total.inc((route, method, str(status)))
+
+
+def register_metrics(app: Flask) -> None:
+    """Register request metrics hooks for the Flask app.
+    
+    Latency is measured until the response is closed, so streamed
+    responses count until their last byte.
+    
+    Args:
+        app: Flask application
+    """
+    
+    @app.before_request
+    def start_request_metrics():
+        """Mark the request as in flight."""
+        http_requests_in_flight.inc()
+        g.metrics_started = time.perf_counter()
+        g.metrics_recorded = False
+    
+    @app.after_request
+    def finish_request_metrics(response):
+        """Record the request when its response is closed."""
+        started = g.get("metrics_started")
+        if started is None:
+            return response
+        rule = request.url_rule
+        route = rule.rule if rule is not None else UNMATCHED_ROUTE
+        method = request.method
+        status = response.status_code
+        g.metrics_recorded = True
+        
+        def on_close():
+            http_requests_in_flight.dec()
+            record_request(route, method, status, started)
+        
+        response.call_on_close(on_close)
+        return response
+    
+    @app.teardown_request
+    def abort_request_metrics(error=None):
+        """Release the in-flight slot if no response was produced."""
+        if g.get("metrics_started") is not None and not g.get("metrics_recorded"):
+            http_requests_in_flight.dec()
@@ -0,0 +1,205 @@
+"""On-demand request profiling middleware.
+
+A request is profiled when it carries ``X-Profile`` together with a valid
+``X-Admin-Token`` (the header value may name the format: ``speedscope`` or
+``pstats``), or when it is picked at ``PROFILING_SAMPLE_RATE``. The
+middleware is only installed when one of both is configured, so profiling
+costs nothing when it is off.
+"""
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map
+
+from core.config import settings
+from core.logging import get_logger
+from repositories.profile_repository import ProfileRepository
+from utils.profiler import FORMATS, RequestProfiler
+from utils.validators import validate_admin_token
+
+logger = get_logger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+ADMIN_TOKEN_HEADER = "HTTP_X_ADMIN_TOKEN"
+
+
+class _ProfiledResponse:
+    """WSGI response iterable that finishes the profile when closed.
+    
+    Streamed responses are produced while the server iterates, so the
+    profile covers the request until its last byte.
+    """
+    
+    def __init__(self, result: Iterable[bytes], on_close: Callable[[], None]):
+        """Initialize profiled response.
+        
+        Args:
+            result: Response iterable of the wrapped app
+            on_close: Called once after the response is closed
+        """
+        self._result = result
+        self._on_close = on_close
+    
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._result)
+    
+    def close(self) -> None:
+        """Close the wrapped response and finish the profile."""
+        try:
+            close = getattr(self._result, "close", None)
+            if close:
+                close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close:
+                on_close()
+
+
+class ProfilingMiddleware:
+    """WSGI middleware profiling selected requests."""
+    
+    def __init__(
+        self,
+        wsgi_app: Callable,
+        url_map: Map,
+        repository: ProfileRepository,
+        sample_rate: float = settings.profiling_sample_rate,
+        default_format: str = settings.profiling_format
+    ):
+        """Initialize profiling middleware.
+        
+        Args:
+            wsgi_app: Wrapped WSGI application
+            url_map: Flask URL map (resolves route templates and chat IDs)
+            repository: Profile repository
+            sample_rate: Fraction of requests profiled without a header
+            default_format: Format used unless the header names one
+        """
+        self.wsgi_app = wsgi_app
+        self.url_map = url_map
+        self.repository = repository
+        self.sample_rate = sample_rate
+        self.default_format = default_format
+    
+    def _select(self, environ: Dict[str, Any]) -> Optional[str]:
+        """Decide whether to profile a request.
+        
+        Returns:
+            Profile format, or None to serve the request unprofiled
+        """
+        requested = environ.get(PROFILE_HEADER)
+        if requested is not None and validate_admin_token(environ.get(ADMIN_TOKEN_HEADER)):
+            requested = requested.strip().lower()
+            return requested if requested in FORMATS else self.default_format
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.default_format
+        return None
+    
+    def _describe(self, environ: Dict[str, Any]) -> Dict[str, Any]:
+        """Annotate a request with its route template and chat ID."""
+        method = environ.get("REQUEST_METHOD", "GET")
+        try:
+            rule, args = self.url_map.bind_to_environ(environ).match(return_rule=True)
+            route, chat_id = rule.rule, args.get("chat_id")
+        except HTTPException:
+            route, chat_id = "unmatched", None
+        return {
+            "route": route,
+            "path": environ.get("PATH_INFO", ""),
+            "method": method,
+            "chat_id": chat_id
+        }
+    
+    def begin(self, environ: Dict[str, Any]) -> Optional[Callable[[Optional[int]], None]]:
+        """Start profiling a request if it is selected.
+        
+        Also used by the ASGI app for the chat turns it serves natively; the
+        event loop thread is sampled then, so concurrent turns share the
+        profile.
+        
+        Args:
+            environ: WSGI environ of the request
+            
+        Returns:
+            Callback finishing and saving the profile (called with the
+            response status), or None if the request is not profiled
+        """
+        fmt = self._select(environ)
+        if fmt is None:
+            return None
+        
+        metadata = self._describe(environ)
+        profiler = RequestProfiler(fmt)
+        created_at = time.time()
+        started = time.perf_counter()
+        try:
+            profiler.start()
+        except Exception as e:
+            # A profiler failure must not break the request it observes
+            logger.warning("No se pudo iniciar el perfil: %s", e)
+            return None
+        
+        def finish(status: Optional[int]) -> None:
+            profiler.stop()
+            metadata.update(
+                status=status,
+                duration_ms=round((time.perf_counter() - started) * 1000, 3),
+                created_at=created_at
+            )
+            profile_id = self.repository.save(profiler, metadata)
+            if profile_id:
+                logger.info(
+                    "Perfil %s guardado: %s %s (%s ms)", profile_id,
+                    metadata["method"], metadata["path"], metadata["duration_ms"]
+                )
+        
+        return finish
+    
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        """Serve a request, profiling it if selected."""
+        finish = self.begin(environ)
+        if finish is None:
+            return self.wsgi_app(environ, start_response)
+        
+        status = {}
+        
+        def start_response_tracking(status_line, headers, exc_info=None):
+            status["code"] = int(status_line.split(" ", 1)[0])
+            return start_response(status_line, headers, exc_info)
+        
+        try:
+            result = self.wsgi_app(environ, start_response_tracking)
+        except BaseException:
+            finish(status.get("code"))
+            raise
+        return _ProfiledResponse(result, lambda: finish(status.get("code")))
+
+
+def register_profiling(app: Flask, repository: ProfileRepository) -> bool:
+    """Install the profiling middleware if profiling is configured.
+    
+    Args:
+        app: Flask application
+        repository: Profile repository
+        
+    Returns:
+        True if the middleware was installed
+    """
+    if not settings.admin_token and settings.profiling_sample_rate <= 0:
+        return False
+    if settings.profiling_format not in FORMATS:
+        logger.warning(
+            "PROFILING_FORMAT inválido: %s. Opciones: %s",
+            settings.profiling_format, ", ".join(FORMATS)
+        )
+        return False
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app.url_map, repository)
+    app.extensions["profiling"] = app.wsgi_app
+    logger.info(
+        "Profiling habilitado (muestreo %g, formato %s)",
+        settings.profiling_sample_rate, settings.profiling_format
+    )
+    return True
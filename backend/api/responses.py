@@ -0,0 +1,50 @@
+"""JSON response helpers backed by the fast serialization layer."""
+from typing import Any
+
+from flask import Response, current_app
+from flask.json.provider import DefaultJSONProvider
+from pydantic import BaseModel
+
+from utils.serialization import dumps_str, loads
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson when available.
+    
+    Keeps Flask's sorted keys and its fallbacks for dates (HTTP date
+    strings), dataclasses and UUIDs; output is compact UTF-8 instead of
+    ASCII-escaped. Calls passing ``json`` options (``indent``,
+    ``ensure_ascii``...) are served by ``DefaultJSONProvider``.
+    """
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data as JSON text."""
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_str(
+            obj, sort_keys=self.sort_keys, default=self.default, native_datetime=False
+        )
+    
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """Deserialize data from JSON text or bytes."""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+
+def model_response(model: BaseModel, status: int = 200) -> Response:
+    """Build a JSON response straight from a response schema.
+    
+    The model is encoded by pydantic-core in one pass, without the
+    intermediate ``model_dump`` dictionary that ``jsonify`` would need.
+    
+    Args:
+        model: Response schema instance
+        status: HTTP status code
+        
+    Returns:
+        Flask response
+    """
+    return current_app.response_class(
+        model.model_dump_json(), status=status, mimetype="application/json"
+    )
@@ -0,0 +1,72 @@
+"""Admin routes blueprint (requires the X-Admin-Token header)."""
+from flask import Blueprint, jsonify, request, abort, send_file
+
+from core.config import settings
+from core.logging import get_logger
+from utils.validators import validate_admin_token
+
+logger = get_logger(__name__)
+
+# Blueprint will be initialized with dependencies in create_app
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/v1/admin')
+
+PROFILES_DEFAULT_LIMIT = 50
+PROFILES_MAX_LIMIT = 500
+
+
+@admin_bp.before_request
+def require_admin_token():
+    """Reject requests without a valid admin token.
+    
+    Admin routes answer 404 while ADMIN_TOKEN is not configured.
+    """
+    if not settings.admin_token:
+        abort(404)
+    if not validate_admin_token(request.headers.get('X-Admin-Token')):
+        logger.warning("Token de administración inválido desde %s", request.remote_addr)
+        abort(403, description="Token de administración inválido.")
+
+
+def init_admin_routes(profile_repository):
+    """Initialize admin routes with dependencies.
+    
+    Args:
+        profile_repository: ProfileRepository instance
+    """
+    
+    @admin_bp.route('/profiles', methods=['GET'])
+    def list_profiles():
+        """List recent request profiles.
+        
+        Query parameters:
+            limit: Maximum number of profiles
+            
+        Returns:
+            200: Profiles, newest first (route, method, chat_id, status,
+                duration_ms, format, file)
+            400: Invalid limit
+            403: Invalid admin token
+        """
+        limit = request.args.get('limit', PROFILES_DEFAULT_LIMIT, type=int)
+        if not 1 <= limit <= PROFILES_MAX_LIMIT:
+            abort(400, description=f"limit debe estar entre 1 y {PROFILES_MAX_LIMIT}.")
+        return jsonify({
+            "profiles": profile_repository.list_recent(limit)
+        }), 200
+    
+    @admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+    def download_profile(profile_id):
+        """Download a request profile.
+        
+        Args:
+            profile_id: Profile ID
+            
+        Returns:
+            200: Profile file (speedscope JSON or pstats dump)
+            403: Invalid admin token
+            404: Unknown profile
+        """
+        path = profile_repository.get_file(profile_id)
+        if path is None:
+            abort(404, description="Perfil no encontrado.")
+        return send_file(path, as_attachment=True, download_name=path.name)
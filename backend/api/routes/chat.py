@@ -1,15 +1,25 @@
 """Chat routes blueprint."""
-from flask import Blueprint, jsonify, request, abort
+from collections.abc import AsyncIterator
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from flask import Blueprint, Response, jsonify, request, abort, stream_with_context
 from pydantic import ValidationError
+from werkzeug.datastructures import MIMEAccept
 
+from api.responses import model_response
+from core.config import settings
+from core.locks import ChatLockTimeout
 from core.logging import get_logger
+from services.rate_limiter import RateLimitExceeded, TokenBudget
 from schemas.chat import (
     SendMessageRequest,
     SendMessageResponse,
+    StreamDeltaEvent,
+    StreamDoneEvent,
+    ErrorResponse,
     CreateChatResponse,
     LoadChatResponse,
-    DeleteChatResponse,
-    MessageResponse
+    DeleteChatResponse
 )
 from utils.validators import validate_chat_id
 
@@ -18,38 +28,237 @@
 # Blueprint will be initialized with dependencies in create_app
 chat_bp = Blueprint('chat', __name__, url_prefix='/api/v1/chat')
 
+SSE_EVENT_SCHEMAS = {
+    "delta": StreamDeltaEvent,
+    "done": StreamDoneEvent,
+    "error": ErrorResponse
+}
+
+
+def wants_event_stream(req: SendMessageRequest, accept_mimetypes: MIMEAccept) -> bool:
+    """Check whether the client asked for a streamed response.
+    
+    Args:
+        req: Validated send message request
+        accept_mimetypes: Parsed Accept header of the request
+        
+    Returns:
+        True if the response should be sent as Server-Sent Events
+    """
+    if req.stream:
+        return True
+    best = accept_mimetypes.best_match(
+        ["application/json", "text/event-stream"]
+    )
+    return best == "text/event-stream"
+
+
+def include_system_requested() -> bool:
+    """Check the ``include_system`` query flag of the current request.
+    
+    Returns:
+        True if the client asked for the system message (true/1/yes)
+    """
+    return request.args.get("include_system", "").lower() in ("1", "true", "yes")
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format an event as a Server-Sent Events frame.
+    
+    Args:
+        event: Event name ('delta', 'done' or 'error')
+        data: Event payload
+        
+    Returns:
+        SSE frame
+    """
+    payload = SSE_EVENT_SCHEMAS[event](**data).model_dump_json()
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _sse_frames(events: Iterator[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+    """Frame the events of a turn as Server-Sent Events.
+    
+    Args:
+        events: Iterator of (event, data) tuples
+        
+    Yields:
+        SSE frames
+    """
+    # A client disconnect closes this generator; pass that on so the
+    # turn releases its chat lock and settles its budget right away
+    try:
+        for event, data in events:
+            yield format_sse(event, data)
+    finally:
+        close = getattr(events, "close", None)
+        if close:
+            close()
+
+
+def rate_limited_response(error: RateLimitExceeded) -> Response:
+    """Build the 429 response of a turn over the client's token budget.
+    
+    Args:
+        error: Rate limit error
+        
+    Returns:
+        JSON error with Retry-After and remaining budget headers
+    """
+    response = jsonify(error="Límite de tokens excedido. Inténtalo más tarde.")
+    response.status_code = 429
+    response.headers.update(error.decision.headers())
+    return response
+
+
+def chat_busy_response() -> Response:
+    """Build the 409 response of a chat whose lock is held by another turn.
+    
+    Returns:
+        JSON error with Retry-After
+    """
+    response = jsonify(error="El chat está ocupado con otro mensaje. Inténtalo más tarde.")
+    response.status_code = 409
+    response.headers["Retry-After"] = str(settings.chat_busy_retry_after)
+    return response
+
+
+def _unavailable_response() -> Response:
+    """Build the 503 response of a turn the AI service could not answer."""
+    response = jsonify(error="Error contactando asistente AI.")
+    response.status_code = 503
+    return response
+
+
+def prepare_send_message(chat_id: str, rate_limiter=None) -> Tuple[Dict[str, Any], bool]:
+    """Validate the current send message request.
+    
+    Shared by the Flask view and the native ASGI handler, which both run
+    inside a request context of the Flask app.
+    
+    Args:
+        chat_id: Chat UUID from the URL
+        rate_limiter: TokenBucketLimiter for message turns (optional)
+        
+    Returns:
+        Tuple of (keyword arguments of the chat service turn, whether the
+        client asked for Server-Sent Events)
+        
+    Raises:
+        BadRequest: If the chat ID or the body are invalid (400)
+    """
+    if not validate_chat_id(chat_id):
+        logger.warning("Chat ID inválido rechazado: %s", chat_id)
+        abort(400, description="Chat ID inválido. Debe ser un UUID válido.")
+    
+    try:
+        req = SendMessageRequest(**request.get_json(force=True))
+    except ValidationError as e:
+        errors = e.errors()
+        if errors:
+            message = errors[0].get('msg', 'Error de validación.')
+        else:
+            message = 'Error de validación.'
+        abort(400, description=message)
+    except Exception as e:
+        logger.warning("JSON inválido en request (chat: %s): %s", chat_id, e)
+        abort(400, description="Formato JSON inválido.")
+    
+    turn = {
+        "chat_id": chat_id,
+        "user_message": req.mensaje,
+        "model": req.modelo or None,
+        "budget": rate_limiter.budget(request.remote_addr) if rate_limiter else None
+    }
+    return turn, wants_event_stream(req, request.accept_mimetypes)
 
-def init_chat_routes(chat_service):
+
+def stream_reply(events, budget: Optional[TokenBudget]) -> Response:
+    """Answer a turn with Server-Sent Events.
+    
+    Args:
+        events: Iterator of (event, data) tuples from ``stream_message``, or
+            None if the turn could not start. An async iterator (ASGI mode)
+            is not framed here; the ASGI app sends its frames itself.
+        budget: Token budget of the client (optional)
+        
+    Returns:
+        SSE response with the budget headers, or the 503 error response
+    """
+    if events is None:
+        return _unavailable_response()
+    body = () if isinstance(events, AsyncIterator) else stream_with_context(_sse_frames(events))
+    return Response(
+        body,
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **(budget.headers() if budget else {})
+        }
+    )
+
+
+def json_reply(
+    result: Tuple[Optional[str], Optional[str], Optional[str]],
+    budget: Optional[TokenBudget]
+) -> Response:
+    """Answer a turn with a single JSON body.
+    
+    Args:
+        result: (response, timestamp, new_title) from ``process_message``
+        budget: Token budget of the client (optional)
+        
+    Returns:
+        JSON response with the budget headers, or the 503 error response
+    """
+    response_text, timestamp, new_title = result
+    if response_text is None:
+        return _unavailable_response()
+    
+    response = model_response(SendMessageResponse(
+        respuesta=response_text,
+        timestamp=timestamp,
+        new_title=new_title
+    ))
+    if budget:
+        response.headers.update(budget.headers())
+    return response
+
+
+def init_chat_routes(chat_service, rate_limiter=None):
     """Initialize chat routes with dependencies.
     
     Args:
         chat_service: ChatService instance
+        rate_limiter: TokenBucketLimiter for message turns (optional)
     """
     
     @chat_bp.route('', methods=['POST'])
     def create_chat():
         """Create a new chat.
         
+        Query parameters:
+            include_system: Also return the system message
+        
         Returns:
             201: Chat created successfully
             500: Server error
         """
         try:
-            chat_id, messages, title = chat_service.create_chat()
+            chat_id, messages, title = chat_service.create_chat(
+                include_system=include_system_requested()
+            )
             
-            response = CreateChatResponse(
-                chat_id=chat_id,
-                messages=[
-                    MessageResponse(role=msg.role, content=msg.content)
-                    for msg in messages
-                ],
-                title=title
+            response = CreateChatResponse.model_validate(
+                {"chat_id": chat_id, "messages": messages, "title": title},
+                from_attributes=True
             )
             
-            return jsonify(response.model_dump()), 201
+            return model_response(response, 201)
         
         except Exception as e:
-            logger.exception(f"Error creando chat: {e}")
+            logger.exception("Error creando chat: %s", e)
             return jsonify(error="No se pudo crear el chat."), 500
     
     @chat_bp.route('/<chat_id>', methods=['GET'])
@@ -58,33 +267,37 @@ def load_chat(chat_id: str):
         
         Args:
             chat_id: Chat UUID
+        
+        Query parameters:
+            include_system: Also return the system message (full text)
             
         Returns:
             200: Chat loaded successfully
             400: Invalid chat ID
             404: Chat not found
         """
-        logger.debug(f"GET /api/v1/chat/{chat_id}")
+        logger.debug("GET /api/v1/chat/%s", chat_id)
         
         if not validate_chat_id(chat_id):
-            logger.warning(f"Chat ID inválido rechazado: {chat_id}")
+            logger.warning("Chat ID inválido rechazado: %s", chat_id)
             abort(400, description="Chat ID inválido. Debe ser un UUID válido.")
         
-        chat = chat_service.get_chat(chat_id)
+        chat = chat_service.get_chat(chat_id, include_system=include_system_requested())
         if chat is None:
             abort(404, description=f"Chat no encontrado: {chat_id}")
         
-        response = LoadChatResponse(
-            chat_id=chat.chat_id,
-            messages=[
-                MessageResponse(role=msg.role, content=msg.content)
-                for msg in chat.messages
-            ],
-            title=chat.title or f"Chat {chat_id[:8]}..."
+        # Messages are validated into the response schema in one pass
+        response = LoadChatResponse.model_validate(
+            {
+                "chat_id": chat.chat_id,
+                "messages": chat.messages,
+                "title": chat.title or f"Chat {chat_id[:8]}..."
+            },
+            from_attributes=True
         )
         
-        logger.debug(f"Chat {chat_id} cargado. Título: {response.title}")
-        return jsonify(response.model_dump()), 200
+        logger.debug("Chat %s cargado. Título: %s", chat_id, response.title)
+        return model_response(response)
     
     @chat_bp.route('/<chat_id>', methods=['DELETE'])
     def delete_chat(chat_id: str):
@@ -97,19 +310,23 @@ def delete_chat(chat_id: str):
             200: Chat deleted successfully
             400: Invalid chat ID
             404: Chat not found
+            409: A turn of the chat holds its lock (see Retry-After)
         """
-        logger.info(f"DELETE /api/v1/chat/{chat_id}")
+        logger.info("DELETE /api/v1/chat/%s", chat_id)
         
         if not validate_chat_id(chat_id):
-            logger.warning(f"Chat ID inválido rechazado: {chat_id}")
+            logger.warning("Chat ID inválido rechazado: %s", chat_id)
             abort(400, description="Chat ID inválido. Debe ser un UUID válido.")
         
-        deleted = chat_service.delete_chat(chat_id)
+        try:
+            deleted = chat_service.delete_chat(chat_id)
+        except ChatLockTimeout:
+            return chat_busy_response()
         if not deleted:
             abort(404, description=f"Chat no encontrado: {chat_id}")
         
         response = DeleteChatResponse(message=f"Chat {chat_id} eliminado.")
-        return jsonify(response.model_dump()), 200
+        return model_response(response)
     
     @chat_bp.route('/<chat_id>', methods=['POST'])
     def send_message(chat_id: str):
@@ -118,47 +335,25 @@ def send_message(chat_id: str):
         Args:
             chat_id: Chat UUID
             
+        Responds with Server-Sent Events ('delta' events followed by a final
+        'done' or 'error' event) when the body sets "stream": true or the
+        client prefers text/event-stream; otherwise with a single JSON body.
+        
         Returns:
             200: Message processed successfully
             400: Invalid request
             404: Chat not found
+            409: Another turn of the chat is in progress (see Retry-After)
+            429: Token budget exhausted (see Retry-After)
             503: AI service unavailable
         """
-        logger.debug(f"POST /api/v1/chat/{chat_id}")
-        
-        if not validate_chat_id(chat_id):
-            logger.warning(f"Chat ID inválido rechazado: {chat_id}")
-            abort(400, description="Chat ID inválido. Debe ser un UUID válido.")
-        
-        # Validate request
+        logger.debug("POST /api/v1/chat/%s", chat_id)
+        turn, stream = prepare_send_message(chat_id, rate_limiter)
         try:
-            data = request.get_json(force=True)
-            req = SendMessageRequest(**data)
-        except ValidationError as e:
-            errors = e.errors()
-            if errors:
-                message = errors[0].get('msg', 'Error de validación.')
-            else:
-                message = 'Error de validación.'
-            return jsonify(error=message), 400
-        except Exception as e:
-            logger.warning(f"JSON inválido en request (chat: {chat_id}): {e}")
-            return jsonify(error="Formato JSON inválido."), 400
-        
-        # Process message
-        response_text, timestamp, new_title = chat_service.process_message(
-            chat_id=chat_id,
-            user_message=req.mensaje,
-            model=req.modelo or None
-        )
-        
-        if response_text is None:
-            return jsonify(error="Error contactando asistente AI."), 503
-        
-        response = SendMessageResponse(
-            respuesta=response_text,
-            timestamp=timestamp,
-            new_title=new_title
-        )
-        
-        return jsonify(response.model_dump()), 200
+            if stream:
+                return stream_reply(chat_service.stream_message(**turn), turn["budget"])
+            return json_reply(chat_service.process_message(**turn), turn["budget"])
+        except RateLimitExceeded as e:
+            return rate_limited_response(e)
+        except ChatLockTimeout:
+            return chat_busy_response()
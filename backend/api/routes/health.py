@@ -1,5 +1,11 @@
 """Health check routes blueprint."""
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, abort, jsonify
+
+from core.config import settings
+from core.logging import get_log_stats
+from core.metrics import CONTENT_TYPE, metrics
+from core.readiness import readiness
+from repositories.file_manager import group_commit
 
 health_bp = Blueprint('health', __name__, url_prefix='/api/v1')
 
@@ -17,6 +23,18 @@ def health_check():
     }), 200
 
 
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint (liveness is ``/health``).
+    
+    Returns:
+        200: The process is initialized and its checks pass
+        503: Still starting, draining for a shutdown, or a check failed
+    """
+    ready, details = readiness.status()
+    return jsonify(details), 200 if ready else 503
+
+
 @health_bp.route('/ping', methods=['GET'])
 def ping():
     """Ping endpoint.
@@ -25,3 +43,102 @@ def ping():
         200: Pong
     """
     return jsonify({"message": "pong"}), 200
+
+
+@health_bp.route('/health/storage', methods=['GET'])
+def storage_health():
+    """Storage durability endpoint.
+    
+    Returns:
+        200: Whether writes are fsynced and group commit batching metrics
+    """
+    return jsonify({
+        "fsync": settings.storage_fsync,
+        "group_commit": group_commit.get_stats()
+    }), 200
+
+
+@health_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics endpoint (all worker processes merged).
+    
+    Returns:
+        200: Metrics in the Prometheus text exposition format
+        404: Metrics are disabled
+    """
+    if not settings.metrics_enabled:
+        abort(404)
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+def init_health_routes(
+    title_service,
+    chat_repo,
+    get_pool_stats,
+    openai_service,
+    lock_manager
+):
+    """Initialize health routes that depend on services.
+    
+    Args:
+        title_service: TitleGenerationService instance
+        chat_repo: Chat repository (its cache, if any, is reported)
+        get_pool_stats: Callable returning upstream connection pool metrics
+        openai_service: OpenAIService instance (latency and completion cache)
+        lock_manager: ChatLockManager instance (per-chat lock contention)
+    """
+    
+    @health_bp.route('/health/queues', methods=['GET'])
+    def queue_health():
+        """Background queue metrics endpoint.
+        
+        Returns:
+            200: Queue metrics (title generation and the logging queue)
+        """
+        return jsonify({
+            "title_generation": title_service.get_stats(),
+            "logging": get_log_stats()
+        }), 200
+    
+    @health_bp.route('/health/caches', methods=['GET'])
+    def cache_health():
+        """Cache statistics endpoint.
+        
+        Returns:
+            200: Cache statistics
+        """
+        chat_cache = chat_repo.cache
+        return jsonify({
+            "chats": chat_cache.get_stats() if chat_cache else None,
+            "completions": openai_service.completion_cache.get_stats()
+        }), 200
+    
+    @health_bp.route('/health/pools', methods=['GET'])
+    def pool_health():
+        """Upstream connection pool metrics endpoint.
+        
+        Returns:
+            200: Utilization, pool wait and connection reuse per pool
+        """
+        return jsonify(get_pool_stats()), 200
+    
+    @health_bp.route('/health/upstream', methods=['GET'])
+    def upstream_health():
+        """Upstream call latency endpoint.
+        
+        Returns:
+            200: Latency per purpose, split into 'upstream', 'cache_hit' and
+                'error' classes, plus completion cache statistics
+        """
+        return jsonify(openai_service.get_stats()), 200
+    
+    @health_bp.route('/health/locks', methods=['GET'])
+    def lock_health():
+        """Per-chat lock contention endpoint.
+        
+        Returns:
+            200: Acquisitions, contention, wait and hold times
+        """
+        return jsonify({
+            "chat_turns": lock_manager.get_stats()
+        }), 200
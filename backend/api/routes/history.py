@@ -1,8 +1,12 @@
 """History routes blueprint."""
-from flask import Blueprint, jsonify
+import hashlib
 
+from flask import Blueprint, jsonify, request, abort
+
+from api.responses import model_response
+from core.config import settings
 from core.logging import get_logger
-from schemas.chat import HistoryResponse, ChatMetadataResponse
+from schemas.chat import HistoryResponse
 
 logger = get_logger(__name__)
 
@@ -21,28 +25,60 @@ def init_history_routes(chat_service):
     def get_history():
         """Get chat history.
         
+        Query parameters:
+            limit: Page size (without it the full history is returned)
+            cursor: next_cursor from the previous page
+            since: Only chats updated at or after this ISO timestamp
+            until: Only chats updated at or before this ISO timestamp
+        
+        Responses carry a strong ETag; If-None-Match is honoured.
+        
         Returns:
             200: History retrieved successfully
+            304: History unchanged
+            400: Invalid query parameters
             500: Server error
         """
-        try:
-            history_list = chat_service.get_history()
-            
-            response = HistoryResponse(
-                history=[
-                    ChatMetadataResponse(
-                        id=meta.id,
-                        title=meta.title,
-                        created_at=meta.created_at,
-                        last_updated=meta.last_updated
+        paginated = any(
+            name in request.args for name in ('limit', 'cursor', 'since', 'until')
+        )
+        limit = settings.history_default_page_size
+        if 'limit' in request.args:
+            try:
+                limit = int(request.args['limit'])
+            except ValueError:
+                limit = 0
+            if not 1 <= limit <= settings.history_max_page_size:
+                abort(
+                    400,
+                    description=(
+                        f"limit debe ser un entero entre 1 y "
+                        f"{settings.history_max_page_size}."
                     )
-                    for meta in history_list
-                ]
-            )
-            
-            logger.debug(f"Historial solicitado: {len(history_list)} chats")
-            return jsonify(response.model_dump()), 200
+                )
         
+        try:
+            if paginated:
+                history_list, next_cursor = chat_service.get_history_page(
+                    limit=limit,
+                    cursor=request.args.get('cursor'),
+                    since=request.args.get('since'),
+                    until=request.args.get('until')
+                )
+            else:
+                history_list, next_cursor = chat_service.get_history(), None
+        except ValueError as e:
+            abort(400, description=str(e))
         except Exception as e:
-            logger.exception(f"Error obteniendo historial: {e}")
+            logger.exception("Error obteniendo historial: %s", e)
             return jsonify(error="Error al obtener historial."), 500
+        
+        response = HistoryResponse.model_validate(
+            {"history": history_list, "next_cursor": next_cursor},
+            from_attributes=True
+        )
+        
+        logger.debug("Historial solicitado: %s chats", len(history_list))
+        http_response = model_response(response)
+        http_response.set_etag(hashlib.sha256(http_response.get_data()).hexdigest())
+        return http_response.make_conditional(request)
@@ -0,0 +1,75 @@
+"""Search routes blueprint."""
+from flask import Blueprint, jsonify, request, abort
+
+from api.responses import model_response
+from core.config import settings
+from core.logging import get_logger
+from schemas.chat import SearchResponse
+
+logger = get_logger(__name__)
+
+# Blueprint will be initialized with dependencies in create_app
+search_bp = Blueprint('search', __name__, url_prefix='/api/v1/search')
+
+
+def init_search_routes(chat_service):
+    """Initialize search routes with dependencies.
+    
+    Args:
+        chat_service: ChatService instance
+    """
+    
+    @search_bp.route('', methods=['GET'])
+    def search_chats():
+        """Search chats by title and message content.
+        
+        Query parameters:
+            q: Search text (every word must match, as a prefix)
+            limit: Maximum number of results
+        
+        Returns:
+            200: Results ordered by relevance
+            400: Invalid query parameters
+            500: Server error
+            503: Search disabled
+        """
+        query = request.args.get('q', '').strip()
+        if not query:
+            abort(400, description="El parámetro q es requerido.")
+        if len(query) > settings.search_max_query_length:
+            abort(
+                400,
+                description=(
+                    f"q no puede exceder {settings.search_max_query_length} caracteres."
+                )
+            )
+        
+        limit = request.args.get('limit', settings.search_default_limit, type=int)
+        if not 1 <= limit <= settings.search_max_limit:
+            abort(
+                400,
+                description=f"limit debe estar entre 1 y {settings.search_max_limit}."
+            )
+        
+        try:
+            results = chat_service.search_chats(query, limit)
+        except RuntimeError as e:
+            return jsonify(error=str(e)), 503
+        except Exception as e:
+            logger.exception("Error en búsqueda: %s", e)
+            return jsonify(error="Error al buscar chats."), 500
+        
+        response = SearchResponse(
+            query=query,
+            results=[
+                {
+                    "chat_id": hit.chat_id,
+                    "title": metadata.title,
+                    "last_updated": metadata.last_updated,
+                    "snippet": hit.snippet,
+                    "score": hit.score
+                }
+                for hit, metadata in results
+            ]
+        )
+        return model_response(response)
@@ -0,0 +1,30 @@
+"""ASGI entry point for Synapse AI (async serving mode).
+
+Run with ``uvicorn asgi:app`` from the backend directory, or directly with
+``python asgi.py``.
+"""
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables first
+load_dotenv()
+
+from factory import create_asgi_app, print_startup_banner
+from core.config import settings
+
+app = create_asgi_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    # Print startup banner
+    print_startup_banner()
+    
+    # Warn if no API key
+    if not settings.openai_api_key:
+        print("⚠️  ADVERTENCIA: OPENAI_APIKEY no configurada", file=sys.stderr)
+        print("   Edita config/.env y agrega tu API key\n", file=sys.stderr)
+    
+    # Keep the application's logging configuration
+    uvicorn.run(app, host=settings.host, port=settings.port, log_config=None)
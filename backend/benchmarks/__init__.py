@@ -0,0 +1 @@
+"""Benchmarks - Performance measurements for hot code paths."""
@@ -0,0 +1,117 @@
+"""Benchmark of the chat load path: per-message models vs bulk serialization.
+
+Measures the CPU time of serving ``GET /api/v1/chat/<id>`` from a stored
+segment, excluding file I/O:
+
+- ``legacy``: ``json.loads`` per line, ``Message(**record)`` per message,
+  ``MessageResponse`` per message, ``model_dump`` and ``json.dumps``
+- ``fast``: ``utils.serialization.loads`` per line, one ``TypeAdapter``
+  validation, one ``model_validate`` into the response schema and
+  ``model_dump_json``
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_serialization --messages 200 --iterations 500
+"""
+import argparse
+import json
+import time
+from typing import Callable, List
+
+from models.message import Message
+from schemas.chat import LoadChatResponse, MessageResponse
+from utils import serialization
+from utils.serialization import dumps, loads, validate_messages
+
+CHAT_ID = "00000000-0000-4000-8000-000000000000"
+
+
+def build_segment(message_count: int) -> List[bytes]:
+    """Build the lines of a JSON Lines segment.
+    
+    Args:
+        message_count: Number of messages
+        
+    Returns:
+        Encoded lines
+    """
+    lines = []
+    for index in range(message_count):
+        role = "user" if index % 2 == 0 else "assistant"
+        content = f"Mensaje {index}: " + "contenido de ejemplo con acentos áéí " * 8
+        lines.append(dumps({"role": role, "content": content}) + b"\n")
+    return lines
+
+
+def legacy_load(lines: List[bytes]) -> bytes:
+    """Serve a chat with per-message models and stdlib JSON."""
+    messages = [Message(**json.loads(line)) for line in lines]
+    response = LoadChatResponse(
+        chat_id=CHAT_ID,
+        messages=[
+            MessageResponse(role=msg.role, content=msg.content)
+            for msg in messages
+        ],
+        title="Chat"
+    )
+    return json.dumps(response.model_dump(), sort_keys=True).encode("utf-8")
+
+
+def fast_load(lines: List[bytes]) -> bytes:
+    """Serve a chat with bulk validation and direct encoding."""
+    messages = validate_messages([loads(line) for line in lines])
+    response = LoadChatResponse.model_validate(
+        {"chat_id": CHAT_ID, "messages": messages, "title": "Chat"},
+        from_attributes=True
+    )
+    return response.model_dump_json().encode("utf-8")
+
+
+def measure(
+    function: Callable[[List[bytes]], bytes],
+    lines: List[bytes],
+    iterations: int
+) -> float:
+    """Measure the mean CPU time of one call.
+    
+    Args:
+        function: Load path to measure
+        lines: Segment lines
+        iterations: Number of calls
+        
+    Returns:
+        Mean CPU seconds per call
+    """
+    function(lines)
+    started = time.process_time()
+    for _ in range(iterations):
+        function(lines)
+    return (time.process_time() - started) / iterations
+
+
+def main() -> int:
+    """Run the benchmark and print the results.
+    
+    Returns:
+        Process exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    
+    lines = build_segment(args.messages)
+    assert json.loads(legacy_load(lines)) == json.loads(fast_load(lines))
+    
+    legacy = measure(legacy_load, lines, args.iterations)
+    fast = measure(fast_load, lines, args.iterations)
+    encoder = "orjson" if serialization.orjson is not None else "json (stdlib)"
+    print(f"Mensajes por chat: {args.messages}, iteraciones: {args.iterations}, codificador: {encoder}")
+    print(f"legacy: {legacy * 1000:8.3f} ms CPU/petición")
+    print(f"fast:   {fast * 1000:8.3f} ms CPU/petición")
+    print(f"ahorro: {(legacy - fast) * 1000:8.3f} ms CPU/petición ({legacy / fast:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
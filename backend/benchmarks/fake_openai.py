@@ -0,0 +1,416 @@
+"""Local stand-in for the OpenAI Chat Completions API.
+
+Serves ``POST /v1/chat/completions`` (plain and streaming) with simulated
+latency, injected server errors and 429 rate-limit responses, so the app
+can be load tested without calling OpenAI. Only the standard library is
+used. Point the app at it with ``OPENAI_BASE_URL=http://127.0.0.1:8081/v1``
+and any ``OPENAI_APIKEY``. With ``--certfile``/``--keyfile`` it serves HTTPS,
+so TLS handshakes are part of what the connection pools are measured on.
+
+Latency distributions (seconds, time to the first byte of the reply):
+
+- ``fixed:0.5``
+- ``uniform:0.2,1.5``
+- ``normal:0.8,0.2`` (mean, standard deviation; clipped at 0)
+- ``lognormal:0.8,0.5`` (median, sigma)
+- ``exponential:0.8`` (mean)
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.fake_openai --port 8081 --latency lognormal:0.8,0.5 \\
+        --error-rate 0.01 --rate-limit-rate 0.02
+"""
+import argparse
+import json
+import math
+import random
+import ssl
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+WORDS = (
+    "la respuesta simulada del asistente incluye algunas palabras de relleno "
+    "para que el tamaño se parezca a una respuesta real del modelo"
+).split()
+
+
+class LatencyModel:
+    """Random latency drawn from a named distribution."""
+    
+    def __init__(self, spec: str, rng: Optional[random.Random] = None):
+        """Initialize latency model.
+        
+        Args:
+            spec: Distribution spec, e.g. ``lognormal:0.8,0.5``
+            rng: Random generator (a new one by default)
+            
+        Raises:
+            ValueError: If the spec is not valid
+        """
+        self.spec = spec
+        self.rng = rng or random.Random()
+        name, _, raw_args = spec.partition(":")
+        try:
+            args = [float(value) for value in raw_args.split(",") if value]
+        except ValueError:
+            raise ValueError(f"Distribución de latencia inválida: {spec}")
+        
+        samplers: Dict[str, Callable[[], float]] = {
+            "fixed": lambda: args[0],
+            "uniform": lambda: self.rng.uniform(args[0], args[1]),
+            "normal": lambda: self.rng.gauss(args[0], args[1]),
+            "lognormal": lambda: self.rng.lognormvariate(math.log(args[0]), args[1]),
+            "exponential": lambda: self.rng.expovariate(1 / args[0])
+        }
+        arity = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if name not in samplers or len(args) != arity[name] or args[0] < 0:
+            raise ValueError(f"Distribución de latencia inválida: {spec}")
+        if name in ("lognormal", "exponential") and args[0] == 0:
+            raise ValueError(f"Distribución de latencia inválida: {spec}")
+        self._sample = samplers[name]
+    
+    def sample(self) -> float:
+        """Draw a latency in seconds (never negative)."""
+        return max(0.0, self._sample())
+
+
+@dataclass
+class FakeOpenAIConfig:
+    """Behaviour of the fake server.
+    
+    Attributes:
+        latency: Time to the first byte of each reply
+        chunk_delay: Seconds between streamed chunks
+        reply_words: Words per chat reply
+        error_rate: Fraction of requests answered with a 500 error
+        rate_limit_rate: Fraction of requests answered with a 429 error
+        retry_after: Retry-After seconds sent with 429 responses
+    """
+    
+    latency: LatencyModel = field(default_factory=lambda: LatencyModel("fixed:0"))
+    chunk_delay: float = 0.0
+    reply_words: int = 60
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering like the Chat Completions API."""
+    
+    daemon_threads = True
+    
+    def __init__(
+        self,
+        address: tuple,
+        config: FakeOpenAIConfig,
+        tls: Optional[ssl.SSLContext] = None
+    ):
+        """Initialize fake server.
+        
+        Args:
+            address: (host, port) to listen on (port 0 picks a free one)
+            config: Server behaviour
+            tls: Server-side TLS context (None serves plain HTTP)
+        """
+        super().__init__(address, _CompletionsHandler)
+        self.config = config
+        self.tls = tls
+        if tls is not None:
+            # Handshake on the handler thread, not in the accept loop
+            self.socket = tls.wrap_socket(
+                self.socket, server_side=True, do_handshake_on_connect=False
+            )
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "streams": 0,
+            "errors": 0,
+            "rate_limited": 0
+        }
+    
+    @property
+    def base_url(self) -> str:
+        """OpenAI base URL of this server."""
+        host, port = self.server_address[:2]
+        scheme = "https" if self.tls is not None else "http"
+        return f"{scheme}://{host}:{port}/v1"
+    
+    def count(self, name: str) -> None:
+        """Increment a request counter."""
+        with self._lock:
+            self._stats[name] += 1
+    
+    def roll(self) -> float:
+        """Draw a uniform number for error injection."""
+        with self._lock:
+            return self.config.latency.rng.random()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get request counters."""
+        with self._lock:
+            return dict(self._stats)
+
+
+class _CompletionsHandler(BaseHTTPRequestHandler):
+    """Request handler of the fake server."""
+    
+    # Keep-alive, so the app's connection pool is exercised as in production
+    protocol_version = "HTTP/1.1"
+    server: FakeOpenAIServer
+    
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silence per-request logging."""
+    
+    def _send_json(
+        self,
+        status: int,
+        body: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Send a JSON response."""
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def _send_error(
+        self,
+        status: int,
+        error_type: str,
+        message: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Send an error in the OpenAI error format."""
+        self._send_json(
+            status,
+            {"error": {"message": message, "type": error_type, "code": None}},
+            headers
+        )
+    
+    def _write_chunk(self, data: bytes) -> None:
+        """Write one HTTP/1.1 chunk (an empty one ends the body)."""
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+    
+    def do_GET(self) -> None:
+        """Answer model listings (used to open connections ahead of traffic)."""
+        self._send_json(200, {"object": "list", "data": []})
+    
+    def do_HEAD(self) -> None:
+        """Answer connection warm-up requests after one simulated round trip."""
+        time.sleep(self.server.config.latency.sample())
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+    
+    def do_POST(self) -> None:
+        """Answer a chat completion."""
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_error(
+                404, "invalid_request_error", f"Ruta desconocida: {self.path}"
+            )
+            return
+        try:
+            request = json.loads(raw_body)
+        except ValueError:
+            self._send_error(400, "invalid_request_error", "JSON inválido")
+            return
+        
+        server = self.server
+        config = server.config
+        server.count("requests")
+        roll = server.roll()
+        if roll < config.rate_limit_rate:
+            server.count("rate_limited")
+            self._send_error(
+                429, "rate_limit_exceeded", "Rate limit simulado",
+                {"Retry-After": f"{config.retry_after:g}"}
+            )
+            return
+        if roll < config.rate_limit_rate + config.error_rate:
+            server.count("errors")
+            self._send_error(500, "server_error", "Error simulado")
+            return
+        
+        time.sleep(config.latency.sample())
+        
+        # Title requests are short; chat replies have reply_words words
+        max_tokens = request.get("max_tokens") or config.reply_words
+        count = min(max_tokens, config.reply_words)
+        words = [WORDS[index % len(WORDS)] for index in range(count)]
+        model = request.get("model", "gpt-3.5-turbo")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        
+        usage = {
+            "prompt_tokens": len(raw_body) // 4,
+            "completion_tokens": len(words),
+            "total_tokens": len(raw_body) // 4 + len(words)
+        }
+        if request.get("stream"):
+            server.count("streams")
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            self._stream(completion_id, created, model, words, usage if include_usage else None)
+            return
+        
+        content = " ".join(words)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+    
+    def _stream(
+        self,
+        completion_id: str,
+        created: int,
+        model: str,
+        words: list,
+        usage: Optional[Dict[str, int]] = None
+    ) -> None:
+        """Stream a reply as Server-Sent Events, one word per chunk.
+        
+        With ``usage`` (``stream_options.include_usage``), a final chunk with
+        no choices carries the token counts, as the real API does.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        def event(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n"
+        
+        self._write_chunk(event({"role": "assistant", "content": ""}))
+        for index, word in enumerate(words):
+            if index and self.server.config.chunk_delay:
+                time.sleep(self.server.config.chunk_delay)
+            self._write_chunk(event({"content": word if index == 0 else f" {word}"}))
+        self._write_chunk(event({}, "stop"))
+        if usage is not None:
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage
+            }
+            self._write_chunk(b"data: " + json.dumps(final).encode("utf-8") + b"\n\n")
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def start_server(
+    config: FakeOpenAIConfig,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    tls: Optional[ssl.SSLContext] = None
+) -> FakeOpenAIServer:
+    """Start the fake server on a background thread.
+    
+    Args:
+        config: Server behaviour
+        host: Listen address
+        port: Listen port (0 picks a free one)
+        tls: Server-side TLS context (None serves plain HTTP)
+        
+    Returns:
+        Running server (stop it with ``shutdown()``)
+    """
+    server = FakeOpenAIServer((host, port), config, tls)
+    threading.Thread(
+        target=server.serve_forever, name="fake-openai", daemon=True
+    ).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the fake server options to a parser."""
+    parser.add_argument("--latency", default="lognormal:0.8,0.5",
+                        help="Distribución de latencia hasta el primer byte")
+    parser.add_argument("--chunk-delay", type=float, default=0.02,
+                        help="Segundos entre chunks en streaming")
+    parser.add_argument("--reply-words", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fracción de respuestas 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, help="Semilla (resultados reproducibles)")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeOpenAIConfig:
+    """Build the server behaviour from parsed options."""
+    return FakeOpenAIConfig(
+        latency=LatencyModel(args.latency, random.Random(args.seed)),
+        chunk_delay=args.chunk_delay,
+        reply_words=args.reply_words,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    )
+
+
+def main() -> int:
+    """Run the fake server in the foreground.
+    
+    Returns:
+        Process exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--certfile", help="Certificado PEM (sirve HTTPS)")
+    parser.add_argument("--keyfile", help="Clave privada PEM del certificado")
+    add_arguments(parser)
+    args = parser.parse_args()
+    
+    try:
+        config = config_from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    tls = None
+    if args.certfile:
+        tls = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        tls.load_cert_chain(args.certfile, args.keyfile)
+    server = FakeOpenAIServer((args.host, args.port), config, tls)
+    print(f"OpenAI simulado en {server.base_url} (latencia {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Peticiones: {server.get_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
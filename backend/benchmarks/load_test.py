@@ -0,0 +1,588 @@
+"""End-to-end load test of the app against the fake OpenAI server.
+
+Starts the fake OpenAI server (``benchmarks.fake_openai``) and the real app
+built by ``factory.create_app`` (Werkzeug threaded server, or uvicorn with
+``--asgi``; the pre-fork production server ``serve.py`` with ``--workers``)
+in a child process with a throwaway data directory, then runs
+``--users`` concurrent simulated users for ``--duration`` seconds. Each
+user picks actions from a weighted mix:
+
+- ``create``: ``POST /api/v1/chat``
+- ``send``: ``POST /api/v1/chat/<id>`` (streamed for ``--stream-ratio``)
+- ``history``: ``GET /api/v1/history?limit=20``
+- ``load``: ``GET /api/v1/chat/<id>``
+
+The report gives throughput and p50/p95/p99 latency per endpoint, and the
+CPU, RSS and thread count of the server processes (read from ``/proc``,
+Linux only). The app's rate limits are raised for the run unless
+``--keep-rate-limits`` is given. ``--url`` targets an already running
+deployment instead (``--server-pid`` enables resource sampling).
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.load_test --users 50 --duration 60 \\
+        --mix create=1,send=4,history=3,load=2 --latency lognormal:0.8,0.5
+    python -m benchmarks.load_test --asgi --users 200 --stream-ratio 1
+    python -m benchmarks.load_test --workers 4 --users 100
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import fake_openai
+
+ACTIONS = ("create", "send", "history", "load")
+DEFAULT_MIX = "create=1,send=4,history=3,load=2"
+# Raised limits for the app under test (requests per window)
+UNLIMITED_RATE = str(10 ** 9)
+
+
+@dataclass
+class EndpointStats:
+    """Samples of one endpoint.
+    
+    Attributes:
+        latencies: Seconds per completed request
+        statuses: Count of responses by status code (0 = transport error)
+    """
+    
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+
+class Recorder:
+    """Thread-safe collection of request samples by endpoint."""
+    
+    def __init__(self):
+        """Initialize recorder."""
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointStats] = {}
+    
+    def record(self, endpoint: str, status: int, seconds: float) -> None:
+        """Record one request.
+        
+        Args:
+            endpoint: Endpoint label
+            status: HTTP status (0 for a transport error)
+            seconds: Request latency
+        """
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, EndpointStats())
+            stats.latencies.append(seconds)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+    
+    def snapshot(self) -> Dict[str, EndpointStats]:
+        """Get the samples collected so far."""
+        with self._lock:
+            return dict(self._endpoints)
+
+
+class ResourceSampler:
+    """Periodic CPU, memory and thread sampling of a process via /proc.
+    
+    The process's descendants (pre-fork server workers) are included.
+    """
+    
+    def __init__(self, pid: int, interval: float = 0.5):
+        """Initialize resource sampler.
+        
+        Args:
+            pid: Process to observe (with its descendants)
+            interval: Seconds between samples
+        """
+        self.pid = pid
+        self.interval = interval
+        self.available = Path(f"/proc/{pid}/stat").exists()
+        self._ticks = os.sysconf("SC_CLK_TCK") if self.available else 100
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cpu_start = 0.0
+        self._cpu_end = 0.0
+        self._started = 0.0
+        self._ended = 0.0
+        self.peak_rss_bytes = 0
+        self.peak_threads = 0
+    
+    def _pids(self) -> List[int]:
+        """List the process and its live descendants."""
+        pids, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as children_file:
+                    pending.extend(int(child) for child in children_file.read().split())
+            except OSError:
+                pass
+        return pids
+    
+    def _cpu_seconds(self) -> float:
+        """Read user + system CPU time of the process tree."""
+        ticks = 0
+        for pid in self._pids():
+            try:
+                with open(f"/proc/{pid}/stat", "rb") as stat_file:
+                    # Fields after the command name, which may contain spaces
+                    fields = stat_file.read().rsplit(b")", 1)[1].split()
+            except OSError:
+                if pid == self.pid:
+                    raise
+                continue
+            ticks += int(fields[11]) + int(fields[12])
+        return ticks / self._ticks
+    
+    def _sample_status(self) -> None:
+        """Update the memory and thread peaks (summed over the tree)."""
+        rss_bytes = threads = 0
+        for pid in self._pids():
+            try:
+                with open(f"/proc/{pid}/status", encoding="utf-8") as status_file:
+                    for line in status_file:
+                        if line.startswith("VmRSS:"):
+                            rss_bytes += int(line.split()[1]) * 1024
+                        elif line.startswith("Threads:"):
+                            threads += int(line.split()[1])
+            except OSError:
+                if pid == self.pid:
+                    raise
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss_bytes)
+        self.peak_threads = max(self.peak_threads, threads)
+    
+    def _run(self) -> None:
+        """Sample until stopped (background thread)."""
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample_status()
+            except OSError:
+                return
+    
+    def start(self) -> None:
+        """Start sampling."""
+        if not self.available:
+            return
+        self._cpu_start = self._cpu_seconds()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop sampling."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        try:
+            self._sample_status()
+            self._cpu_end = self._cpu_seconds()
+        except OSError:
+            self._cpu_end = self._cpu_start
+        self._ended = time.monotonic()
+    
+    def report(self) -> Dict[str, Any]:
+        """Summarize the resource usage of the sampled window."""
+        if not self.available or not self._ended:
+            return {"available": False}
+        cpu_seconds = self._cpu_end - self._cpu_start
+        wall_seconds = self._ended - self._started
+        return {
+            "available": True,
+            "cpu_seconds": round(cpu_seconds, 3),
+            "cpu_percent": round(100 * cpu_seconds / wall_seconds, 1) if wall_seconds else 0.0,
+            "peak_rss_mb": round(self.peak_rss_bytes / 2 ** 20, 1),
+            "peak_threads": self.peak_threads
+        }
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse an action mix such as ``create=1,send=4``."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Peso inválido en la mezcla: {item}")
+        if name not in ACTIONS or mix[name] < 0:
+            raise argparse.ArgumentTypeError(f"Acción inválida en la mezcla: {item}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("La mezcla necesita al menos un peso positivo")
+    return mix
+
+
+def free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def serve_app(port: int, env: Dict[str, str], asgi: bool, workers: int = 0) -> None:
+    """Serve the app in a child process.
+    
+    The environment is applied before the app modules are imported, so the
+    settings pick up the test data directory and the fake OpenAI URL.
+    
+    Args:
+        port: Listen port
+        env: Environment overrides
+        asgi: Serve the ASGI app with uvicorn instead of Werkzeug
+        workers: Serve with the pre-fork production server (``serve.py``)
+            and this many workers (0 = single process)
+    """
+    os.environ.update(env)
+    if workers:
+        import serve
+        
+        serve.main([
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "--mode", "asgi" if asgi else "wsgi"
+        ])
+        return
+    if asgi:
+        import uvicorn
+        from factory import create_asgi_app
+        
+        uvicorn.run(
+            create_asgi_app(), host="127.0.0.1", port=port,
+            log_level="warning", log_config=None
+        )
+        return
+    
+    from werkzeug.serving import make_server
+    from factory import create_app
+    
+    make_server("127.0.0.1", port, create_app(), threaded=True).serve_forever()
+
+
+def wait_ready(url: str, timeout: float) -> None:
+    """Wait until the app answers its health check.
+    
+    Raises:
+        RuntimeError: If the app is not up within the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/api/v1/health", timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"La app no respondió en {url} tras {timeout:.0f}s")
+
+
+class SimulatedUser:
+    """One user issuing a weighted mix of requests in a loop."""
+    
+    def __init__(
+        self,
+        url: str,
+        mix: Dict[str, float],
+        recorder: Recorder,
+        stream_ratio: float,
+        think_seconds: float,
+        seed: int
+    ):
+        """Initialize simulated user.
+        
+        Args:
+            url: App base URL
+            mix: Action weights
+            recorder: Sample collector
+            stream_ratio: Fraction of messages sent with streaming
+            think_seconds: Mean pause between actions
+            seed: Random seed of this user
+        """
+        self.url = url
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.recorder = recorder
+        self.stream_ratio = stream_ratio
+        self.think_seconds = think_seconds
+        self.rng = random.Random(seed)
+        self.chat_ids: List[str] = []
+        self.client = httpx.Client(base_url=url, timeout=120.0)
+    
+    def _request(
+        self,
+        endpoint: str,
+        method: str,
+        path: str,
+        **kwargs: Any
+    ) -> Optional[httpx.Response]:
+        """Send a request and record its latency."""
+        started = time.perf_counter()
+        try:
+            response = self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, 0, time.perf_counter() - started)
+            return None
+        self.recorder.record(endpoint, response.status_code, time.perf_counter() - started)
+        return response
+    
+    def create(self) -> None:
+        """Create a chat."""
+        response = self._request("POST /api/v1/chat", "POST", "/api/v1/chat")
+        if response is not None and response.status_code == 201:
+            self.chat_ids.append(response.json()["chat_id"])
+    
+    def send(self) -> None:
+        """Send a message to one of the user's chats."""
+        if not self.chat_ids:
+            self.create()
+            return
+        chat_id = self.rng.choice(self.chat_ids)
+        body = {"mensaje": f"Pregunta de carga {self.rng.randrange(10 ** 6)}"}
+        
+        if self.rng.random() >= self.stream_ratio:
+            self._request("POST /api/v1/chat/<id>", "POST", f"/api/v1/chat/{chat_id}", json=body)
+            return
+        
+        endpoint = "POST /api/v1/chat/<id> (stream)"
+        started = time.perf_counter()
+        try:
+            with self.client.stream(
+                "POST", f"/api/v1/chat/{chat_id}", json={**body, "stream": True}
+            ) as response:
+                for _ in response.iter_bytes():
+                    pass
+                status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        self.recorder.record(endpoint, status, time.perf_counter() - started)
+    
+    def history(self) -> None:
+        """Fetch the first history page."""
+        self._request("GET /api/v1/history", "GET", "/api/v1/history", params={"limit": 20})
+    
+    def load(self) -> None:
+        """Load one of the user's chats."""
+        if not self.chat_ids:
+            self.create()
+            return
+        chat_id = self.rng.choice(self.chat_ids)
+        self._request("GET /api/v1/chat/<id>", "GET", f"/api/v1/chat/{chat_id}")
+    
+    def run(self, deadline: float) -> None:
+        """Issue requests until the deadline."""
+        try:
+            while time.monotonic() < deadline:
+                action = self.rng.choices(self.actions, self.weights)[0]
+                getattr(self, action)()
+                if self.think_seconds:
+                    time.sleep(self.rng.expovariate(1 / self.think_seconds))
+        finally:
+            self.client.close()
+
+
+def run_load(
+    url: str,
+    users: int,
+    duration: float,
+    mix: Dict[str, float],
+    stream_ratio: float,
+    think_seconds: float,
+    seed: int
+) -> Tuple[Recorder, float]:
+    """Run the simulated users.
+    
+    Returns:
+        Tuple of (recorder, elapsed seconds)
+    """
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=SimulatedUser(
+                url, mix, recorder, stream_ratio, think_seconds, seed + index
+            ).run,
+            args=(deadline,),
+            name=f"user-{index}",
+            daemon=True
+        )
+        for index in range(users)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.monotonic() - started
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """Compute throughput and latency percentiles per endpoint."""
+    summary = {}
+    for endpoint, stats in sorted(recorder.snapshot().items()):
+        ordered = sorted(stats.latencies)
+        errors = sum(count for status, count in stats.statuses.items() if not 200 <= status < 400)
+        summary[endpoint] = {
+            "requests": len(ordered),
+            "errors": errors,
+            "statuses": {str(status): count for status, count in sorted(stats.statuses.items())},
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0
+        }
+    return summary
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the load test report as a table."""
+    print(f"\n{report['users']} usuarios, {report['elapsed_seconds']:.1f}s")
+    print(
+        f"{'endpoint':<34}{'req':>7}{'err':>6}{'req/s':>9}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    )
+    for endpoint, stats in report["endpoints"].items():
+        print(
+            f"{endpoint:<34}{stats['requests']:>7}{stats['errors']:>6}"
+            f"{stats['throughput_rps']:>9.1f}{stats['p50_ms']:>9.1f}"
+            f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+        )
+    total = report["total"]
+    print(
+        f"{'total':<34}{total['requests']:>7}{total['errors']:>6}"
+        f"{total['throughput_rps']:>9.1f}"
+    )
+    
+    server = report["server"]
+    if server.get("available"):
+        print(
+            f"\nServidor: CPU {server['cpu_seconds']}s ({server['cpu_percent']}%), "
+            f"RSS máx. {server['peak_rss_mb']} MB, hilos máx. {server['peak_threads']}"
+        )
+    if report.get("fake_openai"):
+        print(f"OpenAI simulado: {report['fake_openai']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the load test.
+    
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+        
+    Returns:
+        Process exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="Segundos de carga")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Pesos por acción (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--stream-ratio", type=float, default=0.5,
+                        help="Fracción de mensajes enviados en streaming")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="Pausa media entre acciones de un usuario (segundos)")
+    parser.add_argument("--asgi", action="store_true",
+                        help="Servir la app con uvicorn (modo asíncrono)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Servir con serve.py (pre-fork) y N workers")
+    parser.add_argument("--storage-backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="No elevar los rate limits de la app")
+    parser.add_argument("--url", help="Probar una app ya desplegada en esta URL")
+    parser.add_argument("--server-pid", type=int, help="PID a muestrear con --url")
+    parser.add_argument("--output", type=Path, help="Archivo JSON del reporte")
+    fake_openai.add_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    fake_server = None
+    app_process = None
+    server_pid = args.server_pid
+    url = args.url
+    
+    try:
+        if url is None:
+            fake_server = fake_openai.start_server(fake_openai.config_from_args(args))
+            port = free_port()
+            env = {
+                "BASE_DIR": tempfile.mkdtemp(prefix="synapse-load-"),
+                "OPENAI_APIKEY": "sk-load-test",
+                "OPENAI_BASE_URL": fake_server.base_url,
+                "STORAGE_BACKEND": args.storage_backend,
+                "LOG_LEVEL": "WARNING"
+            }
+            if not args.keep_rate_limits:
+                env.update({
+                    "RATE_LIMIT_PER_DAY": UNLIMITED_RATE,
+                    "RATE_LIMIT_PER_HOUR": UNLIMITED_RATE,
+                    "RATE_LIMIT_TOKENS_PER_MINUTE": "0"
+                })
+            # Spawn, so the child imports the app with the environment above
+            context = multiprocessing.get_context("spawn")
+            app_process = context.Process(
+                target=serve_app, args=(port, env, args.asgi, args.workers), daemon=True
+            )
+            app_process.start()
+            server_pid = app_process.pid
+            url = f"http://127.0.0.1:{port}"
+            print(
+                f"App en {url} (datos en {env['BASE_DIR']}), "
+                f"OpenAI simulado en {fake_server.base_url}"
+            )
+        
+        wait_ready(url, timeout=60.0)
+        sampler = ResourceSampler(server_pid) if server_pid else None
+        if sampler:
+            sampler.start()
+        recorder, elapsed = run_load(
+            url, args.users, args.duration, args.mix,
+            args.stream_ratio, args.think, args.seed or 0
+        )
+        if sampler:
+            sampler.stop()
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.join(10)
+        if fake_server is not None:
+            fake_server.shutdown()
+    
+    endpoints = summarize(recorder, elapsed)
+    requests = sum(stats["requests"] for stats in endpoints.values())
+    report = {
+        "users": args.users,
+        "elapsed_seconds": round(elapsed, 2),
+        "mix": args.mix,
+        "endpoints": endpoints,
+        "total": {
+            "requests": requests,
+            "errors": sum(stats["errors"] for stats in endpoints.values()),
+            "throughput_rps": round(requests / elapsed, 2)
+        },
+        "server": sampler.report() if sampler else {"available": False},
+        "fake_openai": fake_server.get_stats() if fake_server else None
+    }
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Reporte guardado en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,530 @@
+"""Microbenchmarks of the repository and service hot paths.
+
+Measures, on a throwaway data directory populated with a synthetic corpus:
+
+- ``chat_repo.load`` / ``chat_repo.save`` (per chat length)
+- ``metadata_repo.load`` / ``get`` / ``update`` (per corpus size)
+- ``chat_service.get_history`` (per corpus size)
+- ``chat_service._apply_context_limit`` (per chat length)
+- ``chat_service.process_message`` with OpenAI mocked (per corpus size and
+  chat length)
+
+Metadata exists for every chat of the corpus; message logs are written for
+a sample of ``--sample`` chats only, since loading a chat does not depend on
+how many other chats exist. Results are written as JSON and, with
+``--baseline``, compared against a previous run: the process exits with 1
+when a median regresses more than ``--threshold``. Baselines are only
+comparable on the same machine and configuration.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.suite --chats 100,10000 --messages 20,200 \\
+        --output benchmarks/baseline.json
+    python -m benchmarks.suite --chats 100,10000 --messages 20,200 \\
+        --output results.json --baseline benchmarks/baseline.json
+"""
+import argparse
+import logging
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import types
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.locks import ChatLockManager
+from models.chat import ChatMetadata
+from models.message import Message
+from repositories.chat_repository import ChatRepository
+from repositories.metadata_repository import MetadataRepository
+from repositories.prompt_registry import PromptRegistry
+from repositories.sqlite_chat_repository import SQLiteChatRepository
+from repositories.sqlite_database import SQLiteDatabase
+from repositories.sqlite_metadata_repository import SQLiteMetadataRepository
+from services.chat_service import ChatService
+from services.openai_service import OpenAIService
+from utils import serialization
+from utils.serialization import dumps_str, loads
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.25
+# Medians closer than this are treated as equal, whatever the ratio
+NOISE_FLOOR_SECONDS = 50e-6
+REPLY = "Respuesta simulada del asistente. " * 6
+
+
+@dataclass
+class BenchResult:
+    """Timing of one benchmark case.
+    
+    Attributes:
+        name: Measured operation
+        params: Case parameters (backend, corpus size, chat length)
+        iterations: Number of timed calls
+        median_s: Median seconds per call
+        p95_s: 95th percentile seconds per call
+        min_s: Fastest call
+        mean_s: Mean seconds per call
+    """
+    
+    name: str
+    params: Dict[str, Any]
+    iterations: int
+    median_s: float
+    p95_s: float
+    min_s: float
+    mean_s: float
+    
+    @property
+    def key(self) -> str:
+        """Identifier used to match a case against the baseline."""
+        params = ",".join(f"{name}={value}" for name, value in sorted(self.params.items()))
+        return f"{self.name}[{params}]"
+
+
+@dataclass
+class BenchConfig:
+    """Timing budget of each case.
+    
+    Attributes:
+        iterations: Maximum timed calls
+        min_iterations: Timed calls made even past the time budget
+        max_seconds: Time budget of a case
+        warmup: Untimed calls before measuring
+    """
+    
+    iterations: int = 50
+    min_iterations: int = 5
+    max_seconds: float = 2.0
+    warmup: int = 2
+
+
+@dataclass
+class Corpus:
+    """Storage and services over a synthetic data directory.
+    
+    Attributes:
+        backend: Storage backend ('json' or 'sqlite')
+        root: Data directory
+        chat_repo: Chat repository
+        metadata_repo: Metadata repository
+        chat_service: Chat service with a mocked OpenAI client
+        chat_ids: All chat ids of the corpus
+        sample_ids: Chats with a message log
+    """
+    
+    backend: str
+    root: Path
+    chat_repo: Any
+    metadata_repo: Any
+    chat_service: ChatService
+    chat_ids: List[str] = field(default_factory=list)
+    sample_ids: List[str] = field(default_factory=list)
+
+
+class _FakeCompletions:
+    """Chat Completions endpoint returning a fixed reply."""
+    
+    def create(self, **params: Any) -> Any:
+        message = types.SimpleNamespace(content=REPLY)
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=message)],
+            usage=types.SimpleNamespace(
+                prompt_tokens=100, completion_tokens=50, total_tokens=150
+            )
+        )
+
+
+class FakeOpenAIClient:
+    """Stand-in for the OpenAI client (no network, constant latency 0)."""
+    
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=_FakeCompletions())
+
+
+def build_messages(count: int) -> List[Message]:
+    """Build an alternating user/assistant conversation.
+    
+    Args:
+        count: Number of messages
+        
+    Returns:
+        List of messages
+    """
+    return [
+        Message(
+            role="user" if index % 2 == 0 else "assistant",
+            content=f"Mensaje {index}: " + "contenido de ejemplo con acentos áéí " * 8
+        )
+        for index in range(count)
+    ]
+
+
+def build_corpus(backend: str, root: Path, chats: int) -> Corpus:
+    """Create repositories and chat metadata for a corpus.
+    
+    Args:
+        backend: Storage backend ('json' or 'sqlite')
+        root: Empty data directory
+        chats: Number of chats
+        
+    Returns:
+        Corpus without message logs
+    """
+    if backend == "sqlite":
+        database = SQLiteDatabase(root / "synapse.db")
+        chat_repo = SQLiteChatRepository(database)
+        metadata_repo = SQLiteMetadataRepository(database)
+    else:
+        # Disable the message cache so loads read the log every time
+        chat_repo = ChatRepository(chats_dir=root / "chats", cache_max_messages=0)
+        metadata_repo = MetadataRepository(
+            metadata_dir=root / "metadata",
+            legacy_file=root / "chats_metadata.json",
+            layout_lock_file=root / "metadata.lock"
+        )
+    
+    chat_service = ChatService(
+        chat_repo,
+        metadata_repo,
+        OpenAIService(FakeOpenAIClient()),
+        lock_manager=ChatLockManager(lock_dir=root / "locks"),
+        prompt_registry=PromptRegistry(prompts_dir=root / "prompts")
+    )
+    corpus = Corpus(backend, root, chat_repo, metadata_repo, chat_service)
+    
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    metadata = {}
+    for index in range(chats):
+        chat_id = str(uuid.uuid4())
+        timestamp = (started + timedelta(seconds=index)).isoformat()
+        metadata[chat_id] = ChatMetadata(
+            id=chat_id,
+            title=f"Chat de prueba {index}",
+            created_at=timestamp,
+            last_updated=timestamp
+        )
+        corpus.chat_ids.append(chat_id)
+    metadata_repo.save(metadata)
+    return corpus
+
+
+def write_chat_logs(corpus: Corpus, sample: int, messages: int) -> None:
+    """Write message logs for a sample of the corpus chats.
+    
+    Args:
+        corpus: Corpus to populate
+        sample: Number of chats with a log
+        messages: Messages per chat (after the system message)
+    """
+    system = corpus.chat_service._get_system_message()
+    conversation = [system] + build_messages(messages)
+    corpus.sample_ids = corpus.chat_ids[:sample]
+    for chat_id in corpus.sample_ids:
+        corpus.chat_repo.save(chat_id, conversation)
+
+
+def measure(
+    name: str,
+    params: Dict[str, Any],
+    func: Callable[[int], Any],
+    config: BenchConfig
+) -> BenchResult:
+    """Time repeated calls of an operation.
+    
+    Args:
+        name: Measured operation
+        params: Case parameters
+        func: Operation, called with the iteration number
+        config: Timing budget
+        
+    Returns:
+        Timing statistics
+    """
+    for index in range(config.warmup):
+        func(index)
+    
+    samples: List[float] = []
+    deadline = time.perf_counter() + config.max_seconds
+    for index in range(config.iterations):
+        started = time.perf_counter()
+        func(config.warmup + index)
+        samples.append(time.perf_counter() - started)
+        if len(samples) >= config.min_iterations and time.perf_counter() > deadline:
+            break
+    
+    ordered = sorted(samples)
+    return BenchResult(
+        name=name,
+        params=params,
+        iterations=len(samples),
+        median_s=statistics.median(ordered),
+        p95_s=ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        min_s=ordered[0],
+        mean_s=statistics.fmean(ordered)
+    )
+
+
+def bench_metadata(corpus: Corpus, config: BenchConfig) -> List[BenchResult]:
+    """Benchmark metadata access and the history listing.
+    
+    Args:
+        corpus: Corpus with metadata
+        config: Timing budget
+        
+    Returns:
+        Results of the metadata cases
+    """
+    params = {"backend": corpus.backend, "chats": len(corpus.chat_ids)}
+    chat_ids = corpus.chat_ids
+    metadata_repo = corpus.metadata_repo
+    
+    def update(index: int) -> None:
+        chat_id = chat_ids[index % len(chat_ids)]
+        metadata = metadata_repo.get(chat_id)
+        metadata.last_updated = datetime.now(timezone.utc).isoformat()
+        metadata_repo.update(chat_id, metadata)
+    
+    return [
+        measure("metadata_repo.load", params, lambda _: metadata_repo.load(), config),
+        measure(
+            "metadata_repo.get", params,
+            lambda index: metadata_repo.get(chat_ids[index % len(chat_ids)]),
+            config
+        ),
+        measure("metadata_repo.update", params, update, config),
+        measure(
+            "chat_service.get_history", params,
+            lambda _: corpus.chat_service.get_history(),
+            config
+        )
+    ]
+
+
+def bench_chats(corpus: Corpus, messages: int, config: BenchConfig) -> List[BenchResult]:
+    """Benchmark chat storage, context building and full turns.
+    
+    Args:
+        corpus: Corpus with message logs
+        messages: Messages per chat
+        config: Timing budget
+        
+    Returns:
+        Results of the chat cases
+    """
+    params = {
+        "backend": corpus.backend,
+        "chats": len(corpus.chat_ids),
+        "messages": messages
+    }
+    sample_ids = corpus.sample_ids
+    chat_repo = corpus.chat_repo
+    chat_service = corpus.chat_service
+    model = settings.openai_chat_model
+    
+    conversation = chat_repo.load(sample_ids[0])
+    resolved = chat_service._resolve_prompts(conversation)
+    scratch_id = str(uuid.uuid4())
+    
+    results = [
+        measure(
+            "chat_repo.load", params,
+            lambda index: chat_repo.load(sample_ids[index % len(sample_ids)]),
+            config
+        ),
+        measure(
+            "chat_repo.save", params,
+            lambda _: chat_repo.save(scratch_id, conversation),
+            config
+        ),
+        measure(
+            "chat_service._apply_context_limit", params,
+            lambda _: chat_service._apply_context_limit(list(resolved), model),
+            config
+        ),
+        measure(
+            "chat_service.process_message", params,
+            lambda index: chat_service.process_message(
+                sample_ids[index % len(sample_ids)], f"Pregunta {index}", model
+            ),
+            config
+        )
+    ]
+    chat_repo.delete(scratch_id)
+    return results
+
+
+def run_suite(
+    backend: str,
+    chat_counts: List[int],
+    message_counts: List[int],
+    sample: int,
+    config: BenchConfig
+) -> List[BenchResult]:
+    """Run every case over the corpus size x chat length grid.
+    
+    Args:
+        backend: Storage backend ('json' or 'sqlite')
+        chat_counts: Corpus sizes
+        message_counts: Chat lengths
+        sample: Chats with a message log per corpus
+        config: Timing budget
+        
+    Returns:
+        All results
+    """
+    results: List[BenchResult] = []
+    for chats in chat_counts:
+        with tempfile.TemporaryDirectory(prefix="synapse-bench-") as directory:
+            print(f"Corpus: {chats} chats ({backend})", file=sys.stderr)
+            corpus = build_corpus(backend, Path(directory), chats)
+            results.extend(bench_metadata(corpus, config))
+            
+            for messages in message_counts:
+                write_chat_logs(corpus, min(sample, chats), messages)
+                results.extend(bench_chats(corpus, messages, config))
+            
+            if backend == "sqlite":
+                corpus.chat_repo.database.close_all()
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and configuration of a run."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlite": sqlite3.sqlite_version,
+        "encoder": "orjson" if serialization.orjson is not None else "json",
+        "storage_fsync": settings.storage_fsync,
+        "storage_group_commit_ms": settings.storage_group_commit_ms
+    }
+
+
+def compare(
+    results: List[BenchResult],
+    baseline: Dict[str, Any],
+    threshold: float
+) -> Tuple[List[str], List[str]]:
+    """Compare results against a baseline run.
+    
+    Args:
+        results: Current results
+        baseline: Decoded baseline document
+        threshold: Allowed relative slowdown of the median (0.25 = 25%)
+        
+    Returns:
+        Tuple of (report lines, regressed case keys)
+    """
+    previous = {
+        BenchResult(**entry).key: BenchResult(**entry)
+        for entry in baseline.get("results", [])
+    }
+    lines = []
+    regressions = []
+    for result in results:
+        before = previous.get(result.key)
+        if before is None:
+            lines.append(f"  nuevo      {result.key}: {result.median_s * 1000:.3f} ms")
+            continue
+        
+        ratio = result.median_s / before.median_s if before.median_s else float("inf")
+        regressed = (
+            ratio > 1 + threshold
+            and result.median_s - before.median_s > NOISE_FLOOR_SECONDS
+        )
+        status = "REGRESIÓN" if regressed else "ok"
+        lines.append(
+            f"  {status:<10} {result.key}: {before.median_s * 1000:.3f} -> "
+            f"{result.median_s * 1000:.3f} ms ({ratio:.2f}x)"
+        )
+        if regressed:
+            regressions.append(result.key)
+    return lines, regressions
+
+
+def parse_counts(value: str) -> List[int]:
+    """Parse a comma separated list of positive integers."""
+    try:
+        counts = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Lista de enteros inválida: {value}")
+    if not counts or min(counts) < 1:
+        raise argparse.ArgumentTypeError(f"Lista de enteros inválida: {value}")
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the suite, write the results and check the baseline.
+    
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+        
+    Returns:
+        Process exit code (1 if a case regressed)
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--chats", type=parse_counts, default=[100, 1000, 10000],
+                        help="Tamaños de corpus, p. ej. 100,1000,100000")
+    parser.add_argument("--messages", type=parse_counts, default=[20, 200],
+                        help="Mensajes por chat, p. ej. 20,200,2000")
+    parser.add_argument("--sample", type=int, default=50,
+                        help="Chats con mensajes por corpus")
+    parser.add_argument("--iterations", type=int, default=BenchConfig.iterations)
+    parser.add_argument("--max-seconds", type=float, default=BenchConfig.max_seconds,
+                        help="Presupuesto de tiempo por caso")
+    parser.add_argument("--output", type=Path, help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", type=Path, help="Resultados previos a comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Regresión máxima tolerada de la mediana (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    
+    # Keep per-call logging out of the measurements
+    logging.disable(logging.INFO)
+    
+    config = BenchConfig(iterations=args.iterations, max_seconds=args.max_seconds)
+    results = run_suite(args.backend, args.chats, args.messages, args.sample, config)
+    
+    for result in results:
+        print(
+            f"{result.key:<80} mediana {result.median_s * 1000:9.3f} ms  "
+            f"p95 {result.p95_s * 1000:9.3f} ms  (n={result.iterations})"
+        )
+    
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "results": [asdict(result) for result in results]
+    }
+    if args.output:
+        args.output.write_text(dumps_str(document) + "\n", encoding="utf-8")
+        print(f"Resultados guardados en {args.output}")
+    
+    if args.baseline is None:
+        return 0
+    if not args.baseline.exists():
+        print(f"Baseline no encontrado: {args.baseline}")
+        return 1
+    
+    lines, regressions = compare(
+        results, loads(args.baseline.read_bytes()), args.threshold
+    )
+    print(f"Comparación con {args.baseline} (umbral {args.threshold:.0%}):")
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} casos con regresión.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,5 @@
 """Application configuration management."""
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pathlib import Path
 from pydantic_settings import BaseSettings
 from pydantic import Field, field_validator
@@ -13,6 +13,25 @@ class Settings(BaseSettings):
     openai_chat_model: str = Field("gpt-3.5-turbo", alias="OPENAI_CHAT_MODEL")
     openai_title_model: str = Field("gpt-3.5-turbo", alias="OPENAI_TITLE_MODEL")
     
+    # Upstream HTTP connection pools (one per traffic class: chat, title)
+    openai_base_url: Optional[str] = Field(None, alias="OPENAI_BASE_URL")
+    openai_max_connections: int = Field(100, alias="OPENAI_MAX_CONNECTIONS")
+    openai_title_max_connections: int = Field(10, alias="OPENAI_TITLE_MAX_CONNECTIONS")
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = Field(60.0, alias="OPENAI_KEEPALIVE_EXPIRY")
+    openai_http2: bool = Field(False, alias="OPENAI_HTTP2")
+    openai_timeout: float = 60.0
+    openai_connect_timeout: float = 5.0
+    openai_pool_timeout: float = 10.0
+    openai_prewarm: bool = Field(False, alias="OPENAI_PREWARM")
+    openai_prewarm_connections: int = 2
+    
+    # Exact-match completion cache (opt-in per purpose)
+    completion_cache_chat: bool = Field(False, alias="COMPLETION_CACHE_CHAT")
+    completion_cache_title: bool = Field(False, alias="COMPLETION_CACHE_TITLE")
+    completion_cache_ttl_seconds: float = Field(300.0, alias="COMPLETION_CACHE_TTL_SECONDS")
+    completion_cache_max_bytes: int = Field(8 * 1024 * 1024, alias="COMPLETION_CACHE_MAX_BYTES")
+    
     # Supported models
     supported_openai_models: List[str] = [
         "gpt-3.5-turbo",
@@ -25,12 +44,22 @@ class Settings(BaseSettings):
     flask_debug: bool = Field(False, alias="FLASK_DEBUG")
     port: int = Field(5000, alias="PORT")
     host: str = Field("0.0.0.0", alias="HOST")
+    # Token for admin endpoints and on-demand profiling (X-Admin-Token);
+    # admin endpoints are disabled when unset
+    admin_token: Optional[str] = Field(None, alias="ADMIN_TOKEN")
     
     # CORS Configuration
     cors_origins: str = Field("*", alias="CORS_ORIGINS")
     
     # Logging Configuration
     log_level: str = Field("INFO", alias="LOG_LEVEL")
+    # 'text' or 'json' (one compact JSON object per line)
+    log_format: str = Field("text", alias="LOG_FORMAT")
+    # Records waiting for the log writer thread; beyond that they are dropped
+    log_queue_size: int = Field(10000, alias="LOG_QUEUE_SIZE")
+    # Fraction of DEBUG records kept per logger (prefix), e.g.
+    # "services.openai_service=0.1,repositories=0.01"
+    log_sample_rates: str = Field("", alias="LOG_SAMPLE_RATES")
     
     # Directory Configuration
     base_dir: Path = Field(default_factory=lambda: Path(__file__).parent.parent)
@@ -42,14 +71,56 @@ def chats_dir(self) -> Path:
     
     @property
     def metadata_file(self) -> Path:
-        """Metadata file path."""
+        """Legacy single-file metadata path (migrated into shards)."""
         return self.chats_dir / "chats_metadata.json"
     
+    @property
+    def metadata_dir(self) -> Path:
+        """Sharded metadata directory."""
+        return self.base_dir / "data" / "metadata"
+    
+    @property
+    def prompts_dir(self) -> Path:
+        """Prompt registry directory (content-addressed system prompts)."""
+        return self.base_dir / "data" / "prompts"
+    
+    @property
+    def locks_dir(self) -> Path:
+        """Per-chat lock files directory."""
+        return self.base_dir / "data" / "locks"
+    
     @property
     def metadata_lock_file(self) -> Path:
-        """Metadata lock file path."""
+        """Metadata layout lock path (taken only while (re)sharding)."""
         return self.chats_dir / "metadata.lock"
     
+    @property
+    def sqlite_database_file(self) -> Path:
+        """SQLite database path (used when storage_backend is 'sqlite')."""
+        return self.base_dir / "data" / "synapse.db"
+    
+    @property
+    def search_database_file(self) -> Path:
+        """Full-text search index path (SQLite FTS5)."""
+        return self.base_dir / "data" / "search.db"
+    
+    @property
+    def metrics_dir(self) -> Path:
+        """Per-process metrics snapshots directory."""
+        return self.base_dir / "data" / "metrics"
+    
+    @property
+    def rate_limit_database_file(self) -> Path:
+        """Token bucket database path (shared by local worker processes)."""
+        return self.base_dir / "data" / "ratelimit.db"
+    
+    @property
+    def rate_limit_storage(self) -> str:
+        """Storage URI of the request-count limits."""
+        if self.rate_limit_storage_uri:
+            return self.rate_limit_storage_uri
+        return f"sqlite://{self.rate_limit_database_file.as_posix()}"
+    
     @property
     def static_folder(self) -> Path:
         """Static files directory."""
@@ -70,10 +141,93 @@ def log_file(self) -> Path:
         """Log file path."""
         return self.logs_folder / "app.log"
     
+    @property
+    def profiles_dir(self) -> Path:
+        """Request profiles directory."""
+        return self.logs_folder / "profiles"
+    
     # Chat Configuration
     max_title_length: int = 40
-    max_context_length: int = 12
+    # Safety ceiling on messages loaded for a turn; the model's token budget
+    # decides how far back the history is read and how much of it is sent.
+    max_context_length: int = 2000
     title_generation_min_messages: int = 5
+    title_worker_threads: int = 2
+    title_queue_max_size: int = 100
+    title_shutdown_timeout: float = 10.0
+    
+    # Per-chat turn locks (ordering of concurrent sends to one chat)
+    chat_lock_stripes: int = 64
+    chat_lock_timeout: float = 180.0
+    chat_lock_slow_wait_seconds: float = 1.0
+    # Retry-After of a request rejected because a turn holds the chat (409)
+    chat_busy_retry_after: int = 5
+    
+    # Full-text search over titles and messages
+    search_enabled: bool = Field(True, alias="SEARCH_ENABLED")
+    search_default_limit: int = 20
+    search_max_limit: int = 50
+    search_max_query_length: int = 200
+    
+    # Prometheus metrics (GET /api/v1/metrics)
+    metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+    metrics_flush_seconds: float = Field(5.0, alias="METRICS_FLUSH_SECONDS")
+    
+    # Request profiling (per request with X-Profile + admin token, or sampled)
+    profiling_sample_rate: float = Field(0.0, alias="PROFILING_SAMPLE_RATE")
+    # 'speedscope' (sampled stacks, flamegraph) or 'pstats' (cProfile)
+    profiling_format: str = Field("speedscope", alias="PROFILING_FORMAT")
+    profiling_interval_ms: float = 1.0
+    profiling_max_profiles: int = 200
+    
+    # Cold start: import time budget of the app (manage.py startup-report;
+    # 0 disables the check)
+    startup_import_budget_ms: float = Field(300.0, alias="STARTUP_IMPORT_BUDGET_MS")
+    
+    # History Pagination
+    history_default_page_size: int = 50
+    history_max_page_size: int = 200
+    
+    # Context Window (prompt token budgets per model)
+    context_token_budgets: Dict[str, int] = {
+        "gpt-3.5-turbo": 12000,
+        "gpt-4": 6000,
+        "gpt-4o": 24000,
+        "gpt-4o-mini": 24000
+    }
+    context_token_budget_default: int = 8000
+    # Fallback estimator when tiktoken is not installed (calibrated on
+    # Spanish chat text with cl100k_base)
+    context_chars_per_token: float = 3.6
+    context_token_cache_size: int = 8192
+    
+    # Chat Storage
+    storage_backend: str = Field("json", alias="STORAGE_BACKEND")
+    chat_segment_max_messages: int = Field(64, alias="CHAT_SEGMENT_MAX_MESSAGES")
+    chat_cache_max_messages: int = Field(20000, alias="CHAT_CACHE_MAX_MESSAGES")
+    metadata_shards: int = Field(16, alias="METADATA_SHARDS")
+    # Durability: fsync every write, optionally batching concurrent fsyncs
+    # within a short window (0 disables group commit)
+    storage_fsync: bool = Field(True, alias="STORAGE_FSYNC")
+    storage_group_commit_ms: float = Field(0.0, alias="STORAGE_GROUP_COMMIT_MS")
+    
+    # Async Serving (ASGI)
+    async_io_workers: int = 8
+    # Threads running the non-chat Flask routes (history, search, static...)
+    async_flask_workers: int = 8
+    max_request_body_bytes: int = 64 * 1024
+    
+    # Production server (serve.py: gunicorn pre-fork workers)
+    server_workers: int = Field(2, alias="SERVER_WORKERS")
+    # Request threads per worker (WSGI mode)
+    server_threads: int = Field(8, alias="SERVER_THREADS")
+    # 'wsgi' (threaded workers) or 'asgi' (uvicorn workers, async chat turns)
+    server_mode: str = Field("wsgi", alias="SERVER_MODE")
+    # Seconds a worker gets on SIGTERM to finish in-flight requests
+    server_graceful_timeout: int = Field(30, alias="SERVER_GRACEFUL_TIMEOUT")
+    server_keepalive: int = 5
+    # Seconds without a worker heartbeat before the master restarts it
+    server_worker_timeout: int = 60
     
     # Input Validation
     max_message_length: int = 4000
@@ -82,7 +236,16 @@ def log_file(self) -> Path:
     # Rate Limiting
     rate_limit_per_day: int = 200
     rate_limit_per_hour: int = 50
-    rate_limit_chat_per_minute: int = 30
+    # Storage of the per-day/per-hour request counts (a ``limits`` storage
+    # URI such as redis://host:6379); defaults to the token bucket database,
+    # shared by the worker processes of a host
+    rate_limit_storage_uri: Optional[str] = Field(None, alias="RATE_LIMIT_STORAGE_URI")
+    # Token budget per client for chat turns (prompt + completion tokens),
+    # shared by the worker processes of a host; 0 disables it
+    rate_limit_tokens_per_minute: int = Field(20000, alias="RATE_LIMIT_TOKENS_PER_MINUTE")
+    rate_limit_token_burst: int = Field(40000, alias="RATE_LIMIT_TOKEN_BURST")
+    # Completion tokens charged up front (corrected when the reply is known)
+    rate_limit_completion_estimate: int = 500
     
     # Default System Message
     default_system_message: str = """Eres Synapse AI, un asistente inteligente, adaptable y profesional. Tu propósito es proporcionar ayuda útil, precisa y contextualmente apropiada a cada usuario.
@@ -145,6 +308,24 @@ def validate_log_level(cls, v: str) -> str:
             raise ValueError(f"Invalid log level. Must be one of {valid_levels}")
         return v_upper
     
+    @field_validator("storage_backend")
+    @classmethod
+    def validate_storage_backend(cls, v: str) -> str:
+        """Validate storage backend."""
+        valid_backends = ["json", "sqlite"]
+        v_lower = v.lower()
+        if v_lower not in valid_backends:
+            raise ValueError(f"Invalid storage backend. Must be one of {valid_backends}")
+        return v_lower
+    
+    @field_validator("metadata_shards")
+    @classmethod
+    def validate_metadata_shards(cls, v: int) -> int:
+        """Validate metadata shard count."""
+        if v < 1:
+            raise ValueError("METADATA_SHARDS must be at least 1")
+        return v
+    
     @field_validator("openai_chat_model", "openai_title_model")
     @classmethod
     def validate_model(cls, v: str) -> str:
@@ -167,6 +348,18 @@ def cors_origins_list(self) -> List[str]:
             return ["*"]
         return [origin.strip() for origin in self.cors_origins.split(",")]
     
+    @property
+    def log_sample_rates_map(self) -> Dict[str, float]:
+        """Get DEBUG sampling rates as logger prefix -> kept fraction."""
+        rates = {}
+        for entry in self.log_sample_rates.split(","):
+            name, _, rate = entry.partition("=")
+            try:
+                rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+            except ValueError:
+                continue
+        return rates
+    
     class Config:
         """Pydantic configuration."""
         env_file = str(Path(__file__).parent.parent.parent / "config" / ".env")
@@ -1,30 +1,99 @@
-"""Dependency injection and instance management."""
-from typing import Optional
-from openai import OpenAI
+"""Dependency injection and instance management.
+
+``openai`` and ``httpx`` are imported with the first client, not with this
+module: they are the heaviest imports of the app, and a process that has
+not called the model yet (health checks, history, a cold start) does not
+need them.
+"""
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
 
 from core.config import settings
 from core.logging import get_logger
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+    from core.http_client import UpstreamPool
+
 logger = get_logger(__name__)
 
 
+class LazyClient:
+    """Stand-in for an OpenAI client that is created on first use.
+    
+    Attribute access (``client.chat.completions.create``) builds the real
+    client once, from any thread, and forwards to it.
+    """
+    
+    def __init__(self, factory: Callable[[], Any]):
+        """Initialize lazy client.
+        
+        Args:
+            factory: Callable returning the client (None if unavailable)
+        """
+        self._factory = factory
+        self._client = None
+        self._resolved = False
+        self._lock = threading.Lock()
+    
+    def resolve(self) -> Any:
+        """Get the real client, creating it on the first call."""
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    self._client = self._factory()
+                    self._resolved = True
+        return self._client
+    
+    def __bool__(self) -> bool:
+        """Whether the real client could be created (builds it if needed)."""
+        return self.resolve() is not None
+    
+    def __getattr__(self, name: str) -> Any:
+        client = self.resolve()
+        if client is None:
+            raise AttributeError(f"Cliente OpenAI no disponible ({name})")
+        return getattr(client, name)
+
+
 class Dependencies:
     """Container for application dependencies."""
     
     def __init__(self):
         """Initialize dependencies."""
-        self._openai_client: Optional[OpenAI] = None
+        self._openai_client: Optional["OpenAI"] = None
+        self._openai_title_client: Optional["OpenAI"] = None
+        self._async_openai_client: Optional["AsyncOpenAI"] = None
+        self._pools: Dict[str, "UpstreamPool"] = {}
     
     @property
-    def openai_client(self) -> Optional[OpenAI]:
-        """Get OpenAI client instance (lazy initialization)."""
+    def openai_client(self) -> Optional["OpenAI"]:
+        """Get OpenAI client instance for chat traffic (lazy initialization)."""
         if self._openai_client is None:
             self._openai_client = self._create_openai_client()
         return self._openai_client
     
-    def _create_openai_client(self) -> Optional[OpenAI]:
-        """Create OpenAI client instance.
+    @property
+    def openai_title_client(self) -> Optional["OpenAI"]:
+        """Get OpenAI client instance for title traffic (lazy initialization)."""
+        if self._openai_title_client is None:
+            self._openai_title_client = self._create_openai_client(
+                pool_name="title",
+                max_connections=settings.openai_title_max_connections
+            )
+        return self._openai_title_client
+    
+    def _create_openai_client(
+        self,
+        pool_name: str = "chat",
+        max_connections: int = settings.openai_max_connections
+    ) -> Optional["OpenAI"]:
+        """Create OpenAI client instance on its own connection pool.
         
+        Args:
+            pool_name: Name of the connection pool
+            max_connections: Maximum connections of the pool
+            
         Returns:
             OpenAI client or None if API key not configured
         """
@@ -35,8 +104,18 @@ def _create_openai_client(self) -> Optional[OpenAI]:
             return None
         
         try:
-            client = OpenAI(api_key=settings.openai_api_key)
-            logger.info("Cliente OpenAI inicializado.")
+            from openai import OpenAI
+            from core.http_client import UpstreamPool
+            
+            pool = UpstreamPool(pool_name, max_connections)
+            client = OpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                http_client=pool.client
+            )
+            pool.base_url = str(client.base_url)
+            self._pools[pool_name] = pool
+            logger.info("Cliente OpenAI inicializado (pool: %s).", pool_name)
             logger.debug(
                 f"Modelo Chat: {settings.openai_chat_model}, "
                 f"Modelo Título: {settings.openai_title_model}"
@@ -46,9 +125,102 @@ def _create_openai_client(self) -> Optional[OpenAI]:
             logger.exception(f"Error inicializando OpenAI: {e}")
             return None
     
+    @property
+    def async_openai_client(self) -> Optional["AsyncOpenAI"]:
+        """Get AsyncOpenAI client instance (lazy initialization)."""
+        if self._async_openai_client is None:
+            self._async_openai_client = self._create_async_openai_client()
+        return self._async_openai_client
+    
+    def _create_async_openai_client(self) -> Optional["AsyncOpenAI"]:
+        """Create AsyncOpenAI client instance for the async serving mode.
+        
+        Returns:
+            AsyncOpenAI client or None if API key not configured
+        """
+        if not settings.openai_api_key:
+            logger.warning(
+                "OPENAI_APIKEY no encontrada. Funcionalidad AI deshabilitada."
+            )
+            return None
+        
+        try:
+            from openai import AsyncOpenAI
+            from core.http_client import UpstreamPool
+            
+            pool = UpstreamPool(
+                "chat_async", settings.openai_max_connections, is_async=True
+            )
+            client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                http_client=pool.client
+            )
+            pool.base_url = str(client.base_url)
+            self._pools["chat_async"] = pool
+            logger.info("Cliente OpenAI asíncrono inicializado.")
+            return client
+        except Exception as e:
+            logger.exception("Error inicializando OpenAI asíncrono: %s", e)
+            return None
+    
+    def lazy(self, name: str) -> Optional[LazyClient]:
+        """Get a client that is only created when first used.
+        
+        Args:
+            name: Client property ('openai_client', 'openai_title_client'
+                or 'async_openai_client')
+            
+        Returns:
+            LazyClient, or None if no API key is configured
+        """
+        if not settings.openai_api_key:
+            return None
+        return LazyClient(lambda: getattr(self, name))
+    
+    @staticmethod
+    def import_client_modules() -> None:
+        """Import openai and httpx without creating clients.
+        
+        A pre-fork master calls it so its workers inherit the loaded
+        modules instead of importing them on their first model call.
+        """
+        import openai  # noqa: F401
+        import core.http_client  # noqa: F401
+    
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get utilization and wait metrics of the upstream pools.
+        
+        Returns:
+            Dictionary of pool name -> pool metrics
+        """
+        return {name: pool.get_stats() for name, pool in self._pools.items()}
+    
+    def prewarm(self) -> int:
+        """Open connections on the synchronous pools ahead of traffic.
+        
+        Returns:
+            Number of warmed connections
+        """
+        return sum(pool.prewarm() for pool in self._pools.values())
+    
+    async def aprewarm(self) -> int:
+        """Open connections on the async pools (on the serving event loop).
+        
+        Returns:
+            Number of warmed connections
+        """
+        warmed = 0
+        for pool in self._pools.values():
+            warmed += await pool.aprewarm()
+        return warmed
+    
     def reset(self):
         """Reset all dependencies (useful for testing)."""
         self._openai_client = None
+        self._openai_title_client = None
+        self._async_openai_client = None
+        self._pools = {}
 
 
 # Global dependencies instance
@@ -0,0 +1,340 @@
+"""Instrumented httpx connection pools for upstream API traffic."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+
+from core.config import settings
+from core.logging import get_logger
+
+try:
+    import h2  # noqa: F401  (required by httpx for HTTP/2)
+except ImportError:  # Optional dependency: HTTP/2 falls back to HTTP/1.1
+    h2 = None
+
+logger = get_logger(__name__)
+
+
+class PoolMetrics:
+    """Thread-safe counters for one connection pool.
+    
+    Pool wait is the time a request spends before it either starts opening
+    a new connection or sends its headers on a reused one; connect time
+    covers TCP, TLS and (for HTTP/2) the connection preface.
+    """
+    
+    def __init__(self):
+        """Initialize pool metrics."""
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            "requests": 0,
+            "failed": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+            "total_pool_wait_seconds": 0.0,
+            "max_pool_wait_seconds": 0.0,
+            "total_connect_seconds": 0.0
+        }
+    
+    def begin(self) -> None:
+        """Record the start of a request."""
+        with self._lock:
+            self._in_flight += 1
+    
+    def end(self, trace: "RequestTrace", failed: bool) -> None:
+        """Record the end of a request (response headers received).
+        
+        Args:
+            trace: Timing trace of the request
+            failed: Whether the request raised
+        """
+        pool_wait = trace.pool_wait
+        with self._lock:
+            self._in_flight -= 1
+            self._stats["requests"] += 1
+            if failed:
+                self._stats["failed"] += 1
+            if trace.connect_started is not None:
+                self._stats["connections_opened"] += 1
+                self._stats["total_connect_seconds"] += trace.connect_time
+            elif trace.headers_sent is not None:
+                self._stats["connections_reused"] += 1
+            if pool_wait is not None:
+                self._stats["total_pool_wait_seconds"] += pool_wait
+                self._stats["max_pool_wait_seconds"] = max(
+                    self._stats["max_pool_wait_seconds"], pool_wait
+                )
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of the counters.
+        
+        Returns:
+            Dictionary with counters, in-flight requests and mean timings
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+        opened = stats["connections_opened"]
+        requests = stats["requests"]
+        stats["mean_pool_wait_seconds"] = (
+            stats["total_pool_wait_seconds"] / requests if requests else 0.0
+        )
+        stats["mean_connect_seconds"] = (
+            stats["total_connect_seconds"] / opened if opened else 0.0
+        )
+        stats["reuse_ratio"] = (
+            stats["connections_reused"] / requests if requests else 0.0
+        )
+        return stats
+
+
+class RequestTrace:
+    """Timing of one request, fed by the httpcore ``trace`` extension."""
+    
+    def __init__(self):
+        """Initialize request trace."""
+        self.started = time.perf_counter()
+        self.connect_started: Optional[float] = None
+        self.headers_sent: Optional[float] = None
+    
+    @property
+    def pool_wait(self) -> Optional[float]:
+        """Seconds spent waiting for a connection (None if never reached)."""
+        reached = self.connect_started or self.headers_sent
+        return reached - self.started if reached is not None else None
+    
+    @property
+    def connect_time(self) -> float:
+        """Seconds spent opening a new connection."""
+        if self.connect_started is None or self.headers_sent is None:
+            return 0.0
+        return self.headers_sent - self.connect_started
+    
+    def record(self, event: str, info: Dict[str, Any]) -> None:
+        """Record an httpcore trace event.
+        
+        Args:
+            event: Event name (e.g. 'connection.connect_tcp.started')
+            info: Event details (unused)
+        """
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started" and self.connect_started is None:
+            self.connect_started = now
+        elif event.endswith(".send_request_headers.started") and self.headers_sent is None:
+            self.headers_sent = now
+    
+    async def arecord(self, event: str, info: Dict[str, Any]) -> None:
+        """Record an httpcore trace event (async transports)."""
+        self.record(event, info)
+
+
+def _describe_connections(pool, max_connections: int) -> Dict[str, Any]:
+    """Summarize the connections of an httpcore pool.
+    
+    Args:
+        pool: httpcore connection pool
+        max_connections: Configured pool size
+        
+    Returns:
+        Dictionary with open, idle and active connections and utilization
+    """
+    connections = list(pool.connections)
+    idle = sum(1 for connection in connections if connection.is_idle())
+    active = len(connections) - idle
+    return {
+        "open_connections": len(connections),
+        "idle_connections": idle,
+        "active_connections": active,
+        "max_connections": max_connections,
+        "utilization": active / max_connections if max_connections else 0.0
+    }
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    """HTTP transport recording pool wait and connection reuse."""
+    
+    def __init__(self, metrics: PoolMetrics, **kwargs):
+        """Initialize transport.
+        
+        Args:
+            metrics: Metrics of the pool
+            **kwargs: httpx.HTTPTransport arguments
+        """
+        super().__init__(**kwargs)
+        self.metrics = metrics
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request, tracing its pool and connection timings."""
+        trace = RequestTrace()
+        request.extensions["trace"] = trace.record
+        self.metrics.begin()
+        failed = True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self.metrics.end(trace, failed)
+
+
+class AsyncInstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Async HTTP transport recording pool wait and connection reuse."""
+    
+    def __init__(self, metrics: PoolMetrics, **kwargs):
+        """Initialize transport.
+        
+        Args:
+            metrics: Metrics of the pool
+            **kwargs: httpx.AsyncHTTPTransport arguments
+        """
+        super().__init__(**kwargs)
+        self.metrics = metrics
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request, tracing its pool and connection timings."""
+        trace = RequestTrace()
+        request.extensions["trace"] = trace.arecord
+        self.metrics.begin()
+        failed = True
+        try:
+            response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self.metrics.end(trace, failed)
+
+
+class UpstreamPool:
+    """httpx client with a dedicated, instrumented connection pool.
+    
+    Each traffic class (chat, title, async chat) gets its own pool so slow
+    or bursty background calls cannot starve interactive ones.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_connections: int,
+        is_async: bool = False,
+        verify: Union[bool, str] = True
+    ):
+        """Initialize upstream pool.
+        
+        Args:
+            name: Pool name used in metrics
+            max_connections: Maximum number of connections
+            is_async: Build an httpx.AsyncClient instead of httpx.Client
+            verify: TLS verification (True, or the path of a CA bundle)
+        """
+        self.name = name
+        self.max_connections = max_connections
+        self.is_async = is_async
+        self.base_url: Optional[str] = None
+        self.metrics = PoolMetrics()
+        
+        self.http2 = settings.openai_http2 and h2 is not None
+        if settings.openai_http2 and h2 is None:
+            logger.warning(
+                "OPENAI_HTTP2 activo pero 'h2' no está instalado; "
+                "pool '%s' usará HTTP/1.1", name
+            )
+        
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(
+                settings.openai_max_keepalive_connections, max_connections
+            ),
+            keepalive_expiry=settings.openai_keepalive_expiry
+        )
+        timeout = httpx.Timeout(
+            settings.openai_timeout,
+            connect=settings.openai_connect_timeout,
+            pool=settings.openai_pool_timeout
+        )
+        transport_class = AsyncInstrumentedTransport if is_async else InstrumentedTransport
+        client_class = httpx.AsyncClient if is_async else httpx.Client
+        self.transport = transport_class(
+            self.metrics, verify=verify, limits=limits, http2=self.http2
+        )
+        self.client = client_class(
+            transport=self.transport,
+            timeout=timeout,
+            follow_redirects=True
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool utilization and timing metrics.
+        
+        Returns:
+            Dictionary with request counters, timings and connection usage
+        """
+        stats = self.metrics.snapshot()
+        stats.update(_describe_connections(self.transport._pool, self.max_connections))
+        stats["http2"] = self.http2
+        return stats
+    
+    def _warm_up_request(self) -> bool:
+        """Open (or reuse) one connection to the upstream base URL."""
+        try:
+            self.client.head(self.base_url)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning("Precalentamiento fallido (pool %s): %s", self.name, e)
+            return False
+    
+    def prewarm(self, connections: int = settings.openai_prewarm_connections) -> int:
+        """Open connections ahead of the first request (DNS + TLS).
+        
+        Requests are sent concurrently so each one opens its own connection;
+        any HTTP response counts, since only the connection is wanted.
+        
+        Args:
+            connections: Number of connections to open
+            
+        Returns:
+            Number of successful warm-up requests
+        """
+        if self.is_async or not self.base_url or connections <= 0:
+            return 0
+        
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            results: List[bool] = list(executor.map(
+                lambda _: self._warm_up_request(), range(connections)
+            ))
+        warmed = sum(results)
+        logger.info("Pool '%s' precalentado: %s/%s conexiones", self.name, warmed, connections)
+        return warmed
+    
+    async def _awarm_up_request(self) -> bool:
+        """Open (or reuse) one connection to the upstream base URL (async)."""
+        try:
+            await self.client.head(self.base_url)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning("Precalentamiento fallido (pool %s): %s", self.name, e)
+            return False
+    
+    async def aprewarm(self, connections: int = settings.openai_prewarm_connections) -> int:
+        """Open connections ahead of the first request (async pools).
+        
+        Must run on the event loop that will use the pool.
+        
+        Args:
+            connections: Number of connections to open
+            
+        Returns:
+            Number of successful warm-up requests
+        """
+        if not self.is_async or not self.base_url or connections <= 0:
+            return 0
+        
+        results = await asyncio.gather(
+            *(self._awarm_up_request() for _ in range(connections))
+        )
+        warmed = sum(results)
+        logger.info("Pool '%s' precalentado: %s/%s conexiones", self.name, warmed, connections)
+        return warmed
@@ -0,0 +1,422 @@
+"""Per-chat locks shared by threads, coroutines and processes."""
+import asyncio
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from filelock import FileLock, Timeout
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ChatLockTimeout(Exception):
+    """Raised when a chat lock cannot be acquired in time."""
+
+
+@dataclass
+class _LockEntry:
+    """Lock state of one chat, alive while someone holds or waits for it."""
+    
+    thread_lock: threading.Lock
+    file_lock: FileLock
+    refs: int = 0
+
+
+class ChatLock:
+    """Handle of an acquired chat lock."""
+    
+    def __init__(self, manager: "ChatLockManager", chat_id: str, entry: _LockEntry):
+        """Initialize lock handle.
+        
+        Args:
+            manager: Owning lock manager
+            chat_id: Chat UUID
+            entry: Lock entry of the chat
+        """
+        self._manager = manager
+        self._entry: Optional[_LockEntry] = entry
+        self.chat_id = chat_id
+        self.acquired_at = time.perf_counter()
+    
+    def release(self) -> None:
+        """Release the lock (idempotent, callable from any thread)."""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._manager._release(self.chat_id, entry, self.acquired_at)
+
+
+class ChatLockManager:
+    """Per-chat mutual exclusion across threads, coroutines and processes.
+    
+    Each chat gets its own lock, so turns of one chat run one at a time
+    while different chats never wait on each other. In-process, the lock
+    registry is split into stripes (by CRC32 of the chat id), each guarded
+    by its own mutex, so registry bookkeeping does not serialize unrelated
+    chats either; entries are dropped as soon as nobody holds or waits on
+    them. Across processes sharing the data directory, each chat also has
+    a ``FileLock`` under ``lock_dir``, taken after the in-process lock so
+    only one thread per process ever waits on the file.
+    """
+    
+    def __init__(
+        self,
+        lock_dir: Path = settings.locks_dir,
+        stripes: int = settings.chat_lock_stripes,
+        timeout: float = settings.chat_lock_timeout
+    ):
+        """Initialize lock manager.
+        
+        Args:
+            lock_dir: Directory for the cross-process lock files
+            stripes: Number of registry stripes
+            timeout: Default seconds to wait for a lock
+        """
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self._stripes: List[Tuple[threading.Lock, Dict[str, _LockEntry]]] = [
+            (threading.Lock(), {}) for _ in range(max(stripes, 1))
+        ]
+        self._stats_lock = threading.Lock()
+        self._held = 0
+        self._waiting = 0
+        self._stats = {
+            "acquisitions": 0,
+            "contended": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "total_hold_seconds": 0.0,
+            "max_hold_seconds": 0.0
+        }
+    
+    def _get_stripe(self, chat_id: str) -> Tuple[threading.Lock, Dict[str, _LockEntry]]:
+        """Get the registry stripe of a chat."""
+        return self._stripes[zlib.crc32(chat_id.encode("utf-8")) % len(self._stripes)]
+    
+    def _get_lock_file(self, chat_id: str) -> Path:
+        """Get the cross-process lock file of a chat."""
+        return self.lock_dir / f"{chat_id}.lock"
+    
+    def _checkout(self, chat_id: str) -> _LockEntry:
+        """Get (or create) the lock entry of a chat and reference it."""
+        mutex, entries = self._get_stripe(chat_id)
+        with mutex:
+            entry = entries.get(chat_id)
+            if entry is None:
+                entry = _LockEntry(
+                    threading.Lock(),
+                    FileLock(str(self._get_lock_file(chat_id)), thread_local=False)
+                )
+                entries[chat_id] = entry
+            entry.refs += 1
+        with self._stats_lock:
+            self._waiting += 1
+        return entry
+    
+    def _checkin(self, chat_id: str, entry: _LockEntry) -> None:
+        """Drop a reference to a lock entry, removing it when unused."""
+        mutex, entries = self._get_stripe(chat_id)
+        with mutex:
+            entry.refs -= 1
+            if entry.refs == 0 and entries.get(chat_id) is entry:
+                del entries[chat_id]
+    
+    def _record_acquired(self, chat_id: str, wait: float, contended: bool) -> None:
+        """Record a successful acquisition."""
+        with self._stats_lock:
+            self._waiting -= 1
+            self._held += 1
+            self._stats["acquisitions"] += 1
+            if contended:
+                self._stats["contended"] += 1
+            self._stats["total_wait_seconds"] += wait
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+        if wait >= settings.chat_lock_slow_wait_seconds:
+            logger.warning("Espera de %.2fs por el lock del chat %s", wait, chat_id)
+    
+    def _record_timeout(self, chat_id: str, entry: _LockEntry) -> ChatLockTimeout:
+        """Record a timed out acquisition and build its exception."""
+        self._checkin(chat_id, entry)
+        with self._stats_lock:
+            self._waiting -= 1
+            self._stats["timeouts"] += 1
+        logger.error("Timeout esperando lock del chat %s", chat_id)
+        return ChatLockTimeout(f"Timeout esperando lock del chat {chat_id}")
+    
+    def _release(self, chat_id: str, entry: _LockEntry, acquired_at: float) -> None:
+        """Release a held lock (see ``ChatLock.release``)."""
+        held_for = time.perf_counter() - acquired_at
+        try:
+            entry.file_lock.release()
+        finally:
+            entry.thread_lock.release()
+            self._checkin(chat_id, entry)
+            with self._stats_lock:
+                self._held -= 1
+                self._stats["total_hold_seconds"] += held_for
+                self._stats["max_hold_seconds"] = max(
+                    self._stats["max_hold_seconds"], held_for
+                )
+    
+    def acquire(self, chat_id: str, timeout: Optional[float] = None) -> ChatLock:
+        """Acquire the lock of a chat, blocking the calling thread.
+        
+        Args:
+            chat_id: Chat UUID
+            timeout: Seconds to wait (default: manager timeout)
+            
+        Returns:
+            Handle to release the lock
+            
+        Raises:
+            ChatLockTimeout: If the lock was not acquired in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        entry = self._checkout(chat_id)
+        
+        contended = not entry.thread_lock.acquire(blocking=False)
+        if contended and not entry.thread_lock.acquire(timeout=timeout):
+            raise self._record_timeout(chat_id, entry)
+        
+        try:
+            entry.file_lock.acquire(timeout=0)
+        except Timeout:
+            # Held by another process
+            contended = True
+            try:
+                remaining = max(timeout - (time.perf_counter() - started), 0.0)
+                entry.file_lock.acquire(timeout=remaining, poll_interval=0.01)
+            except Timeout as e:
+                entry.thread_lock.release()
+                raise self._record_timeout(chat_id, entry) from e
+        
+        self._record_acquired(chat_id, time.perf_counter() - started, contended)
+        return ChatLock(self, chat_id, entry)
+    
+    async def acquire_async(self, chat_id: str, timeout: Optional[float] = None) -> ChatLock:
+        """Acquire the lock of a chat without blocking the event loop.
+        
+        Waiting polls with exponential backoff, so contended chats cost no
+        threads; uncontended acquisitions complete on the first attempt.
+        
+        Args:
+            chat_id: Chat UUID
+            timeout: Seconds to wait (default: manager timeout)
+            
+        Returns:
+            Handle to release the lock
+            
+        Raises:
+            ChatLockTimeout: If the lock was not acquired in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        entry = self._checkout(chat_id)
+        delay = 0.001
+        attempts = 0
+        
+        while True:
+            attempts += 1
+            if entry.thread_lock.acquire(blocking=False):
+                try:
+                    entry.file_lock.acquire(timeout=0)
+                    break
+                except Timeout:
+                    entry.thread_lock.release()
+            if time.perf_counter() - started >= timeout:
+                raise self._record_timeout(chat_id, entry)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        
+        self._record_acquired(chat_id, time.perf_counter() - started, attempts > 1)
+        return ChatLock(self, chat_id, entry)
+    
+    @contextmanager
+    def lock(self, chat_id: str, timeout: Optional[float] = None) -> Iterator[ChatLock]:
+        """Hold the lock of a chat for the duration of a ``with`` block.
+        
+        Args:
+            chat_id: Chat UUID
+            timeout: Seconds to wait (default: manager timeout)
+            
+        Yields:
+            Lock handle
+        """
+        handle = self.acquire(chat_id, timeout)
+        try:
+            yield handle
+        finally:
+            handle.release()
+    
+    @asynccontextmanager
+    async def lock_async(
+        self,
+        chat_id: str,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[ChatLock]:
+        """Hold the lock of a chat for the duration of an ``async with`` block.
+        
+        Args:
+            chat_id: Chat UUID
+            timeout: Seconds to wait (default: manager timeout)
+            
+        Yields:
+            Lock handle
+        """
+        handle = await self.acquire_async(chat_id, timeout)
+        try:
+            yield handle
+        finally:
+            handle.release()
+    
+    def prune(self, keep: Callable[[str], bool]) -> int:
+        """Remove the lock files of chats that no longer exist.
+        
+        Lock files are never removed while the server runs: a process
+        waiting on a file that gets unlinked would lock the orphaned inode
+        while a newcomer locks a fresh file, and both would hold the chat.
+        Run this offline (``python manage.py prune-locks``) with no server
+        using ``lock_dir``; files that are locked anyway are skipped.
+        
+        Args:
+            keep: Called with a chat ID; True if its lock file must stay
+            
+        Returns:
+            Number of lock files removed
+        """
+        removed = 0
+        for lock_file in self.lock_dir.glob("*.lock"):
+            if keep(lock_file.stem):
+                continue
+            file_lock = FileLock(str(lock_file), thread_local=False)
+            try:
+                file_lock.acquire(timeout=0)
+            except Timeout:
+                logger.warning("Lock en uso, se conserva: %s", lock_file)
+                continue
+            try:
+                lock_file.unlink(missing_ok=True)
+                removed += 1
+            except OSError as e:
+                logger.warning("No se pudo eliminar lock de %s: %s", lock_file.stem, e)
+            finally:
+                file_lock.release()
+        return removed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lock contention statistics.
+        
+        Returns:
+            Dictionary with acquisition counters, wait and hold times, and
+            the number of locks currently held and waited on
+        """
+        with self._stats_lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["held"] = self._held
+            stats["waiting"] = self._waiting
+        acquisitions = stats["acquisitions"]
+        stats["mean_wait_seconds"] = (
+            stats["total_wait_seconds"] / acquisitions if acquisitions else 0.0
+        )
+        stats["contention_ratio"] = (
+            stats["contended"] / acquisitions if acquisitions else 0.0
+        )
+        return stats
+
+
+class ReleasingIterator:
+    """Iterator that runs a release callback once it is exhausted or closed.
+    
+    Unlike a ``finally`` inside a generator, the callback also runs when the
+    iterator is closed (or collected) before its first item.
+    """
+    
+    def __init__(self, iterator: Iterator, release: Callable[[], None]):
+        """Initialize releasing iterator.
+        
+        Args:
+            iterator: Wrapped iterator
+            release: Idempotent callback, e.g. ``ChatLock.release``
+        """
+        self._iterator = iterator
+        self._release: Optional[Callable[[], None]] = release
+    
+    def __iter__(self) -> "ReleasingIterator":
+        return self
+    
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+    
+    def close(self) -> None:
+        """Close the wrapped iterator and run the release callback."""
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self._iterator, "close", None)
+            if close:
+                close()
+        finally:
+            release()
+    
+    def __del__(self):
+        self.close()
+
+
+class AsyncReleasingIterator:
+    """Async iterator that runs a release callback once exhausted or closed.
+    
+    Async counterpart of ``ReleasingIterator``; callers that stop early
+    must ``await aclose()``.
+    """
+    
+    def __init__(self, iterator: AsyncIterator, release: Callable[[], None]):
+        """Initialize releasing async iterator.
+        
+        Args:
+            iterator: Wrapped async iterator
+            release: Idempotent callback, e.g. ``ChatLock.release``
+        """
+        self._iterator = iterator
+        self._release: Optional[Callable[[], None]] = release
+    
+    def __aiter__(self) -> "AsyncReleasingIterator":
+        return self
+    
+    async def __anext__(self):
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+    
+    async def aclose(self) -> None:
+        """Close the wrapped iterator and run the release callback."""
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            aclose = getattr(self._iterator, "aclose", None)
+            if aclose:
+                await aclose()
+        finally:
+            release()
+    
+    def __del__(self):
+        # Last resort if never closed: release without closing the iterator
+        release, self._release = self._release, None
+        if release is not None:
+            release()
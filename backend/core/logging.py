@@ -1,61 +1,309 @@
-"""Logging configuration and setup."""
+"""Logging configuration and setup.
+
+Records are handed to a bounded queue and written to the console and the
+log file by a background listener thread, so slow disks and file rollover
+never stall a request. When the queue is full, records are dropped and
+counted instead of blocking (see ``get_log_stats``). A forked process
+(pre-fork server worker) starts its own queue and listener thread.
+
+A single process rotates its log file itself. Processes sharing the file
+(pre-fork workers) only append to it and reopen it when it is moved
+(``WatchedFileHandler``), so rotation is left to an external tool such as
+logrotate; concurrent in-process rollovers would lose records.
+"""
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(threadName)s - %(message)s'
+
+_listener: Optional["_BlockingStopListener"] = None
+_queue_handler: Optional["BoundedQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as compact single-line JSON objects."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a record.
+        
+        Args:
+            record: Log record
+            
+        Returns:
+            JSON line with time, level, logger, thread, message and, if
+            present, the exception traceback
+        """
+        document: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            document["exc"] = record.exc_text
+        if record.stack_info:
+            document["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of DEBUG records of high-volume loggers."""
+    
+    def __init__(self, rates: Dict[str, float]):
+        """Initialize sampling filter.
+        
+        Args:
+            rates: Logger name prefix -> fraction of DEBUG records kept
+                (the longest matching prefix applies)
+        """
+        super().__init__()
+        self.rates = rates
+        self._prefixes = sorted(rates, key=len, reverse=True)
+        self._cache: Dict[str, float] = {}
+    
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix in self._prefixes:
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = self.rates[prefix]
+                    break
+            self._cache[name] = rate
+        return rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Decide whether a record is kept."""
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when full."""
+    
+    def __init__(self, log_queue: queue.Queue):
+        """Initialize queue handler.
+        
+        Args:
+            log_queue: Bounded queue read by the listener thread
+        """
+        super().__init__(log_queue)
+        self._lock_stats = threading.Lock()
+        self.dropped = 0
+        self.enqueued = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the message arguments so the record is safe to hand over.
+        
+        Unlike ``QueueHandler.prepare``, the record is not formatted here:
+        formatting happens on the listener thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put a record in the queue, or count it as dropped."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_stats:
+                self.dropped += 1
+            return
+        with self._lock_stats:
+            self.enqueued += 1
+
+
+class _BlockingStopListener(QueueListener):
+    """Queue listener whose stop waits for room in a full queue."""
+    
+    def enqueue_sentinel(self) -> None:
+        """Ask the listener thread to stop after the pending records."""
+        self.queue.put(self._sentinel)
+
+
+def _file_handler(log_file: Path, rotate: bool) -> logging.FileHandler:
+    """Create the log file handler (rotating, or reopened when moved)."""
+    if rotate:
+        return RotatingFileHandler(
+            log_file,
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+    return WatchedFileHandler(log_file, encoding='utf-8')
+
+
+def _build_handlers(
+    log_file: Optional[Path],
+    log_format: str,
+    rotate: bool = True
+) -> List[logging.Handler]:
+    """Create the console and file handlers run by the listener."""
+    if log_format == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    handlers: List[logging.Handler] = [stream_handler]
+    
+    if log_file:
+        try:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            file_handler = _file_handler(log_file, rotate)
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        except (OSError, PermissionError) as e:
+            print(
+                f"WARNING: No se pudo configurar logging a archivo '{log_file}': {e}",
+                file=sys.stderr
+            )
+    return handlers
 
 
 def setup_logging(
     log_level: str = "INFO",
     log_file: Optional[Path] = None,
-    app_logger: Optional[logging.Logger] = None
+    app_logger: Optional[logging.Logger] = None,
+    log_format: str = settings.log_format,
+    queue_size: int = settings.log_queue_size,
+    sample_rates: Optional[Dict[str, float]] = None,
+    rotate: bool = True
 ) -> None:
     """Configure application logging.
     
+    The root logger gets a non-blocking queue handler; module loggers and
+    the Flask app logger propagate to it. Calling it again replaces the
+    previous configuration.
+    
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Path to log file (optional)
-        app_logger: Flask app logger (optional)
+        app_logger: Flask app logger (optional; its default handler is
+            removed so records are not written twice)
+        log_format: 'text' or 'json'
+        queue_size: Maximum records waiting to be written
+        sample_rates: DEBUG sampling per logger prefix (defaults to
+            ``LOG_SAMPLE_RATES``)
+        rotate: Rotate the log file in process; False when several
+            processes write it (rotate it externally)
     """
-    # Create logs directory if needed
-    if log_file:
-        log_file.parent.mkdir(parents=True, exist_ok=True)
+    global _listener, _queue_handler
     
-    # Formatter
-    log_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(threadName)s - %(message)s'
-    )
+    level = getattr(logging, log_level.upper(), logging.INFO)
+    root = logging.getLogger()
     
-    # Configure root or app logger
-    logger = app_logger if app_logger else logging.getLogger()
-    logger.setLevel(getattr(logging, log_level, logging.INFO))
+    if _listener is None:
+        atexit.register(shutdown_logging)
+    root.removeHandler(_queue_handler)
+    shutdown_logging()
     
-    # Console handler
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(log_formatter)
-    logger.addHandler(stream_handler)
+    _queue_handler = BoundedQueueHandler(queue.Queue(maxsize=queue_size))
+    if sample_rates is None:
+        sample_rates = settings.log_sample_rates_map
+    if sample_rates:
+        _queue_handler.addFilter(SamplingFilter(sample_rates))
+    _listener = _BlockingStopListener(
+        _queue_handler.queue,
+        *_build_handlers(log_file, log_format, rotate),
+        respect_handler_level=True
+    )
+    _listener.start()
     
-    # File handler (if path provided)
-    if log_file:
-        try:
-            file_handler = RotatingFileHandler(
-                log_file,
-                maxBytes=10*1024*1024,  # 10MB
-                backupCount=5,
-                encoding='utf-8'
-            )
-            file_handler.setFormatter(log_formatter)
-            logger.addHandler(file_handler)
-        except (OSError, PermissionError) as e:
-            print(
-                f"WARNING: No se pudo configurar logging a archivo '{log_file}': {e}",
-                file=sys.stderr
-            )
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    # Werkzeug sets its logger to INFO on first use unless it has a level,
+    # and propagated records skip the root logger's level check
+    logging.getLogger("werkzeug").setLevel(level)
     
-    # Prevent propagation if using app logger
     if app_logger:
-        app_logger.propagate = False
+        app_logger.setLevel(level)
+        for handler in list(app_logger.handlers):
+            app_logger.removeHandler(handler)
+        app_logger.propagate = True
+
+
+def shutdown_logging() -> None:
+    """Write pending records, stop the listener thread and close the files."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+
+
+def _after_fork() -> None:
+    """Give a forked child its own queue and listener thread.
+    
+    The parent's listener thread does not exist in the child, and the
+    inherited queue may have been locked by it at fork time. A rotating
+    file handler becomes a watched one, since the file is now shared.
+    """
+    global _listener
+    if _listener is None or _listener._thread is None or _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _queue_handler._lock_stats = threading.Lock()
+    _queue_handler.enqueued = _queue_handler.dropped = 0
+    handlers = []
+    for handler in _listener.handlers:
+        if isinstance(handler, RotatingFileHandler):
+            shared = WatchedFileHandler(handler.baseFilename, encoding=handler.encoding)
+            shared.setFormatter(handler.formatter)
+            shared.setLevel(handler.level)
+            handler.close()
+            handler = shared
+        handlers.append(handler)
+    _listener = _BlockingStopListener(
+        _queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def get_log_stats() -> Dict[str, Any]:
+    """Get logging queue statistics.
+    
+    Returns:
+        Dictionary with enqueued and dropped records, pending records and
+        the queue capacity
+    """
+    handler = _queue_handler
+    if handler is None:
+        return {"enqueued": 0, "dropped": 0, "pending": 0, "capacity": 0}
+    return {
+        "enqueued": handler.enqueued,
+        "dropped": handler.dropped,
+        "pending": handler.queue.qsize(),
+        "capacity": handler.queue.maxsize
+    }
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -0,0 +1,474 @@
+"""Prometheus metrics with multi-process aggregation.
+
+Metrics are kept in process memory (a dictionary update under a lock per
+observation) and rendered in the Prometheus text exposition format. Each
+process periodically writes a snapshot of its values to
+``data/metrics/<pid>.json``; a scrape served by any worker flushes its own
+snapshot and merges all of them, so ``GET /api/v1/metrics`` reports the
+whole deployment:
+
+- counters and histograms are summed over every snapshot, including those
+  of exited workers, so totals do not drop when a worker is replaced
+  (snapshots of dead processes are pruned when a new process starts,
+  which Prometheus sees as a counter reset)
+- gauges are summed over live processes only
+
+Values from other workers are at most ``METRICS_FLUSH_SECONDS`` old.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request and upstream call latency (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Local I/O and lock waits (seconds)
+IO_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format a label set, e.g. ``{route="/x",status="200"}``."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value (integers without a decimal point)."""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Base class of a metric family with labels."""
+    
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initialize metric.
+        
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Label names, in the order values are passed
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, Any] = {}
+    
+    def reset(self) -> None:
+        """Drop all values (e.g. in a freshly forked worker)."""
+        with self._lock:
+            self._values = {}
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Serializable copy of the family."""
+        with self._lock:
+            samples = [[list(labels), self._copy(value)] for labels, value in self._values.items()]
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "samples": samples
+        }
+    
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return value
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+    
+    kind = "counter"
+    
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        """Increment the counter of a label set."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def set_total(self, labels: Labels, value: float) -> None:
+        """Set the running total of a label set (for callback collectors)."""
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (summed over live processes)."""
+    
+    kind = "gauge"
+    
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        """Increase the gauge of a label set."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        """Decrease the gauge of a label set."""
+        self.inc(labels, -amount)
+    
+    def set(self, labels: Labels, value: float) -> None:
+        """Set the gauge of a label set."""
+        with self._lock:
+            self._values[labels] = float(value)
+    
+    @contextmanager
+    def track(self, labels: Labels = ()) -> Iterator[None]:
+        """Count the enclosed block as in progress."""
+        self.inc(labels)
+        try:
+            yield
+        finally:
+            self.dec(labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets."""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        """Initialize histogram.
+        
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Label names
+            buckets: Upper bounds of the buckets (+Inf is implicit)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, labels: Labels, value: float) -> None:
+        """Record an observation.
+        
+        Args:
+            labels: Label values
+            value: Observed value
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then sum
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+    
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return list(value)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Serializable copy of the family, including the bucket bounds."""
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics, shared across workers via snapshots."""
+    
+    def __init__(self, metrics_dir: Path = settings.metrics_dir):
+        """Initialize metrics registry.
+        
+        Args:
+            metrics_dir: Directory of the per-process snapshots
+        """
+        self.metrics_dir = metrics_dir
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._flusher_pid: Optional[int] = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+    
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create (or get) a counter."""
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Create (or get) a gauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        """Create (or get) a histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback that refreshes metrics before each snapshot.
+        
+        Args:
+            collector: Callable copying external statistics (e.g. cache
+                counters) into registry metrics
+        """
+        with self._lock:
+            self._collectors.append(collector)
+    
+    def _after_fork(self) -> None:
+        """Start a forked worker from zero, with its own flusher."""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+        self._flusher_pid = None
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Collect the values of this process."""
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("Error en colector de métricas: %s", e)
+        return {
+            name: metric.snapshot() for name, metric in list(self._metrics.items())
+        }
+    
+    def _snapshot_file(self, pid: int) -> Path:
+        return self.metrics_dir / f"{pid}.json"
+    
+    def flush(self) -> None:
+        """Write this process's snapshot atomically."""
+        document = {"pid": os.getpid(), "written_at": time.time(), "metrics": self.snapshot()}
+        target = self._snapshot_file(os.getpid())
+        tmp_path = None
+        try:
+            self.metrics_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f".{target.name}.", suffix=".tmp", dir=self.metrics_dir
+            )
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(document, f, separators=(",", ":"))
+            os.replace(tmp_path, target)
+        except OSError as e:
+            logger.warning("No se pudo guardar el snapshot de métricas: %s", e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        """Whether a process with this pid exists."""
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+    
+    def prune(self) -> int:
+        """Remove the snapshots of processes that no longer exist.
+        
+        Returns:
+            Number of snapshots removed
+        """
+        removed = 0
+        for path in self.metrics_dir.glob("*.json"):
+            try:
+                pid = int(path.stem)
+            except ValueError:
+                continue
+            if not self._is_alive(pid):
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+    
+    def start(self, interval: float = settings.metrics_flush_seconds) -> None:
+        """Start flushing snapshots periodically (once per process).
+        
+        Args:
+            interval: Seconds between flushes
+        """
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        
+        if self.metrics_dir.exists():
+            removed = self.prune()
+            if removed:
+                logger.info("Snapshots de métricas de procesos terminados eliminados: %s", removed)
+        
+        def run() -> None:
+            while True:
+                time.sleep(interval)
+                self.flush()
+        
+        threading.Thread(target=run, name="metrics-flusher", daemon=True).start()
+    
+    def _load_snapshots(self) -> List[Dict[str, Any]]:
+        """Read every process snapshot (this process's is flushed first)."""
+        self.flush()
+        snapshots = []
+        for path in sorted(self.metrics_dir.glob("*.json")):
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                logger.warning("Snapshot de métricas ilegible %s: %s", path, e)
+        return snapshots
+    
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Merge the snapshots of all processes.
+        
+        Returns:
+            Dictionary of metric name -> merged family
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        for document in self._load_snapshots():
+            alive = self._is_alive(int(document.get("pid", 0)))
+            for name, family in document.get("metrics", {}).items():
+                if family["kind"] == "gauge" and not alive:
+                    continue
+                target = merged.setdefault(name, {
+                    "kind": family["kind"],
+                    "help": family["help"],
+                    "labels": family["labels"],
+                    "buckets": family.get("buckets"),
+                    "samples": {}
+                })
+                if target["kind"] != family["kind"] or target["buckets"] != family.get("buckets"):
+                    # Snapshot written by a different version of the family
+                    continue
+                samples = target["samples"]
+                for labels, value in family["samples"]:
+                    key = tuple(labels)
+                    if family["kind"] == "histogram":
+                        current = samples.get(key)
+                        samples[key] = (
+                            [a + b for a, b in zip(current, value)] if current else list(value)
+                        )
+                    else:
+                        samples[key] = samples.get(key, 0.0) + value
+        return merged
+    
+    def render(self) -> str:
+        """Render all processes' metrics in the text exposition format."""
+        lines: List[str] = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            labelnames = family["labels"]
+            for labels, value in sorted(family["samples"].items()):
+                if family["kind"] != "histogram":
+                    label_text = _format_labels(labelnames, labels)
+                    lines.append(f"{name}{label_text} {_format_value(value)}")
+                    continue
+                
+                bounds = [*(repr(float(bound)) for bound in family["buckets"]), "+Inf"]
+                cumulative = 0
+                for bound, count in zip(bounds, value[:-1]):
+                    cumulative += count
+                    bucket_labels = _format_labels((*labelnames, "le"), (*labels, bound))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                label_text = _format_labels(labelnames, labels)
+                lines.append(f"{name}_sum{label_text} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{label_text} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_requests_total = metrics.counter(
+    "synapse_http_requests_total",
+    "HTTP requests by route, method and status.",
+    ("route", "method", "status")
+)
+http_request_duration_seconds = metrics.histogram(
+    "synapse_http_request_duration_seconds",
+    "HTTP request latency (streams until the last byte).",
+    ("route", "method")
+)
+http_requests_in_flight = metrics.gauge(
+    "synapse_http_requests_in_flight",
+    "HTTP requests being served."
+)
+openai_request_duration_seconds = metrics.histogram(
+    "synapse_openai_request_duration_seconds",
+    "OpenAI call latency by model, purpose and outcome.",
+    ("model", "purpose", "outcome")
+)
+openai_tokens_total = metrics.counter(
+    "synapse_openai_tokens_total",
+    "Tokens reported by OpenAI (prompt, completion).",
+    ("model", "purpose", "kind")
+)
+metadata_lock_wait_seconds = metrics.histogram(
+    "synapse_metadata_lock_wait_seconds",
+    "Wait for a metadata shard file lock.",
+    buckets=IO_BUCKETS
+)
+metadata_lock_timeouts_total = metrics.counter(
+    "synapse_metadata_lock_timeouts_total",
+    "Metadata shard file lock timeouts."
+)
+file_io_bytes_total = metrics.counter(
+    "synapse_file_io_bytes_total",
+    "Bytes read and written by FileManager.",
+    ("operation",)
+)
+file_io_duration_seconds = metrics.histogram(
+    "synapse_file_io_duration_seconds",
+    "FileManager read and write latency (including fsync).",
+    ("operation",),
+    buckets=IO_BUCKETS
+)
+cache_requests_total = metrics.counter(
+    "synapse_cache_requests_total",
+    "Cache lookups by cache and result (hit ratio = hit / (hit + miss)).",
+    ("cache", "result")
+)
+context_dropped_total = metrics.counter(
+    "synapse_context_dropped_total",
+    "Messages and tokens left out of context windows by the token budget.",
+    ("model", "kind")
+)
+log_records_dropped_total = metrics.counter(
+    "synapse_log_records_dropped_total",
+    "Log records dropped because the logging queue was full."
+)
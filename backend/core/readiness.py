@@ -0,0 +1,91 @@
+"""Process readiness, reported separately from liveness.
+
+Liveness (``GET /api/v1/health``) only says that the process answers.
+Readiness (``GET /api/v1/health/ready``) says that it should get traffic:
+the serving process finished its initialization (``factory.init_worker``),
+its checks pass (e.g. storage is writable) and it is not draining for a
+shutdown. A forked worker starts over as not ready.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+STARTING = "starting"
+READY = "ready"
+DRAINING = "draining"
+
+
+class Readiness:
+    """Readiness state and checks of the current process."""
+    
+    def __init__(self):
+        """Initialize readiness (starting)."""
+        self._lock = threading.Lock()
+        self._checks: Dict[str, Callable[[], bool]] = {}
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+    
+    def _reset(self) -> None:
+        """Start over as not ready (new process)."""
+        self._state = STARTING
+        self._started = time.monotonic()
+        self._ready_after: Optional[float] = None
+    
+    def add_check(self, name: str, check: Callable[[], bool]) -> None:
+        """Register a check that must pass for the process to be ready.
+        
+        Args:
+            name: Check name (reported by the readiness endpoint)
+            check: Callable returning True when healthy; exceptions count
+                as a failure
+        """
+        with self._lock:
+            self._checks[name] = check
+    
+    def mark_ready(self) -> None:
+        """Mark the process as initialized."""
+        with self._lock:
+            if self._state != STARTING:
+                return
+            self._state = READY
+            self._ready_after = time.monotonic() - self._started
+        logger.info("Proceso listo en %.3fs", self._ready_after)
+    
+    def mark_draining(self) -> None:
+        """Mark the process as shutting down (no new traffic)."""
+        with self._lock:
+            self._state = DRAINING
+    
+    def status(self) -> Tuple[bool, Dict[str, Any]]:
+        """Evaluate readiness.
+        
+        Returns:
+            Tuple of (ready, details with the state, the seconds it took to
+            become ready and the result of each check)
+        """
+        with self._lock:
+            state, ready_after = self._state, self._ready_after
+            checks = list(self._checks.items())
+        results = {}
+        for name, check in checks:
+            try:
+                results[name] = bool(check())
+            except Exception as e:
+                logger.warning("Chequeo de readiness '%s' fallido: %s", name, e)
+                results[name] = False
+        ready = state == READY and all(results.values())
+        return ready, {
+            "status": state,
+            "ready_after_seconds": round(ready_after, 3) if ready_after is not None else None,
+            "checks": results
+        }
+
+
+# Global readiness instance
+readiness = Readiness()
@@ -1,64 +1,85 @@
-"""Flask application factory and initialization."""
-from flask import Flask, render_template
-from flask_cors import CORS
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-from flask_talisman import Talisman
-
-from core.config import settings
-from core.logging import setup_logging, get_logger
-from core.dependencies import dependencies
-from repositories.chat_repository import ChatRepository
-from repositories.metadata_repository import MetadataRepository
-from services.chat_service import ChatService
-from services.openai_service import OpenAIService
-from api.routes.chat import chat_bp, init_chat_routes
-from api.routes.history import history_bp, init_history_routes
-from api.routes.health import health_bp
-from api.middleware.error_handlers import register_error_handlers
-
-logger = get_logger(__name__)
-
-
-def create_app() -> Flask:
+"""Flask application factory and initialization.
+
+Importing this module only loads the standard library: Flask, the
+extensions, the settings (pydantic-settings), the blueprints and the
+services are imported by ``create_app``, and optional subsystems (async
+chat service, search index, token limiter, metrics, security headers) only
+when they are enabled.
+"""
+import atexit
+import logging
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from flask import Flask
+    from flask_limiter import Limiter
+    
+    from api.asgi import AsyncChatApp
+    from services.openai_service import OpenAIService
+
+# core.logging.get_logger without importing the settings
+logger = logging.getLogger(__name__)
+
+
+def create_app(async_mode: bool = False, preload: bool = False) -> "Flask":
     """Create and configure Flask application.
     
+    Args:
+        async_mode: Wire an AsyncChatService backed by AsyncOpenAI (used by
+            the ASGI app; the Flask routes keep using its sync methods)
+        preload: Build the app in a pre-fork server master: per-process
+            resources (OpenAI clients, metrics flusher) are left to
+            ``init_worker`` in each forked worker
+    
     Returns:
         Configured Flask application
     """
+    from flask import Flask, render_template
+    from flask_cors import CORS
+    
+    from core.config import settings
+    from core.dependencies import dependencies
+    from core.locks import ChatLockManager
+    from core.logging import setup_logging
+    from repositories.backends import create_repositories
+    from repositories.profile_repository import ProfileRepository
+    from services.openai_service import OpenAIService
+    from services.title_service import TitleGenerationService
+    from api.routes.admin import admin_bp, init_admin_routes
+    from api.routes.chat import chat_bp, init_chat_routes
+    from api.routes.history import history_bp, init_history_routes
+    from api.routes.health import health_bp, init_health_routes
+    from api.routes.search import search_bp, init_search_routes
+    from api.middleware.error_handlers import register_error_handlers
+    from api.middleware.profiling import register_profiling
+    from api.responses import FastJSONProvider
+    
     app = Flask(
         __name__,
         template_folder=str(settings.templates_folder),
         static_folder=str(settings.static_folder)
     )
+    app.json = FastJSONProvider(app)
     
     setup_logging(
         log_level=settings.log_level,
         log_file=settings.log_file,
-        app_logger=app.logger
+        app_logger=app.logger,
+        # Pre-fork workers share the log file: rotate it externally
+        rotate=not preload
     )
     
     cors_origins = settings.cors_origins_list
     CORS(app, origins=cors_origins, supports_credentials=True)
     logger.info(f"CORS configurado con orígenes: {cors_origins}")
     
-    limiter = Limiter(
-        app=app,
-        key_func=get_remote_address,
-        default_limits=[
-            f"{settings.rate_limit_per_day} per day",
-            f"{settings.rate_limit_per_hour} per hour"
-        ],
-        storage_uri="memory://"
-    )
-    
-    @limiter.limit(f"{settings.rate_limit_chat_per_minute} per minute")
-    def rate_limited_chat():
-        pass
-    
+    init_rate_limits(app)
     logger.info("Rate limiting configurado")
     
     if not settings.flask_debug:
+        from flask_talisman import Talisman
+        
         Talisman(
             app,
             content_security_policy={
@@ -86,27 +107,77 @@ def rate_limited_chat():
         )
         logger.info("Talisman (security headers) configurado")
     
-    openai_client = dependencies.openai_client
-    if not openai_client:
-        logger.warning("OpenAI client no inicializado. Funcionalidad AI limitada.")
+    chat_repo, metadata_repo = create_repositories()
     
-    chat_repo = ChatRepository()
-    metadata_repo = MetadataRepository()
+    # Clients are bound by init_worker
+    openai_service = OpenAIService(None)
+    search_index = None
+    if settings.search_enabled:
+        from repositories.search_index import SearchIndex, fts5_available
+        
+        if fts5_available():
+            search_index = SearchIndex()
+        else:
+            logger.warning("SQLite compilado sin FTS5: búsqueda deshabilitada.")
+    lock_manager = ChatLockManager()
+    title_service = TitleGenerationService(
+        openai_service, metadata_repo, search_index=search_index,
+        lock_manager=lock_manager
+    )
+    atexit.register(title_service.shutdown)
+    if async_mode:
+        from services.async_chat_service import AsyncChatService as service_class
+    else:
+        from services.chat_service import ChatService as service_class
+    chat_service = service_class(
+        chat_repo, metadata_repo, openai_service, title_service, lock_manager,
+        search_index=search_index
+    )
+    app.extensions["chat_service"] = chat_service
+    app.extensions["async_mode"] = async_mode
+    app.extensions["openai_service"] = openai_service
     
-    openai_service = OpenAIService(openai_client)
-    chat_service = ChatService(chat_repo, metadata_repo, openai_service)
+    rate_limiter = None
+    if settings.rate_limit_tokens_per_minute > 0:
+        from services.rate_limiter import TokenBucketLimiter
+        
+        rate_limiter = TokenBucketLimiter()
+        logger.info(
+            f"Límite de tokens: {settings.rate_limit_tokens_per_minute}/min "
+            f"(ráfaga {settings.rate_limit_token_burst})"
+        )
+    app.extensions["rate_limiter"] = rate_limiter
     
-    init_chat_routes(chat_service)
+    init_chat_routes(chat_service, rate_limiter)
     init_history_routes(chat_service)
+    init_search_routes(chat_service)
+    profile_repository = ProfileRepository()
+    init_admin_routes(profile_repository)
+    init_health_routes(
+        title_service, chat_repo, dependencies.get_pool_stats, openai_service,
+        lock_manager
+    )
     
     app.register_blueprint(chat_bp)
     app.register_blueprint(history_bp)
     app.register_blueprint(health_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(admin_bp)
     
     logger.info("Blueprints registrados")
     
     register_error_handlers(app)
     
+    if settings.metrics_enabled:
+        from api.middleware.metrics import register_metrics
+        
+        register_metrics(app)
+        _register_metric_collectors(chat_repo, openai_service)
+        logger.info("Métricas habilitadas en /api/v1/metrics")
+    
+    register_profiling(app, profile_repository)
+    _register_readiness_checks(chat_repo)
+    
     @app.route('/')
     def home():
         """Serve main HTML interface."""
@@ -116,11 +187,173 @@ def home():
             app.logger.exception(f"Error renderizando index.html: {e}")
             return "Error UI.", 500
     
+    if not preload:
+        init_worker(app)
+    
     return app
 
 
+def init_rate_limits(app: "Flask", storage_uri: Optional[str] = None) -> "Limiter":
+    """Apply the per-day and per-hour request limits to the app.
+    
+    The liveness and readiness probes and the Prometheus endpoint are
+    exempt: an orchestrator or scraper polling them must not see a healthy
+    worker as failing once the hourly limit of its address is used up.
+    
+    Args:
+        app: Flask application
+        storage_uri: Window counter storage (defaults to
+            ``settings.rate_limit_storage``)
+    
+    Returns:
+        Flask-Limiter extension
+    """
+    from flask_limiter import Limiter
+    from flask_limiter.util import get_remote_address
+    
+    from core.config import settings
+    from api.routes.health import health_check, ping, prometheus_metrics, readiness_check
+    
+    import services.rate_limiter  # noqa: F401  (registers the sqlite:// storage)
+    limiter = Limiter(
+        app=app,
+        key_func=get_remote_address,
+        default_limits=[
+            f"{settings.rate_limit_per_day} per day",
+            f"{settings.rate_limit_per_hour} per hour"
+        ],
+        storage_uri=storage_uri or settings.rate_limit_storage,
+        swallow_errors=True
+    )
+    for probe in (health_check, readiness_check, ping, prometheus_metrics):
+        limiter.exempt(probe)
+    return limiter
+
+
+def init_worker(app: "Flask") -> None:
+    """Create the per-process resources of a serving process.
+    
+    Called by ``create_app``, or after the fork in each pre-fork worker
+    (see ``serve.py``): connection pools and threads cannot be shared with
+    the master process, so each worker opens its own.
+    
+    Args:
+        app: Flask application built by ``create_app``
+    """
+    from core.config import settings
+    from core.dependencies import dependencies
+    from core.readiness import readiness
+    
+    if not settings.openai_api_key:
+        logger.warning("OpenAI client no inicializado. Funcionalidad AI limitada.")
+    
+    async_mode = app.extensions["async_mode"]
+    openai_service = app.extensions["openai_service"]
+    if settings.openai_prewarm:
+        openai_service.bind_clients(
+            dependencies.openai_client,
+            dependencies.async_openai_client if async_mode else None,
+            dependencies.openai_title_client
+        )
+        dependencies.prewarm()
+    else:
+        # Created (and openai imported) on the first model call
+        openai_service.bind_clients(
+            dependencies.lazy("openai_client"),
+            dependencies.lazy("async_openai_client") if async_mode else None,
+            dependencies.lazy("openai_title_client")
+        )
+    if settings.metrics_enabled:
+        from core.metrics import metrics
+        
+        metrics.start()
+    readiness.mark_ready()
+
+
+def shutdown_worker(app: "Flask") -> None:
+    """Drain the background work of a serving process before it exits.
+    
+    Args:
+        app: Flask application built by ``create_app``
+    """
+    from core.config import settings
+    from core.readiness import readiness
+    
+    readiness.mark_draining()
+    title_service = app.extensions["chat_service"].title_service
+    if title_service:
+        title_service.shutdown()
+    if settings.metrics_enabled:
+        from core.metrics import metrics
+        
+        metrics.flush()
+
+
+def _register_metric_collectors(chat_repo, openai_service: "OpenAIService") -> None:
+    """Export cache hit/miss and dropped log record counters as metrics.
+    
+    Args:
+        chat_repo: Chat repository (its cache, if any, is exported)
+        openai_service: OpenAIService instance (completion cache)
+    """
+    from core.logging import get_log_stats
+    from core.metrics import cache_requests_total, log_records_dropped_total, metrics
+    
+    caches = {"completions": openai_service.completion_cache}
+    if chat_repo.cache:
+        caches["chats"] = chat_repo.cache
+    
+    def collect() -> None:
+        for name, cache in caches.items():
+            stats = cache.get_stats()
+            cache_requests_total.set_total((name, "hit"), stats["hits"])
+            cache_requests_total.set_total((name, "miss"), stats["misses"])
+        log_records_dropped_total.set_total((), get_log_stats()["dropped"])
+    
+    metrics.register_collector(collect)
+
+
+def _register_readiness_checks(chat_repo) -> None:
+    """Register the storage check reported by ``/api/v1/health/ready``."""
+    from core.config import settings
+    from core.readiness import readiness
+    from repositories.file_manager import FileManager
+    
+    database = getattr(chat_repo, "database", None)
+    if database is not None:
+        readiness.add_check(
+            "storage", lambda: database.connection.execute("SELECT 1").fetchone() is not None
+        )
+    else:
+        def chats_dir_writable() -> bool:
+            FileManager.ensure_directory_exists(settings.chats_dir)
+            return os.access(settings.chats_dir, os.W_OK)
+        
+        readiness.add_check("storage", chats_dir_writable)
+
+
+def create_asgi_app(preload: bool = False) -> "AsyncChatApp":
+    """Create the ASGI application (async serving mode).
+    
+    Args:
+        preload: Build the app in a pre-fork server master (see
+            ``create_app``)
+    
+    Returns:
+        ASGI app serving chat turns on the event loop
+    """
+    from api.asgi import AsyncChatApp
+    
+    app = create_app(async_mode=True, preload=preload)
+    return AsyncChatApp(
+        app, app.extensions["chat_service"], app.extensions["rate_limiter"]
+    )
+
+
 def print_startup_banner() -> None:
     """Print startup banner with server information."""
+    from core.config import settings
+    
     print("\n" + "="*60)
     print(" Synapse AI Server")
     print("="*60)
@@ -0,0 +1,226 @@
+"""Maintenance commands for Synapse AI.
+
+Usage:
+    python manage.py migrate-segments
+    python manage.py migrate-sqlite
+    python manage.py migrate-prompts
+    python manage.py rebuild-search [--workers N]
+    python manage.py prune-locks
+    python manage.py startup-report [--top N] [--budget-ms MS] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables first
+load_dotenv()
+
+from core.config import settings
+from core.logging import setup_logging
+from core.locks import ChatLockManager
+from repositories.backends import (
+    create_repositories,
+    migrate_json_to_sqlite,
+    migrate_system_prompts,
+    rebuild_search_index
+)
+from repositories.chat_repository import ChatRepository
+from repositories.metadata_repository import MetadataRepository
+from repositories.prompt_registry import PromptRegistry
+from repositories.search_index import fts5_available
+from repositories.sqlite_database import SQLiteDatabase
+from utils.startup_report import format_report, profile_startup
+
+
+def migrate_segments(args: argparse.Namespace) -> int:
+    """Convert legacy ``<chat_id>.json`` chats to segmented logs.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Process exit code
+    """
+    chat_repo = ChatRepository()
+    migrated = chat_repo.migrate_legacy_chats()
+    print(f"Chats migrados a segmentos: {migrated}")
+    return 0
+
+
+def migrate_sqlite(args: argparse.Namespace) -> int:
+    """Copy chats and metadata from the JSON layout into SQLite.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Process exit code
+    """
+    database = SQLiteDatabase()
+    try:
+        chats, metadata = migrate_json_to_sqlite(
+            ChatRepository(), MetadataRepository(), database
+        )
+    finally:
+        database.close_all()
+    print(f"Migrados a {database.database_file}: {chats} chats, {metadata} metadata")
+    return 0
+
+
+def migrate_prompts(args: argparse.Namespace) -> int:
+    """Replace system prompts embedded in chats with registry references.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Process exit code
+    """
+    chat_repo, _ = create_repositories()
+    chats, versions = migrate_system_prompts(
+        chat_repo, PromptRegistry(), ChatLockManager()
+    )
+    print(f"Chats con prompt deduplicado: {chats} ({versions} versiones de prompt)")
+    return 0
+
+
+def rebuild_search(args: argparse.Namespace) -> int:
+    """Recreate the full-text search index from storage.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Process exit code
+    """
+    if not fts5_available():
+        print("SQLite compilado sin FTS5: búsqueda no disponible.")
+        return 1
+    indexed = rebuild_search_index(args.workers)
+    print(f"Chats indexados para búsqueda: {indexed}")
+    return 0
+
+
+def prune_locks(args: argparse.Namespace) -> int:
+    """Remove the lock files of deleted chats (with the server stopped).
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Process exit code
+    """
+    chat_repo, metadata_repo = create_repositories()
+    removed = ChatLockManager().prune(
+        lambda chat_id: chat_repo.exists(chat_id) or metadata_repo.get(chat_id) is not None
+    )
+    print(f"Locks de chats eliminados: {removed}")
+    return 0
+
+
+def startup_report(args: argparse.Namespace) -> int:
+    """Profile the cold start of the app (imports, creation, first request).
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Process exit code (1 if the import time exceeds the budget)
+    """
+    try:
+        report = profile_startup(top=args.top, budget_ms=args.budget_ms)
+    except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+        print(f"No se pudo perfilar el arranque: {e}", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+    return 1 if report["over_budget"] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser.
+    
+    Returns:
+        Argument parser with all subcommands
+    """
+    parser = argparse.ArgumentParser(description="Comandos de mantenimiento de Synapse AI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    migrate_parser = subparsers.add_parser(
+        "migrate-segments",
+        help="Migra chats <chat_id>.json al formato de segmentos"
+    )
+    migrate_parser.set_defaults(handler=migrate_segments)
+    
+    sqlite_parser = subparsers.add_parser(
+        "migrate-sqlite",
+        help="Copia chats y metadata del formato JSON a SQLite"
+    )
+    sqlite_parser.set_defaults(handler=migrate_sqlite)
+    
+    prompts_parser = subparsers.add_parser(
+        "migrate-prompts",
+        help="Reemplaza el prompt de sistema de cada chat por una referencia al registro"
+    )
+    prompts_parser.set_defaults(handler=migrate_prompts)
+    
+    search_parser = subparsers.add_parser(
+        "rebuild-search",
+        help="Reconstruye el índice de búsqueda a partir de los chats guardados"
+    )
+    search_parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Procesos en paralelo (por defecto, uno por CPU)"
+    )
+    search_parser.set_defaults(handler=rebuild_search)
+    
+    prune_parser = subparsers.add_parser(
+        "prune-locks",
+        help="Elimina los locks de chats borrados (con el servidor detenido)"
+    )
+    prune_parser.set_defaults(handler=prune_locks)
+    
+    startup_parser = subparsers.add_parser(
+        "startup-report",
+        help="Perfila el arranque en frío (-X importtime) y lo compara con el presupuesto"
+    )
+    startup_parser.add_argument(
+        "--top", type=int, default=15, help="Entradas por ranking"
+    )
+    startup_parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=settings.startup_import_budget_ms,
+        help="Presupuesto de importación de la app en ms (0 lo desactiva)"
+    )
+    startup_parser.add_argument(
+        "--json", action="store_true", help="Salida en JSON"
+    )
+    startup_parser.set_defaults(handler=startup_report)
+    
+    return parser
+
+
+def main(argv=None) -> int:
+    """Run a maintenance command.
+    
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+        
+    Returns:
+        Process exit code
+    """
+    args = build_parser().parse_args(argv)
+    setup_logging(log_level=settings.log_level)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
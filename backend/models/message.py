@@ -1,5 +1,5 @@
 """Message model."""
-from typing import Literal
+from typing import Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -11,6 +11,13 @@ class Message(BaseModel):
     
     role: MessageRole = Field(..., description="Message role")
     content: str = Field(..., description="Message content")
+    prompt_ref: Optional[str] = Field(
+        None,
+        description=(
+            "Prompt registry reference '<id>@<version>' of a system message "
+            "stored without its text (content is then empty)"
+        )
+    )
     
     class Config:
         """Pydantic configuration."""
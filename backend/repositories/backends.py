@@ -0,0 +1,198 @@
+"""Storage backend selection and migration."""
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple, Union
+
+from core.config import settings
+from core.locks import ChatLockManager
+from core.logging import get_logger
+from models.message import Message
+from repositories.chat_repository import ChatRepository
+from repositories.metadata_repository import MetadataRepository
+from repositories.prompt_registry import PromptRegistry
+from repositories.search_index import SearchIndex
+from repositories.sqlite_chat_repository import SQLiteChatRepository
+from repositories.sqlite_database import SQLiteDatabase
+from repositories.sqlite_metadata_repository import SQLiteMetadataRepository
+
+logger = get_logger(__name__)
+
+ChatRepositoryType = Union[ChatRepository, SQLiteChatRepository]
+MetadataRepositoryType = Union[MetadataRepository, SQLiteMetadataRepository]
+
+# Chats re-indexed per search index transaction during a rebuild
+SEARCH_REBUILD_BATCH_SIZE = 200
+
+
+def create_repositories(
+    backend: str = settings.storage_backend
+) -> Tuple[ChatRepositoryType, MetadataRepositoryType]:
+    """Create the chat and metadata repositories for a storage backend.
+    
+    Args:
+        backend: Storage backend ('json' or 'sqlite')
+        
+    Returns:
+        Tuple of (chat_repo, metadata_repo)
+    """
+    if backend == "sqlite":
+        database = SQLiteDatabase()
+        logger.info("Almacenamiento SQLite: %s", database.database_file)
+        return SQLiteChatRepository(database), SQLiteMetadataRepository(database)
+    
+    logger.info("Almacenamiento JSON: %s", settings.chats_dir)
+    return ChatRepository(), MetadataRepository()
+
+
+def migrate_json_to_sqlite(
+    chat_repo: ChatRepository,
+    metadata_repo: MetadataRepository,
+    database: SQLiteDatabase
+) -> Tuple[int, int]:
+    """Copy chats and metadata from the JSON layout into SQLite.
+    
+    Existing rows for the same chat ids are replaced, so the migration can
+    be re-run safely.
+    
+    Args:
+        chat_repo: Source JSON chat repository
+        metadata_repo: Source JSON metadata repository
+        database: Target SQLite database
+        
+    Returns:
+        Tuple of (chats migrated, metadata entries migrated)
+    """
+    sqlite_chat_repo = SQLiteChatRepository(database)
+    sqlite_metadata_repo = SQLiteMetadataRepository(database)
+    
+    chats_migrated = 0
+    for chat_id in chat_repo.list_chat_ids():
+        messages = chat_repo.load(chat_id)
+        if messages is None:
+            logger.warning("Chat %s omitido en la migración (ilegible).", chat_id)
+            continue
+        if sqlite_chat_repo.save(chat_id, messages):
+            chats_migrated += 1
+    
+    metadata = metadata_repo.load()
+    existing = sqlite_metadata_repo.load()
+    sqlite_metadata_repo.save({**existing, **metadata})
+    
+    logger.info(
+        "Migración a SQLite completada: %s chats, %s entradas de metadata.",
+        chats_migrated, len(metadata)
+    )
+    return chats_migrated, len(metadata)
+
+
+def migrate_system_prompts(
+    chat_repo: ChatRepositoryType,
+    prompt_registry: PromptRegistry,
+    lock_manager: ChatLockManager
+) -> Tuple[int, int]:
+    """Replace system prompts embedded in chats with registry references.
+    
+    Each distinct prompt text is stored once as a version of the default
+    prompt; chats already storing a reference are left untouched, so the
+    migration can be re-run safely. Each chat is rewritten under its turn
+    lock.
+    
+    Args:
+        chat_repo: Chat repository (JSON or SQLite)
+        prompt_registry: Registry receiving the prompt texts
+        lock_manager: Per-chat lock manager
+        
+    Returns:
+        Tuple of (chats rewritten, distinct prompt versions found)
+    """
+    chats_migrated = 0
+    refs: Set[str] = set()
+    for chat_id in chat_repo.list_chat_ids():
+        with lock_manager.lock(chat_id):
+            messages = chat_repo.load(chat_id)
+            if not messages or messages[0].role != "system" or messages[0].prompt_ref:
+                continue
+            
+            try:
+                ref = prompt_registry.register(messages[0].content)
+            except OSError as e:
+                logger.warning("Chat %s omitido en la migración de prompts: %s", chat_id, e)
+                continue
+            refs.add(ref)
+            messages = [Message(role="system", content="", prompt_ref=ref)] + messages[1:]
+            if chat_repo.save(chat_id, messages):
+                chats_migrated += 1
+            else:
+                logger.warning("Chat %s omitido en la migración de prompts.", chat_id)
+    
+    logger.info(
+        "Migración de prompts completada: %s chats, %s versiones de prompt.",
+        chats_migrated, len(refs)
+    )
+    return chats_migrated, len(refs)
+
+
+def _index_partition(partition: int, partitions: int) -> int:
+    """Index the chats of one partition (runs in a worker process).
+    
+    Args:
+        partition: Partition number handled by this worker
+        partitions: Total number of partitions
+        
+    Returns:
+        Number of chats indexed
+    """
+    chat_repo, metadata_repo = create_repositories()
+    search_index = SearchIndex()
+    indexed = 0
+    batch: List[Tuple[str, Optional[str], Sequence[Message]]] = []
+    
+    for chat_id in chat_repo.list_chat_ids():
+        if zlib.crc32(chat_id.encode("utf-8")) % partitions != partition:
+            continue
+        messages = chat_repo.load(chat_id)
+        if messages is None:
+            logger.warning("Chat %s omitido en la reindexación (ilegible).", chat_id)
+            continue
+        metadata = metadata_repo.get(chat_id)
+        batch.append((chat_id, metadata.title if metadata else None, messages))
+        if len(batch) >= SEARCH_REBUILD_BATCH_SIZE:
+            indexed += search_index.replace_chats(batch)
+            batch = []
+    
+    if batch:
+        indexed += search_index.replace_chats(batch)
+    search_index.database.close_all()
+    return indexed
+
+
+def rebuild_search_index(workers: int = 1) -> int:
+    """Recreate the full-text search index from storage.
+    
+    Chats are partitioned by CRC32 of their id and each partition is
+    indexed by its own process, writing in batched transactions; SQLite
+    serializes the writers while parsing and tokenizing run in parallel.
+    Turns saved while the rebuild runs may be missed; re-run it if the
+    server was not stopped.
+    
+    Args:
+        workers: Number of worker processes
+        
+    Returns:
+        Number of chats indexed
+    """
+    search_index = SearchIndex()
+    search_index.clear()
+    search_index.database.close_all()
+    
+    workers = max(1, workers)
+    if workers == 1:
+        indexed = _index_partition(0, 1)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            indexed = sum(
+                executor.map(_index_partition, range(workers), [workers] * workers)
+            )
+    
+    logger.info("Índice de búsqueda reconstruido: %s chats (%s procesos).", indexed, workers)
+    return indexed
@@ -0,0 +1,192 @@
+"""In-process LRU cache of parsed chat messages."""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from models.message import Message
+
+
+@dataclass
+class CachedChat:
+    """Cached messages of one chat.
+    
+    Attributes:
+        messages: Most recent messages of the chat (read-only for callers)
+        complete: Whether ``messages`` is the full history or only a tail
+        stamp: Storage stamp the messages correspond to
+    """
+    
+    messages: List[Message]
+    complete: bool
+    stamp: Hashable
+
+
+class ChatCache:
+    """Bounded LRU cache of parsed chats, limited by total message count.
+    
+    Every lookup carries the current storage stamp of the chat (e.g. file
+    inode/size/mtime); an entry whose stamp differs was changed by someone
+    else and is dropped instead of served.
+    """
+    
+    def __init__(self, max_messages: int):
+        """Initialize chat cache.
+        
+        Args:
+            max_messages: Maximum number of cached messages (0 disables)
+        """
+        self.max_messages = max_messages
+        self._entries: "OrderedDict[str, CachedChat]" = OrderedDict()
+        self._message_count = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything."""
+        return self.max_messages > 0
+    
+    def _drop(self, chat_id: str) -> None:
+        """Remove an entry (lock must be held)."""
+        entry = self._entries.pop(chat_id, None)
+        if entry is not None:
+            self._message_count -= len(entry.messages)
+    
+    def _evict(self) -> None:
+        """Evict least recently used entries over the limit (lock held)."""
+        while self._message_count > self.max_messages and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._message_count -= len(entry.messages)
+            self._stats["evictions"] += 1
+    
+    def get(
+        self,
+        chat_id: str,
+        stamp: Hashable,
+        min_messages: Optional[int] = None,
+        until: Optional[Callable[[List[Message]], bool]] = None
+    ) -> Optional[CachedChat]:
+        """Look up a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            stamp: Current storage stamp of the chat
+            min_messages: Tail length needed; None requires the full history
+            until: Also accept a shorter tail for which this returns True
+            
+        Returns:
+            Cached entry or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is not None and entry.stamp != stamp:
+                self._drop(chat_id)
+                self._stats["invalidations"] += 1
+                entry = None
+            
+            usable = entry is not None and (
+                entry.complete
+                or (min_messages is not None and len(entry.messages) >= min_messages)
+                or (until is not None and until(entry.messages))
+            )
+            if not usable:
+                self._stats["misses"] += 1
+                return None
+            
+            self._entries.move_to_end(chat_id)
+            self._stats["hits"] += 1
+            return entry
+    
+    def put(
+        self,
+        chat_id: str,
+        messages: List[Message],
+        complete: bool,
+        stamp: Hashable
+    ) -> None:
+        """Store the messages of a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            messages: Messages (full history or most recent tail)
+            complete: Whether ``messages`` is the full history
+            stamp: Storage stamp the messages were read at
+        """
+        if not self.enabled or len(messages) > self.max_messages:
+            return
+        
+        with self._lock:
+            self._drop(chat_id)
+            self._entries[chat_id] = CachedChat(list(messages), complete, stamp)
+            self._message_count += len(messages)
+            self._evict()
+    
+    def extend(
+        self,
+        chat_id: str,
+        expected_stamp: Hashable,
+        messages: List[Message],
+        new_stamp: Hashable
+    ) -> None:
+        """Apply an append to a cached chat (write-through).
+        
+        The entry is only updated if it was current before the write;
+        otherwise it is dropped, since it may be missing other writes.
+        
+        Args:
+            chat_id: Chat UUID
+            expected_stamp: Storage stamp before the append
+            messages: Appended messages
+            new_stamp: Storage stamp after the append
+        """
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                return
+            if entry.stamp != expected_stamp:
+                self._drop(chat_id)
+                self._stats["invalidations"] += 1
+                return
+            
+            entry.messages = entry.messages + list(messages)
+            entry.stamp = new_stamp
+            self._message_count += len(messages)
+            self._entries.move_to_end(chat_id)
+            self._evict()
+    
+    def invalidate(self, chat_id: str) -> None:
+        """Drop a chat from the cache.
+        
+        Args:
+            chat_id: Chat UUID
+        """
+        with self._lock:
+            self._drop(chat_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+        
+        Returns:
+            Dictionary with hits, misses, evictions, invalidations, hit
+            ratio and current size
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["messages"] = self._message_count
+            stats["max_messages"] = self.max_messages
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
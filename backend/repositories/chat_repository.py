@@ -1,11 +1,36 @@
-"""Chat repository for chat message management."""
-from typing import List, Optional
+"""Chat repository for chat message management.
+
+Each chat is stored as a directory of JSON Lines segments::
+
+    <chats_dir>/<chat_id>/seg-000000.jsonl   sealed cold segment
+    <chat_id>/seg-000001.jsonl               sealed cold segment
+    <chat_id>/hot.jsonl                      active hot tail (appended)
+
+New messages are appended to the hot segment; once it reaches
+``settings.chat_segment_max_messages`` it is sealed by renaming it to the
+next cold segment. Appending a turn therefore costs the same regardless of
+chat length, and the context window is built from the hot tail (plus the
+newest cold segment when the tail is short). Chats stored in the legacy
+``<chat_id>.json`` format are migrated on first access.
+
+Parsed messages are kept in a bounded LRU ``ChatCache``. Each lookup
+compares the chat's storage stamp (directory inode/mtime plus hot segment
+inode/size/mtime) with the cached one, so writes from other processes are
+picked up; writes from this process go through the cache.
+"""
+import os
+import shutil
+import uuid
+from typing import Callable, Hashable, List, Optional
 from pathlib import Path
 
 from core.config import settings
 from core.logging import get_logger
 from models.message import Message
+from repositories.chat_cache import ChatCache
 from repositories.file_manager import FileManager
+from utils.serialization import dump_messages, validate_messages
+from utils.validators import validate_chat_id
 
 logger = get_logger(__name__)
 
@@ -13,59 +38,373 @@
 class ChatRepository:
     """Repository for managing chat messages."""
     
-    def __init__(self, chats_dir: Path = settings.chats_dir):
+    HOT_SEGMENT_NAME = "hot.jsonl"
+    COLD_SEGMENT_PATTERN = "seg-*.jsonl"
+    
+    def __init__(
+        self,
+        chats_dir: Path = settings.chats_dir,
+        segment_max_messages: int = settings.chat_segment_max_messages,
+        cache_max_messages: int = settings.chat_cache_max_messages
+    ):
         """Initialize chat repository.
         
         Args:
             chats_dir: Directory for chat storage
+            segment_max_messages: Messages per segment before the hot
+                segment is sealed
+            cache_max_messages: Parsed messages kept in memory (0 disables)
         """
         self.chats_dir = chats_dir
+        self.segment_max_messages = max(1, segment_max_messages)
         self.file_manager = FileManager()
+        self.cache = ChatCache(cache_max_messages)
     
-    def _get_chat_file_path(self, chat_id: str) -> Path:
-        """Get file path for a chat.
+    def _get_chat_dir(self, chat_id: str) -> Path:
+        """Get segment directory for a chat.
         
         Args:
             chat_id: Chat UUID
             
         Returns:
-            Path to chat file
+            Path to chat directory
         """
-        return self.chats_dir / f"{chat_id}.json"
+        return self.chats_dir / chat_id
     
-    def load(self, chat_id: str) -> Optional[List[Message]]:
-        """Load messages for a chat.
+    def _get_legacy_file_path(self, chat_id: str) -> Path:
+        """Get legacy single-file path for a chat.
         
         Args:
             chat_id: Chat UUID
             
         Returns:
-            List of messages or None if not found/invalid
+            Path to legacy chat file
         """
-        self.file_manager.ensure_directory_exists(self.chats_dir)
-        chat_file = self._get_chat_file_path(chat_id)
+        return self.chats_dir / f"{chat_id}.json"
+    
+    def _get_hot_segment_path(self, chat_dir: Path) -> Path:
+        """Get hot segment path inside a chat directory."""
+        return chat_dir / self.HOT_SEGMENT_NAME
+    
+    @staticmethod
+    def _get_cold_segment_path(chat_dir: Path, index: int) -> Path:
+        """Get path of the cold segment with the given index."""
+        return chat_dir / f"seg-{index:06d}.jsonl"
+    
+    def _chat_stamp(self, chat_dir: Path) -> Optional[Hashable]:
+        """Get the storage stamp of a chat for cache validation.
         
-        messages_data = self.file_manager.read_json_file(chat_file)
+        Sealing or replacing segments changes the directory; appends change
+        the hot segment.
         
-        if messages_data is None:
-            logger.warning(f"Archivo de chat no encontrado: {chat_file}")
+        Args:
+            chat_dir: Chat directory
+            
+        Returns:
+            Stamp tuple or None if the chat directory is missing
+        """
+        try:
+            dir_stat = os.stat(chat_dir)
+        except FileNotFoundError:
             return None
+        try:
+            hot_stat = os.stat(self._get_hot_segment_path(chat_dir))
+            hot_stamp = (hot_stat.st_ino, hot_stat.st_size, hot_stat.st_mtime_ns)
+        except FileNotFoundError:
+            hot_stamp = None
+        return dir_stat.st_ino, dir_stat.st_mtime_ns, hot_stamp
+    
+    def _list_cold_segments(self, chat_dir: Path) -> List[Path]:
+        """List sealed cold segments, oldest first.
         
-        if not isinstance(messages_data, list):
-            logger.error(f"Chat {chat_file} con formato inválido (no es lista).")
+        Args:
+            chat_dir: Chat directory
+            
+        Returns:
+            Sorted list of cold segment paths
+        """
+        return sorted(chat_dir.glob(self.COLD_SEGMENT_PATTERN))
+    
+    def _read_segment(self, segment: Path) -> Optional[List[Message]]:
+        """Read and parse a segment file.
+        
+        Args:
+            segment: Segment path
+            
+        Returns:
+            List of messages (empty if the segment does not exist) or None
+            if it cannot be read or is invalid
+        """
+        records = self.file_manager.read_json_lines(segment)
+        if records is None:
+            # Only a missing segment is empty; a read error must not serve
+            # (and cache) a shortened history
+            return None if segment.exists() else []
+        try:
+            return validate_messages(records)
+        except Exception as e:
+            logger.error("Error parsing segment %s: %s", segment, e)
             return None
+    
+    def _seal_hot_segment(self, chat_dir: Path) -> None:
+        """Roll the hot segment into the next sealed cold segment.
         
-        # Convert to Message objects
+        Args:
+            chat_dir: Chat directory
+        """
+        cold_segments = self._list_cold_segments(chat_dir)
+        next_index = (
+            int(cold_segments[-1].stem.split("-")[1]) + 1 if cold_segments else 0
+        )
+        target = self._get_cold_segment_path(chat_dir, next_index)
+        self._get_hot_segment_path(chat_dir).replace(target)
+        self.file_manager.sync_paths(chat_dir)
+        logger.debug("Segmento sellado: %s", target)
+    
+    def _write_segments(self, chat_dir: Path, messages: List[Message]) -> bool:
+        """Write messages into a fresh set of segments.
+        
+        Args:
+            chat_dir: Empty chat directory
+            messages: Messages to write
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        records = dump_messages(messages)
+        size = self.segment_max_messages
+        sealed_count = len(records) // size
+        
+        for index in range(sealed_count):
+            segment = self._get_cold_segment_path(chat_dir, index)
+            chunk = records[index * size:(index + 1) * size]
+            if not self.file_manager.append_json_lines(segment, chunk):
+                return False
+        
+        hot_records = records[sealed_count * size:]
+        return self.file_manager.append_json_lines(
+            self._get_hot_segment_path(chat_dir), hot_records
+        )
+    
+    def _stage_segments(self, chat_id: str, messages: List[Message]) -> Optional[Path]:
+        """Write messages into a new staging directory next to the chats.
+        
+        The staging directory always holds a hot segment (possibly empty),
+        so it is never empty when renamed into place.
+        
+        Args:
+            chat_id: Chat UUID
+            messages: Messages to write
+            
+        Returns:
+            Staging directory or None if the segments could not be written
+        """
+        staging_dir = self.chats_dir / f".{chat_id}.{uuid.uuid4().hex}.tmp"
         try:
-            messages = [Message(**msg) for msg in messages_data]
-            logger.debug(f"Chat {chat_id} cargado ({len(messages)} mensajes).")
-            return messages
+            staging_dir.mkdir()
+        except OSError as e:
+            logger.error("Error guardando chat %s: %s", chat_id, e)
+            return None
+        if not self._write_segments(staging_dir, messages):
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            logger.error("Error guardando chat %s", chat_id)
+            return None
+        return staging_dir
+    
+    def _migrate_legacy(self, chat_id: str) -> bool:
+        """Convert a legacy ``<chat_id>.json`` file to segments.
+        
+        The segments are staged and renamed onto the chat directory, which
+        fails once the directory exists (it is never empty). Whoever renames
+        first wins; a concurrent migrator drops its copy instead of replacing
+        a directory that may already hold newer turns.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            True if the chat directory exists after the migration, False
+            otherwise
+        """
+        legacy_file = self._get_legacy_file_path(chat_id)
+        chat_dir = self._get_chat_dir(chat_id)
+        if not legacy_file.exists() or chat_dir.exists():
+            return False
+        
+        messages_data = self.file_manager.read_json_file(legacy_file)
+        if not isinstance(messages_data, list):
+            logger.error("Chat %s con formato inválido (no es lista).", legacy_file)
+            return False
+        
+        try:
+            messages = validate_messages(messages_data)
         except Exception as e:
-            logger.error(f"Error parsing messages for {chat_id}: {e}")
+            logger.error("Error parsing messages for %s: %s", chat_id, e)
+            return False
+        
+        staging_dir = self._stage_segments(chat_id, messages)
+        if staging_dir is None:
+            return False
+        
+        try:
+            # os.rename only replaces an empty directory, so this is exclusive
+            staging_dir.rename(chat_dir)
+            self.file_manager.sync_paths(self.chats_dir)
+        except OSError as e:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            if chat_dir.is_dir():
+                logger.debug("Chat %s ya migrado por otro proceso.", chat_id)
+                return True
+            logger.error("Error migrando chat %s: %s", chat_id, e)
+            return False
+        
+        self.cache.put(chat_id, messages, True, self._chat_stamp(chat_dir))
+        try:
+            legacy_file.unlink()
+        except FileNotFoundError:
+            pass
+        except (OSError, PermissionError) as e:
+            logger.warning("No se pudo eliminar %s tras migrar: %s", legacy_file, e)
+        
+        logger.info("Chat %s migrado a segmentos (%s mensajes).", chat_id, len(messages))
+        return True
+    
+    def _resolve_chat_dir(self, chat_id: str) -> Optional[Path]:
+        """Get the chat directory, migrating legacy storage if needed.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            Chat directory or None if the chat does not exist
+        """
+        self.file_manager.ensure_directory_exists(self.chats_dir)
+        chat_dir = self._get_chat_dir(chat_id)
+        if chat_dir.is_dir():
+            return chat_dir
+        if self._migrate_legacy(chat_id):
+            return chat_dir
+        return None
+    
+    def load(self, chat_id: str) -> Optional[List[Message]]:
+        """Load the full message history of a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            List of messages or None if not found/invalid
+        """
+        chat_dir = self._resolve_chat_dir(chat_id)
+        if chat_dir is None:
+            self.cache.invalidate(chat_id)
+            logger.warning("Chat no encontrado: %s", chat_id)
             return None
+        
+        stamp = self._chat_stamp(chat_dir)
+        cached = self.cache.get(chat_id, stamp)
+        if cached is not None:
+            return list(cached.messages)
+        
+        messages: List[Message] = []
+        segments = self._list_cold_segments(chat_dir)
+        segments.append(self._get_hot_segment_path(chat_dir))
+        for segment in segments:
+            segment_messages = self._read_segment(segment)
+            if segment_messages is None:
+                return None
+            messages.extend(segment_messages)
+        
+        self.cache.put(chat_id, messages, True, stamp)
+        logger.debug("Chat %s cargado (%s mensajes).", chat_id, len(messages))
+        return messages
+    
+    def load_tail(
+        self,
+        chat_id: str,
+        count: int,
+        until: Optional[Callable[[List[Message]], bool]] = None
+    ) -> Optional[List[Message]]:
+        """Load the most recent messages of a chat.
+        
+        Reads the hot segment and only as many cold segments (newest first)
+        as needed to collect ``count`` messages, or fewer once ``until``
+        accepts the messages read so far.
+        
+        Args:
+            chat_id: Chat UUID
+            count: Maximum number of messages to return
+            until: Called with the tail read so far (oldest first); True
+                stops reading older segments
+            
+        Returns:
+            Up to ``count`` most recent messages or None if not found/invalid
+        """
+        chat_dir = self._resolve_chat_dir(chat_id)
+        if chat_dir is None:
+            logger.warning("Chat no encontrado: %s", chat_id)
+            return None
+        
+        if count <= 0:
+            return []
+        
+        stamp = self._chat_stamp(chat_dir)
+        cached = self.cache.get(chat_id, stamp, min_messages=count, until=until)
+        if cached is not None:
+            return cached.messages[-count:]
+        
+        messages = self._read_segment(self._get_hot_segment_path(chat_dir))
+        if messages is None:
+            return None
+        
+        cold_segments = self._list_cold_segments(chat_dir)
+        while len(messages) < count and cold_segments and not (until and until(messages)):
+            segment_messages = self._read_segment(cold_segments.pop())
+            if segment_messages is None:
+                return None
+            messages = segment_messages + messages
+        
+        self.cache.put(chat_id, messages, not cold_segments, stamp)
+        return messages[-count:]
+    
+    def append(self, chat_id: str, messages: List[Message]) -> bool:
+        """Append messages to a chat log.
+        
+        Args:
+            chat_id: Chat UUID
+            messages: New messages to append
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        chat_dir = self._resolve_chat_dir(chat_id)
+        if chat_dir is None:
+            logger.error("No se puede agregar a chat inexistente %s", chat_id)
+            return False
+        
+        stamp_before = self._chat_stamp(chat_dir)
+        hot_segment = self._get_hot_segment_path(chat_dir)
+        records = dump_messages(messages)
+        if not self.file_manager.append_json_lines(hot_segment, records):
+            self.cache.invalidate(chat_id)
+            logger.error("Error guardando chat %s", chat_id)
+            return False
+        
+        if self.file_manager.count_lines(hot_segment) >= self.segment_max_messages:
+            try:
+                self._seal_hot_segment(chat_dir)
+            except OSError as e:
+                logger.error("Error sellando segmento de %s: %s", chat_id, e)
+        
+        self.cache.extend(chat_id, stamp_before, messages, self._chat_stamp(chat_dir))
+        logger.debug("Chat %s: %s mensajes agregados.", chat_id, len(messages))
+        return True
     
     def save(self, chat_id: str, messages: List[Message]) -> bool:
-        """Save messages for a chat.
+        """Replace the full message history of a chat.
+        
+        Segments are written to a staging directory and swapped in, so a
+        failure leaves the previous history intact.
         
         Args:
             chat_id: Chat UUID
@@ -75,20 +414,33 @@ def save(self, chat_id: str, messages: List[Message]) -> bool:
             True if successful, False otherwise
         """
         self.file_manager.ensure_directory_exists(self.chats_dir)
-        chat_file = self._get_chat_file_path(chat_id)
-        
-        # Convert Message objects to dict
-        messages_dict = [msg.model_dump() for msg in messages]
+        chat_dir = self._get_chat_dir(chat_id)
+        staging_dir = self._stage_segments(chat_id, messages)
+        if staging_dir is None:
+            self.cache.invalidate(chat_id)
+            return False
         
-        if self.file_manager.write_json_file(chat_file, messages_dict):
-            logger.debug(f"Chat {chat_id} guardado ({len(messages)} mensajes).")
-            return True
+        try:
+            if chat_dir.exists():
+                retired_dir = self.chats_dir / f".{chat_id}.{uuid.uuid4().hex}.old"
+                chat_dir.replace(retired_dir)
+                staging_dir.replace(chat_dir)
+                shutil.rmtree(retired_dir, ignore_errors=True)
+            else:
+                staging_dir.replace(chat_dir)
+            self.file_manager.sync_paths(self.chats_dir)
+        except OSError as e:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            self.cache.invalidate(chat_id)
+            logger.error("Error guardando chat %s: %s", chat_id, e)
+            return False
         
-        logger.error(f"Error guardando chat {chat_id}")
-        return False
+        self.cache.put(chat_id, messages, True, self._chat_stamp(chat_dir))
+        logger.debug("Chat %s guardado (%s mensajes).", chat_id, len(messages))
+        return True
     
     def delete(self, chat_id: str) -> bool:
-        """Delete a chat file.
+        """Delete a chat and all its segments.
         
         Args:
             chat_id: Chat UUID
@@ -96,18 +448,25 @@ def delete(self, chat_id: str) -> bool:
         Returns:
             True if deleted, False if not found or error
         """
-        chat_file = self._get_chat_file_path(chat_id)
+        deleted = False
+        self.cache.invalidate(chat_id)
+        chat_dir = self._get_chat_dir(chat_id)
+        legacy_file = self._get_legacy_file_path(chat_id)
         
-        if chat_file.exists():
-            try:
-                chat_file.unlink()
-                logger.info(f"Archivo eliminado: {chat_file}")
-                return True
-            except (OSError, PermissionError) as e:
-                logger.error(f"Error eliminando archivo {chat_file}: {e}")
-                return False
+        try:
+            if chat_dir.is_dir():
+                shutil.rmtree(chat_dir)
+                logger.info("Directorio eliminado: %s", chat_dir)
+                deleted = True
+            if legacy_file.exists():
+                legacy_file.unlink()
+                logger.info("Archivo eliminado: %s", legacy_file)
+                deleted = True
+        except (OSError, PermissionError) as e:
+            logger.error("Error eliminando chat %s: %s", chat_id, e)
+            return False
         
-        return False
+        return deleted
     
     def exists(self, chat_id: str) -> bool:
         """Check if a chat exists.
@@ -118,5 +477,38 @@ def exists(self, chat_id: str) -> bool:
         Returns:
             True if chat exists, False otherwise
         """
-        chat_file = self._get_chat_file_path(chat_id)
-        return chat_file.exists()
+        return (
+            self._get_chat_dir(chat_id).is_dir()
+            or self._get_legacy_file_path(chat_id).exists()
+        )
+    
+    def list_chat_ids(self) -> List[str]:
+        """List the ids of all stored chats (segmented or legacy).
+        
+        Returns:
+            Sorted list of chat UUIDs
+        """
+        if not self.chats_dir.exists():
+            return []
+        chat_ids = {
+            path.stem if path.suffix == ".json" else path.name
+            for path in self.chats_dir.iterdir()
+            if path.is_dir() or path.suffix == ".json"
+        }
+        return sorted(chat_id for chat_id in chat_ids if validate_chat_id(chat_id))
+    
+    def migrate_legacy_chats(self) -> int:
+        """Migrate every legacy ``<chat_id>.json`` file to segments.
+        
+        Returns:
+            Number of chats migrated
+        """
+        self.file_manager.ensure_directory_exists(self.chats_dir)
+        migrated = 0
+        for legacy_file in sorted(self.chats_dir.glob("*.json")):
+            if validate_chat_id(legacy_file.stem) and self._migrate_legacy(
+                legacy_file.stem
+            ):
+                migrated += 1
+        logger.info("Migración completada: %s chats convertidos a segmentos.", migrated)
+        return migrated
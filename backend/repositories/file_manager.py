@@ -1,13 +1,180 @@
-"""File management utilities for repositories."""
-import json
+"""File management utilities for repositories.
+
+Writes are crash-safe: whole-file writes go to a temporary file that is
+fsynced and renamed over the target (then the directory is fsynced), and
+appends are fsynced before returning. With ``STORAGE_GROUP_COMMIT_MS`` set,
+fsyncs from concurrent writers are batched by ``GroupCommit``.
+"""
+import os
+import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable, List, Set
 
+from core.config import settings
 from core.logging import get_logger
+from core.metrics import file_io_bytes_total, file_io_duration_seconds
+from utils.serialization import dumps, loads
 
 logger = get_logger(__name__)
 
 
+def _record_io(operation: str, size: int, started: float) -> None:
+    """Record the bytes and duration of a file operation.
+    
+    Args:
+        operation: 'read', 'write' or 'append'
+        size: Bytes read or written
+        started: perf_counter value at the start of the operation
+    """
+    file_io_bytes_total.inc((operation,), size)
+    file_io_duration_seconds.observe((operation,), time.perf_counter() - started)
+
+
+def _fsync_path(path: str) -> bool:
+    """Flush a file or directory to stable storage.
+    
+    Args:
+        path: File or directory path
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    if os.name == "nt" and os.path.isdir(path):
+        # Directories cannot be opened for fsync on Windows
+        return True
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return True
+    except OSError as e:
+        logger.error("Error sincronizando %s: %s", path, e)
+        return False
+
+
+def _truncate_torn_tail(f) -> int:
+    """Drop an incomplete last line left by an interrupted append.
+    
+    An append that crashed before writing its final newline was never
+    acknowledged; the next append must not be written onto it, or the
+    merged line would be unreadable and take the new records with it.
+    
+    Args:
+        f: File opened in ``a+b`` mode
+        
+    Returns:
+        Number of bytes dropped (0 if the file ends with a newline)
+    """
+    end = f.seek(0, os.SEEK_END)
+    if end == 0:
+        return 0
+    f.seek(end - 1)
+    if f.read(1) == b"\n":
+        return 0
+    
+    keep = 0
+    position = end
+    while position > 0:
+        start = max(0, position - 4096)
+        f.seek(start)
+        newline = f.read(position - start).rfind(b"\n")
+        if newline != -1:
+            keep = start + newline + 1
+            break
+        position = start
+    f.truncate(keep)
+    return end - keep
+
+
+class _SyncBatch:
+    """Paths waiting for one group commit."""
+    
+    def __init__(self):
+        """Initialize batch."""
+        self.paths: Set[str] = set()
+        self.failed: Set[str] = set()
+        self.done = threading.Event()
+
+
+class GroupCommit:
+    """Coalesces fsyncs from concurrent writers into short batches.
+    
+    The first writer to join a batch becomes its leader: it waits for the
+    commit window so other writers can join, fsyncs every distinct path of
+    the batch once and wakes them all. Writes to the same file or directory
+    within a window (metadata shards, the chats directory) share one fsync.
+    """
+    
+    def __init__(self, window_seconds: float):
+        """Initialize group commit.
+        
+        Args:
+            window_seconds: Time the leader waits for other writers
+        """
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._batch: Optional[_SyncBatch] = None
+        self._stats = {"requests": 0, "batches": 0, "fsyncs": 0}
+    
+    def sync(self, paths: Iterable[Path]) -> bool:
+        """Flush paths to stable storage, batched with concurrent callers.
+        
+        Args:
+            paths: Files or directories to flush
+            
+        Returns:
+            True if every path was flushed, False otherwise
+        """
+        keys = {str(path) for path in paths}
+        with self._lock:
+            self._stats["requests"] += 1
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _SyncBatch()
+            batch.paths.update(keys)
+        
+        if not leader:
+            batch.done.wait()
+            return not keys & batch.failed
+        
+        time.sleep(self.window_seconds)
+        with self._lock:
+            # Close the batch: later writers start the next one
+            self._batch = None
+            self._stats["batches"] += 1
+            self._stats["fsyncs"] += len(batch.paths)
+        try:
+            for path in batch.paths:
+                if not _fsync_path(path):
+                    batch.failed.add(path)
+        finally:
+            batch.done.set()
+        return not keys & batch.failed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get group commit statistics.
+        
+        Returns:
+            Dictionary with sync requests, batches, fsyncs and the mean
+            number of requests per batch
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats["window_seconds"] = self.window_seconds
+        stats["requests_per_batch"] = (
+            stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        return stats
+
+
+group_commit = GroupCommit(settings.storage_group_commit_ms / 1000)
+
+
 class FileManager:
     """Gestor de archivos y directorios."""
     
@@ -24,9 +191,9 @@ def ensure_directory_exists(directory: Path) -> None:
         if not directory.exists():
             try:
                 directory.mkdir(parents=True, exist_ok=True)
-                logger.info(f"Directorio '{directory}' creado.")
+                logger.info("Directorio '%s' creado.", directory)
             except OSError as e:
-                logger.error(f"Error crítico: No se pudo crear '{directory}': {e}")
+                logger.error("Error crítico: No se pudo crear '%s': %s", directory, e)
                 raise
     
     @staticmethod
@@ -43,23 +210,66 @@ def read_json_file(file_path: Path) -> Optional[Any]:
             return None
         
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = json.load(f)
-                # Validar que el contenido no esté vacío o sea None
-                if content is None:
-                    logger.warning(f"Archivo {file_path} contiene null")
-                    return None
-                return content
-        except (IOError, json.JSONDecodeError) as e:
-            logger.error(f"Error leyendo {file_path}: {e}")
+            started = time.perf_counter()
+            with open(file_path, "rb") as f:
+                raw = f.read()
+            _record_io("read", len(raw), started)
+            content = loads(raw)
+            # Validar que el contenido no esté vacío o sea None
+            if content is None:
+                logger.warning("Archivo %s contiene null", file_path)
+                return None
+            return content
+        except (IOError, ValueError) as e:
+            logger.error("Error leyendo %s: %s", file_path, e)
             return None
         except Exception as e:
-            logger.exception(f"Error inesperado leyendo {file_path}: {e}")
+            logger.exception("Error inesperado leyendo %s: %s", file_path, e)
             return None
     
+    @staticmethod
+    def sync_paths(*paths: Path) -> bool:
+        """Flush files or directories to stable storage.
+        
+        Does nothing when ``STORAGE_FSYNC`` is disabled; batches with other
+        writers when group commit is enabled.
+        
+        Args:
+            *paths: Files or directories to flush
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not settings.storage_fsync:
+            return True
+        if group_commit.window_seconds > 0:
+            return group_commit.sync(paths)
+        return all([_fsync_path(str(path)) for path in paths])
+    
     @staticmethod
     def write_json_file(file_path: Path, data: Any) -> bool:
-        """Escribe datos en un archivo JSON.
+        """Escribe datos en un archivo JSON de forma atómica.
+        
+        Equivalent to ``replace_json_file``: a crash or a concurrent reader
+        never observes a truncated file.
+        
+        Args:
+            file_path: Path to JSON file
+            data: Data to write
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        return FileManager.replace_json_file(file_path, data)
+    
+    @staticmethod
+    def replace_json_file(file_path: Path, data: Any) -> bool:
+        """Reemplaza atómicamente un archivo JSON.
+        
+        The data is written compactly to a temporary file in the same
+        directory, fsynced and moved over the target with ``os.replace``;
+        the directory is then fsynced so the rename survives a crash.
+        Readers always see either the previous or the new complete file.
         
         Args:
             file_path: Path to JSON file
@@ -68,10 +278,129 @@ def write_json_file(file_path: Path, data: Any) -> bool:
         Returns:
             True if successful, False otherwise
         """
+        tmp_path = None
+        started = time.perf_counter()
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            payload = dumps(data)
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent
+            )
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            if not FileManager.sync_paths(Path(tmp_path)):
+                raise OSError(f"fsync fallido para {tmp_path}")
+            os.replace(tmp_path, file_path)
+            tmp_path = None
+            FileManager.sync_paths(file_path.parent)
+            _record_io("write", len(payload), started)
             return True
+        except (IOError, OSError) as e:
+            logger.error("Error escribiendo %s: %s", file_path, e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+    
+    @staticmethod
+    def read_json_lines(file_path: Path) -> Optional[List[Any]]:
+        """Lee un archivo JSON Lines y retorna sus registros.
+        
+        A truncated or corrupt trailing line (e.g. from an interrupted append)
+        is skipped with a warning. A corrupt line followed by more records
+        fails the whole read, so damaged history is never served shortened.
+        
+        Args:
+            file_path: Path to JSON Lines file
+            
+        Returns:
+            List of parsed records or None if the file does not exist,
+            cannot be read or is corrupt before its last line
+        """
+        if not file_path.exists():
+            return None
+        
+        records = []
+        size = 0
+        bad_line = None
+        started = time.perf_counter()
+        try:
+            with open(file_path, "rb") as f:
+                for line_number, line in enumerate(f, start=1):
+                    size += len(line)
+                    if not line.strip():
+                        continue
+                    if bad_line is not None:
+                        logger.error(
+                            "Línea %s inválida en %s: %s", bad_line[0], file_path, bad_line[1]
+                        )
+                        return None
+                    try:
+                        records.append(loads(line))
+                    except ValueError as e:
+                        bad_line = (line_number, e)
+            if bad_line is not None:
+                logger.warning(
+                    "Línea final %s inválida en %s: %s", bad_line[0], file_path, bad_line[1]
+                )
+            _record_io("read", size, started)
+            return records
+        except IOError as e:
+            logger.error("Error leyendo %s: %s", file_path, e)
+            return None
+    
+    @staticmethod
+    def count_lines(file_path: Path) -> int:
+        """Cuenta las líneas completas de un archivo sin decodificarlas.
+        
+        Args:
+            file_path: Path to JSON Lines file
+            
+        Returns:
+            Number of newline-terminated lines (0 if the file does not exist)
+        """
+        started = time.perf_counter()
+        count = size = 0
+        try:
+            with open(file_path, "rb") as f:
+                while chunk := f.read(65536):
+                    count += chunk.count(b"\n")
+                    size += len(chunk)
+        except FileNotFoundError:
+            return 0
+        _record_io("read", size, started)
+        return count
+    
+    @staticmethod
+    def append_json_lines(file_path: Path, records: Iterable[Any]) -> bool:
+        """Agrega registros al final de un archivo JSON Lines.
+        
+        The file (and its directory, when the file is new) is fsynced before
+        returning. An incomplete last line left by an interrupted append is
+        truncated first, so the new records start on a line of their own.
+        
+        Args:
+            file_path: Path to JSON Lines file
+            records: Records to append, one per line
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        started = time.perf_counter()
+        payload = b"".join(dumps(record) + b"\n" for record in records)
+        try:
+            created = not file_path.exists()
+            with open(file_path, "a+b") as f:
+                dropped = _truncate_torn_tail(f)
+                if dropped:
+                    logger.warning(
+                        "Línea final incompleta en %s: %s bytes descartados", file_path, dropped
+                    )
+                f.write(payload)
+            if created:
+                synced = FileManager.sync_paths(file_path, file_path.parent)
+            else:
+                synced = FileManager.sync_paths(file_path)
+            _record_io("append", len(payload), started)
+            return synced
         except IOError as e:
-            logger.error(f"Error escribiendo {file_path}: {e}")
+            logger.error("Error agregando a %s: %s", file_path, e)
             return False
@@ -1,91 +1,462 @@
-"""Metadata repository for chat metadata management."""
-from typing import Dict
+"""Metadata repository for chat metadata management.
+
+Metadata is hash-sharded by chat id into ``METADATA_SHARDS`` snapshot files
+(``data/metadata/shard-NNN.json``), each with its own ``FileLock``. A turn
+only rewrites the shard that owns its chat, so writes to different chats
+rarely contend and the bytes written per turn are proportional to the shard,
+not to the whole history.
+
+Every shard keeps a process-resident index that is loaded once and then
+updated incrementally. Writers take the shard's cross-process lock and
+persist it as an atomic snapshot (write temp file + ``os.replace``), so
+readers never need the lock: they only ``stat`` the shard file and reload
+it when its stamp (inode, size, mtime) shows that another process has
+replaced it.
+
+Alongside each index, a list of ``(last_updated, chat_id)`` keys is kept
+sorted; history pages are served by lazily merging the shards' lists, in
+O(page size * log shards). The lists are replaced copy-on-write by writers,
+so readers can walk a consistent snapshot without locking.
+
+The previous single-file layout (``chats_metadata.json``) is split into
+shards on first use. The shard count is recorded in ``layout.json``; when it
+changes, existing shards are redistributed at startup.
+"""
+import bisect
+import heapq
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 from filelock import FileLock
+from pydantic import ValidationError
 
 from core.config import settings
 from core.logging import get_logger
+from core.metrics import metadata_lock_timeouts_total, metadata_lock_wait_seconds
 from models.chat import ChatMetadata
 from repositories.file_manager import FileManager
+from utils.serialization import validate_metadata
 
 logger = get_logger(__name__)
 
+FileStamp = Tuple[int, int, int]
+SortKey = Tuple[str, str]
+
+LAYOUT_FILE_NAME = "layout.json"
+LAYOUT_LOCK_TIMEOUT = 30
+SHARD_LOCK_TIMEOUT = 5
+
+
+class _MetadataShard:
+    """One metadata shard: snapshot file, lock and resident index."""
+    
+    def __init__(self, shard_file: Path, lock_file: Path, file_manager: FileManager):
+        """Initialize shard.
+        
+        Args:
+            shard_file: Path to the shard JSON file
+            lock_file: Path to the shard lock file
+            file_manager: File manager used for reads and snapshots
+        """
+        self.shard_file = shard_file
+        self.lock = FileLock(str(lock_file))
+        self.file_manager = file_manager
+        
+        # Resident index: parsed models plus their serialized form, so that
+        # persisting a snapshot does not re-dump every entry.
+        self.index: Dict[str, ChatMetadata] = {}
+        self.records: Dict[str, dict] = {}
+        self.order: List[SortKey] = []
+        self.stamp: Optional[FileStamp] = None
+        self.loaded = False
+        self.mutex = threading.RLock()
+    
+    @contextmanager
+    def locked(self, timeout: float = SHARD_LOCK_TIMEOUT) -> Iterator[None]:
+        """Hold the shard's cross-process lock, recording the wait.
+        
+        Args:
+            timeout: Seconds to wait for the lock
+            
+        Raises:
+            TimeoutError: If the lock is not acquired in time
+        """
+        started = time.perf_counter()
+        try:
+            self.lock.acquire(timeout=timeout)
+        except TimeoutError:
+            metadata_lock_timeouts_total.inc()
+            raise
+        finally:
+            metadata_lock_wait_seconds.observe((), time.perf_counter() - started)
+        
+        try:
+            yield
+        finally:
+            self.lock.release()
+    
+    def file_stamp(self) -> Optional[FileStamp]:
+        """Get the current stamp of the shard file.
+        
+        Returns:
+            Tuple of (inode, size, mtime_ns) or None if the file is missing
+        """
+        try:
+            stat = os.stat(self.shard_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+    
+    def is_stale(self) -> bool:
+        """Whether the index was never loaded or the file changed."""
+        return not self.loaded or self.file_stamp() != self.stamp
+    
+    def reload(self) -> None:
+        """Rebuild the resident index from the shard file.
+        
+        Must be called with ``self.mutex`` held. Does not take the file
+        lock: snapshots are replaced atomically, so the file is always
+        complete.
+        """
+        stamp = self.file_stamp()
+        loaded_data = self.file_manager.read_json_file(self.shard_file)
+        
+        index: Dict[str, ChatMetadata] = {}
+        records: Dict[str, dict] = {}
+        if loaded_data and isinstance(loaded_data, dict):
+            try:
+                index = validate_metadata(loaded_data)
+                records = loaded_data
+            except ValidationError:
+                # Keep the valid entries, logging each invalid one
+                for chat_id, data in loaded_data.items():
+                    try:
+                        index[chat_id] = ChatMetadata(**data)
+                        records[chat_id] = data
+                    except Exception as e:
+                        logger.error("Error parsing metadata for %s: %s", chat_id, e)
+        elif loaded_data is not None:
+            logger.warning("%s contiene datos inválidos. Reiniciando.", self.shard_file)
+        
+        self.index = index
+        self.records = records
+        self.order = sorted(
+            (meta.last_updated, chat_id) for chat_id, meta in index.items()
+        )
+        self.stamp = stamp
+        self.loaded = True
+        logger.debug(
+            "Índice de metadata cargado desde %s (%s chats)", self.shard_file, len(index)
+        )
+    
+    def ensure_fresh(self) -> None:
+        """Reload the index if it was never loaded or the file changed."""
+        if not self.is_stale():
+            return
+        
+        with self.mutex:
+            if self.is_stale():
+                self.reload()
+    
+    def replace(self, metadata: Dict[str, ChatMetadata]) -> None:
+        """Replace the resident index (mutex and file lock must be held).
+        
+        Args:
+            metadata: Dictionary of chat_id -> ChatMetadata for this shard
+        """
+        self.index = {chat_id: meta.model_copy() for chat_id, meta in metadata.items()}
+        self.records = {chat_id: meta.model_dump() for chat_id, meta in metadata.items()}
+        self.order = sorted(
+            (meta.last_updated, chat_id) for chat_id, meta in metadata.items()
+        )
+        self.loaded = True
+    
+    def persist(self) -> bool:
+        """Write the resident index as an atomic snapshot.
+        
+        Must be called with ``self.mutex`` and the file lock held.
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if self.file_manager.replace_json_file(self.shard_file, self.records):
+            self.stamp = self.file_stamp()
+            logger.debug("Metadata guardada en %s (%s chats)", self.shard_file, len(self.records))
+            return True
+        
+        # Force a reload so the index matches what is actually on disk
+        self.loaded = False
+        return False
+
 
 class MetadataRepository:
     """Repository for managing chat metadata."""
     
     def __init__(
         self,
-        metadata_file: Path = settings.metadata_file,
-        lock_file: Path = settings.metadata_lock_file
+        metadata_dir: Path = settings.metadata_dir,
+        shards: int = settings.metadata_shards,
+        legacy_file: Path = settings.metadata_file,
+        layout_lock_file: Path = settings.metadata_lock_file
     ):
         """Initialize metadata repository.
         
         Args:
-            metadata_file: Path to metadata JSON file
-            lock_file: Path to lock file
+            metadata_dir: Directory holding the shard files
+            shards: Number of shards
+            legacy_file: Single-file metadata to migrate, if present
+            layout_lock_file: Lock taken while checking or changing the
+                shard layout
         """
-        self.metadata_file = metadata_file
-        self.lock_file = lock_file
-        self.lock = FileLock(str(lock_file))
+        self.metadata_dir = metadata_dir
+        self.legacy_file = legacy_file
+        self.layout_file = metadata_dir / LAYOUT_FILE_NAME
+        self.layout_lock = FileLock(str(layout_lock_file))
         self.file_manager = FileManager()
+        self._shards = [
+            _MetadataShard(
+                metadata_dir / f"shard-{number:03d}.json",
+                metadata_dir / f"shard-{number:03d}.lock",
+                self.file_manager
+            )
+            for number in range(shards)
+        ]
+        self._layout_ready = False
+        self._layout_mutex = threading.Lock()
+    
+    def _shard_number(self, chat_id: str) -> int:
+        """Get the number of the shard owning a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            Shard number
+        """
+        return zlib.crc32(chat_id.encode("utf-8")) % len(self._shards)
+    
+    def _shard_for(self, chat_id: str) -> _MetadataShard:
+        """Get the shard owning a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            Shard for the chat
+        """
+        return self._shards[self._shard_number(chat_id)]
+    
+    def _ensure_layout(self) -> None:
+        """Create the shard directory and migrate older layouts, once."""
+        if self._layout_ready:
+            return
+        
+        with self._layout_mutex:
+            if self._layout_ready:
+                return
+            self.file_manager.ensure_directory_exists(self.metadata_dir)
+            self.file_manager.ensure_directory_exists(self.legacy_file.parent)
+            with self.layout_lock.acquire(timeout=LAYOUT_LOCK_TIMEOUT):
+                layout = self.file_manager.read_json_file(self.layout_file)
+                current = layout.get("shards") if isinstance(layout, dict) else None
+                if current != len(self._shards) or self.legacy_file.exists():
+                    self._reshard(current)
+            self._layout_ready = True
+    
+    def _reshard(self, previous_shards: Optional[int]) -> None:
+        """Redistribute the legacy file and existing shards (layout lock held).
+        
+        Every process sharing ``data/`` must run with the same shard count;
+        resharding happens when the first process with a new count starts.
+        
+        Args:
+            previous_shards: Shard count recorded in the layout file, if any
+        """
+        merged: Dict[str, ChatMetadata] = {}
+        sources = [self.legacy_file] + sorted(self.metadata_dir.glob("shard-*.json"))
+        for source in sources:
+            loaded_data = self.file_manager.read_json_file(source)
+            if not isinstance(loaded_data, dict):
+                continue
+            for chat_id, data in loaded_data.items():
+                try:
+                    merged[chat_id] = ChatMetadata(**data)
+                except Exception as e:
+                    logger.error("Error parsing metadata for %s: %s", chat_id, e)
+        
+        assigned: List[Dict[str, ChatMetadata]] = [{} for _ in self._shards]
+        for chat_id, meta in merged.items():
+            assigned[self._shard_number(chat_id)][chat_id] = meta
+        
+        for shard, metadata in zip(self._shards, assigned):
+            with shard.mutex, shard.lock.acquire(timeout=LAYOUT_LOCK_TIMEOUT):
+                shard.replace(metadata)
+                if not shard.persist():
+                    raise OSError(f"No se pudo escribir {shard.shard_file}")
+        
+        # Shards beyond the new count hold no data anymore
+        current_files = {shard.shard_file for shard in self._shards}
+        for stale_file in self.metadata_dir.glob("shard-*.json"):
+            if stale_file not in current_files:
+                stale_file.unlink()
+        
+        self.file_manager.replace_json_file(
+            self.layout_file, {"shards": len(self._shards)}
+        )
+        if self.legacy_file.exists():
+            os.replace(
+                self.legacy_file,
+                self.legacy_file.with_name(self.legacy_file.name + ".migrated")
+            )
+        logger.info(
+            "Metadata distribuida en %s shards (%s chats, shards anteriores: %s)",
+            len(self._shards), len(merged), previous_shards
+        )
+    
+    def _fresh_shards(self) -> List[_MetadataShard]:
+        """Get all shards with their indexes up to date.
+        
+        Returns:
+            List of shards
+        """
+        self._ensure_layout()
+        for shard in self._shards:
+            shard.ensure_fresh()
+        return self._shards
+    
+    @staticmethod
+    def _remove_sort_key(order: List[SortKey], key: SortKey) -> None:
+        """Remove a key from a sorted key list if present.
+        
+        Args:
+            order: Sorted list of (last_updated, chat_id) keys
+            key: Key to remove
+        """
+        position = bisect.bisect_left(order, key)
+        if position < len(order) and order[position] == key:
+            del order[position]
+    
+    @staticmethod
+    def _iter_descending(
+        order: List[SortKey],
+        before: Optional[SortKey],
+        until: Optional[str]
+    ) -> Iterator[SortKey]:
+        """Iterate the keys of one shard from newest to oldest.
+        
+        Args:
+            order: Sorted list of (last_updated, chat_id) keys
+            before: Exclusive upper bound key
+            until: Inclusive upper bound for last_updated
+            
+        Yields:
+            (last_updated, chat_id) keys in descending order
+        """
+        end = bisect.bisect_left(order, before) if before else len(order)
+        if until is not None:
+            end = min(end, bisect.bisect_right(order, (until, "\uffff")))
+        for position in range(end - 1, -1, -1):
+            yield order[position]
+    
+    def list_recent(
+        self,
+        limit: Optional[int] = None,
+        before: Optional[SortKey] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> List[ChatMetadata]:
+        """List chats by last_updated, most recent first.
+        
+        Entries are shared with the resident indexes and must be treated as
+        read-only.
+        
+        Args:
+            limit: Maximum number of chats (all if None)
+            before: Exclusive upper bound (last_updated, chat_id) key
+            since: Inclusive lower bound for last_updated (ISO format)
+            until: Inclusive upper bound for last_updated (ISO format)
+            
+        Returns:
+            List of ChatMetadata
+        """
+        try:
+            shards = self._fresh_shards()
+        except Exception as e:
+            logger.exception("Error inesperado cargando metadata: %s", e)
+            shards = self._shards
+        
+        # Snapshot each shard's index together with its key list
+        indexes = [shard.index for shard in shards]
+        merged = heapq.merge(
+            *(
+                self._iter_descending(shard.order, before, until)
+                for shard in shards
+            ),
+            reverse=True
+        )
+        
+        page: List[ChatMetadata] = []
+        for last_updated, chat_id in merged:
+            if limit is not None and len(page) >= limit:
+                break
+            if since is not None and last_updated < since:
+                break
+            metadata = indexes[self._shard_number(chat_id)].get(chat_id)
+            if metadata is not None:
+                page.append(metadata)
+        return page
     
     def load(self) -> Dict[str, ChatMetadata]:
-        """Carga metadata desde archivo con protección de lock.
+        """Retorna un snapshot de la metadata sin tomar locks.
+        
+        The returned dictionary is a copy, but its entries are shared with
+        the resident indexes and must be treated as read-only; use ``get``
+        to obtain a copy that can be modified.
         
         Returns:
             Dictionary of chat_id -> ChatMetadata
         """
-        self.file_manager.ensure_directory_exists(self.metadata_file.parent)
-        metadata = {}
-        
         try:
-            with self.lock.acquire(timeout=5):
-                loaded_data = self.file_manager.read_json_file(self.metadata_file)
-                
-                if loaded_data and isinstance(loaded_data, dict):
-                    # Convert dict to ChatMetadata objects
-                    for chat_id, data in loaded_data.items():
-                        try:
-                            metadata[chat_id] = ChatMetadata(**data)
-                        except Exception as e:
-                            logger.error(f"Error parsing metadata for {chat_id}: {e}")
-                elif loaded_data is not None:
-                    logger.warning(
-                        f"{self.metadata_file} contiene datos inválidos. Reiniciando."
-                    )
-        except TimeoutError:
-            logger.error(f"Timeout esperando lock para leer {self.metadata_file}.")
+            shards = self._fresh_shards()
         except Exception as e:
-            logger.exception(f"Error inesperado cargando metadata: {e}")
+            logger.exception("Error inesperado cargando metadata: %s", e)
+            shards = self._shards
         
+        metadata: Dict[str, ChatMetadata] = {}
+        for shard in shards:
+            metadata.update(shard.index)
         return metadata
     
     def save(self, metadata: Dict[str, ChatMetadata]) -> None:
-        """Guarda metadata en archivo con protección de lock.
+        """Reemplaza toda la metadata, shard por shard, con protección de lock.
         
         Args:
             metadata: Dictionary of chat_id -> ChatMetadata
         """
-        self.file_manager.ensure_directory_exists(self.metadata_file.parent)
-        
         try:
-            with self.lock.acquire(timeout=5):
-                # Convert ChatMetadata objects to dict
-                data_dict = {
-                    chat_id: meta.model_dump()
-                    for chat_id, meta in metadata.items()
-                }
-                
-                if self.file_manager.write_json_file(self.metadata_file, data_dict):
-                    logger.debug(
-                        f"Metadata guardada en {self.metadata_file} "
-                        f"({len(metadata)} chats)"
-                    )
-        except TimeoutError:
-            logger.error(f"Timeout esperando lock para guardar {self.metadata_file}.")
+            self._ensure_layout()
         except Exception as e:
-            logger.exception(f"Error inesperado guardando metadata: {e}")
+            logger.exception("Error inesperado preparando metadata: %s", e)
+            return
+        
+        assigned: List[Dict[str, ChatMetadata]] = [{} for _ in self._shards]
+        for chat_id, meta in metadata.items():
+            assigned[self._shard_number(chat_id)][chat_id] = meta
+        
+        for shard, shard_metadata in zip(self._shards, assigned):
+            with shard.mutex:
+                try:
+                    with shard.locked():
+                        shard.replace(shard_metadata)
+                        shard.persist()
+                except TimeoutError:
+                    logger.error("Timeout esperando lock para guardar %s.", shard.shard_file)
+                except Exception as e:
+                    logger.exception("Error inesperado guardando metadata: %s", e)
     
     def get(self, chat_id: str) -> ChatMetadata | None:
         """Get metadata for a specific chat.
@@ -94,21 +465,54 @@ def get(self, chat_id: str) -> ChatMetadata | None:
             chat_id: Chat UUID
             
         Returns:
-            ChatMetadata or None if not found
+            Copy of the ChatMetadata or None if not found
         """
-        metadata = self.load()
-        return metadata.get(chat_id)
+        shard = self._shard_for(chat_id)
+        try:
+            self._ensure_layout()
+            shard.ensure_fresh()
+        except Exception as e:
+            logger.exception("Error inesperado cargando metadata: %s", e)
+        
+        metadata = shard.index.get(chat_id)
+        return metadata.model_copy() if metadata else None
     
     def update(self, chat_id: str, metadata: ChatMetadata) -> None:
         """Update metadata for a specific chat.
         
+        Only the shard owning the chat is locked and rewritten.
+        
         Args:
             chat_id: Chat UUID
             metadata: Updated metadata
         """
-        all_metadata = self.load()
-        all_metadata[chat_id] = metadata
-        self.save(all_metadata)
+        shard = self._shard_for(chat_id)
+        
+        try:
+            self._ensure_layout()
+        except Exception as e:
+            logger.exception("Error inesperado preparando metadata: %s", e)
+            return
+        
+        with shard.mutex:
+            try:
+                with shard.locked():
+                    # Pick up snapshots written by other processes first
+                    if shard.is_stale():
+                        shard.reload()
+                    previous = shard.index.get(chat_id)
+                    order = list(shard.order)
+                    if previous is not None:
+                        self._remove_sort_key(order, (previous.last_updated, chat_id))
+                    bisect.insort(order, (metadata.last_updated, chat_id))
+                    shard.index[chat_id] = metadata.model_copy()
+                    shard.records[chat_id] = metadata.model_dump()
+                    shard.order = order
+                    shard.persist()
+            except TimeoutError:
+                logger.error("Timeout esperando lock para guardar %s.", shard.shard_file)
+            except Exception as e:
+                logger.exception("Error inesperado guardando metadata: %s", e)
     
     def delete(self, chat_id: str) -> bool:
         """Delete metadata for a specific chat.
@@ -119,9 +523,33 @@ def delete(self, chat_id: str) -> bool:
         Returns:
             True if deleted, False if not found
         """
-        metadata = self.load()
-        if chat_id in metadata:
-            del metadata[chat_id]
-            self.save(metadata)
-            return True
+        shard = self._shard_for(chat_id)
+        
+        try:
+            self._ensure_layout()
+        except Exception as e:
+            logger.exception("Error inesperado preparando metadata: %s", e)
+            return False
+        
+        with shard.mutex:
+            try:
+                with shard.locked():
+                    if shard.is_stale():
+                        shard.reload()
+                    if chat_id not in shard.index:
+                        return False
+                    order = list(shard.order)
+                    self._remove_sort_key(
+                        order, (shard.index[chat_id].last_updated, chat_id)
+                    )
+                    shard.order = order
+                    del shard.index[chat_id]
+                    del shard.records[chat_id]
+                    shard.persist()
+                    return True
+            except TimeoutError:
+                logger.error("Timeout esperando lock para guardar %s.", shard.shard_file)
+            except Exception as e:
+                logger.exception("Error inesperado guardando metadata: %s", e)
+        
         return False
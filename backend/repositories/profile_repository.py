@@ -0,0 +1,143 @@
+"""Repository for request profiles."""
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from core.logging import get_logger
+from repositories.file_manager import FileManager
+from utils.profiler import EXTENSIONS, RequestProfiler
+
+logger = get_logger(__name__)
+
+PROFILE_ID = re.compile(r"^\d{8}T\d{12}-\d+-[0-9a-f]{8}$")
+
+
+class ProfileRepository:
+    """Request profiles on disk, each with a JSON metadata file next to it."""
+    
+    def __init__(
+        self,
+        directory: Path = settings.profiles_dir,
+        max_profiles: int = settings.profiling_max_profiles
+    ):
+        """Initialize profile repository.
+        
+        Args:
+            directory: Profiles directory
+            max_profiles: Profiles kept (the oldest are removed)
+        """
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def new_id() -> str:
+        """Generate a profile ID (sortable by creation time)."""
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+        micros = int(now % 1 * 1_000_000)
+        return f"{stamp}{micros:06d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    
+    def _meta_path(self, profile_id: str) -> Path:
+        return self.directory / f"{profile_id}.meta.json"
+    
+    def save(self, profiler: RequestProfiler, metadata: Dict[str, Any]) -> Optional[str]:
+        """Write a finished profile and its metadata.
+        
+        Args:
+            profiler: Stopped profiler
+            metadata: Request annotations (route, method, chat_id, status,
+                duration_ms, ...)
+                
+        Returns:
+            Profile ID or None if it could not be written
+        """
+        profile_id = self.new_id()
+        filename = profile_id + EXTENSIONS[profiler.format]
+        try:
+            FileManager.ensure_directory_exists(self.directory)
+        except OSError:
+            return None
+        
+        name = f"{metadata.get('method')} {metadata.get('route')}"
+        if metadata.get("chat_id"):
+            name += f" chat={metadata['chat_id']}"
+        if not profiler.write(self.directory / filename, name):
+            return None
+        
+        document = {
+            "id": profile_id,
+            "file": filename,
+            "format": profiler.format,
+            "pid": os.getpid(),
+            **metadata
+        }
+        if not FileManager.write_json_file(self._meta_path(profile_id), document):
+            return None
+        self.prune()
+        return profile_id
+    
+    def _profile_ids(self) -> List[str]:
+        """IDs of stored profiles, oldest first."""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            path.name[:-len(".meta.json")] for path in self.directory.glob("*.meta.json")
+        )
+    
+    def prune(self) -> int:
+        """Remove the oldest profiles beyond ``max_profiles``.
+        
+        Returns:
+            Number of profiles removed
+        """
+        with self._lock:
+            ids = self._profile_ids()
+            excess = ids[:max(0, len(ids) - self.max_profiles)]
+            for profile_id in excess:
+                for path in self.directory.glob(f"{profile_id}.*"):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+        return len(excess)
+    
+    def list_recent(self, limit: int) -> List[Dict[str, Any]]:
+        """List the most recent profiles.
+        
+        Args:
+            limit: Maximum number of profiles
+            
+        Returns:
+            Profile metadata, newest first
+        """
+        profiles = []
+        for profile_id in reversed(self._profile_ids()):
+            if len(profiles) >= limit:
+                break
+            metadata = FileManager.read_json_file(self._meta_path(profile_id))
+            if metadata:
+                profiles.append(metadata)
+        return profiles
+    
+    def get_file(self, profile_id: str) -> Optional[Path]:
+        """Get the profile file of an ID.
+        
+        Args:
+            profile_id: Profile ID
+            
+        Returns:
+            Path or None if the ID is invalid or unknown
+        """
+        if not PROFILE_ID.match(profile_id):
+            return None
+        metadata = FileManager.read_json_file(self._meta_path(profile_id))
+        if not metadata or metadata.get("format") not in EXTENSIONS:
+            return None
+        path = self.directory / (profile_id + EXTENSIONS[metadata["format"]])
+        return path if path.exists() else None
@@ -0,0 +1,162 @@
+"""Content-addressed registry of system prompts.
+
+Prompt texts are stored once, as ``data/prompts/<prompt_id>/<version>.json``,
+where the version is a SHA-256 prefix of the text: registering the same text
+again is a no-op. Chats only keep a reference (``"<prompt_id>@<version>"``)
+and the text is resolved when an upstream request is built. Versions are
+immutable, so resolved texts are cached for the life of the process.
+"""
+import hashlib
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+from core.logging import get_logger
+from repositories.file_manager import FileManager
+
+logger = get_logger(__name__)
+
+DEFAULT_PROMPT_ID = "default"
+VERSION_LENGTH = 16
+PROMPT_ID_PATTERN = re.compile(r"^[a-z0-9_-]{1,64}$")
+VERSION_PATTERN = re.compile(rf"^[0-9a-f]{{{VERSION_LENGTH}}}$")
+
+
+def make_prompt_ref(prompt_id: str, version: str) -> str:
+    """Build a prompt reference.
+    
+    Args:
+        prompt_id: Prompt identifier
+        version: Prompt version (content hash prefix)
+        
+    Returns:
+        Reference in the form ``<prompt_id>@<version>``
+    """
+    return f"{prompt_id}@{version}"
+
+
+def parse_prompt_ref(ref: str) -> Tuple[str, str]:
+    """Split a prompt reference.
+    
+    Args:
+        ref: Reference in the form ``<prompt_id>@<version>``
+        
+    Returns:
+        Tuple of (prompt_id, version)
+        
+    Raises:
+        ValueError: If the reference is malformed
+    """
+    prompt_id, _, version = ref.partition("@")
+    if not PROMPT_ID_PATTERN.match(prompt_id) or not VERSION_PATTERN.match(version):
+        raise ValueError(f"Referencia de prompt inválida: {ref}")
+    return prompt_id, version
+
+
+class PromptRegistry:
+    """Registry of immutable, content-addressed prompt versions."""
+    
+    def __init__(self, prompts_dir: Path = settings.prompts_dir):
+        """Initialize prompt registry.
+        
+        Args:
+            prompts_dir: Directory holding the prompt versions
+        """
+        self.prompts_dir = prompts_dir
+        self.file_manager = FileManager()
+        self._texts: Dict[str, str] = {}
+        self._default_ref: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def version_of(text: str) -> str:
+        """Compute the version of a prompt text.
+        
+        Args:
+            text: Prompt text
+            
+        Returns:
+            SHA-256 hex prefix of the text
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:VERSION_LENGTH]
+    
+    def _get_path(self, prompt_id: str, version: str) -> Path:
+        """Get the file of a prompt version."""
+        return self.prompts_dir / prompt_id / f"{version}.json"
+    
+    def register(self, text: str, prompt_id: str = DEFAULT_PROMPT_ID) -> str:
+        """Store a prompt text (once) and return its reference.
+        
+        Args:
+            text: Prompt text
+            prompt_id: Prompt identifier
+            
+        Returns:
+            Prompt reference
+            
+        Raises:
+            ValueError: If the prompt id is invalid
+            OSError: If the prompt version could not be stored
+        """
+        if not PROMPT_ID_PATTERN.match(prompt_id):
+            raise ValueError(f"Identificador de prompt inválido: {prompt_id}")
+        
+        version = self.version_of(text)
+        ref = make_prompt_ref(prompt_id, version)
+        if ref in self._texts:
+            return ref
+        
+        with self._lock:
+            path = self._get_path(prompt_id, version)
+            if not path.exists():
+                self.file_manager.ensure_directory_exists(path.parent)
+                stored = self.file_manager.replace_json_file(path, {
+                    "id": prompt_id,
+                    "version": version,
+                    "text": text,
+                    "created_at": datetime.now(timezone.utc).isoformat()
+                })
+                if not stored:
+                    # A reference to a missing version would not resolve later
+                    raise OSError(f"No se pudo guardar el prompt {ref}")
+                logger.info("Prompt registrado: %s (%s caracteres)", ref, len(text))
+            self._texts[ref] = text
+        return ref
+    
+    def resolve(self, ref: str) -> Optional[str]:
+        """Get the text of a prompt reference.
+        
+        Args:
+            ref: Prompt reference
+            
+        Returns:
+            Prompt text or None if unknown, unreadable or corrupt
+        """
+        text = self._texts.get(ref)
+        if text is not None:
+            return text
+        
+        try:
+            prompt_id, version = parse_prompt_ref(ref)
+        except ValueError as e:
+            logger.error(str(e))
+            return None
+        
+        data = self.file_manager.read_json_file(self._get_path(prompt_id, version))
+        text = data.get("text") if isinstance(data, dict) else None
+        if not isinstance(text, str) or self.version_of(text) != version:
+            logger.error("Prompt no encontrado o corrupto: %s", ref)
+            return None
+        
+        self._texts[ref] = text
+        return text
+    
+    @property
+    def default_ref(self) -> str:
+        """Reference of the configured default system message."""
+        if self._default_ref is None:
+            self._default_ref = self.register(settings.default_system_message)
+        return self._default_ref
@@ -0,0 +1,318 @@
+"""Full-text search index over chat titles and messages (SQLite FTS5)."""
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.logging import get_logger
+from models.message import Message
+from repositories.sqlite_database import SQLiteDatabase
+
+logger = get_logger(__name__)
+
+# Documents are one row per title and one per user/assistant message. The FTS
+# table is an external-content index over search_docs, kept in sync by
+# triggers, so snippets are read from the original text.
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_docs (
+    id INTEGER PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_search_docs_chat ON search_docs (chat_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS chat_search USING fts5(
+    title, body,
+    content='search_docs', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS search_docs_ai AFTER INSERT ON search_docs BEGIN
+    INSERT INTO chat_search (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS search_docs_ad AFTER DELETE ON search_docs BEGIN
+    INSERT INTO chat_search (chat_search, rowid, title, body)
+    VALUES ('delete', old.id, old.title, old.body);
+END;
+"""
+
+DROP_SCHEMA = """
+DROP TRIGGER IF EXISTS search_docs_ai;
+DROP TRIGGER IF EXISTS search_docs_ad;
+DROP TABLE IF EXISTS chat_search;
+DROP TABLE IF EXISTS search_docs;
+"""
+
+INDEXED_ROLES = ("user", "assistant")
+MAX_QUERY_TERMS = 16
+SNIPPET_TOKENS = 12
+# Title matches weigh twice as much as message matches
+TITLE_WEIGHT = 2.0
+BODY_WEIGHT = 1.0
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class SearchHit:
+    """Best match of a chat.
+    
+    Attributes:
+        chat_id: Chat identifier
+        snippet: Matching fragment with the terms wrapped in ``**``
+        score: BM25 relevance (higher is better)
+    """
+    
+    chat_id: str
+    snippet: str
+    score: float
+
+
+def fts5_available() -> bool:
+    """Check whether the SQLite library was built with FTS5.
+    
+    Returns:
+        True if FTS5 virtual tables can be created
+    """
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE probe USING fts5(body)")
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """Turn free user text into a safe FTS5 query.
+    
+    Every word becomes a quoted prefix term, so FTS5 operators and syntax
+    in the input are matched literally; all terms must match (implicit AND).
+    
+    Args:
+        text: User query
+        
+    Returns:
+        FTS5 MATCH expression or None if the text has no searchable words
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())[:MAX_QUERY_TERMS]
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class SearchIndex:
+    """Incremental full-text index of chats.
+    
+    The index lives in its own SQLite database, separate from the storage
+    backend, and is updated as turns are saved, titles change and chats are
+    deleted. Writes run one at a time on a single connection shared by the
+    process's threads (SQLite has one writer anyway); searches use the
+    per-thread connections, so concurrent reads stay parallel. A term must
+    appear in the title or in a single message for the chat to match.
+    Write failures are logged and never fail the
+    operation that triggered them; ``manage.py rebuild-search`` recreates
+    the index from storage.
+    """
+    
+    INSERT_DOC = "INSERT INTO search_docs (chat_id, title, body) VALUES (?, ?, ?)"
+    DELETE_CHAT = "DELETE FROM search_docs WHERE chat_id = ?"
+    DELETE_TITLE = "DELETE FROM search_docs WHERE chat_id = ? AND title != ''"
+    SEARCH = f"""
+        SELECT d.chat_id,
+               snippet(chat_search, -1, '**', '**', '…', {SNIPPET_TOKENS}),
+               bm25(chat_search, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score
+        FROM chat_search JOIN search_docs d ON d.id = chat_search.rowid
+        WHERE chat_search MATCH ?
+        ORDER BY score
+        LIMIT ?
+    """
+    
+    # Rows fetched per requested result; chats with many matching messages
+    # take several rows, so the window grows until enough chats are found
+    CANDIDATES_PER_RESULT = 4
+    MAX_FETCH_ROUNDS = 4
+    
+    def __init__(self, database: Optional[SQLiteDatabase] = None):
+        """Initialize search index.
+        
+        Args:
+            database: Index database (defaults to settings.search_database_file)
+        """
+        self.database = database or SQLiteDatabase(
+            settings.search_database_file, schema=SEARCH_SCHEMA
+        )
+        self._write_lock = threading.Lock()
+    
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction on the shared connection.
+        
+        Yields:
+            Shared connection, held by the calling thread until the end of
+            the transaction
+        """
+        with self._write_lock:
+            with self.database.transaction(self.database.shared_connection) as conn:
+                yield conn
+    
+    @staticmethod
+    def _documents(
+        chat_id: str,
+        messages: Iterable[Message],
+        title: Optional[str] = None
+    ) -> List[Tuple[str, str, str]]:
+        """Build the index rows of a chat.
+        
+        Args:
+            chat_id: Chat identifier
+            messages: Messages to index (system messages are skipped)
+            title: Chat title, if it should be indexed
+            
+        Returns:
+            List of (chat_id, title, body) rows
+        """
+        rows = [(chat_id, title, "")] if title else []
+        rows.extend(
+            (chat_id, "", message.content)
+            for message in messages
+            if message.role in INDEXED_ROLES and message.content
+        )
+        return rows
+    
+    def add_messages(self, chat_id: str, messages: Sequence[Message]) -> bool:
+        """Index new messages of a chat.
+        
+        Args:
+            chat_id: Chat identifier
+            messages: Messages appended to the chat
+            
+        Returns:
+            True if indexed successfully
+        """
+        rows = self._documents(chat_id, messages)
+        if not rows:
+            return True
+        try:
+            with self._write() as conn:
+                conn.executemany(self.INSERT_DOC, rows)
+            return True
+        except sqlite3.Error as e:
+            logger.error("Error indexando mensajes del chat %s: %s", chat_id, e)
+            return False
+    
+    def set_title(self, chat_id: str, title: str) -> bool:
+        """Replace the indexed title of a chat.
+        
+        Args:
+            chat_id: Chat identifier
+            title: New title
+            
+        Returns:
+            True if indexed successfully
+        """
+        try:
+            with self._write() as conn:
+                conn.execute(self.DELETE_TITLE, (chat_id,))
+                if title:
+                    conn.execute(self.INSERT_DOC, (chat_id, title, ""))
+            return True
+        except sqlite3.Error as e:
+            logger.error("Error indexando el título del chat %s: %s", chat_id, e)
+            return False
+    
+    def replace_chats(
+        self,
+        chats: Iterable[Tuple[str, Optional[str], Sequence[Message]]]
+    ) -> int:
+        """Re-index whole chats in a single transaction.
+        
+        Args:
+            chats: (chat_id, title, messages) entries
+            
+        Returns:
+            Number of chats indexed (0 if the transaction failed)
+        """
+        count = 0
+        try:
+            with self._write() as conn:
+                for chat_id, title, messages in chats:
+                    conn.execute(self.DELETE_CHAT, (chat_id,))
+                    conn.executemany(
+                        self.INSERT_DOC, self._documents(chat_id, messages, title)
+                    )
+                    count += 1
+        except sqlite3.Error as e:
+            logger.error("Error reindexando chats: %s", e)
+            return 0
+        return count
+    
+    def delete_chat(self, chat_id: str) -> bool:
+        """Remove a chat from the index.
+        
+        Args:
+            chat_id: Chat identifier
+            
+        Returns:
+            True if removed successfully
+        """
+        try:
+            with self._write() as conn:
+                conn.execute(self.DELETE_CHAT, (chat_id,))
+            return True
+        except sqlite3.Error as e:
+            logger.error("Error eliminando el chat %s del índice: %s", chat_id, e)
+            return False
+    
+    def clear(self) -> None:
+        """Drop and recreate the index (before a full rebuild)."""
+        with self._write_lock:
+            self.database.shared_connection.executescript(
+                f"BEGIN IMMEDIATE;{DROP_SCHEMA}{SEARCH_SCHEMA}COMMIT;"
+            )
+        logger.info("Índice de búsqueda vaciado: %s", self.database.database_file)
+    
+    def search(self, text: str, limit: int) -> List[SearchHit]:
+        """Find the chats best matching a query.
+        
+        Args:
+            text: User query
+            limit: Maximum number of chats
+            
+        Returns:
+            Hits ordered by relevance, one per chat
+        """
+        query = build_match_query(text)
+        if query is None or limit <= 0:
+            return []
+        
+        fetch = limit * self.CANDIDATES_PER_RESULT
+        hits: Dict[str, SearchHit] = {}
+        for _ in range(self.MAX_FETCH_ROUNDS):
+            try:
+                rows = self.database.connection.execute(
+                    self.SEARCH, (query, fetch)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.error("Error en la búsqueda '%s': %s", text, e)
+                return []
+            
+            hits = {}
+            for chat_id, snippet, score in rows:
+                # Rows come best first; keep the best one of each chat
+                if chat_id not in hits:
+                    hits[chat_id] = SearchHit(chat_id, snippet, -score)
+                    if len(hits) == limit:
+                        break
+            
+            if len(hits) == limit or len(rows) < fetch:
+                break
+            fetch *= 2
+        
+        return list(hits.values())
@@ -0,0 +1,221 @@
+"""SQLite-backed chat repository."""
+import sqlite3
+from typing import Callable, List, Optional
+
+from core.logging import get_logger
+from models.message import Message
+from repositories.sqlite_database import SQLiteDatabase
+from utils.serialization import validate_messages
+
+logger = get_logger(__name__)
+
+
+class SQLiteChatRepository:
+    """Repository for managing chat messages in SQLite.
+    
+    Messages are rows of the ``messages`` table keyed by ``(chat_id, seq)``.
+    Implements the same interface as ``ChatRepository``; reads are served by
+    SQLite's page cache, so no parsed-chat cache is kept (``cache`` is None).
+    """
+    
+    # Rows read per query by a budgeted tail load (load_tail with until)
+    TAIL_PAGE_SIZE = 200
+    
+    SELECT_ALL = (
+        "SELECT role, content, prompt_ref FROM messages WHERE chat_id = ? ORDER BY seq"
+    )
+    SELECT_TAIL = (
+        "SELECT role, content, prompt_ref FROM messages WHERE chat_id = ? "
+        "ORDER BY seq DESC LIMIT ? OFFSET ?"
+    )
+    SELECT_CHAT_IDS = "SELECT DISTINCT chat_id FROM messages ORDER BY chat_id"
+    SELECT_NEXT_SEQ = (
+        "SELECT COALESCE(MAX(seq), -1) + 1 FROM messages WHERE chat_id = ?"
+    )
+    SELECT_EXISTS = "SELECT 1 FROM messages WHERE chat_id = ? LIMIT 1"
+    INSERT = (
+        "INSERT INTO messages (chat_id, seq, role, content, prompt_ref) "
+        "VALUES (?, ?, ?, ?, ?)"
+    )
+    DELETE = "DELETE FROM messages WHERE chat_id = ?"
+    
+    def __init__(self, database: SQLiteDatabase):
+        """Initialize SQLite chat repository.
+        
+        Args:
+            database: Shared SQLite database
+        """
+        self.database = database
+        self.cache = None
+    
+    @staticmethod
+    def _to_messages(rows) -> List[Message]:
+        """Convert (role, content, prompt_ref) rows to messages."""
+        return validate_messages([
+            {"role": role, "content": content, "prompt_ref": prompt_ref}
+            for role, content, prompt_ref in rows
+        ])
+    
+    def load(self, chat_id: str) -> Optional[List[Message]]:
+        """Load the full message history of a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            List of messages or None if not found/invalid
+        """
+        try:
+            rows = self.database.connection.execute(self.SELECT_ALL, (chat_id,)).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Error SQLite cargando chat %s: %s", chat_id, e)
+            return None
+        
+        if not rows:
+            logger.warning("Chat no encontrado: %s", chat_id)
+            return None
+        
+        messages = self._to_messages(rows)
+        logger.debug("Chat %s cargado (%s mensajes).", chat_id, len(messages))
+        return messages
+    
+    def load_tail(
+        self,
+        chat_id: str,
+        count: int,
+        until: Optional[Callable[[List[Message]], bool]] = None
+    ) -> Optional[List[Message]]:
+        """Load the most recent messages of a chat.
+        
+        With ``until``, rows are read newest first in pages of
+        ``TAIL_PAGE_SIZE`` and reading stops once it accepts the tail.
+        
+        Args:
+            chat_id: Chat UUID
+            count: Maximum number of messages to return
+            until: Called with the tail read so far (oldest first); True
+                stops reading older messages
+            
+        Returns:
+            Up to ``count`` most recent messages or None if not found/invalid
+        """
+        page_size = min(count, self.TAIL_PAGE_SIZE) if until else count
+        messages: List[Message] = []
+        try:
+            conn = self.database.connection
+            while True:
+                limit = max(min(page_size, count - len(messages)), 1)
+                rows = conn.execute(
+                    self.SELECT_TAIL, (chat_id, limit, len(messages))
+                ).fetchall()
+                if not rows and not messages:
+                    logger.warning("Chat no encontrado: %s", chat_id)
+                    return None
+                if count <= 0:
+                    return []
+                messages = self._to_messages(reversed(rows)) + messages
+                if len(rows) < limit or len(messages) >= count or (until and until(messages)):
+                    return messages
+        except sqlite3.Error as e:
+            logger.error("Error SQLite cargando chat %s: %s", chat_id, e)
+            return None
+    
+    def append(self, chat_id: str, messages: List[Message]) -> bool:
+        """Append messages to a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            messages: New messages to append
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with self.database.transaction() as conn:
+                if conn.execute(self.SELECT_EXISTS, (chat_id,)).fetchone() is None:
+                    logger.error("No se puede agregar a chat inexistente %s", chat_id)
+                    return False
+                next_seq = conn.execute(self.SELECT_NEXT_SEQ, (chat_id,)).fetchone()[0]
+                conn.executemany(self.INSERT, [
+                    (chat_id, next_seq + offset, msg.role, msg.content, msg.prompt_ref)
+                    for offset, msg in enumerate(messages)
+                ])
+        except sqlite3.Error as e:
+            logger.error("Error SQLite guardando chat %s: %s", chat_id, e)
+            return False
+        
+        logger.debug("Chat %s: %s mensajes agregados.", chat_id, len(messages))
+        return True
+    
+    def save(self, chat_id: str, messages: List[Message]) -> bool:
+        """Replace the full message history of a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            messages: List of messages
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with self.database.transaction() as conn:
+                conn.execute(self.DELETE, (chat_id,))
+                conn.executemany(self.INSERT, [
+                    (chat_id, seq, msg.role, msg.content, msg.prompt_ref)
+                    for seq, msg in enumerate(messages)
+                ])
+        except sqlite3.Error as e:
+            logger.error("Error SQLite guardando chat %s: %s", chat_id, e)
+            return False
+        
+        logger.debug("Chat %s guardado (%s mensajes).", chat_id, len(messages))
+        return True
+    
+    def list_chat_ids(self) -> List[str]:
+        """List the ids of all stored chats.
+        
+        Returns:
+            Sorted list of chat UUIDs
+        """
+        try:
+            rows = self.database.connection.execute(self.SELECT_CHAT_IDS).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Error SQLite listando chats: %s", e)
+            return []
+        return [row[0] for row in rows]
+    
+    def delete(self, chat_id: str) -> bool:
+        """Delete a chat and all its messages.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            True if deleted, False if not found or error
+        """
+        try:
+            with self.database.transaction() as conn:
+                deleted = conn.execute(self.DELETE, (chat_id,)).rowcount
+        except sqlite3.Error as e:
+            logger.error("Error SQLite eliminando chat %s: %s", chat_id, e)
+            return False
+        
+        if deleted:
+            logger.info("Chat eliminado de SQLite: %s", chat_id)
+        return deleted > 0
+    
+    def exists(self, chat_id: str) -> bool:
+        """Check if a chat exists.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            True if chat exists, False otherwise
+        """
+        try:
+            conn = self.database.connection
+            return conn.execute(self.SELECT_EXISTS, (chat_id,)).fetchone() is not None
+        except sqlite3.Error as e:
+            logger.error("Error SQLite consultando chat %s: %s", chat_id, e)
+            return False
@@ -0,0 +1,249 @@
+"""SQLite database access shared by the SQLite repositories."""
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Set
+
+from core.config import settings
+from core.logging import get_logger
+from repositories.file_manager import FileManager
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    last_updated TEXT NOT NULL
+);
+DROP INDEX IF EXISTS idx_chats_last_updated;
+CREATE INDEX IF NOT EXISTS idx_chats_recent ON chats (last_updated, id);
+
+CREATE TABLE IF NOT EXISTS messages (
+    chat_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    prompt_ref TEXT,
+    PRIMARY KEY (chat_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+# Open databases, so forked children can drop the parent's connections
+_databases: "weakref.WeakSet[SQLiteDatabase]" = weakref.WeakSet()
+# Connections inherited through fork; kept referenced (never closed) so the
+# child does not release locks or checkpoint the WAL on the parent's behalf
+_inherited_connections: List[sqlite3.Connection] = []
+
+
+def _after_fork() -> None:
+    """Make every database open fresh connections in a forked child."""
+    for database in list(_databases):
+        database._forget_connections()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class _ThreadConnection:
+    """Holder of one thread's connection, stored in a ``threading.local``.
+    
+    The thread's local storage is cleared when the thread exits, which
+    drops the holder and closes its connection (see
+    ``SQLiteDatabase._release``).
+    """
+    
+    __slots__ = ("conn", "__weakref__")
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class SQLiteDatabase:
+    """SQLite database in WAL mode with a per-thread connection pool.
+    
+    Each thread gets its own connection, created on first use and reused
+    afterwards; ``sqlite3`` keeps a per-connection cache of prepared
+    statements, so the constant SQL used by the repositories is only
+    compiled once per thread. The connection is closed when its thread
+    exits, so servers starting a thread per request (``threaded=True``)
+    keep one open connection per live thread. A forked process (pre-fork
+    server workers) never reuses a connection opened by its parent.
+    """
+    
+    def __init__(
+        self,
+        database_file: Path = settings.sqlite_database_file,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 128,
+        schema: str = SCHEMA
+    ):
+        """Initialize SQLite database.
+        
+        Args:
+            database_file: Path to the SQLite database file
+            busy_timeout_ms: Time to wait for locks held by other writers
+            cached_statements: Prepared statement cache size per connection
+            schema: Schema script run on the first connection
+        """
+        self.database_file = database_file
+        self.schema = schema
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: Set[sqlite3.Connection] = set()
+        self._connections_lock = threading.Lock()
+        self._shared: Optional[sqlite3.Connection] = None
+        self._shared_lock = threading.Lock()
+        self._schema_ready = False
+        _databases.add(self)
+    
+    def _forget_connections(self) -> None:
+        """Drop the connections of the parent process (after fork)."""
+        _inherited_connections.extend(self._connections)
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self._shared = None
+        self._shared_lock = threading.Lock()
+        self._local = threading.local()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a new connection.
+        
+        Returns:
+            SQLite connection in autocommit mode (transactions are explicit)
+        """
+        FileManager.ensure_directory_exists(self.database_file.parent)
+        conn = sqlite3.connect(
+            str(self.database_file),
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        
+        if not self._schema_ready:
+            conn.executescript(self.schema)
+            self._migrate_schema(conn)
+            self._schema_ready = True
+            logger.info("Base de datos SQLite lista: %s", self.database_file)
+        
+        with self._connections_lock:
+            self._connections.add(conn)
+        return conn
+    
+    @staticmethod
+    def _release(database_ref: "weakref.ref[SQLiteDatabase]", conn: sqlite3.Connection) -> None:
+        """Close the connection of a thread that exited.
+        
+        Connections already closed by ``close_all`` or inherited through
+        fork are no longer tracked and are left alone.
+        
+        Args:
+            database_ref: Weak reference to the owning database
+            conn: Connection of the exited thread
+        """
+        database = database_ref()
+        if database is None:
+            return
+        with database._connections_lock:
+            if conn not in database._connections:
+                return
+            database._connections.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Error cerrando conexión SQLite: %s", e)
+    
+    @staticmethod
+    def _migrate_schema(conn: sqlite3.Connection) -> None:
+        """Add columns introduced after a database was created.
+        
+        Args:
+            conn: Open connection
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+        if columns and "prompt_ref" not in columns:
+            try:
+                conn.execute("ALTER TABLE messages ADD COLUMN prompt_ref TEXT")
+                logger.info("Columna messages.prompt_ref agregada.")
+            except sqlite3.OperationalError as e:
+                # Another process may have added it concurrently
+                if "duplicate column" not in str(e):
+                    raise
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Get the connection for the current thread."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = _ThreadConnection(self._connect())
+            finalizer = weakref.finalize(
+                holder, self._release, weakref.ref(self), holder.conn
+            )
+            finalizer.atexit = False
+            self._local.holder = holder
+        return holder.conn
+    
+    @property
+    def shared_connection(self) -> sqlite3.Connection:
+        """Get a single long-lived connection shared by all threads.
+        
+        For callers running short statements under their own lock (e.g.
+        the rate limiter), so request threads do not each open one.
+        """
+        conn = self._shared
+        if conn is None:
+            with self._shared_lock:
+                if self._shared is None:
+                    self._shared = self._connect()
+                conn = self._shared
+        return conn
+    
+    @contextmanager
+    def transaction(
+        self,
+        conn: Optional[sqlite3.Connection] = None
+    ) -> Iterator[sqlite3.Connection]:
+        """Run statements in a write transaction.
+        
+        ``BEGIN IMMEDIATE`` takes the write lock up front so concurrent
+        writers (threads or processes) serialize instead of failing on
+        upgrade.
+        
+        Args:
+            conn: Connection to use (defaults to the current thread's);
+                callers passing ``shared_connection`` serialize its use
+        
+        Yields:
+            Connection running the transaction
+        """
+        conn = conn or self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
+    def close_all(self) -> None:
+        """Close every pooled connection."""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logger.warning("Error cerrando conexión SQLite: %s", e)
+            self._connections.clear()
+        self._shared = None
+        self._local = threading.local()
@@ -0,0 +1,168 @@
+"""SQLite-backed metadata repository."""
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from core.logging import get_logger
+from models.chat import ChatMetadata
+from repositories.sqlite_database import SQLiteDatabase
+
+logger = get_logger(__name__)
+
+
+class SQLiteMetadataRepository:
+    """Repository for managing chat metadata in SQLite.
+    
+    Implements the same interface as ``MetadataRepository``.
+    """
+    
+    SELECT_ALL = "SELECT id, title, created_at, last_updated FROM chats"
+    SELECT_ONE = (
+        "SELECT id, title, created_at, last_updated FROM chats WHERE id = ?"
+    )
+    UPSERT = (
+        "INSERT INTO chats (id, title, created_at, last_updated) "
+        "VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET title = excluded.title, "
+        "created_at = excluded.created_at, last_updated = excluded.last_updated"
+    )
+    SELECT_RECENT = (
+        "SELECT id, title, created_at, last_updated FROM chats "
+        "WHERE (last_updated, id) < (?, ?) AND last_updated >= ? AND last_updated <= ? "
+        "ORDER BY last_updated DESC, id DESC LIMIT ?"
+    )
+    DELETE = "DELETE FROM chats WHERE id = ?"
+    DELETE_ALL = "DELETE FROM chats"
+    
+    def __init__(self, database: SQLiteDatabase):
+        """Initialize SQLite metadata repository.
+        
+        Args:
+            database: Shared SQLite database
+        """
+        self.database = database
+    
+    @staticmethod
+    def _to_metadata(row) -> ChatMetadata:
+        """Convert a chats row to ChatMetadata."""
+        chat_id, title, created_at, last_updated = row
+        return ChatMetadata(
+            id=chat_id,
+            title=title,
+            created_at=created_at,
+            last_updated=last_updated
+        )
+    
+    @staticmethod
+    def _to_row(chat_id: str, metadata: ChatMetadata) -> tuple:
+        """Convert ChatMetadata to a chats row."""
+        return chat_id, metadata.title, metadata.created_at, metadata.last_updated
+    
+    def list_recent(
+        self,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[str, str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> List[ChatMetadata]:
+        """List chats by last_updated, most recent first.
+        
+        Served from the (last_updated, id) index; unset bounds are replaced
+        by sentinels so a single prepared statement covers every query.
+        
+        Args:
+            limit: Maximum number of chats (all if None)
+            before: Exclusive upper bound (last_updated, chat_id) key
+            since: Inclusive lower bound for last_updated (ISO format)
+            until: Inclusive upper bound for last_updated (ISO format)
+            
+        Returns:
+            List of ChatMetadata
+        """
+        before_updated, before_id = before or ("\uffff", "")
+        params = (
+            before_updated,
+            before_id,
+            since if since is not None else "",
+            until if until is not None else "\uffff",
+            limit if limit is not None else -1
+        )
+        try:
+            rows = self.database.connection.execute(self.SELECT_RECENT, params).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Error SQLite listando historial: %s", e)
+            return []
+        return [self._to_metadata(row) for row in rows]
+    
+    def load(self) -> Dict[str, ChatMetadata]:
+        """Carga toda la metadata desde SQLite.
+        
+        Returns:
+            Dictionary of chat_id -> ChatMetadata
+        """
+        try:
+            rows = self.database.connection.execute(self.SELECT_ALL).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Error SQLite cargando metadata: %s", e)
+            return {}
+        return {row[0]: self._to_metadata(row) for row in rows}
+    
+    def save(self, metadata: Dict[str, ChatMetadata]) -> None:
+        """Reemplaza toda la metadata en una sola transacción.
+        
+        Args:
+            metadata: Dictionary of chat_id -> ChatMetadata
+        """
+        try:
+            with self.database.transaction() as conn:
+                conn.execute(self.DELETE_ALL)
+                conn.executemany(self.UPSERT, [
+                    self._to_row(chat_id, meta) for chat_id, meta in metadata.items()
+                ])
+            logger.debug("Metadata guardada en SQLite (%s chats)", len(metadata))
+        except sqlite3.Error as e:
+            logger.error("Error SQLite guardando metadata: %s", e)
+    
+    def get(self, chat_id: str) -> ChatMetadata | None:
+        """Get metadata for a specific chat.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            ChatMetadata or None if not found
+        """
+        try:
+            row = self.database.connection.execute(self.SELECT_ONE, (chat_id,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error("Error SQLite cargando metadata de %s: %s", chat_id, e)
+            return None
+        return self._to_metadata(row) if row else None
+    
+    def update(self, chat_id: str, metadata: ChatMetadata) -> None:
+        """Update metadata for a specific chat.
+        
+        Args:
+            chat_id: Chat UUID
+            metadata: Updated metadata
+        """
+        try:
+            with self.database.transaction() as conn:
+                conn.execute(self.UPSERT, self._to_row(chat_id, metadata))
+        except sqlite3.Error as e:
+            logger.error("Error SQLite guardando metadata de %s: %s", chat_id, e)
+    
+    def delete(self, chat_id: str) -> bool:
+        """Delete metadata for a specific chat.
+        
+        Args:
+            chat_id: Chat UUID
+            
+        Returns:
+            True if deleted, False if not found
+        """
+        try:
+            with self.database.transaction() as conn:
+                return conn.execute(self.DELETE, (chat_id,)).rowcount > 0
+        except sqlite3.Error as e:
+            logger.error("Error SQLite eliminando metadata de %s: %s", chat_id, e)
+            return False
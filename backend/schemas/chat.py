@@ -13,6 +13,10 @@ class SendMessageRequest(BaseModel):
         None,
         description="Model to use (defaults to configured model)"
     )
+    stream: bool = Field(
+        False,
+        description="Stream the response as Server-Sent Events"
+    )
     
     @field_validator("mensaje")
     @classmethod
@@ -56,6 +60,19 @@ class SendMessageResponse(BaseModel):
     new_title: Optional[str] = Field(None, description="New chat title if generated")
 
 
+class StreamDeltaEvent(BaseModel):
+    """Server-Sent Event payload for a streamed response fragment."""
+    
+    content: str = Field(..., description="Response content delta")
+
+
+class StreamDoneEvent(BaseModel):
+    """Server-Sent Event payload sent when a streamed response completes."""
+    
+    timestamp: str = Field(..., description="Response timestamp (ISO format)")
+    new_title: Optional[str] = Field(None, description="New chat title if generated")
+
+
 class CreateChatResponse(BaseModel):
     """Response schema for creating a chat."""
     
@@ -85,6 +102,30 @@ class HistoryResponse(BaseModel):
     """Response schema for chat history."""
     
     history: List[ChatMetadataResponse] = Field(..., description="List of chats")
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor for the next page (null on the last page)"
+    )
+
+
+class SearchResultResponse(BaseModel):
+    """Search result schema (best match of a chat)."""
+    
+    chat_id: str = Field(..., description="Chat UUID")
+    title: str = Field(..., description="Chat title")
+    last_updated: str = Field(..., description="Last update timestamp")
+    snippet: str = Field(..., description="Matching fragment, terms wrapped in **")
+    score: float = Field(..., description="Relevance (higher is better)")
+
+
+class SearchResponse(BaseModel):
+    """Response schema for chat search."""
+    
+    query: str = Field(..., description="Search query")
+    results: List[SearchResultResponse] = Field(
+        ...,
+        description="Matching chats ordered by relevance"
+    )
 
 
 class DeleteChatResponse(BaseModel):
@@ -0,0 +1,168 @@
+"""Production entry point for Synapse AI (gunicorn pre-fork workers).
+
+The master process imports the application and builds it once
+(``preload_app``), then forks ``--workers`` workers that share the loaded
+code copy-on-write. Each worker opens its own OpenAI connection pools,
+database connections and background threads after the fork
+(``factory.init_worker``).
+
+- WSGI mode (default): threaded workers, ``--threads`` requests each.
+- ASGI mode (``--asgi``): uvicorn workers running the async chat turns.
+
+Every process appends to the same ``LOG_FILE`` without rotating it; rotate
+it externally (e.g. logrotate, which the handlers follow when the file is
+moved).
+
+On SIGTERM the master stops accepting connections and gives the workers
+``--graceful-timeout`` seconds to finish in-flight requests (including
+streamed responses) and drain the title queue before they exit.
+
+Usage (from ``backend/``, Linux/macOS)::
+
+    python serve.py --workers 4 --threads 8
+    python serve.py --asgi --workers 4
+"""
+import argparse
+import gc
+import sys
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables first
+load_dotenv()
+
+from gunicorn.app.base import BaseApplication
+
+from core.config import settings
+from core.logging import get_logger
+from core.dependencies import dependencies
+from factory import create_app, create_asgi_app, init_worker, shutdown_worker
+
+logger = get_logger(__name__)
+
+SERVER_MODES = ("wsgi", "asgi")
+WORKER_CLASSES = {
+    "wsgi": "gthread",
+    "asgi": "uvicorn.workers.UvicornWorker"
+}
+
+
+class SynapseServer(BaseApplication):
+    """Gunicorn application preloading the Synapse AI app in the master."""
+    
+    def __init__(self, mode: str, options: Dict[str, Any]):
+        """Initialize server.
+        
+        Args:
+            mode: 'wsgi' or 'asgi'
+            options: Gunicorn settings
+        """
+        self.mode = mode
+        self.options = options
+        self.application = None
+        self.flask_app = None
+        super().__init__()
+    
+    def load_config(self) -> None:
+        """Apply the options and the worker lifecycle hooks."""
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set("post_fork", self._post_fork)
+        self.cfg.set("worker_exit", self._worker_exit)
+    
+    def load(self):
+        """Build the application once, in the master process."""
+        if self.application is None:
+            if self.mode == "asgi":
+                self.application = create_asgi_app(preload=True)
+                self.flask_app = self.application.flask_app
+            else:
+                self.application = self.flask_app = create_app(preload=True)
+            # The app defers importing openai to the first model call; import
+            # it here so the workers share the loaded modules
+            dependencies.import_client_modules()
+            # Keep the preloaded objects out of the workers' garbage
+            # collections, so the shared pages are not copied on write
+            gc.freeze()
+            logger.info(
+                f"App precargada (modo {self.mode.upper()}): "
+                f"{self.cfg.workers} workers"
+                + (f" x {self.cfg.threads} hilos" if self.mode == "wsgi" else "")
+            )
+        return self.application
+    
+    def _post_fork(self, server, worker) -> None:
+        """Open the per-process resources of a new worker."""
+        init_worker(self.flask_app)
+        logger.info("Worker %s listo", worker.pid)
+    
+    def _worker_exit(self, server, worker) -> None:
+        """Drain background work before a worker exits."""
+        shutdown_worker(self.flask_app)
+        logger.info("Worker %s detenido", worker.pid)
+
+
+def build_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Translate command line arguments into gunicorn settings.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Gunicorn settings
+    """
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": WORKER_CLASSES[args.mode],
+        "preload_app": True,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": settings.server_worker_timeout,
+        "keepalive": settings.server_keepalive,
+        "loglevel": settings.log_level.lower(),
+        "proc_name": "synapse-ai"
+    }
+    if args.mode == "wsgi":
+        options["threads"] = args.threads
+    return options
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the production server.
+    
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+        
+    Returns:
+        Process exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bind", default=f"{settings.host}:{settings.port}",
+                        help="Dirección de escucha (host:puerto)")
+    parser.add_argument("--workers", type=int, default=settings.server_workers,
+                        help="Procesos worker")
+    parser.add_argument("--threads", type=int, default=settings.server_threads,
+                        help="Hilos por worker (modo WSGI)")
+    parser.add_argument("--mode", choices=SERVER_MODES, default=settings.server_mode,
+                        help="Modelo de servidor")
+    parser.add_argument("--asgi", dest="mode", action="store_const", const="asgi",
+                        help="Equivale a --mode asgi")
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=settings.server_graceful_timeout,
+                        help="Segundos para terminar las peticiones en curso tras SIGTERM")
+    args = parser.parse_args(argv)
+    
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers y --threads deben ser al menos 1")
+    
+    if not settings.openai_api_key:
+        print("⚠️  ADVERTENCIA: OPENAI_APIKEY no configurada", file=sys.stderr)
+        print("   Edita config/.env y agrega tu API key\n", file=sys.stderr)
+    
+    SynapseServer(args.mode, build_options(args)).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Async chat service for the ASGI serving mode."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from core.config import settings
+from core.locks import AsyncReleasingIterator, ChatLockManager
+from core.logging import get_logger
+from repositories.chat_repository import ChatRepository
+from repositories.metadata_repository import MetadataRepository
+from repositories.prompt_registry import PromptRegistry
+from repositories.search_index import SearchIndex
+from services.chat_service import ChatService
+from services.openai_service import OpenAIService
+from services.rate_limiter import TokenBudget
+from services.title_service import TitleGenerationService
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncChatService(ChatService):
+    """Chat service whose message turns run on the event loop.
+    
+    Upstream calls go through the AsyncOpenAI client, so a chat waiting on
+    the model holds no thread. Repository I/O (loading the context, saving
+    the turn, metadata updates) is blocking and runs on a small dedicated
+    executor instead. Synchronous methods inherited from ``ChatService``
+    keep working for the routes served by Flask.
+    """
+    
+    def __init__(
+        self,
+        chat_repo: ChatRepository,
+        metadata_repo: MetadataRepository,
+        openai_service: OpenAIService,
+        title_service: Optional[TitleGenerationService] = None,
+        lock_manager: Optional[ChatLockManager] = None,
+        prompt_registry: Optional[PromptRegistry] = None,
+        search_index: Optional[SearchIndex] = None,
+        io_workers: int = settings.async_io_workers
+    ):
+        """Initialize async chat service.
+        
+        Args:
+            chat_repo: Chat repository
+            metadata_repo: Metadata repository
+            openai_service: OpenAI service with an async client
+            title_service: Background title generator
+            lock_manager: Per-chat lock manager ordering turns of a chat
+            prompt_registry: Registry resolving system prompt references
+            search_index: Full-text index of chats
+            io_workers: Number of repository I/O threads
+        """
+        super().__init__(
+            chat_repo,
+            metadata_repo,
+            openai_service,
+            title_service,
+            lock_manager,
+            prompt_registry,
+            search_index
+        )
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=io_workers,
+            thread_name_prefix="repo-io"
+        )
+    
+    async def _run_io(self, func: Callable[..., T], *args: Any) -> T:
+        """Run a blocking repository call on the I/O executor.
+        
+        Args:
+            func: Blocking callable
+            *args: Positional arguments for ``func``
+            
+        Returns:
+            Result of ``func``
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, partial(func, *args))
+    
+    async def process_message_async(
+        self,
+        chat_id: str,
+        user_message: str,
+        model: str,
+        budget: Optional[TokenBudget] = None
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Process a user message and generate AI response (async).
+        
+        Args:
+            chat_id: Chat UUID
+            user_message: User's message
+            model: Model to use
+            budget: Client token budget (optional)
+            
+        Returns:
+            Tuple of (response, timestamp, new_title)
+            Returns (None, None, None) if error
+            
+        Raises:
+            RateLimitExceeded: If the turn does not fit in the budget
+            ChatLockTimeout: If another turn of the chat holds its lock too long
+        """
+        chat_lock = await self.lock_manager.acquire_async(chat_id)
+        try:
+            turn = await self._run_io(
+                self._prepare_turn, chat_id, user_message, model, budget
+            )
+            if turn is None:
+                return None, None, None
+            messages, messages_for_api, validated_model = turn
+            
+            assistant_reply = await self.openai_service.call_api_async(
+                messages_for_api,
+                validated_model,
+                purpose="chat"
+            )
+            
+            if assistant_reply is None:
+                await self._run_io(self._abandon_turn, chat_id, budget)
+                return None, None, None
+            
+            now_iso, new_title = await self._run_io(
+                self._complete_turn, chat_id, messages, assistant_reply, validated_model,
+                budget
+            )
+            return assistant_reply, now_iso, new_title
+        finally:
+            chat_lock.release()
+    
+    async def stream_message_async(
+        self,
+        chat_id: str,
+        user_message: str,
+        model: str,
+        budget: Optional[TokenBudget] = None
+    ) -> Optional[AsyncIterator[Tuple[str, Dict[str, Any]]]]:
+        """Process a user message streaming the AI response (async).
+        
+        Same contract as ``stream_message``: the turn is only persisted once
+        the upstream stream has finished. The chat lock is held until the
+        returned iterator finishes or is closed with ``aclose()``.
+        
+        Args:
+            chat_id: Chat UUID
+            user_message: User's message
+            model: Model to use
+            budget: Client token budget (optional)
+            
+        Returns:
+            Async iterator of (event, data) tuples, where event is 'delta',
+            'done' or 'error'. Returns None if the turn could not start.
+            
+        Raises:
+            RateLimitExceeded: If the turn does not fit in the budget
+            ChatLockTimeout: If another turn of the chat holds its lock too long
+        """
+        chat_lock = await self.lock_manager.acquire_async(chat_id)
+        
+        # The lock stays held until the returned stream finishes or is closed
+        with ExitStack() as held:
+            held.callback(chat_lock.release)
+            turn = await self._run_io(
+                self._prepare_turn, chat_id, user_message, model, budget
+            )
+            if turn is None:
+                return None
+            messages, messages_for_api, validated_model = turn
+            
+            deltas = await self.openai_service.stream_api_async(
+                messages_for_api,
+                validated_model,
+                purpose="chat"
+            )
+            
+            if deltas is None:
+                await self._run_io(self._abandon_turn, chat_id, budget, True)
+                return None
+            held.pop_all()
+        
+        parts: List[str] = []
+        
+        async def events() -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+            try:
+                async for delta in deltas:
+                    yield self._record_delta(parts, delta)
+            except Exception as e:
+                yield self._interrupted_stream(chat_id, e)
+            else:
+                yield await self._run_io(
+                    self._finish_stream, chat_id, messages, parts, validated_model, budget
+                )
+        
+        def release() -> None:
+            chat_lock.release()
+            if budget is not None and not budget.settled:
+                # Runs on the event loop: settle on the I/O executor
+                try:
+                    self.io_executor.submit(
+                        self._settle_stream, parts, validated_model, budget
+                    )
+                except RuntimeError as e:
+                    logger.warning("No se pudo ajustar el presupuesto (chat: %s): %s", chat_id, e)
+        
+        return AsyncReleasingIterator(events(), release)
+    
+    def shutdown(self) -> None:
+        """Drain background title jobs and stop the I/O executor."""
+        if self.title_service:
+            self.title_service.shutdown()
+        self.io_executor.shutdown(wait=True)
+        logger.info("Ejecutor de I/O de repositorios detenido.")
@@ -1,15 +1,23 @@
 """Chat service for business logic."""
 import uuid
+from contextlib import ExitStack
 from datetime import datetime, timezone
-from typing import List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from core.config import settings
+from core.locks import ChatLockManager, ReleasingIterator
 from core.logging import get_logger
 from models.message import Message
 from models.chat import Chat, ChatMetadata
 from repositories.chat_repository import ChatRepository
 from repositories.metadata_repository import MetadataRepository
+from repositories.prompt_registry import PromptRegistry
+from repositories.search_index import SearchHit, SearchIndex
+from services.context_builder import ContextBuilder, count_message_tokens
 from services.openai_service import OpenAIService
+from services.rate_limiter import TokenBudget
+from services.title_service import TitleGenerationService
+from utils.pagination import decode_cursor, encode_cursor, normalize_timestamp
 
 logger = get_logger(__name__)
 
@@ -21,7 +29,11 @@ def __init__(
         self,
         chat_repo: ChatRepository,
         metadata_repo: MetadataRepository,
-        openai_service: OpenAIService
+        openai_service: OpenAIService,
+        title_service: Optional[TitleGenerationService] = None,
+        lock_manager: Optional[ChatLockManager] = None,
+        prompt_registry: Optional[PromptRegistry] = None,
+        search_index: Optional[SearchIndex] = None
     ):
         """Initialize chat service.
         
@@ -29,18 +41,31 @@ def __init__(
             chat_repo: Chat repository
             metadata_repo: Metadata repository
             openai_service: OpenAI service
+            title_service: Background title generator (titles are generated
+                synchronously when not provided)
+            lock_manager: Per-chat lock manager ordering turns of a chat
+            prompt_registry: Registry resolving system prompt references
+            search_index: Full-text index of chats (search is disabled when
+                not provided)
         """
         self.chat_repo = chat_repo
         self.metadata_repo = metadata_repo
         self.openai_service = openai_service
+        self.title_service = title_service
+        self.lock_manager = lock_manager or ChatLockManager()
+        self.prompt_registry = prompt_registry or PromptRegistry()
+        self.search_index = search_index
+        self.context_builder = ContextBuilder()
     
     def _get_system_message(self) -> Message:
-        """Get default system message.
+        """Get default system message, stored by prompt reference.
         
         Returns:
-            System message
+            System message without its text
         """
-        return Message(role="system", content=settings.default_system_message)
+        return Message(
+            role="system", content="", prompt_ref=self.prompt_registry.default_ref
+        )
     
     def _ensure_system_message(self, messages: List[Message]) -> List[Message]:
         """Ensure messages have system prompt.
@@ -54,42 +79,86 @@ def _ensure_system_message(self, messages: List[Message]) -> List[Message]:
         if not messages or messages[0].role != "system":
             return [self._get_system_message()] + (messages or [])
         
-        # Update system message if different
-        if messages[0].content != settings.default_system_message:
-            messages[0].content = settings.default_system_message
+        # Update system message if different (replaced rather than mutated,
+        # since loaded messages may be shared with the repository cache)
+        if messages[0].prompt_ref != self.prompt_registry.default_ref:
+            messages[0] = self._get_system_message()
         
         return messages
     
-    def _apply_context_limit(self, messages: List[Message]) -> List[Message]:
-        """Apply context window limit.
+    def _resolve_prompts(self, messages: List[Message]) -> List[Message]:
+        """Replace prompt references with their full text.
+        
+        Only used for upstream requests and explicit client requests; stored
+        chats keep the reference.
         
         Args:
             messages: List of messages
             
         Returns:
-            Truncated messages
+            Messages with every system prompt expanded
         """
-        if len(messages) <= settings.max_context_length:
-            return messages
+        resolved = []
+        for message in messages:
+            if message.prompt_ref is None:
+                resolved.append(message)
+                continue
+            text = self.prompt_registry.resolve(message.prompt_ref)
+            if text is None:
+                logger.error(
+                    "Prompt %s no disponible; usando el mensaje de sistema por defecto.",
+                    message.prompt_ref
+                )
+                text = settings.default_system_message
+            resolved.append(Message(role=message.role, content=text))
+        return resolved
+    
+    def _visible_messages(
+        self,
+        messages: List[Message],
+        include_system: bool
+    ) -> List[Message]:
+        """Select the messages returned to clients.
         
-        # Keep system message
-        system_message = (
-            [messages[0]] if messages and messages[0].role == "system" else []
-        )
+        Args:
+            messages: Stored messages
+            include_system: Whether to include the (expanded) system message
+            
+        Returns:
+            Messages for the client
+        """
+        if include_system:
+            return self._resolve_prompts(messages)
+        return [msg for msg in messages if msg.role != "system"]
+    
+    def _apply_context_limit(
+        self,
+        messages: List[Message],
+        model: Optional[str] = None
+    ) -> List[Message]:
+        """Apply context window limit.
         
-        # Keep last N user/assistant messages
-        user_assistant_msgs = [msg for msg in messages if msg.role != "system"]
-        msgs_to_keep = max(0, settings.max_context_length - len(system_message))
-        limited_messages = system_message + user_assistant_msgs[-msgs_to_keep:]
+        Keeps the system message and the most recent messages that fit the
+        model's prompt token budget (see ContextBuilder).
         
-        logger.debug(
-            f"Contexto truncado de {len(messages)} a {len(limited_messages)} mensajes."
+        Args:
+            messages: List of messages
+            model: Model the context is built for (defaults to chat model)
+            
+        Returns:
+            Truncated messages
+        """
+        window = self.context_builder.build(
+            messages, model or settings.openai_chat_model
         )
-        return limited_messages
+        return window.messages
     
-    def create_chat(self) -> Tuple[str, List[Message], str]:
+    def create_chat(self, include_system: bool = False) -> Tuple[str, List[Message], str]:
         """Create a new chat.
         
+        Args:
+            include_system: Return the system message to the client
+        
         Returns:
             Tuple of (chat_id, messages, title)
         """
@@ -109,14 +178,15 @@ def create_chat(self) -> Tuple[str, List[Message], str]:
         )
         self.metadata_repo.update(chat_id, metadata)
         
-        logger.info(f"Nuevo chat creado: {chat_id}")
-        return chat_id, messages, "Nuevo Chat"
+        logger.info("Nuevo chat creado: %s", chat_id)
+        return chat_id, self._visible_messages(messages, include_system), "Nuevo Chat"
     
-    def get_chat(self, chat_id: str) -> Optional[Chat]:
+    def get_chat(self, chat_id: str, include_system: bool = False) -> Optional[Chat]:
         """Get a specific chat.
         
         Args:
             chat_id: Chat UUID
+            include_system: Include the system message (with its full text)
             
         Returns:
             Chat or None if not found
@@ -125,15 +195,15 @@ def get_chat(self, chat_id: str) -> Optional[Chat]:
         if messages is None:
             return None
         
-        # Ensure system message and apply context limit
-        messages = self._ensure_system_message(messages)
-        messages = self._apply_context_limit(messages)
+        if include_system:
+            messages = self._ensure_system_message(list(messages))
+        messages = self._visible_messages(messages, include_system)
         
         # Get metadata
         metadata = self.metadata_repo.get(chat_id)
         title = metadata.title if metadata else f"Chat {chat_id[:8]}..."
         
-        logger.debug(f"Chat {chat_id} cargado. Título: {title}")
+        logger.debug("Chat %s cargado. Título: %s", chat_id, title)
         return Chat(chat_id=chat_id, messages=messages, title=title)
     
     def get_history(self) -> List[ChatMetadata]:
@@ -142,15 +212,48 @@ def get_history(self) -> List[ChatMetadata]:
         Returns:
             List of chat metadata sorted by last_updated
         """
-        metadata = self.metadata_repo.load()
-        history_list = sorted(
-            metadata.values(),
-            key=lambda m: m.last_updated,
-            reverse=True
-        )
-        logger.debug(f"Historial solicitado: {len(history_list)} chats")
+        history_list = self.metadata_repo.list_recent()
+        logger.debug("Historial solicitado: %s chats", len(history_list))
         return history_list
     
+    def get_history_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[ChatMetadata], Optional[str]]:
+        """Get one page of chat history.
+        
+        Args:
+            limit: Page size
+            cursor: Cursor returned by the previous page
+            since: Only chats updated at or after this ISO timestamp
+            until: Only chats updated at or before this ISO timestamp
+            
+        Returns:
+            Tuple of (chats sorted by last_updated desc, next cursor or None)
+            
+        Raises:
+            ValueError: If the cursor or a timestamp is invalid
+        """
+        before = decode_cursor(cursor) if cursor else None
+        since = normalize_timestamp(since) if since else None
+        until = normalize_timestamp(until) if until else None
+        
+        # Fetch one extra entry to know whether another page exists
+        page = self.metadata_repo.list_recent(
+            limit=limit + 1, before=before, since=since, until=until
+        )
+        
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1].last_updated, page[-1].id)
+        
+        logger.debug("Página de historial: %s chats", len(page))
+        return page, next_cursor
+    
     def delete_chat(self, chat_id: str) -> bool:
         """Delete a chat.
         
@@ -159,80 +262,360 @@ def delete_chat(self, chat_id: str) -> bool:
             
         Returns:
             True if deleted, False if not found
+            
+        Raises:
+            ChatLockTimeout: If a turn of the chat holds its lock too long
         """
-        metadata_deleted = self.metadata_repo.delete(chat_id)
-        file_deleted = self.chat_repo.delete(chat_id)
-        
+        chat_lock = self.lock_manager.acquire(chat_id)
+        try:
+            metadata_deleted = self.metadata_repo.delete(chat_id)
+            file_deleted = self.chat_repo.delete(chat_id)
+        finally:
+            chat_lock.release()
+        
+        # The lock file stays: see ChatLockManager.prune
         if metadata_deleted or file_deleted:
-            logger.info(f"Chat {chat_id} eliminado.")
+            if self.search_index:
+                self.search_index.delete_chat(chat_id)
+            logger.info("Chat %s eliminado.", chat_id)
             return True
         
         return False
     
-    def process_message(
+    def search_chats(
+        self,
+        query: str,
+        limit: int = settings.search_default_limit
+    ) -> List[Tuple[SearchHit, ChatMetadata]]:
+        """Find chats by title and message content.
+        
+        Args:
+            query: Free text query
+            limit: Maximum number of results
+            
+        Returns:
+            List of (hit, metadata) tuples ordered by relevance; chats whose
+            metadata no longer exists are skipped
+            
+        Raises:
+            RuntimeError: If search is disabled
+        """
+        if self.search_index is None:
+            raise RuntimeError("La búsqueda no está disponible")
+        
+        results = []
+        for hit in self.search_index.search(query, limit):
+            metadata = self.metadata_repo.get(hit.chat_id)
+            if metadata is not None:
+                results.append((hit, metadata))
+        
+        logger.debug("Búsqueda '%s': %s resultados", query, len(results))
+        return results
+    
+    def _prepare_turn(
         self,
         chat_id: str,
         user_message: str,
-        model: str
-    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-        """Process a user message and generate AI response.
+        model: str,
+        budget: Optional[TokenBudget] = None
+    ) -> Optional[Tuple[List[Message], List[Message], str]]:
+        """Load a chat and append the user message for a new turn.
         
         Args:
             chat_id: Chat UUID
             user_message: User's message
             model: Model to use
+            budget: Client token budget, charged with the prompt tokens of
+                the context window plus the completion estimate
             
         Returns:
-            Tuple of (response, timestamp, new_title)
-            Returns (None, None, None) if error
+            Tuple of (messages, messages_for_api, validated_model)
+            or None if the chat does not exist
+            
+        Raises:
+            RateLimitExceeded: If the turn does not fit in the budget
         """
-        # Load messages
-        messages = self.chat_repo.load(chat_id)
+        # Validate model
+        validated_model = settings.validate_openai_model(model)
+        
+        # Load only the recent tail that can fit the model's token budget
+        messages = self.chat_repo.load_tail(
+            chat_id,
+            settings.max_context_length,
+            until=lambda tail: self.context_builder.covers(tail, validated_model)
+        )
         if messages is None:
-            logger.warning(f"Chat inexistente o corrupto: {chat_id}")
-            return None, None, None
+            logger.warning("Chat inexistente o corrupto: %s", chat_id)
+            return None
         
         # Ensure system message
         messages = self._ensure_system_message(messages)
         
-        # Validate model
-        validated_model = settings.validate_openai_model(model)
-        logger.info(f"Procesando mensaje (chat: {chat_id}, modelo: {validated_model})")
+        logger.info("Procesando mensaje (chat: %s, modelo: %s)", chat_id, validated_model)
         
         # Add user message
         messages.append(Message(role="user", content=user_message))
         
-        # Apply context limit for API call
-        messages_for_api = self._apply_context_limit(messages)
-        
-        # Call OpenAI
-        assistant_reply = self.openai_service.call_api(
-            messages_for_api,
-            validated_model,
-            purpose="chat"
+        # Apply token budget for API call (system prompt expanded only here)
+        window = self.context_builder.build(
+            self._resolve_prompts(messages), validated_model
         )
+        if budget is not None:
+            budget.charge(window.tokens)
         
-        if assistant_reply is None:
-            logger.error(f"Llamada API fallida (chat: {chat_id})")
-            return None, None, None
+        return messages, window.messages, validated_model
+    
+    def _complete_turn(
+        self,
+        chat_id: str,
+        messages: List[Message],
+        assistant_reply: str,
+        model: str,
+        budget: Optional[TokenBudget] = None
+    ) -> Tuple[str, Optional[str]]:
+        """Persist the assistant reply and update chat metadata.
         
+        Args:
+            chat_id: Chat UUID
+            messages: Context messages ending with the new user message
+            assistant_reply: Assistant reply content
+            model: Model used for the reply
+            budget: Client token budget, settled with the reply's tokens
+            
+        Returns:
+            Tuple of (timestamp, new_title)
+        """
         # Add assistant response
-        messages.append(Message(role="assistant", content=assistant_reply))
+        user_message = messages[-1]
+        assistant_message = Message(role="assistant", content=assistant_reply)
+        messages.append(assistant_message)
+        if budget is not None:
+            budget.settle(count_message_tokens(assistant_message, model))
         
         # Update title if needed
         new_title = self._update_title_if_needed(chat_id, messages)
         
-        # Save messages
-        messages_to_save = self._apply_context_limit(messages)
-        if not self.chat_repo.save(chat_id, messages_to_save):
-            logger.error(
-                f"Error guardando mensajes después de respuesta (chat: {chat_id})"
-            )
+        # Append the new turn to the chat log
+        if not self.chat_repo.append(chat_id, [user_message, assistant_message]):
+            logger.error("Error guardando mensajes después de respuesta (chat: %s)", chat_id)
+        elif self.search_index:
+            self.search_index.add_messages(chat_id, [user_message, assistant_message])
         
-        # Return response
         now_iso = datetime.now(timezone.utc).isoformat()
-        logger.info(f"Respuesta enviada (chat: {chat_id}, modelo: {validated_model})")
-        return assistant_reply, now_iso, new_title
+        logger.info("Respuesta enviada (chat: %s, modelo: %s)", chat_id, model)
+        return now_iso, new_title
+    
+    def process_message(
+        self,
+        chat_id: str,
+        user_message: str,
+        model: str,
+        budget: Optional[TokenBudget] = None
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Process a user message and generate AI response.
+        
+        Args:
+            chat_id: Chat UUID
+            user_message: User's message
+            model: Model to use
+            budget: Client token budget (optional)
+            
+        Returns:
+            Tuple of (response, timestamp, new_title)
+            Returns (None, None, None) if error
+            
+        Raises:
+            RateLimitExceeded: If the turn does not fit in the budget
+            ChatLockTimeout: If another turn of the chat holds its lock too long
+        """
+        chat_lock = self.lock_manager.acquire(chat_id)
+        try:
+            turn = self._prepare_turn(chat_id, user_message, model, budget)
+            if turn is None:
+                return None, None, None
+            messages, messages_for_api, validated_model = turn
+            
+            # Call OpenAI
+            assistant_reply = self.openai_service.call_api(
+                messages_for_api,
+                validated_model,
+                purpose="chat"
+            )
+            
+            if assistant_reply is None:
+                self._abandon_turn(chat_id, budget)
+                return None, None, None
+            
+            now_iso, new_title = self._complete_turn(
+                chat_id, messages, assistant_reply, validated_model, budget
+            )
+            return assistant_reply, now_iso, new_title
+        finally:
+            chat_lock.release()
+    
+    def stream_message(
+        self,
+        chat_id: str,
+        user_message: str,
+        model: str,
+        budget: Optional[TokenBudget] = None
+    ) -> Optional[Iterator[Tuple[str, Dict[str, Any]]]]:
+        """Process a user message streaming the AI response.
+        
+        The assistant message is only persisted once the upstream stream has
+        finished; an interrupted stream leaves the chat untouched.
+        
+        Args:
+            chat_id: Chat UUID
+            user_message: User's message
+            model: Model to use
+            budget: Client token budget (optional)
+            
+        Returns:
+            Iterator of (event, data) tuples, where event is 'delta',
+            'done' or 'error'. Returns None if the turn could not start.
+            
+        Raises:
+            RateLimitExceeded: If the turn does not fit in the budget
+            ChatLockTimeout: If another turn of the chat holds its lock too long
+        """
+        chat_lock = self.lock_manager.acquire(chat_id)
+        
+        # The lock stays held until the returned stream is exhausted or closed
+        with ExitStack() as held:
+            held.callback(chat_lock.release)
+            turn = self._prepare_turn(chat_id, user_message, model, budget)
+            if turn is None:
+                return None
+            messages, messages_for_api, validated_model = turn
+            
+            deltas = self.openai_service.stream_api(
+                messages_for_api,
+                validated_model,
+                purpose="chat"
+            )
+            
+            if deltas is None:
+                self._abandon_turn(chat_id, budget, streaming=True)
+                return None
+            held.pop_all()
+        
+        parts: List[str] = []
+        
+        def events() -> Iterator[Tuple[str, Dict[str, Any]]]:
+            try:
+                for delta in deltas:
+                    yield self._record_delta(parts, delta)
+            except Exception as e:
+                yield self._interrupted_stream(chat_id, e)
+            else:
+                yield self._finish_stream(chat_id, messages, parts, validated_model, budget)
+        
+        def release() -> None:
+            chat_lock.release()
+            self._settle_stream(parts, validated_model, budget)
+        
+        return ReleasingIterator(events(), release)
+    
+    @staticmethod
+    def _abandon_turn(
+        chat_id: str,
+        budget: Optional[TokenBudget],
+        streaming: bool = False
+    ) -> None:
+        """Give back the budget of a turn whose upstream call failed.
+        
+        Args:
+            chat_id: Chat UUID
+            budget: Client token budget (optional)
+            streaming: Whether the failed call was a streamed one
+        """
+        if streaming:
+            logger.error("Llamada API en streaming fallida (chat: %s)", chat_id)
+        else:
+            logger.error("Llamada API fallida (chat: %s)", chat_id)
+        if budget is not None:
+            budget.refund()
+    
+    @staticmethod
+    def _record_delta(parts: List[str], delta: str) -> Tuple[str, Dict[str, Any]]:
+        """Keep a streamed content delta and build its event.
+        
+        Args:
+            parts: Content deltas streamed so far
+            delta: New content delta
+            
+        Returns:
+            ('delta', data) tuple
+        """
+        parts.append(delta)
+        return "delta", {"content": delta}
+    
+    @staticmethod
+    def _interrupted_stream(chat_id: str, error: Exception) -> Tuple[str, Dict[str, Any]]:
+        """Log an upstream stream that broke off and build its final event.
+        
+        Args:
+            chat_id: Chat UUID
+            error: Error raised while reading the stream
+            
+        Returns:
+            ('error', data) tuple
+        """
+        logger.error("Streaming interrumpido (chat: %s): %s", chat_id, error, exc_info=error)
+        return "error", {"error": "Error contactando asistente AI."}
+    
+    def _settle_stream(
+        self,
+        parts: List[str],
+        model: str,
+        budget: Optional[TokenBudget]
+    ) -> None:
+        """Settle the budget of a stream that ended without a stored reply.
+        
+        An upstream error, an empty reply or a client disconnect still
+        consumed the prompt and the tokens streamed so far; a completed
+        turn was already settled and is left as is.
+        
+        Args:
+            parts: Content deltas streamed so far
+            model: Validated model name
+            budget: Client token budget (optional)
+        """
+        if budget is None or budget.settled:
+            return
+        partial = Message(role="assistant", content="".join(parts))
+        budget.settle(count_message_tokens(partial, model))
+    
+    def _finish_stream(
+        self,
+        chat_id: str,
+        messages: List[Message],
+        parts: List[str],
+        model: str,
+        budget: Optional[TokenBudget] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Persist a fully streamed turn and build its final event.
+        
+        Args:
+            chat_id: Chat UUID
+            messages: Messages of the turn (ending with the user message)
+            parts: Streamed content deltas
+            model: Validated model name
+            budget: Client token budget, settled with the reply's tokens
+            
+        Returns:
+            ('done', data) tuple, or ('error', data) if the reply was empty
+        """
+        assistant_reply = "".join(parts).strip()
+        if not assistant_reply:
+            logger.error("Respuesta vacía en streaming (chat: %s)", chat_id)
+            return "error", {"error": "Error contactando asistente AI."}
+        
+        now_iso, new_title = self._complete_turn(
+            chat_id, messages, assistant_reply, model, budget
+        )
+        return "done", {"timestamp": now_iso, "new_title": new_title}
     
     def _update_title_if_needed(
         self,
@@ -241,6 +624,10 @@ def _update_title_if_needed(
     ) -> Optional[str]:
         """Update chat title if needed.
         
+        With a title service the title is generated in the background and
+        reaches clients through the chat history; only the synchronous
+        fallback returns it directly.
+        
         Args:
             chat_id: Chat UUID
             messages: Current messages
@@ -250,16 +637,28 @@ def _update_title_if_needed(
         """
         metadata = self.metadata_repo.get(chat_id)
         if not metadata:
-            logger.warning(f"Metadata no encontrada para {chat_id}")
+            logger.warning("Metadata no encontrada para %s", chat_id)
             return None
         
         # Count non-system messages
         message_count = len([m for m in messages if m.role != "system"])
         min_messages = settings.title_generation_min_messages - 1
         
+        needs_title = (
+            metadata.title == "Nuevo Chat" and message_count >= min_messages
+        )
+        
+        if needs_title and self.title_service:
+            # Touch the timestamp first; the worker re-reads metadata before
+            # storing the title, so this update cannot overwrite it.
+            metadata.last_updated = datetime.now(timezone.utc).isoformat()
+            self.metadata_repo.update(chat_id, metadata)
+            self.title_service.submit(chat_id, messages)
+            return None
+        
         # Generate title if conditions met
-        if metadata.title == "Nuevo Chat" and message_count >= min_messages:
-            logger.info(f"Generando título para chat {chat_id}...")
+        if needs_title:
+            logger.info("Generando título para chat %s...", chat_id)
             new_title = self.openai_service.generate_title(messages)
             
             if new_title:
@@ -267,9 +666,11 @@ def _update_title_if_needed(
                 metadata.title = new_title
                 metadata.last_updated = datetime.now(timezone.utc).isoformat()
                 self.metadata_repo.update(chat_id, metadata)
+                if self.search_index:
+                    self.search_index.set_title(chat_id, new_title)
                 return new_title
             
-            logger.warning(f"Fallo al generar título para {chat_id}")
+            logger.warning("Fallo al generar título para %s", chat_id)
         else:
             # Just update timestamp
             metadata.last_updated = datetime.now(timezone.utc).isoformat()
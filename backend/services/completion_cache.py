@@ -0,0 +1,140 @@
+"""Exact-match cache of upstream completions."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from utils.serialization import dumps
+
+
+@dataclass
+class CachedCompletion:
+    """Cached completion.
+    
+    Attributes:
+        reply: Completion text
+        size: Accounted size in bytes (key + reply)
+        expires_at: Monotonic expiry time
+    """
+    
+    reply: str
+    size: int
+    expires_at: float
+
+
+class CompletionCache:
+    """Bounded LRU cache of completions with TTL, limited by size in bytes.
+    
+    Keys are SHA-256 hashes of the canonical JSON of the full request
+    parameters (model, messages and sampling parameters), so only
+    byte-identical requests share an entry.
+    """
+    
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        """Initialize completion cache.
+        
+        Args:
+            max_bytes: Maximum accounted size of all entries (0 disables)
+            ttl_seconds: Lifetime of an entry
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedCompletion]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything."""
+        return self.max_bytes > 0 and self.ttl_seconds > 0
+    
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """Build the cache key of a request.
+        
+        Args:
+            params: Chat Completions request parameters
+            
+        Returns:
+            Hex digest of the canonical request
+        """
+        return hashlib.sha256(dumps(params, sort_keys=True)).hexdigest()
+    
+    def _drop(self, key: str) -> None:
+        """Remove an entry (lock must be held)."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+    
+    def get(self, key: str) -> Optional[str]:
+        """Look up a completion.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Cached reply or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats["expirations"] += 1
+                entry = None
+            
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry.reply
+    
+    def put(self, key: str, reply: str) -> None:
+        """Store a completion.
+        
+        Args:
+            key: Cache key
+            reply: Completion text
+        """
+        size = len(key) + len(reply.encode("utf-8"))
+        if not self.enabled or size > self.max_bytes:
+            return
+        
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = CachedCompletion(
+                reply, size, time.monotonic() + self.ttl_seconds
+            )
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats["evictions"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+        
+        Returns:
+            Dictionary with hits, misses, evictions, expirations, hit ratio
+            and current size
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
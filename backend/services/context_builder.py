@@ -0,0 +1,180 @@
+"""Token-budgeted context window construction."""
+import math
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List
+
+from core.config import settings
+from core.logging import get_logger
+from core.metrics import context_dropped_total
+from models.message import Message
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency: fall back to the estimator
+    tiktoken = None
+
+logger = get_logger(__name__)
+
+# Tokens added by the chat format around every message and for priming the
+# assistant reply (OpenAI cookbook values for gpt-3.5/gpt-4 family models).
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=32)
+def _get_encoding(model: str):
+    """Get the tiktoken encoding for a model (None without tiktoken)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=settings.context_token_cache_size)
+def _count_text_tokens(model: str, text: str) -> int:
+    """Count tokens in a text, memoized per (model, text).
+    
+    Args:
+        model: Model name
+        text: Text to count
+        
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / settings.context_chars_per_token)
+
+
+def count_message_tokens(message: Message, model: str) -> int:
+    """Count the prompt tokens used by a message.
+    
+    Args:
+        message: Message to count
+        model: Model name
+        
+    Returns:
+        Number of tokens including per-message overhead
+    """
+    return TOKENS_PER_MESSAGE + _count_text_tokens(model, message.content)
+
+
+@dataclass
+class ContextWindow:
+    """Result of building a context window.
+    
+    Attributes:
+        messages: Messages to send upstream
+        tokens: Prompt tokens used by ``messages``
+        budget: Prompt token budget for the model
+        dropped_messages: Messages left out of the window
+        dropped_tokens: Tokens of the messages left out
+    """
+    
+    messages: List[Message] = field(default_factory=list)
+    tokens: int = 0
+    budget: int = 0
+    dropped_messages: int = 0
+    dropped_tokens: int = 0
+
+
+class ContextBuilder:
+    """Builds the newest-first context window that fits a token budget.
+    
+    The system message (if first) and the latest message are always kept;
+    older messages are added newest first until the next one would exceed
+    the budget. Token counts are memoized per message text, so each turn
+    only tokenizes the new messages.
+    """
+    
+    def get_budget(self, model: str) -> int:
+        """Get the prompt token budget for a model.
+        
+        Args:
+            model: Model name
+            
+        Returns:
+            Prompt token budget
+        """
+        return settings.context_token_budgets.get(
+            model, settings.context_token_budget_default
+        )
+    
+    def covers(self, messages: List[Message], model: str) -> bool:
+        """Check whether a history tail already fills a model's budget.
+        
+        Any older message would be left out of the window, so loading
+        stops once this is True.
+        
+        Args:
+            messages: Most recent messages, oldest first
+            model: Model name
+            
+        Returns:
+            True if ``messages`` use at least the whole prompt token budget
+        """
+        budget = self.get_budget(model)
+        tokens = 0
+        for message in reversed(messages):
+            tokens += count_message_tokens(message, model)
+            if tokens >= budget:
+                return True
+        return False
+    
+    def build(self, messages: List[Message], model: str) -> ContextWindow:
+        """Select the messages that fit the model's token budget.
+        
+        Args:
+            messages: Candidate messages, oldest first
+            model: Model name
+            
+        Returns:
+            ContextWindow with the selected messages and token accounting
+        """
+        budget = self.get_budget(model)
+        if not messages:
+            return ContextWindow(budget=budget)
+        
+        system_message = [messages[0]] if messages[0].role == "system" else []
+        history = messages[len(system_message):]
+        
+        tokens = TOKENS_PER_REPLY + sum(
+            count_message_tokens(msg, model) for msg in system_message
+        )
+        
+        kept: List[Message] = []
+        dropped_tokens = 0
+        for index in range(len(history) - 1, -1, -1):
+            message_tokens = count_message_tokens(history[index], model)
+            # The latest message is always sent, even if it alone is too big
+            if kept and tokens + message_tokens > budget:
+                dropped_tokens = message_tokens + sum(
+                    count_message_tokens(msg, model) for msg in history[:index]
+                )
+                break
+            kept.append(history[index])
+            tokens += message_tokens
+        
+        kept.reverse()
+        window = ContextWindow(
+            messages=system_message + kept,
+            tokens=tokens,
+            budget=budget,
+            dropped_messages=len(history) - len(kept),
+            dropped_tokens=dropped_tokens
+        )
+        
+        if window.dropped_messages:
+            context_dropped_total.inc((model, "messages"), window.dropped_messages)
+            context_dropped_total.inc((model, "tokens"), window.dropped_tokens)
+            logger.debug(
+                "Contexto truncado: %s mensajes y %s tokens descartados "
+                "(%s/%s tokens, modelo: %s)",
+                window.dropped_messages, window.dropped_tokens,
+                window.tokens, budget, model
+            )
+        return window
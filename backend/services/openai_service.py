@@ -1,14 +1,28 @@
 """OpenAI service for AI interactions."""
-from typing import List, Optional, Dict, Any
-from openai import APIError
+import time
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator, Tuple
 
 from core.config import settings
 from core.logging import get_logger
+from core.metrics import openai_request_duration_seconds, openai_tokens_total
 from models.message import Message
+from services.completion_cache import CompletionCache
+from utils.latency import LatencyTracker
+from utils.serialization import dump_messages
 
 logger = get_logger(__name__)
 
 
+def _api_error() -> type:
+    """Get ``openai.APIError`` for an ``except`` clause.
+    
+    The clause is only evaluated once an exception is raised, so openai is
+    not imported until the first client exists (see core.dependencies).
+    """
+    from openai import APIError
+    return APIError
+
+
 class OpenAIService:
     """Service for interacting with OpenAI API."""
     
@@ -27,13 +41,51 @@ class OpenAIService:
         }
     }
     
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, async_client=None, title_client=None):
         """Initialize OpenAI service.
         
         Args:
             openai_client: OpenAI client instance
+            async_client: AsyncOpenAI client instance (async serving mode)
+            title_client: OpenAI client for title calls, on its own
+                connection pool (defaults to ``openai_client``)
+        """
+        self.bind_clients(openai_client, async_client, title_client)
+        self.completion_cache = CompletionCache(
+            settings.completion_cache_max_bytes,
+            settings.completion_cache_ttl_seconds
+        )
+        self.cached_purposes = {
+            purpose for purpose, enabled in (
+                ("chat", settings.completion_cache_chat),
+                ("title", settings.completion_cache_title)
+            ) if enabled
+        }
+        self.latency = LatencyTracker()
+    
+    def bind_clients(self, openai_client, async_client=None, title_client=None) -> None:
+        """Set the OpenAI clients (a pre-fork worker binds its own).
+        
+        Args:
+            openai_client: OpenAI client instance
+            async_client: AsyncOpenAI client instance (async serving mode)
+            title_client: OpenAI client for title calls (defaults to
+                ``openai_client``)
         """
         self.client = openai_client
+        self.async_client = async_client
+        self.title_client = title_client or openai_client
+    
+    def _get_client(self, purpose: str):
+        """Get the synchronous client for a purpose.
+        
+        Args:
+            purpose: Purpose of call ('chat' or 'title')
+            
+        Returns:
+            OpenAI client (None if not initialized)
+        """
+        return self.title_client if purpose == "title" else self.client
     
     def _get_api_parameters(self, purpose: str) -> Dict[str, Any]:
         """Get API parameters for specific purpose.
@@ -46,6 +98,157 @@ def _get_api_parameters(self, purpose: str) -> Dict[str, Any]:
         """
         return self.API_PARAMETERS.get(purpose, self.API_PARAMETERS["chat"])
     
+    def _build_params(
+        self,
+        messages: List[Message],
+        model: str,
+        purpose: str,
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """Build Chat Completions request parameters.
+        
+        Args:
+            messages: List of messages
+            model: Model name
+            purpose: Purpose of call ('chat' or 'title')
+            stream: Whether to request a streamed response
+            
+        Returns:
+            Keyword arguments for chat.completions.create
+        """
+        # Convert Message objects to dict (one pass for the whole list)
+        messages_dict = dump_messages(messages)
+        
+        logger.debug(
+            "Enviando %s mensajes a OpenAI%s (%s, modelo: %s)",
+            len(messages), ' en streaming' if stream else '', purpose, model
+        )
+        
+        params = {
+            "model": model,
+            "messages": messages_dict,
+            **self._get_api_parameters(purpose)
+        }
+        if stream:
+            params["stream"] = True
+            # The last chunk then carries the token usage of the call
+            params["stream_options"] = {"include_usage": True}
+        return params
+    
+    @staticmethod
+    def _extract_reply(response, purpose: str, model: str) -> Optional[str]:
+        """Extract the reply text from a completion response.
+        
+        Args:
+            response: Chat Completions response
+            purpose: Purpose of call ('chat' or 'title')
+            model: Model name
+            
+        Returns:
+            Reply content or None if the response is invalid
+        """
+        if not (response.choices and response.choices[0].message and
+                response.choices[0].message.content):
+            logger.error("Respuesta inválida de OpenAI (%s, %s)", purpose, model)
+            return None
+        
+        reply = response.choices[0].message.content.strip()
+        logger.debug("Respuesta recibida (%s): '%s...'", purpose, reply[:100])
+        return reply
+    
+    def _observe(self, purpose: str, model: str, outcome: str, started: float) -> None:
+        """Record the latency of a call.
+        
+        Args:
+            purpose: Purpose of call ('chat' or 'title')
+            model: Model name
+            outcome: 'upstream', 'cache_hit', 'stream' or 'error'
+            started: perf_counter value at the start of the call
+        """
+        seconds = time.perf_counter() - started
+        self.latency.record(purpose, outcome, seconds)
+        openai_request_duration_seconds.observe((model, purpose, outcome), seconds)
+    
+    @staticmethod
+    def _record_usage(usage: Any, model: str, purpose: str) -> None:
+        """Count the tokens reported for a call.
+        
+        Args:
+            usage: ``usage`` of a response or final stream chunk (may be None)
+            model: Model name
+            purpose: Purpose of call ('chat' or 'title')
+        """
+        if usage is None:
+            return
+        openai_tokens_total.inc((model, purpose, "prompt"), usage.prompt_tokens or 0)
+        openai_tokens_total.inc((model, purpose, "completion"), usage.completion_tokens or 0)
+    
+    def _lookup_cache(
+        self,
+        params: Dict[str, Any],
+        purpose: str,
+        started: float
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Look up a request in the completion cache.
+        
+        Args:
+            params: Request parameters
+            purpose: Purpose of call ('chat' or 'title')
+            started: perf_counter value at the start of the call
+            
+        Returns:
+            Tuple of (cache key, cached reply); the key is None when caching
+            is disabled for the purpose, the reply is None on a miss
+        """
+        if purpose not in self.cached_purposes or not self.completion_cache.enabled:
+            return None, None
+        
+        cache_key = self.completion_cache.make_key(params)
+        cached_reply = self.completion_cache.get(cache_key)
+        if cached_reply is not None:
+            self._observe(purpose, params["model"], "cache_hit", started)
+            logger.debug("Respuesta servida desde caché (%s)", purpose)
+        return cache_key, cached_reply
+    
+    def _record_reply(
+        self,
+        response: Any,
+        cache_key: Optional[str],
+        purpose: str,
+        model: str,
+        started: float
+    ) -> Optional[str]:
+        """Record the latency and usage of an upstream call and cache its reply.
+        
+        Args:
+            response: Chat Completions response
+            cache_key: Cache key or None if caching is disabled
+            purpose: Purpose of call ('chat' or 'title')
+            model: Model name
+            started: perf_counter value at the start of the call
+            
+        Returns:
+            Reply content or None if the response is invalid
+        """
+        reply = self._extract_reply(response, purpose, model)
+        self._observe(purpose, model, "upstream" if reply is not None else "error", started)
+        self._record_usage(getattr(response, "usage", None), model, purpose)
+        if reply is not None and cache_key:
+            self.completion_cache.put(cache_key, reply)
+        return reply
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get upstream latency and completion cache statistics.
+        
+        Returns:
+            Dictionary with latency per purpose and class, and cache stats
+        """
+        return {
+            "latency": self.latency.get_stats(),
+            "completion_cache": self.completion_cache.get_stats(),
+            "cached_purposes": sorted(self.cached_purposes)
+        }
+    
     def call_api(
         self,
         messages: List[Message],
@@ -62,42 +265,220 @@ def call_api(
         Returns:
             API response content or None if error
         """
-        if not self.client:
-            logger.error(f"Cliente OpenAI no inicializado ({purpose}).")
+        client = self._get_client(purpose)
+        if not client:
+            logger.error("Cliente OpenAI no inicializado (%s).", purpose)
             return None
         
+        started = time.perf_counter()
         try:
-            # Convert Message objects to dict
-            messages_dict = [msg.model_dump() for msg in messages]
+            params = self._build_params(messages, model, purpose)
+            cache_key, cached_reply = self._lookup_cache(params, purpose, started)
+            if cached_reply is not None:
+                return cached_reply
             
-            logger.debug(
-                f"Enviando {len(messages)} mensajes a OpenAI "
-                f"({purpose}, modelo: {model})"
-            )
+            response = client.chat.completions.create(**params)
+            return self._record_reply(response, cache_key, purpose, model, started)
+        
+        except _api_error() as e:
+            self._observe(purpose, model, "error", started)
+            logger.error("Error API OpenAI (%s, %s): %s", purpose, model, e)
+            return None
+        except Exception as e:
+            self._observe(purpose, model, "error", started)
+            logger.exception("Error inesperado en OpenAI API (%s): %s", purpose, e)
+            return None
+    
+    def stream_api(
+        self,
+        messages: List[Message],
+        model: str,
+        purpose: str = "chat"
+    ) -> Optional[Iterator[str]]:
+        """Call OpenAI Chat Completions API in streaming mode.
+        
+        The request is sent eagerly so that connection and HTTP errors are
+        reported before the first token; the returned iterator then yields
+        content deltas as they arrive. Errors raised while iterating (e.g. a
+        dropped connection) propagate to the consumer.
+        
+        Args:
+            messages: List of messages
+            model: Model name
+            purpose: Purpose of call ('chat' or 'title')
             
-            params = {
-                "model": model,
-                "messages": messages_dict,
-                **self._get_api_parameters(purpose)
-            }
+        Returns:
+            Iterator of content deltas or None if error
+        """
+        client = self._get_client(purpose)
+        if not client:
+            logger.error("Cliente OpenAI no inicializado (%s, stream).", purpose)
+            return None
+        
+        started = time.perf_counter()
+        try:
+            params = self._build_params(messages, model, purpose, stream=True)
+            stream = client.chat.completions.create(**params)
+        
+        except _api_error() as e:
+            self._observe(purpose, model, "error", started)
+            logger.error("Error API OpenAI (%s, %s, stream): %s", purpose, model, e)
+            return None
+        except Exception as e:
+            self._observe(purpose, model, "error", started)
+            logger.exception("Error inesperado en OpenAI API (%s, stream): %s", purpose, e)
+            return None
+        
+        return self._iter_stream_deltas(stream, purpose, model, started)
+    
+    def _iter_stream_deltas(
+        self,
+        stream,
+        purpose: str,
+        model: str,
+        started: float
+    ) -> Iterator[str]:
+        """Yield non-empty content deltas from a completion stream.
+        
+        The call's latency is recorded when the stream ends, and its token
+        usage from the final usage-only chunk.
+        
+        Args:
+            stream: Streaming response from the OpenAI client
+            purpose: Purpose of call ('chat' or 'title')
+            model: Model name
+            started: perf_counter value at the start of the call
+            
+        Yields:
+            Content deltas
+        """
+        outcome = "error"
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    self._record_usage(getattr(chunk, "usage", None), model, purpose)
+                    continue
+                delta = chunk.choices[0].delta
+                if delta and delta.content:
+                    yield delta.content
+            outcome = "stream"
+        finally:
+            self._observe(purpose, model, outcome, started)
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+    
+    async def call_api_async(
+        self,
+        messages: List[Message],
+        model: str,
+        purpose: str = "chat"
+    ) -> Optional[str]:
+        """Call OpenAI Chat Completions API with the async client.
+        
+        Args:
+            messages: List of messages
+            model: Model name
+            purpose: Purpose of call ('chat' or 'title')
             
-            response = self.client.chat.completions.create(**params)
+        Returns:
+            API response content or None if error
+        """
+        if not self.async_client:
+            logger.error("Cliente OpenAI asíncrono no inicializado (%s).", purpose)
+            return None
+        
+        started = time.perf_counter()
+        try:
+            params = self._build_params(messages, model, purpose)
+            cache_key, cached_reply = self._lookup_cache(params, purpose, started)
+            if cached_reply is not None:
+                return cached_reply
             
-            if not (response.choices and response.choices[0].message and
-                    response.choices[0].message.content):
-                logger.error(f"Respuesta inválida de OpenAI ({purpose}, {model})")
-                return None
+            response = await self.async_client.chat.completions.create(**params)
+            return self._record_reply(response, cache_key, purpose, model, started)
+        
+        except _api_error() as e:
+            self._observe(purpose, model, "error", started)
+            logger.error("Error API OpenAI (%s, %s): %s", purpose, model, e)
+            return None
+        except Exception as e:
+            self._observe(purpose, model, "error", started)
+            logger.exception("Error inesperado en OpenAI API (%s): %s", purpose, e)
+            return None
+    
+    async def stream_api_async(
+        self,
+        messages: List[Message],
+        model: str,
+        purpose: str = "chat"
+    ) -> Optional[AsyncIterator[str]]:
+        """Call OpenAI Chat Completions API in streaming mode (async client).
+        
+        Same contract as ``stream_api``: errors before the first token
+        return None, errors while iterating propagate to the consumer.
+        
+        Args:
+            messages: List of messages
+            model: Model name
+            purpose: Purpose of call ('chat' or 'title')
             
-            reply = response.choices[0].message.content.strip()
-            logger.debug(f"Respuesta recibida ({purpose}): '{reply[:100]}...'")
-            return reply
+        Returns:
+            Async iterator of content deltas or None if error
+        """
+        if not self.async_client:
+            logger.error("Cliente OpenAI asíncrono no inicializado (%s, stream).", purpose)
+            return None
         
-        except APIError as e:
-            logger.error(f"Error API OpenAI ({purpose}, {model}): {str(e)}")
+        started = time.perf_counter()
+        try:
+            params = self._build_params(messages, model, purpose, stream=True)
+            stream = await self.async_client.chat.completions.create(**params)
+        
+        except _api_error() as e:
+            self._observe(purpose, model, "error", started)
+            logger.error("Error API OpenAI (%s, %s, stream): %s", purpose, model, e)
             return None
         except Exception as e:
-            logger.exception(f"Error inesperado en OpenAI API ({purpose}): {e}")
+            self._observe(purpose, model, "error", started)
+            logger.exception("Error inesperado en OpenAI API (%s, stream): %s", purpose, e)
             return None
+        
+        return self._aiter_stream_deltas(stream, purpose, model, started)
+    
+    async def _aiter_stream_deltas(
+        self,
+        stream,
+        purpose: str,
+        model: str,
+        started: float
+    ) -> AsyncIterator[str]:
+        """Yield non-empty content deltas from an async completion stream.
+        
+        Args:
+            stream: Async streaming response from the OpenAI client
+            purpose: Purpose of call ('chat' or 'title')
+            model: Model name
+            started: perf_counter value at the start of the call
+            
+        Yields:
+            Content deltas
+        """
+        outcome = "error"
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    self._record_usage(getattr(chunk, "usage", None), model, purpose)
+                    continue
+                delta = chunk.choices[0].delta
+                if delta and delta.content:
+                    yield delta.content
+            outcome = "stream"
+        finally:
+            self._observe(purpose, model, outcome, started)
+            close = getattr(stream, "close", None)
+            if close:
+                await close()
     
     def generate_title(self, messages: List[Message]) -> Optional[str]:
         """Generate title for conversation.
@@ -151,8 +532,8 @@ def generate_title(self, messages: List[Message]) -> Optional[str]:
         # Reject generic or too short titles
         if (len(cleaned_title) > 3 and
                 not cleaned_title.lower().startswith("conversación sobre")):
-            logger.info(f"Título generado: '{cleaned_title}'")
+            logger.info("Título generado: '%s'", cleaned_title)
             return cleaned_title
         
-        logger.warning(f"Título rechazado: '{cleaned_title}' (genérico/corto)")
+        logger.warning("Título rechazado: '%s' (genérico/corto)", cleaned_title)
         return None
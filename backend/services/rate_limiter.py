@@ -0,0 +1,423 @@
+"""Token-bucket rate limiting of chat turns, shared across processes.
+
+Each client has a bucket of ``RATE_LIMIT_TOKEN_BURST`` tokens refilled at
+``RATE_LIMIT_TOKENS_PER_MINUTE``. A turn is charged by its cost in model
+tokens: the prompt tokens of its context window plus an estimate of the
+completion, corrected once the reply is known. Buckets live in a small
+SQLite database (``data/ratelimit.db``) so every worker process on the
+host enforces the same budget; each check is a single UPSERT statement on
+one connection shared by the process's threads.
+
+The same database backs the request-count limits of Flask-Limiter
+(``sqlite://`` storage URI, see ``SQLiteWindowStorage``), so the per-day
+and per-hour windows are also counted once per host instead of per worker.
+"""
+import math
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from limits.storage import Storage
+
+from core.config import settings
+from core.logging import get_logger
+from repositories.sqlite_database import SQLiteDatabase
+
+logger = get_logger(__name__)
+
+RATE_LIMIT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rate_windows (
+    key TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Level of a bucket refilled since its last update, capped at the capacity
+_REFILLED = "min(:capacity, tokens + max(0.0, :now - updated) * :rate)"
+
+ACQUIRE_SQL = f"""
+INSERT INTO token_buckets (key, tokens, updated) VALUES (:key, :capacity - :cost, :now)
+ON CONFLICT (key) DO UPDATE SET tokens = {_REFILLED} - :cost, updated = :now
+WHERE {_REFILLED} >= :cost
+RETURNING tokens
+"""
+ADJUST_SQL = f"""
+UPDATE token_buckets SET tokens = {_REFILLED} - :delta, updated = :now
+WHERE key = :key
+RETURNING tokens
+"""
+LEVEL_SQL = f"SELECT {_REFILLED} FROM token_buckets WHERE key = :key"
+PRUNE_SQL = "DELETE FROM token_buckets WHERE updated < :before"
+
+# Fixed window counter; an expired window starts over
+WINDOW_INCR_SQL = """
+INSERT INTO rate_windows (key, hits, expires) VALUES (:key, :amount, :now + :expiry)
+ON CONFLICT (key) DO UPDATE SET
+    hits = CASE WHEN expires <= :now THEN :amount ELSE hits + :amount END,
+    expires = CASE WHEN expires <= :now THEN :now + :expiry ELSE expires END
+RETURNING hits
+"""
+WINDOW_GET_SQL = "SELECT hits, expires FROM rate_windows WHERE key = :key AND expires > :now"
+WINDOW_PRUNE_SQL = "DELETE FROM rate_windows WHERE expires <= :now"
+
+# Acquisitions between prunes of idle (full) buckets, per process
+PRUNE_EVERY = 1000
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a turn does not fit in the client's token budget."""
+    
+    def __init__(self, decision: "RateLimitDecision"):
+        """Initialize exception.
+        
+        Args:
+            decision: Rejected rate limit decision
+        """
+        super().__init__(f"Presupuesto de tokens agotado ({decision.cost} tokens)")
+        self.decision = decision
+
+
+@dataclass
+class RateLimitDecision:
+    """Outcome of charging a bucket.
+    
+    Attributes:
+        allowed: Whether the cost was charged
+        cost: Tokens requested
+        limit: Bucket capacity
+        remaining: Tokens left after the charge (current level if rejected)
+        retry_after: Seconds until the cost fits (0 if allowed)
+        reset_after: Seconds until the bucket is full again
+    """
+    
+    allowed: bool
+    cost: int
+    limit: int
+    remaining: float
+    retry_after: float = 0.0
+    reset_after: float = 0.0
+    
+    def headers(self) -> Dict[str, str]:
+        """Response headers describing the remaining budget."""
+        headers = {
+            "X-RateLimit-Limit-Tokens": str(self.limit),
+            "X-RateLimit-Remaining-Tokens": str(max(0, int(self.remaining))),
+            "X-RateLimit-Reset-Tokens": f"{self.reset_after:.1f}s"
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class TokenBucketLimiter:
+    """Token buckets stored in SQLite, shared by local worker processes."""
+    
+    def __init__(
+        self,
+        database: Optional[SQLiteDatabase] = None,
+        tokens_per_minute: float = settings.rate_limit_tokens_per_minute,
+        burst: int = settings.rate_limit_token_burst
+    ):
+        """Initialize limiter.
+        
+        Args:
+            database: Bucket storage (defaults to ``data/ratelimit.db``)
+            tokens_per_minute: Refill rate of every bucket
+            burst: Bucket capacity
+        """
+        self.database = database or SQLiteDatabase(
+            settings.rate_limit_database_file, schema=RATE_LIMIT_SCHEMA
+        )
+        self.rate = tokens_per_minute / 60
+        self.capacity = burst
+        self._acquisitions = 0
+        # Serializes the shared connection (statements take microseconds)
+        self._lock = threading.Lock()
+    
+    def _params(self, key: str, **values: float) -> Dict[str, object]:
+        return {
+            "key": key,
+            "capacity": self.capacity,
+            "rate": self.rate,
+            "now": time.time(),
+            **values
+        }
+    
+    def decision(self, allowed: bool, cost: int, level: float) -> RateLimitDecision:
+        """Describe a charge against a bucket.
+        
+        Args:
+            allowed: Whether the cost was charged
+            cost: Tokens requested
+            level: Bucket level after the charge (current level if rejected)
+            
+        Returns:
+            Decision with the remaining budget and retry/reset times
+        """
+        missing = max(0.0, cost - level) if not allowed else 0.0
+        return RateLimitDecision(
+            allowed=allowed,
+            cost=cost,
+            limit=self.capacity,
+            remaining=level,
+            retry_after=missing / self.rate if self.rate else 0.0,
+            reset_after=max(0.0, self.capacity - level) / self.rate if self.rate else 0.0
+        )
+    
+    def acquire(self, key: str, cost: int) -> RateLimitDecision:
+        """Charge a cost to a bucket if it fits.
+        
+        Costs above the capacity are capped to it, so a large prompt needs
+        a full bucket instead of never fitting.
+        
+        Args:
+            key: Bucket key (client address)
+            cost: Tokens to charge
+            
+        Returns:
+            Decision (allowed, or rejected with the time to retry). Storage
+            errors allow the request.
+        """
+        cost = min(max(0, int(cost)), self.capacity)
+        params = self._params(key, cost=cost)
+        try:
+            with self._lock:
+                conn = self.database.shared_connection
+                row = conn.execute(ACQUIRE_SQL, params).fetchone()
+                if row is not None:
+                    self._maybe_prune(conn, params["now"])
+                    return self.decision(True, cost, row[0])
+                level_row = conn.execute(LEVEL_SQL, params).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Error en el rate limiter (se permite la petición): %s", e)
+            return self.decision(True, cost, float(self.capacity))
+        level = level_row[0] if level_row else float(self.capacity)
+        return self.decision(False, cost, level)
+    
+    def adjust(self, key: str, delta: int) -> Optional[float]:
+        """Correct a previous charge once the real cost is known.
+        
+        Args:
+            key: Bucket key
+            delta: Extra tokens to charge (negative to refund); the bucket
+                may go below zero, delaying the client's next turn
+                
+        Returns:
+            Tokens left, or None if the bucket does not exist
+        """
+        if not delta:
+            return None
+        try:
+            with self._lock:
+                row = self.database.shared_connection.execute(
+                    ADJUST_SQL, self._params(key, delta=int(delta))
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Error ajustando el presupuesto de %s: %s", key, e)
+            return None
+        return row[0] if row else None
+    
+    def _maybe_prune(self, conn: sqlite3.Connection, now: float) -> None:
+        """Delete buckets idle long enough to be full (occasionally).
+        
+        Called with the connection lock held.
+        """
+        self._acquisitions += 1
+        if self._acquisitions % PRUNE_EVERY:
+            return
+        if self.rate:
+            conn.execute(PRUNE_SQL, {"before": now - self.capacity / self.rate})
+    
+    def budget(self, key: str) -> "TokenBudget":
+        """Create the budget of one request.
+        
+        Args:
+            key: Bucket key (client address)
+            
+        Returns:
+            TokenBudget charging this limiter
+        """
+        return TokenBudget(self, key)
+
+
+class TokenBudget:
+    """Token charge of one chat turn against a client's bucket."""
+    
+    def __init__(
+        self,
+        limiter: TokenBucketLimiter,
+        key: str,
+        completion_estimate: int = settings.rate_limit_completion_estimate
+    ):
+        """Initialize budget.
+        
+        Args:
+            limiter: Limiter holding the buckets
+            key: Bucket key (client address)
+            completion_estimate: Completion tokens charged up front
+        """
+        self.limiter = limiter
+        self.key = key
+        self.completion_estimate = completion_estimate
+        self.decision: Optional[RateLimitDecision] = None
+        self.settled = False
+    
+    def charge(self, prompt_tokens: int) -> RateLimitDecision:
+        """Charge a turn before calling the model.
+        
+        Args:
+            prompt_tokens: Tokens of the context window sent upstream
+            
+        Returns:
+            Allowed decision
+            
+        Raises:
+            RateLimitExceeded: If the turn does not fit in the budget
+        """
+        self.decision = self.limiter.acquire(
+            self.key, prompt_tokens + self.completion_estimate
+        )
+        if not self.decision.allowed:
+            logger.info(
+                "Presupuesto de tokens agotado para %s (%s tokens, reintentar en %.1fs)",
+                self.key, self.decision.cost, self.decision.retry_after
+            )
+            raise RateLimitExceeded(self.decision)
+        return self.decision
+    
+    def settle(self, completion_tokens: int) -> None:
+        """Replace the completion estimate with the real completion cost.
+        
+        Only the first call adjusts the bucket, so a stream can be settled
+        with its partial reply when it ends early.
+        
+        Args:
+            completion_tokens: Tokens of the assistant reply
+        """
+        if self.decision is None or not self.decision.allowed or self.settled:
+            return
+        self.settled = True
+        delta = completion_tokens - self.completion_estimate
+        remaining = self.limiter.adjust(self.key, delta)
+        if remaining is not None:
+            self.decision = self.limiter.decision(True, self.decision.cost + delta, remaining)
+    
+    def refund(self) -> None:
+        """Return the whole charge (the model was not called)."""
+        if self.decision is None or not self.decision.allowed or self.settled:
+            return
+        self.limiter.adjust(self.key, -self.decision.cost)
+        self.decision = None
+    
+    def headers(self) -> Dict[str, str]:
+        """Remaining budget headers (empty before the charge).
+        
+        Once settled they report the bucket after the real cost; streamed
+        responses send them before the reply, with the estimate charged.
+        """
+        return self.decision.headers() if self.decision else {}
+
+
+class SQLiteWindowStorage(Storage):
+    """``limits`` storage keeping fixed window counters in SQLite.
+    
+    Registered for ``sqlite://<path>`` storage URIs, so Flask-Limiter's
+    request-count limits are shared by the worker processes of a host like
+    the token buckets. Statements run on one connection per process under
+    a lock; expired windows are pruned every ``PRUNE_EVERY`` hits.
+    """
+    
+    STORAGE_SCHEME = ["sqlite"]
+    
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        """Initialize storage.
+        
+        Args:
+            uri: ``sqlite://`` followed by the database path
+            wrap_exceptions: Wrap SQLite errors in ``limits.errors.StorageError``
+            options: Ignored storage options
+        """
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.database = SQLiteDatabase(
+            Path(uri.split("://", 1)[1]), schema=RATE_LIMIT_SCHEMA
+        )
+        self._hits = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+    
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        """Count hits in the current window of a key.
+        
+        Args:
+            key: Rate limit key
+            expiry: Window length in seconds
+            amount: Hits to add
+            
+        Returns:
+            Hits in the window after this one
+        """
+        now = time.time()
+        with self._lock:
+            conn = self.database.shared_connection
+            row = conn.execute(WINDOW_INCR_SQL, {
+                "key": key, "amount": amount, "expiry": expiry, "now": now
+            }).fetchone()
+            self._hits += 1
+            if not self._hits % PRUNE_EVERY:
+                conn.execute(WINDOW_PRUNE_SQL, {"now": now})
+        return row[0]
+    
+    def _window(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            return self.database.shared_connection.execute(
+                WINDOW_GET_SQL, {"key": key, "now": time.time()}
+            ).fetchone()
+    
+    def get(self, key: str) -> int:
+        """Get the hits in the current window of a key (0 if none)."""
+        window = self._window(key)
+        return window[0] if window else 0
+    
+    def get_expiry(self, key: str) -> float:
+        """Get the end of the current window of a key (now if none)."""
+        window = self._window(key)
+        return window[1] if window else time.time()
+    
+    def check(self) -> bool:
+        """Check that the database answers."""
+        try:
+            with self._lock:
+                self.database.shared_connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def reset(self) -> Optional[int]:
+        """Clear every window.
+        
+        Returns:
+            Number of windows removed
+        """
+        with self._lock:
+            return self.database.shared_connection.execute(
+                "DELETE FROM rate_windows"
+            ).rowcount
+    
+    def clear(self, key: str) -> None:
+        """Clear the window of a key."""
+        with self._lock:
+            self.database.shared_connection.execute(
+                "DELETE FROM rate_windows WHERE key = ?", (key,)
+            )
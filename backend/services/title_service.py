@@ -0,0 +1,203 @@
+"""Background title generation service."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, ContextManager, Dict, List, Optional, Set
+
+from core.config import settings
+from core.locks import ChatLockManager, ChatLockTimeout
+from core.logging import get_logger
+from models.message import Message
+from repositories.metadata_repository import MetadataRepository
+from repositories.search_index import SearchIndex
+from services.openai_service import OpenAIService
+
+logger = get_logger(__name__)
+
+
+class TitleGenerationService:
+    """Generates chat titles on a bounded background worker pool.
+    
+    At most one job per chat is queued or running at any time, and no more
+    than ``max_queue_size`` jobs are pending overall; extra submissions are
+    dropped and retried naturally on the chat's next turn, since the title
+    is still the default one. Generated titles are written to the chat
+    metadata under the chat's turn lock, so a concurrent turn cannot write
+    back the default title; clients pick them up on their next history
+    fetch.
+    """
+    
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        metadata_repo: MetadataRepository,
+        max_workers: int = settings.title_worker_threads,
+        max_queue_size: int = settings.title_queue_max_size,
+        search_index: Optional[SearchIndex] = None,
+        lock_manager: Optional[ChatLockManager] = None
+    ):
+        """Initialize title generation service.
+        
+        Args:
+            openai_service: OpenAI service
+            metadata_repo: Metadata repository
+            max_workers: Number of worker threads
+            max_queue_size: Maximum number of queued or running jobs
+            search_index: Full-text index receiving generated titles
+            lock_manager: Per-chat lock manager shared with the chat
+                service (None to write without locking)
+        """
+        self.openai_service = openai_service
+        self.metadata_repo = metadata_repo
+        self.search_index = search_index
+        self.lock_manager = lock_manager
+        self.max_queue_size = max_queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="title-worker"
+        )
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._running = 0
+        self._accepting = True
+        self._stats = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "total_duration_seconds": 0.0
+        }
+    
+    def submit(self, chat_id: str, messages: List[Message]) -> bool:
+        """Queue title generation for a chat.
+        
+        Args:
+            chat_id: Chat UUID
+            messages: Conversation messages used to generate the title
+            
+        Returns:
+            True if a job was queued, False if deduplicated or rejected
+        """
+        with self._lock:
+            if not self._accepting:
+                self._stats["rejected"] += 1
+                return False
+            if chat_id in self._pending:
+                self._stats["deduplicated"] += 1
+                logger.debug("Título ya en cola para %s", chat_id)
+                return False
+            if len(self._pending) >= self.max_queue_size:
+                self._stats["rejected"] += 1
+                logger.warning("Cola de títulos llena, descartando %s", chat_id)
+                return False
+            self._pending.add(chat_id)
+            self._stats["submitted"] += 1
+        
+        self._executor.submit(self._run, chat_id, list(messages))
+        logger.info("Generación de título encolada para %s", chat_id)
+        return True
+    
+    def _run(self, chat_id: str, messages: List[Message]) -> None:
+        """Generate and store the title for a chat (worker thread).
+        
+        Args:
+            chat_id: Chat UUID
+            messages: Conversation messages
+        """
+        with self._lock:
+            self._running += 1
+        started = time.perf_counter()
+        succeeded = False
+        
+        try:
+            new_title = self.openai_service.generate_title(messages)
+            if not new_title:
+                logger.warning("Fallo al generar título para %s", chat_id)
+                return
+            
+            with self._chat_lock(chat_id):
+                # Re-read metadata so concurrent timestamp updates are preserved
+                metadata = self.metadata_repo.get(chat_id)
+                if not metadata:
+                    logger.warning("Metadata no encontrada para %s", chat_id)
+                    return
+                if metadata.title != "Nuevo Chat":
+                    logger.debug("Chat %s ya tiene título, descartando", chat_id)
+                    succeeded = True
+                    return
+                
+                metadata.title = new_title
+                metadata.last_updated = datetime.now(timezone.utc).isoformat()
+                self.metadata_repo.update(chat_id, metadata)
+            if self.search_index:
+                self.search_index.set_title(chat_id, new_title)
+            succeeded = True
+        except ChatLockTimeout:
+            logger.warning("Chat %s ocupado, título descartado", chat_id)
+        except Exception as e:
+            logger.exception("Error generando título para %s: %s", chat_id, e)
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._pending.discard(chat_id)
+                self._stats["completed" if succeeded else "failed"] += 1
+                self._stats["total_duration_seconds"] += duration
+    
+    def _chat_lock(self, chat_id: str) -> ContextManager[Any]:
+        """Hold the chat's turn lock while its metadata is updated."""
+        if self.lock_manager is None:
+            return nullcontext()
+        return self.lock_manager.lock(chat_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue metrics.
+        
+        Returns:
+            Dictionary with job counters, queue depth and mean duration
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            finished = stats["completed"] + stats["failed"]
+            stats["running"] = self._running
+            stats["queued"] = len(self._pending) - self._running
+            stats["mean_duration_seconds"] = (
+                stats["total_duration_seconds"] / finished if finished else 0.0
+            )
+        return stats
+    
+    def shutdown(self, timeout: float = settings.title_shutdown_timeout) -> bool:
+        """Stop accepting jobs and drain the queue.
+        
+        Args:
+            timeout: Maximum seconds to wait for pending jobs
+            
+        Returns:
+            True if the queue was fully drained, False on timeout
+        """
+        with self._lock:
+            if not self._accepting and not self._pending:
+                # Already drained (e.g. by a server hook before atexit)
+                return True
+            self._accepting = False
+        
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending:
+                    break
+            time.sleep(0.05)
+        
+        with self._lock:
+            remaining = len(self._pending)
+        
+        self._executor.shutdown(wait=remaining == 0, cancel_futures=True)
+        if remaining:
+            logger.warning("Cola de títulos cerrada con %s trabajos pendientes", remaining)
+            return False
+        
+        logger.info("Cola de títulos drenada.")
+        return True
@@ -0,0 +1,15 @@
+"""Test setup: import path and an isolated data directory.
+
+Run from ``backend/`` with ``python -m pytest``. Settings are read when
+``core.config`` is first imported, so ``BASE_DIR`` points at a temporary
+directory before any application module is loaded.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("BASE_DIR", tempfile.mkdtemp(prefix="synapse-tests-"))
@@ -0,0 +1,112 @@
+"""Tests of the in-process chat cache."""
+from models.message import Message
+from repositories.chat_cache import ChatCache
+
+
+def _messages(count: int, start: int = 0):
+    return [Message(role="user", content=f"mensaje {n}") for n in range(start, start + count)]
+
+
+def test_stamp_mismatch_invalidates_entry():
+    cache = ChatCache(max_messages=10)
+    cache.put("chat-1", _messages(2), complete=True, stamp=1)
+    
+    assert cache.get("chat-1", stamp=1) is not None
+    assert cache.get("chat-1", stamp=2) is None
+    # The entry is gone, not just skipped
+    assert cache.get("chat-1", stamp=1) is None
+    assert cache.get_stats()["invalidations"] == 1
+    assert cache.get_stats()["messages"] == 0
+
+
+def test_extend_applies_current_and_drops_stale_entries():
+    cache = ChatCache(max_messages=10)
+    cache.put("chat-1", _messages(2), complete=True, stamp=1)
+    cache.put("chat-2", _messages(2), complete=True, stamp=1)
+    
+    cache.extend("chat-1", expected_stamp=1, messages=_messages(2, start=2), new_stamp=2)
+    # chat-2 was written by someone else after it was cached
+    cache.extend("chat-2", expected_stamp=5, messages=_messages(2, start=2), new_stamp=6)
+    # Appends to uncached chats are ignored
+    cache.extend("chat-3", expected_stamp=1, messages=_messages(1), new_stamp=2)
+    
+    entry = cache.get("chat-1", stamp=2)
+    assert [m.content for m in entry.messages] == [f"mensaje {n}" for n in range(4)]
+    assert cache.get("chat-2", stamp=6) is None
+    stats = cache.get_stats()
+    assert stats["entries"] == 1
+    assert stats["messages"] == 4
+    assert stats["invalidations"] == 1
+
+
+def test_evicts_least_recently_used_by_message_count():
+    cache = ChatCache(max_messages=6)
+    cache.put("a", _messages(2), complete=True, stamp=1)
+    cache.put("b", _messages(2), complete=True, stamp=1)
+    cache.put("c", _messages(2), complete=True, stamp=1)
+    assert cache.get("a", stamp=1) is not None
+    
+    cache.put("d", _messages(3), complete=True, stamp=1)
+    
+    # b, then c, were the least recently used
+    assert cache.get("b", stamp=1) is None
+    assert cache.get("c", stamp=1) is None
+    assert cache.get("a", stamp=1) is not None
+    assert cache.get("d", stamp=1) is not None
+    assert cache.get_stats()["evictions"] == 2
+    assert cache.get_stats()["messages"] == 5
+    
+    # A chat larger than the whole cache is never stored
+    cache.put("e", _messages(7), complete=True, stamp=1)
+    assert cache.get("e", stamp=1) is None
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_tail_entries_only_serve_requests_they_cover():
+    cache = ChatCache(max_messages=20)
+    cache.put("tail", _messages(4, start=6), complete=False, stamp=1)
+    cache.put("full", _messages(3), complete=True, stamp=1)
+    
+    # Full history requested
+    assert cache.get("tail", stamp=1) is None
+    assert cache.get("full", stamp=1) is not None
+    # Tail length
+    assert cache.get("tail", stamp=1, min_messages=4) is not None
+    assert cache.get("tail", stamp=1, min_messages=5) is None
+    assert cache.get("full", stamp=1, min_messages=5) is not None
+    # Shorter tail accepted by the caller's predicate
+    def has_start(messages):
+        return messages[0].content == "mensaje 6"
+    
+    assert cache.get("tail", stamp=1, min_messages=10, until=has_start) is not None
+    assert cache.get("tail", stamp=1, min_messages=10, until=lambda messages: False) is None
+
+
+def test_stats_count_hits_misses_and_evictions():
+    cache = ChatCache(max_messages=4)
+    cache.put("a", _messages(2), complete=True, stamp=1)
+    cache.get("a", stamp=1)
+    cache.get("a", stamp=1)
+    cache.get("b", stamp=1)
+    cache.put("b", _messages(3), complete=True, stamp=1)
+    cache.get("a", stamp=1)
+    
+    assert cache.get_stats() == {
+        "hits": 2,
+        "misses": 2,
+        "evictions": 1,
+        "invalidations": 0,
+        "entries": 1,
+        "messages": 3,
+        "max_messages": 4,
+        "hit_ratio": 0.5
+    }
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ChatCache(max_messages=0)
+    cache.put("a", _messages(1), complete=True, stamp=1)
+    
+    assert not cache.enabled
+    assert cache.get("a", stamp=1) is None
+    assert cache.get_stats()["misses"] == 0
@@ -0,0 +1,107 @@
+"""Tests of the segmented chat log."""
+import json
+import uuid
+
+from models.message import Message
+from repositories.chat_repository import ChatRepository
+from repositories.sqlite_chat_repository import SQLiteChatRepository
+from repositories.sqlite_database import SQLiteDatabase
+
+
+def _message(n: int) -> Message:
+    return Message(role="user" if n % 2 else "assistant", content=f"mensaje {n}")
+
+
+def test_append_seals_full_hot_segment(tmp_path):
+    repo = ChatRepository(chats_dir=tmp_path, segment_max_messages=4, cache_max_messages=0)
+    chat_id = str(uuid.uuid4())
+    assert repo.save(chat_id, [_message(0)])
+    
+    for n in range(1, 10, 2):
+        assert repo.append(chat_id, [_message(n), _message(n + 1)])
+    
+    chat_dir = tmp_path / chat_id
+    assert len(list(chat_dir.glob(ChatRepository.COLD_SEGMENT_PATTERN))) == 2
+    assert [m.content for m in repo.load(chat_id)] == [f"mensaje {n}" for n in range(11)]
+
+
+def test_unreadable_segment_fails_instead_of_shortening(tmp_path, monkeypatch):
+    repo = ChatRepository(chats_dir=tmp_path, segment_max_messages=4)
+    chat_id = str(uuid.uuid4())
+    assert repo.save(chat_id, [_message(n) for n in range(6)])
+    repo.cache.invalidate(chat_id)
+    
+    cold_segment = next((tmp_path / chat_id).glob(ChatRepository.COLD_SEGMENT_PATTERN))
+    read_json_lines = repo.file_manager.read_json_lines
+    monkeypatch.setattr(
+        repo.file_manager, "read_json_lines",
+        lambda path: None if path == cold_segment else read_json_lines(path)
+    )
+    assert repo.load_tail(chat_id, 4) is None
+    assert repo.load(chat_id) is None
+    
+    monkeypatch.undo()
+    assert len(repo.load_tail(chat_id, 4)) == 4
+    assert len(repo.load(chat_id)) == 6
+
+
+
+def test_losing_legacy_migration_keeps_the_winners_turns(tmp_path):
+    chat_id = str(uuid.uuid4())
+    legacy = [_message(n).model_dump() for n in range(3)]
+    (tmp_path / f"{chat_id}.json").write_text(json.dumps(legacy))
+    winner = ChatRepository(chats_dir=tmp_path, cache_max_messages=0)
+    loser = ChatRepository(chats_dir=tmp_path, cache_max_messages=0)
+    stage_segments = loser._stage_segments
+    
+    def stage_then_lose_race(chat_id, messages):
+        staging_dir = stage_segments(chat_id, messages)
+        # Another request migrates and appends a turn before the rename
+        assert winner.append(chat_id, [_message(3)])
+        return staging_dir
+    loser._stage_segments = stage_then_lose_race
+    
+    assert len(loser.load(chat_id)) == 4
+    assert [m.content for m in winner.load(chat_id)] == [f"mensaje {n}" for n in range(4)]
+    assert not (tmp_path / f"{chat_id}.json").exists()
+    assert not list(tmp_path.glob(".*.tmp"))
+
+def _stop_after(n: int):
+    reads = []
+    
+    def until(tail):
+        reads.append(len(tail))
+        return len(tail) >= n
+    return until, reads
+
+
+def test_load_tail_stops_reading_once_until_accepts(tmp_path):
+    repo = ChatRepository(chats_dir=tmp_path, segment_max_messages=4, cache_max_messages=0)
+    chat_id = str(uuid.uuid4())
+    assert repo.save(chat_id, [_message(n) for n in range(18)])
+    
+    until, reads = _stop_after(5)
+    tail = repo.load_tail(chat_id, 100, until=until)
+    # Hot segment (2) plus the newest cold segment (4), not all 18 messages
+    assert [m.content for m in tail] == [f"mensaje {n}" for n in range(12, 18)]
+    assert reads == [2, 6]
+    
+    assert len(repo.load_tail(chat_id, 100)) == 18
+    assert len(repo.load_tail(chat_id, 3, until=until)) == 3
+
+
+def test_sqlite_load_tail_pages_until_accepted(tmp_path):
+    database = SQLiteDatabase(tmp_path / "chats.db")
+    repo = SQLiteChatRepository(database)
+    repo.TAIL_PAGE_SIZE = 4
+    chat_id = str(uuid.uuid4())
+    assert repo.save(chat_id, [_message(n) for n in range(18)])
+    
+    until, reads = _stop_after(5)
+    tail = repo.load_tail(chat_id, 100, until=until)
+    assert [m.content for m in tail] == [f"mensaje {n}" for n in range(10, 18)]
+    assert reads == [4, 8]
+    
+    assert len(repo.load_tail(chat_id, 100)) == 18
+    assert repo.load_tail(str(uuid.uuid4()), 10, until=until) is None
+    database.close_all()
@@ -0,0 +1,132 @@
+"""Tests of the chat route helpers and the native ASGI turn."""
+import asyncio
+import json
+import threading
+import uuid
+
+from flask import Flask
+
+from api.asgi import AsyncChatApp
+from api.middleware.error_handlers import register_error_handlers
+from api.routes.chat import chat_bp, init_chat_routes, stream_reply
+from core.locks import ChatLockTimeout, ReleasingIterator
+
+
+def test_stream_reply_closes_events_on_disconnect():
+    released = []
+    events = ReleasingIterator(
+        iter([("delta", {"content": "a"}), ("delta", {"content": "b"})]),
+        lambda: released.append(True)
+    )
+    with Flask(__name__).test_request_context():
+        response = stream_reply(events, None)
+        body = iter(response.response)
+        assert next(body).startswith("event: delta")
+        response.close()
+    assert released == [True]
+
+
+class _StubChatService:
+    """Async chat service answering every turn with a fixed reply."""
+    
+    async def process_message_async(self, chat_id, user_message, model, budget=None):
+        if user_message == "ocupado":
+            raise ChatLockTimeout(f"Timeout esperando lock del chat {chat_id}")
+        return f"eco: {user_message}", "2024-01-01T00:00:00+00:00", None
+
+
+def _send_native(app: AsyncChatApp, chat_id: str, body: bytes):
+    """Drive one native POST /api/v1/chat/<chat_id> through the ASGI app."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": f"/api/v1/chat/{chat_id}",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "http_version": "1.1"
+    }
+    asyncio.run(app(scope, receive, send))
+    headers = dict(sent[0]["headers"])
+    return sent[0]["status"], headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_native_turn_runs_the_flask_request_hooks():
+    flask_app = Flask(__name__)
+    register_error_handlers(flask_app)
+    
+    hook_threads = []
+    
+    @flask_app.before_request
+    def record_thread():
+        hook_threads.append(threading.current_thread().name)
+    
+    @flask_app.after_request
+    def security_headers(response):
+        hook_threads.append(threading.current_thread().name)
+        response.headers["X-Frame-Options"] = "SAMEORIGIN"
+        return response
+    
+    init_chat_routes(None)
+    flask_app.register_blueprint(chat_bp)
+    app = AsyncChatApp(flask_app, _StubChatService())
+    chat_id = str(uuid.uuid4())
+    
+    status, headers, body = _send_native(app, chat_id, b'{"mensaje": "hola"}')
+    assert status == 200
+    assert headers[b"x-frame-options"] == b"SAMEORIGIN"
+    assert json.loads(body)["respuesta"] == "eco: hola"
+    # The hooks (request limits included) run off the event loop
+    assert len(hook_threads) == 2
+    assert all(name.startswith("flask") for name in hook_threads)
+    
+    # A busy chat is not reported as an upstream failure
+    status, headers, body = _send_native(app, chat_id, b'{"mensaje": "ocupado"}')
+    assert status == 409
+    assert headers[b"retry-after"] == b"5"
+    assert "ocupado" in json.loads(body)["error"]
+    
+    status, headers, body = _send_native(app, "not-a-uuid", b'{"mensaje": "hola"}')
+    assert status == 400
+    assert headers[b"x-frame-options"] == b"SAMEORIGIN"
+    assert "Chat ID inválido" in json.loads(body)["error"]
+
+
+def test_flask_routes_run_on_their_own_executor():
+    flask_app = Flask(__name__)
+    
+    @flask_app.route("/api/v1/thread")
+    def thread_name():
+        return threading.current_thread().name
+    
+    # The stub service has no I/O executor to borrow
+    app = AsyncChatApp(flask_app, _StubChatService(), flask_workers=1)
+    sent = []
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/v1/thread",
+        "query_string": b"",
+        "headers": [],
+        "http_version": "1.1"
+    }
+    asyncio.run(app(scope, receive, send))
+    app.flask_executor.shutdown()
+    
+    assert sent[0]["status"] == 200
+    assert sent[1]["body"].decode().startswith("flask")
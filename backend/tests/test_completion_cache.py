@@ -0,0 +1,77 @@
+"""Tests of the completion cache TTL and size bound."""
+import types
+
+import pytest
+
+from services import completion_cache
+from services.completion_cache import CompletionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen monotonic clock of the cache, advanced by the test."""
+    now = [100.0]
+    monkeypatch.setattr(
+        completion_cache, "time", types.SimpleNamespace(monotonic=lambda: now[0])
+    )
+    return now
+
+
+def _key(name: str) -> str:
+    return CompletionCache.make_key({"model": "gpt-4o-mini", "messages": [name]})
+
+
+def test_entry_expires_after_its_ttl(clock):
+    cache = CompletionCache(max_bytes=10_000, ttl_seconds=60)
+    cache.put(_key("a"), "respuesta")
+    
+    clock[0] += 59
+    assert cache.get(_key("a")) == "respuesta"
+    clock[0] += 1
+    assert cache.get(_key("a")) is None
+    
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 1, 1)
+    assert stats["entries"] == stats["bytes"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_cap(clock):
+    entry_size = len(_key("a")) + len("x" * 36)
+    cache = CompletionCache(max_bytes=3 * entry_size, ttl_seconds=60)
+    for name in "abc":
+        cache.put(_key(name), "x" * 36)
+    assert cache.get(_key("a")) is not None
+    
+    cache.put(_key("d"), "x" * 36)
+    
+    assert cache.get(_key("b")) is None
+    assert all(cache.get(_key(name)) is not None for name in "acd")
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 3 * entry_size
+
+
+def test_replacing_an_entry_accounts_its_new_size(clock):
+    cache = CompletionCache(max_bytes=10_000, ttl_seconds=60)
+    cache.put(_key("a"), "corta")
+    cache.put(_key("a"), "ñ" * 10)
+    
+    assert cache.get(_key("a")) == "ñ" * 10
+    assert cache.get_stats()["bytes"] == len(_key("a")) + 20
+
+
+def test_entry_larger_than_the_cache_is_not_stored(clock):
+    cache = CompletionCache(max_bytes=100, ttl_seconds=60)
+    cache.put(_key("a"), "x" * 100)
+    
+    assert cache.get(_key("a")) is None
+    assert cache.get_stats()["evictions"] == 0
+
+
+def test_disabled_cache_stores_nothing(clock):
+    cache = CompletionCache(max_bytes=10_000, ttl_seconds=0)
+    cache.put(_key("a"), "respuesta")
+    
+    assert not cache.enabled
+    assert cache.get(_key("a")) is None
+    assert cache.get_stats()["misses"] == 0
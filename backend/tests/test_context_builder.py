@@ -0,0 +1,81 @@
+"""Tests of the token-budgeted context window."""
+from core.config import settings
+from core.metrics import context_dropped_total
+from models.message import Message
+from services.context_builder import TOKENS_PER_REPLY, ContextBuilder, count_message_tokens
+
+MODEL = "modelo-de-prueba"
+
+
+def _messages(count: int, words: int = 20):
+    system = Message(role="system", content="Eres un asistente.")
+    turns = [
+        Message(role="user" if i % 2 == 0 else "assistant", content=f"mensaje {i} " * words)
+        for i in range(count)
+    ]
+    return [system] + turns
+
+
+def _dropped(kind: str) -> float:
+    samples = context_dropped_total.snapshot()["samples"]
+    return dict((tuple(labels), value) for labels, value in samples).get((MODEL, kind), 0.0)
+
+
+def _budget_for(monkeypatch, messages) -> None:
+    """Budget that fits the system message, the reply and ``messages``."""
+    tokens = TOKENS_PER_REPLY + sum(count_message_tokens(m, MODEL) for m in messages)
+    monkeypatch.setitem(settings.context_token_budgets, MODEL, tokens)
+
+
+def test_build_keeps_system_and_newest_messages_within_budget(monkeypatch):
+    messages = _messages(10)
+    _budget_for(monkeypatch, [messages[0]] + messages[-3:])
+    dropped_messages, dropped_tokens = _dropped("messages"), _dropped("tokens")
+    
+    window = ContextBuilder().build(messages, MODEL)
+    
+    assert window.messages == [messages[0]] + messages[-3:]
+    assert window.tokens == window.budget
+    assert window.dropped_messages == 7
+    assert window.dropped_tokens == sum(
+        count_message_tokens(m, MODEL) for m in messages[1:8]
+    )
+    assert _dropped("messages") == dropped_messages + 7
+    assert _dropped("tokens") == dropped_tokens + window.dropped_tokens
+
+
+def test_build_always_keeps_the_latest_message(monkeypatch):
+    messages = _messages(3, words=500)
+    monkeypatch.setitem(settings.context_token_budgets, MODEL, 10)
+    
+    window = ContextBuilder().build(messages, MODEL)
+    
+    assert window.messages == [messages[0], messages[-1]]
+    assert window.tokens > window.budget
+    assert window.dropped_messages == 2
+
+
+def test_build_without_dropping_leaves_metrics_alone(monkeypatch):
+    messages = _messages(4)
+    _budget_for(monkeypatch, messages)
+    dropped_messages = _dropped("messages")
+    
+    window = ContextBuilder().build(messages, MODEL)
+    
+    assert window.messages == messages
+    assert window.dropped_messages == window.dropped_tokens == 0
+    assert _dropped("messages") == dropped_messages
+
+
+def test_covers_stops_once_the_tail_fills_the_budget(monkeypatch):
+    messages = _messages(6)
+    tail = messages[-2:]
+    monkeypatch.setitem(
+        settings.context_token_budgets, MODEL,
+        sum(count_message_tokens(m, MODEL) for m in tail)
+    )
+    builder = ContextBuilder()
+    
+    assert builder.covers(tail, MODEL)
+    assert not builder.covers(tail[1:], MODEL)
+    assert not builder.covers([], MODEL)
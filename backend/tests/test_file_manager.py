@@ -0,0 +1,72 @@
+"""Tests of the crash-safe JSON Lines appends."""
+from repositories.file_manager import FileManager
+
+
+def _tear(path, fragment: bytes) -> None:
+    """Simulate an append that crashed before writing its newline."""
+    with open(path, "ab") as f:
+        f.write(fragment)
+
+
+def test_append_after_torn_write_keeps_new_records(tmp_path):
+    path = tmp_path / "segment.jsonl"
+    assert FileManager.append_json_lines(path, [{"seq": 1}, {"seq": 2}])
+    _tear(path, b'{"seq": 3, "content": "respuesta interrump')
+    
+    assert FileManager.append_json_lines(path, [{"seq": 3, "content": "ok"}])
+    
+    assert FileManager.read_json_lines(path) == [
+        {"seq": 1}, {"seq": 2}, {"seq": 3, "content": "ok"}
+    ]
+    assert path.read_bytes().endswith(b"\n")
+
+
+def test_append_after_torn_first_line(tmp_path):
+    path = tmp_path / "segment.jsonl"
+    _tear(path, b'{"seq": 1, "con')
+    
+    assert FileManager.append_json_lines(path, [{"seq": 1}])
+    
+    assert FileManager.read_json_lines(path) == [{"seq": 1}]
+
+
+def test_torn_tail_longer_than_one_read_block(tmp_path):
+    path = tmp_path / "segment.jsonl"
+    assert FileManager.append_json_lines(path, [{"seq": 1}])
+    _tear(path, b'{"seq": 2, "content": "' + b"x" * 10000)
+    
+    assert FileManager.append_json_lines(path, [{"seq": 2}])
+    
+    assert FileManager.read_json_lines(path) == [{"seq": 1}, {"seq": 2}]
+
+
+def test_complete_file_is_not_truncated(tmp_path):
+    path = tmp_path / "segment.jsonl"
+    assert FileManager.append_json_lines(path, [{"seq": 1}])
+    assert FileManager.append_json_lines(path, [{"seq": 2}])
+    
+    assert FileManager.read_json_lines(path) == [{"seq": 1}, {"seq": 2}]
+
+
+def test_count_lines_ignores_torn_tail(tmp_path):
+    path = tmp_path / "segment.jsonl"
+    assert FileManager.count_lines(path) == 0
+    assert FileManager.append_json_lines(path, [{"seq": 1}, {"seq": 2}])
+    _tear(path, b'{"seq": 3')
+    
+    assert FileManager.count_lines(path) == 2
+
+
+def test_read_skips_only_a_torn_last_line(tmp_path):
+    path = tmp_path / "segment.jsonl"
+    assert FileManager.append_json_lines(path, [{"seq": 1}])
+    _tear(path, b'{"seq": 2, "con')
+    
+    assert FileManager.read_json_lines(path) == [{"seq": 1}]
+
+
+def test_read_fails_on_a_corrupt_line_mid_file(tmp_path):
+    path = tmp_path / "segment.jsonl"
+    path.write_bytes(b'{"seq": 1}\n{"seq": 2, "con\n{"seq": 3}\n')
+    
+    assert FileManager.read_json_lines(path) is None
@@ -0,0 +1,33 @@
+"""Tests of the health routes behind the request limits."""
+import pytest
+from flask import Flask
+
+from api.routes.health import health_bp
+from core import readiness as readiness_module
+from core.config import settings
+from factory import init_rate_limits
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_per_hour", 3)
+    monkeypatch.setattr(readiness_module.readiness, "_state", readiness_module.READY)
+    app = Flask(__name__)
+    app.register_blueprint(health_bp)
+    init_rate_limits(app, storage_uri="memory://")
+    return app.test_client()
+
+
+@pytest.mark.parametrize(
+    "path", ["/api/v1/health/ready", "/api/v1/health", "/api/v1/ping", "/api/v1/metrics"]
+)
+def test_probes_stay_up_past_the_hourly_limit(client, path):
+    statuses = {client.get(path).status_code for _ in range(10)}
+    
+    assert statuses == {200}
+
+
+def test_other_routes_keep_the_hourly_limit(client):
+    statuses = [client.get("/api/v1/health/storage").status_code for _ in range(4)]
+    
+    assert statuses == [200, 200, 200, 429]
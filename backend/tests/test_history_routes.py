@@ -0,0 +1,37 @@
+"""Tests of the history route's query parameters."""
+import pytest
+from flask import Flask
+
+from api.middleware.error_handlers import register_error_handlers
+from api.routes.history import history_bp, init_history_routes
+
+
+class _StubChatService:
+    """Chat service returning an empty history page."""
+    
+    def get_history_page(self, limit, cursor=None, since=None, until=None):
+        return [], None
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = Flask(__name__)
+    register_error_handlers(app)
+    init_history_routes(_StubChatService())
+    app.register_blueprint(history_bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("limit", ["abc", "1.5", "", "0", "100000"])
+def test_invalid_limit_is_rejected(client, limit):
+    response = client.get("/api/v1/history", query_string={"limit": limit})
+    
+    assert response.status_code == 400
+    assert "limit" in response.get_json()["error"]
+
+
+def test_valid_limit_returns_a_page(client):
+    response = client.get("/api/v1/history", query_string={"limit": "10"})
+    
+    assert response.status_code == 200
+    assert response.get_json() == {"history": [], "next_cursor": None}
@@ -0,0 +1,144 @@
+"""Tests of the upstream connection pools against a local HTTPS stub."""
+import shutil
+import ssl
+import subprocess
+import threading
+
+import httpx
+import pytest
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAIConfig, LatencyModel, start_server
+from core.dependencies import LazyClient
+from core.http_client import UpstreamPool
+from models.chat import Message
+from services.openai_service import OpenAIService
+
+COMPLETION = {
+    "model": "gpt-4o-mini",
+    "messages": [{"role": "user", "content": "hola"}]
+}
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    """Self-signed certificate for 127.0.0.1 as (cert, key) paths."""
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        pytest.skip("openssl no disponible")
+    directory = tmp_path_factory.mktemp("tls")
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [
+            openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", str(key), "-out", str(cert), "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"
+        ],
+        check=True,
+        capture_output=True
+    )
+    return cert, key
+
+
+def _stub(certificate, latency: str = "fixed:0"):
+    cert, key = certificate
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    config = FakeOpenAIConfig(latency=LatencyModel(latency), reply_words=5)
+    return start_server(config, tls=context)
+
+
+@pytest.fixture
+def stub(certificate):
+    server = _stub(certificate)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def slow_stub(certificate):
+    server = _stub(certificate, "fixed:0.2")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _pool(certificate, server, max_connections: int = 4) -> UpstreamPool:
+    pool = UpstreamPool("test", max_connections, verify=str(certificate[0]))
+    pool.base_url = server.base_url
+    return pool
+
+
+def test_connection_is_reused_across_requests(certificate, stub):
+    pool = _pool(certificate, stub)
+    for _ in range(5):
+        response = pool.client.post(f"{stub.base_url}/chat/completions", json=COMPLETION)
+        assert response.status_code == 200
+    
+    stats = pool.get_stats()
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 4
+    assert stats["open_connections"] == 1
+
+
+def test_prewarm_opens_connections_ahead_of_traffic(certificate, slow_stub):
+    pool = _pool(certificate, slow_stub)
+    assert pool.prewarm(3) == 3
+    assert pool.get_stats()["connections_opened"] == 3
+    
+    response = pool.client.post(f"{slow_stub.base_url}/chat/completions", json=COMPLETION)
+    assert response.status_code == 200
+    stats = pool.get_stats()
+    assert stats["connections_opened"] == 3
+    assert stats["connections_reused"] == 1
+
+
+def test_pool_wait_is_measured_when_pool_is_full(certificate, slow_stub):
+    pool = _pool(certificate, slow_stub, max_connections=1)
+    url = f"{slow_stub.base_url}/chat/completions"
+    threads = [
+        threading.Thread(target=pool.client.post, args=(url,), kwargs={"json": COMPLETION})
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    stats = pool.get_stats()
+    assert stats["requests"] == 2
+    assert stats["connections_opened"] == 1
+    assert stats["max_pool_wait_seconds"] >= 0.15
+
+
+def test_untrusted_certificate_is_rejected(stub):
+    pool = UpstreamPool("test", 1)
+    with pytest.raises(httpx.ConnectError):
+        pool.client.post(f"{stub.base_url}/chat/completions", json=COMPLETION)
+    assert pool.get_stats()["failed"] == 1
+
+
+def test_openai_client_uses_the_pool(certificate, stub):
+    pool = _pool(certificate, stub)
+    client = OpenAI(
+        api_key="sk-test", base_url=stub.base_url, http_client=pool.client, max_retries=0
+    )
+    reply = client.chat.completions.create(**COMPLETION)
+    assert reply.choices[0].message.content
+    assert pool.get_stats()["requests"] == 1
+
+
+def test_lazy_client_that_cannot_be_built_is_falsy():
+    calls = []
+    client = LazyClient(lambda: calls.append(1))
+    assert not client
+    assert not client
+    assert calls == [1]
+
+
+def test_openai_service_reports_missing_client():
+    service = OpenAIService(LazyClient(lambda: None))
+    messages = [Message(role="user", content="hola")]
+    assert service.call_api(messages, "gpt-4o-mini") is None
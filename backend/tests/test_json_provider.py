@@ -0,0 +1,37 @@
+"""Tests of the fast Flask JSON provider."""
+import json
+import uuid
+from datetime import datetime, timezone
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from api.responses import FastJSONProvider
+
+
+def _providers():
+    app = Flask(__name__)
+    return FastJSONProvider(app), DefaultJSONProvider(app)
+
+
+def test_values_decode_like_the_default_provider():
+    fast, default = _providers()
+    value = {
+        "b": datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc),
+        "a": uuid.UUID("c0ffee00-0000-4000-8000-000000000000"),
+        "texto": "canción"
+    }
+    
+    encoded = fast.dumps(value)
+    
+    assert json.loads(encoded) == json.loads(default.dumps(value))
+    assert encoded.index('"a"') < encoded.index('"b"')
+    assert "canción" in encoded
+
+
+def test_json_options_are_honoured():
+    fast, default = _providers()
+    value = {"texto": "canción", "n": [1, 2]}
+    
+    for options in ({"indent": 2}, {"ensure_ascii": True}, {"sort_keys": False}):
+        assert fast.dumps(value, **options) == default.dumps(value, **options)
@@ -0,0 +1,26 @@
+"""Tests of the per-chat lock files."""
+from filelock import FileLock
+
+from core.locks import ChatLockManager
+
+
+def test_lock_file_outlives_its_holder(tmp_path):
+    manager = ChatLockManager(lock_dir=tmp_path)
+    with manager.lock("chat-a"):
+        pass
+    
+    assert (tmp_path / "chat-a.lock").exists()
+
+
+def test_prune_removes_only_unknown_and_unused_lock_files(tmp_path):
+    manager = ChatLockManager(lock_dir=tmp_path)
+    for chat_id in ("vivo", "borrado", "en-uso"):
+        with manager.lock(chat_id):
+            pass
+    
+    in_use = FileLock(str(tmp_path / "en-uso.lock"))
+    with in_use:
+        removed = manager.prune(lambda chat_id: chat_id == "vivo")
+    
+    assert removed == 1
+    assert sorted(path.name for path in tmp_path.glob("*.lock")) == ["en-uso.lock", "vivo.lock"]
@@ -0,0 +1,49 @@
+"""Tests of the logging setup."""
+import logging
+import os
+from logging.handlers import RotatingFileHandler, WatchedFileHandler
+
+import pytest
+
+import core.logging as core_logging
+from core.logging import setup_logging, shutdown_logging
+
+
+def _file_handlers():
+    return [h for h in core_logging._listener.handlers if isinstance(h, logging.FileHandler)]
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    yield tmp_path / "app.log"
+    shutdown_logging()
+    logging.getLogger().removeHandler(core_logging._queue_handler)
+
+
+def test_shared_log_file_is_not_rotated_in_process(log_file):
+    setup_logging("INFO", log_file=log_file, rotate=False)
+    handlers = _file_handlers()
+    assert len(handlers) == 1
+    assert isinstance(handlers[0], WatchedFileHandler)
+    assert not isinstance(handlers[0], RotatingFileHandler)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere fork")
+def test_forked_worker_stops_rotating_the_inherited_file(log_file):
+    setup_logging("INFO", log_file=log_file)
+    assert isinstance(_file_handlers()[0], RotatingFileHandler)
+    
+    pid = os.fork()
+    if pid == 0:
+        watched = [type(h) for h in _file_handlers()] == [WatchedFileHandler]
+        logging.getLogger("test").info("registro del hijo")
+        shutdown_logging()
+        os._exit(0 if watched else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    
+    logging.getLogger("test").info("registro del padre")
+    shutdown_logging()
+    content = log_file.read_text(encoding="utf-8")
+    assert "registro del hijo" in content
+    assert "registro del padre" in content
@@ -0,0 +1,97 @@
+"""Tests of the sharded metadata repository."""
+import json
+import uuid
+import zlib
+
+from models.chat import ChatMetadata
+from repositories.metadata_repository import MetadataRepository
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def _repository(tmp_path, shards: int) -> MetadataRepository:
+    return MetadataRepository(
+        metadata_dir=tmp_path / "metadata",
+        shards=shards,
+        legacy_file=tmp_path / "chats_metadata.json",
+        layout_lock_file=tmp_path / "metadata.lock"
+    )
+
+
+def _chats(count: int):
+    return [
+        ChatMetadata(
+            id=str(uuid.uuid4()),
+            title=f"Chat {i}",
+            last_updated=f"2024-01-{i + 1:02d}T00:00:00+00:00"
+        )
+        for i in range(count)
+    ]
+
+
+def _shard_contents(tmp_path):
+    return {
+        path.name: json.loads(path.read_text())
+        for path in sorted((tmp_path / "metadata").glob("shard-*.json"))
+    }
+
+
+def test_chat_is_stored_in_the_shard_of_its_id_hash(tmp_path):
+    repo = _repository(tmp_path, shards=4)
+    chats = _chats(12)
+    for chat in chats:
+        repo.update(chat.id, chat)
+    
+    contents = _shard_contents(tmp_path)
+    assert len(contents) == 4
+    for chat in chats:
+        shard = f"shard-{zlib.crc32(chat.id.encode('utf-8')) % 4:03d}.json"
+        assert [name for name, data in contents.items() if chat.id in data] == [shard]
+    assert _repository(tmp_path, shards=4).get(chats[0].id) == chats[0]
+
+
+def test_changing_the_shard_count_redistributes_existing_chats(tmp_path):
+    chats = _chats(20)
+    repo = _repository(tmp_path, shards=4)
+    for chat in chats:
+        repo.update(chat.id, chat)
+    
+    resharded = _repository(tmp_path, shards=3)
+    
+    assert resharded.load() == {chat.id: chat for chat in chats}
+    contents = _shard_contents(tmp_path)
+    assert sorted(contents) == ["shard-000.json", "shard-001.json", "shard-002.json"]
+    for name, data in contents.items():
+        assert all(zlib.crc32(chat_id.encode("utf-8")) % 3 == int(name[6:9]) for chat_id in data)
+    layout = json.loads((tmp_path / "metadata" / "layout.json").read_text())
+    assert layout == {"shards": 3}
+
+
+def test_legacy_single_file_is_split_into_shards(tmp_path):
+    chats = _chats(5)
+    legacy_file = tmp_path / "chats_metadata.json"
+    legacy_file.write_text(json.dumps({chat.id: chat.model_dump() for chat in chats}))
+    
+    repo = _repository(tmp_path, shards=2)
+    
+    assert repo.load() == {chat.id: chat for chat in chats}
+    assert not legacy_file.exists()
+    assert (tmp_path / "chats_metadata.json.migrated").exists()
+
+
+def test_list_recent_pages_across_shards_within_since_and_until(tmp_path):
+    chats = _chats(10)
+    repo = _repository(tmp_path, shards=3)
+    for chat in chats:
+        repo.update(chat.id, chat)
+    since, until = chats[2].last_updated, chats[8].last_updated
+    
+    seen = []
+    before = None
+    while True:
+        page = repo.list_recent(limit=3, before=before, since=since, until=until)
+        seen.extend(page)
+        if len(page) < 3:
+            break
+        before = decode_cursor(encode_cursor(page[-1].last_updated, page[-1].id))
+    
+    assert [chat.id for chat in seen] == [chat.id for chat in reversed(chats[2:9])]
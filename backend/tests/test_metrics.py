@@ -0,0 +1,67 @@
+"""Tests of the multi-process metrics registry."""
+import json
+import os
+
+import pytest
+
+from core.metrics import MetricsRegistry
+
+# No process has this pid (above the kernel's pid_max)
+DEAD_PID = 2 ** 30
+
+
+def _registry(tmp_path) -> MetricsRegistry:
+    registry = MetricsRegistry(tmp_path)
+    registry.counter("t_requests_total", "Requests.", ("route",)).inc(("/a",), 2)
+    registry.gauge("t_in_flight", "In flight.").set((), 1)
+    histogram = registry.histogram("t_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe((), 0.05)
+    histogram.observe((), 0.5)
+    return registry
+
+
+def _write_snapshot(registry: MetricsRegistry, pid: int) -> None:
+    document = {"pid": pid, "written_at": 0, "metrics": registry.snapshot()}
+    (registry.metrics_dir / f"{pid}.json").write_text(json.dumps(document))
+
+
+def test_collect_sums_counters_and_histograms_of_every_snapshot(tmp_path):
+    registry = _registry(tmp_path)
+    _write_snapshot(registry, os.getppid())
+    _write_snapshot(registry, DEAD_PID)
+    
+    merged = registry.collect()
+    
+    assert merged["t_requests_total"]["samples"] == {("/a",): 6}
+    assert merged["t_seconds"]["samples"] == {(): [3, 3, 0, pytest.approx(1.65)]}
+    # The gauge of the exited process is dropped
+    assert merged["t_in_flight"]["samples"] == {(): 2}
+
+
+def test_render_uses_the_exposition_format(tmp_path):
+    registry = _registry(tmp_path)
+    
+    lines = registry.render().splitlines()
+    
+    assert lines[:3] == [
+        "# HELP t_in_flight In flight.",
+        "# TYPE t_in_flight gauge",
+        "t_in_flight 1"
+    ]
+    assert "t_requests_total{route=\"/a\"} 2" in lines
+    assert lines[-5:] == [
+        't_seconds_bucket{le="0.1"} 1',
+        't_seconds_bucket{le="1.0"} 2',
+        't_seconds_bucket{le="+Inf"} 2',
+        "t_seconds_sum 0.55",
+        "t_seconds_count 2"
+    ]
+
+
+def test_prune_removes_snapshots_of_dead_processes(tmp_path):
+    registry = _registry(tmp_path)
+    _write_snapshot(registry, DEAD_PID)
+    _write_snapshot(registry, os.getppid())
+    
+    assert registry.prune() == 1
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == [f"{os.getppid()}.json"]
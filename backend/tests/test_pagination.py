@@ -0,0 +1,33 @@
+"""Tests of the history cursors and timestamp normalization."""
+import pytest
+
+from utils.pagination import decode_cursor, encode_cursor, normalize_timestamp
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-05-01T10:00:00+00:00", "c0ffee00-0000-4000-8000-000000000000")
+    
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (
+        "2024-05-01T10:00:00+00:00", "c0ffee00-0000-4000-8000-000000000000"
+    )
+
+
+@pytest.mark.parametrize("cursor", ["", "no-es-base64!", encode_cursor("a", "b")[:-3], "WzEsMl0"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        decode_cursor(cursor)
+
+
+def test_naive_timestamp_is_taken_as_utc():
+    assert normalize_timestamp("2024-05-01T10:00:00") == "2024-05-01T10:00:00+00:00"
+
+
+def test_offset_timestamp_is_converted_to_utc():
+    assert normalize_timestamp("2024-05-01T12:00:00+02:00") == "2024-05-01T10:00:00+00:00"
+    assert normalize_timestamp("2024-05-01") == "2024-05-01T00:00:00+00:00"
+
+
+def test_invalid_timestamp_is_rejected():
+    with pytest.raises(ValueError, match="Fecha inválida"):
+        normalize_timestamp("ayer")
@@ -0,0 +1,51 @@
+"""Tests of the request profilers and the profiling middleware."""
+from flask import Flask
+
+from api.middleware.profiling import ProfilingMiddleware
+from repositories.profile_repository import ProfileRepository
+from utils.profiler import RequestProfiler
+
+
+def test_concurrent_pstats_profile_falls_back_to_speedscope():
+    first, second = RequestProfiler("pstats"), RequestProfiler("pstats")
+    first.start()
+    try:
+        second.start()
+        second.stop()
+    finally:
+        first.stop()
+    assert first.format == "pstats"
+    assert second.format == "speedscope"
+    
+    third = RequestProfiler("pstats")
+    third.start()
+    third.stop()
+    assert third.format == "pstats"
+
+
+def test_saved_profile_uses_the_format_it_ran_with(tmp_path):
+    repository = ProfileRepository(directory=tmp_path)
+    first, second = RequestProfiler("pstats"), RequestProfiler("pstats")
+    first.start()
+    second.start()
+    second.stop()
+    first.stop()
+    
+    profile_id = repository.save(second, {"method": "GET", "route": "/"})
+    assert (tmp_path / f"{profile_id}.speedscope.json").exists()
+
+
+def test_profiler_failure_does_not_break_the_request(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.add_url_rule("/", "index", lambda: "ok")
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app, app.url_map, ProfileRepository(directory=tmp_path), sample_rate=1.0
+    )
+    
+    def fail(self):
+        raise RuntimeError("perfilador roto")
+    
+    monkeypatch.setattr(RequestProfiler, "start", fail)
+    response = app.test_client().get("/")
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "ok"
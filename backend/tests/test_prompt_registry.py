@@ -0,0 +1,124 @@
+"""Tests of the prompt registry and the system prompt references of chats."""
+import uuid
+
+import pytest
+from flask import Flask
+
+from api.routes.chat import include_system_requested
+from core.config import settings
+from core.locks import ChatLockManager
+from models.message import Message
+from repositories.backends import migrate_system_prompts
+from repositories.chat_repository import ChatRepository
+from repositories.metadata_repository import MetadataRepository
+from repositories.prompt_registry import PromptRegistry, parse_prompt_ref
+from services.chat_service import ChatService
+
+
+def _chat_service(tmp_path, prompt_registry: PromptRegistry) -> ChatService:
+    return ChatService(
+        ChatRepository(chats_dir=tmp_path / "chats"),
+        MetadataRepository(
+            metadata_dir=tmp_path / "metadata",
+            legacy_file=tmp_path / "chats_metadata.json",
+            layout_lock_file=tmp_path / "metadata.lock"
+        ),
+        openai_service=None,
+        lock_manager=ChatLockManager(lock_dir=tmp_path / "locks"),
+        prompt_registry=prompt_registry
+    )
+
+
+def test_same_text_is_stored_once(tmp_path):
+    registry = PromptRegistry(prompts_dir=tmp_path)
+    
+    ref = registry.register("Eres un asistente.")
+    
+    assert registry.register("Eres un asistente.") == ref
+    assert registry.register("Eres un asistente!") != ref
+    prompt_id, version = parse_prompt_ref(ref)
+    assert prompt_id == "default"
+    assert len(list((tmp_path / prompt_id).glob("*.json"))) == 2
+    # A fresh process reads the text back from disk
+    assert PromptRegistry(prompts_dir=tmp_path).resolve(ref) == "Eres un asistente."
+
+
+def test_failed_write_is_not_registered(tmp_path, monkeypatch):
+    registry = PromptRegistry(prompts_dir=tmp_path)
+    monkeypatch.setattr(registry.file_manager, "replace_json_file", lambda path, data: False)
+    
+    with pytest.raises(OSError):
+        registry.register("Eres un asistente.")
+    
+    assert registry._texts == {}
+    monkeypatch.undo()
+    ref = registry.register("Eres un asistente.")
+    assert PromptRegistry(prompts_dir=tmp_path).resolve(ref) == "Eres un asistente."
+
+
+def test_corrupt_or_unknown_versions_do_not_resolve(tmp_path):
+    registry = PromptRegistry(prompts_dir=tmp_path)
+    ref = registry.register("original")
+    prompt_id, version = parse_prompt_ref(ref)
+    (tmp_path / prompt_id / f"{version}.json").write_text('{"text": "editado"}')
+    
+    fresh = PromptRegistry(prompts_dir=tmp_path)
+    assert fresh.resolve(ref) is None
+    assert fresh.resolve("default@" + "0" * 16) is None
+    assert fresh.resolve("no es una referencia") is None
+    with pytest.raises(ValueError):
+        fresh.register("texto", prompt_id="Con Espacios")
+
+
+def test_migration_replaces_embedded_prompts(tmp_path):
+    chat_repo = ChatRepository(chats_dir=tmp_path / "chats")
+    registry = PromptRegistry(prompts_dir=tmp_path / "prompts")
+    lock_manager = ChatLockManager(lock_dir=tmp_path / "locks")
+    turn = [Message(role="user", content="hola"), Message(role="assistant", content="hola!")]
+    embedded = {str(uuid.uuid4()): "Prompt A", str(uuid.uuid4()): "Prompt A", str(uuid.uuid4()): "Prompt B"}
+    for chat_id, text in embedded.items():
+        assert chat_repo.save(chat_id, [Message(role="system", content=text)] + turn)
+    referenced = str(uuid.uuid4())
+    assert chat_repo.save(referenced, [
+        Message(role="system", content="", prompt_ref=registry.register("Prompt C"))
+    ] + turn)
+    
+    assert migrate_system_prompts(chat_repo, registry, lock_manager) == (3, 2)
+    
+    for chat_id, text in embedded.items():
+        system, *rest = chat_repo.load(chat_id)
+        assert system.content == ""
+        assert registry.resolve(system.prompt_ref) == text
+        assert rest == turn
+    # Already migrated: nothing left to rewrite
+    assert migrate_system_prompts(chat_repo, registry, lock_manager) == (0, 0)
+
+
+def test_include_system_returns_the_resolved_prompt(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "default_system_message", "Responde en español.")
+    service = _chat_service(tmp_path, PromptRegistry(prompts_dir=tmp_path / "prompts"))
+    
+    chat_id, messages, _ = service.create_chat()
+    assert messages == []
+    _, messages, _ = service.create_chat(include_system=True)
+    assert [(m.role, m.content) for m in messages] == [("system", "Responde en español.")]
+    
+    assert service.get_chat(chat_id).messages == []
+    stored = service.chat_repo.load(chat_id)
+    assert stored[0].content == "" and stored[0].prompt_ref
+    chat = service.get_chat(chat_id, include_system=True)
+    assert [(m.role, m.content, m.prompt_ref) for m in chat.messages] == [
+        ("system", "Responde en español.", None)
+    ]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", False),
+    ("?include_system=1", True),
+    ("?include_system=true", True),
+    ("?include_system=YES", True),
+    ("?include_system=0", False)
+])
+def test_include_system_flag(query, expected):
+    with Flask(__name__).test_request_context(f"/api/v1/chat/x{query}"):
+        assert include_system_requested() is expected
@@ -0,0 +1,130 @@
+"""Tests of the token buckets and the request-count window storage."""
+import time
+import types
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from repositories.sqlite_database import SQLiteDatabase
+from services import rate_limiter
+from services.rate_limiter import (
+    RATE_LIMIT_SCHEMA,
+    RateLimitExceeded,
+    SQLiteWindowStorage,
+    TokenBucketLimiter
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen wall clock of the limiter, advanced by the test."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _limiter(tmp_path, tokens_per_minute: float = 600, burst: int = 1000) -> TokenBucketLimiter:
+    database = SQLiteDatabase(tmp_path / "ratelimit.db", schema=RATE_LIMIT_SCHEMA)
+    return TokenBucketLimiter(database, tokens_per_minute=tokens_per_minute, burst=burst)
+
+
+def _storage(tmp_path) -> SQLiteWindowStorage:
+    return storage_from_string(f"sqlite://{(tmp_path / 'ratelimit.db').as_posix()}")
+
+
+def test_window_storage_is_shared_between_instances(tmp_path):
+    first, second = _storage(tmp_path), _storage(tmp_path)
+    assert isinstance(first, SQLiteWindowStorage)
+    limit = parse("3 per hour")
+    
+    assert FixedWindowRateLimiter(first).hit(limit, "10.0.0.1")
+    assert FixedWindowRateLimiter(second).hit(limit, "10.0.0.1")
+    assert FixedWindowRateLimiter(first).hit(limit, "10.0.0.1")
+    assert not FixedWindowRateLimiter(second).hit(limit, "10.0.0.1")
+    assert FixedWindowRateLimiter(second).hit(limit, "10.0.0.2")
+    assert first.get(limit.key_for("10.0.0.1")) == 4
+
+
+def test_window_restarts_after_expiry(tmp_path):
+    storage = _storage(tmp_path)
+    assert storage.incr("clave", 1) == 1
+    assert storage.incr("clave", 1) == 2
+    assert storage.get_expiry("clave") > time.time()
+    time.sleep(1.05)
+    assert storage.get("clave") == 0
+    assert storage.incr("clave", 1) == 1
+    
+    # Same positional signature as limits.storage.Storage.incr
+    assert storage.incr("clave", 1, 3) == 4
+    
+    storage.clear("clave")
+    assert storage.get("clave") == 0
+    assert storage.check()
+
+
+def test_bucket_refills_at_the_configured_rate(tmp_path, clock):
+    limiter = _limiter(tmp_path)
+    assert limiter.acquire("10.0.0.1", 900).remaining == 100
+    
+    rejected = limiter.acquire("10.0.0.1", 400)
+    assert not rejected.allowed
+    assert rejected.retry_after == pytest.approx(30)
+    assert rejected.headers()["Retry-After"] == "30"
+    
+    clock[0] += 30
+    allowed = limiter.acquire("10.0.0.1", 400)
+    assert allowed.allowed
+    assert allowed.remaining == pytest.approx(0)
+    assert limiter.acquire("10.0.0.2", 400).allowed
+
+
+def test_bucket_never_refills_above_its_capacity(tmp_path, clock):
+    limiter = _limiter(tmp_path)
+    assert limiter.acquire("10.0.0.1", 100).allowed
+    clock[0] += 3600
+    
+    assert limiter.acquire("10.0.0.1", 0).remaining == 1000
+    # A cost above the capacity needs a full bucket instead of never fitting
+    assert limiter.acquire("10.0.0.1", 5000).cost == 1000
+
+
+def test_budget_settles_the_estimate_once(tmp_path, clock):
+    limiter = _limiter(tmp_path)
+    budget = limiter.budget("10.0.0.1")
+    budget.completion_estimate = 200
+    assert budget.charge(300).remaining == 500
+    
+    budget.settle(50)
+    assert budget.decision.cost == 350
+    assert budget.decision.remaining == 650
+    assert budget.headers()["X-RateLimit-Remaining-Tokens"] == "650"
+    
+    budget.settle(400)
+    budget.refund()
+    assert limiter.acquire("10.0.0.1", 0).remaining == 650
+
+
+def test_budget_refund_returns_the_whole_charge(tmp_path, clock):
+    limiter = _limiter(tmp_path)
+    budget = limiter.budget("10.0.0.1")
+    budget.charge(600)
+    
+    budget.refund()
+    
+    assert budget.headers() == {}
+    assert limiter.acquire("10.0.0.1", 0).remaining == 1000
+
+
+def test_budget_over_the_bucket_is_rejected(tmp_path, clock):
+    limiter = _limiter(tmp_path)
+    limiter.acquire("10.0.0.1", 1000)
+    budget = limiter.budget("10.0.0.1")
+    
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        budget.charge(10)
+    
+    assert excinfo.value.decision is budget.decision
+    budget.settle(0)
+    assert limiter.acquire("10.0.0.1", 0).remaining == 0
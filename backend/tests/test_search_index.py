@@ -0,0 +1,136 @@
+"""Tests of the full-text search index, its rebuild and the search route."""
+import uuid
+
+import pytest
+from flask import Flask
+
+from api.middleware.error_handlers import register_error_handlers
+from api.routes.search import search_bp, init_search_routes
+from core.config import settings
+from models.chat import ChatMetadata
+from models.message import Message
+from repositories.backends import rebuild_search_index
+from repositories.chat_repository import ChatRepository
+from repositories.metadata_repository import MetadataRepository
+from repositories.search_index import (
+    MAX_QUERY_TERMS,
+    SEARCH_SCHEMA,
+    SearchIndex,
+    build_match_query,
+    fts5_available
+)
+from repositories.sqlite_database import SQLiteDatabase
+from services.chat_service import ChatService
+
+pytestmark = pytest.mark.skipif(not fts5_available(), reason="SQLite sin FTS5")
+
+
+def _index(tmp_path, name: str = "search.db") -> SearchIndex:
+    return SearchIndex(SQLiteDatabase(tmp_path / name, schema=SEARCH_SCHEMA))
+
+
+def _turn(user: str, assistant: str):
+    return [Message(role="user", content=user), Message(role="assistant", content=assistant)]
+
+
+def test_match_query_quotes_every_word():
+    assert build_match_query('rust OR "python" NEAR(go*) -java') == (
+        '"rust"* "or"* "python"* "near"* "go"* "java"*'
+    )
+    assert build_match_query("Canción") == '"canción"*'
+    assert build_match_query(' "*()-:^ ') is None
+    assert build_match_query(" ".join(["a"] * 40)).count('"a"*') == MAX_QUERY_TERMS
+
+
+def test_operators_in_the_query_are_matched_literally(tmp_path):
+    index = _index(tmp_path)
+    index.add_messages("chat-1", _turn("rust or python", "ok"))
+    
+    assert [hit.chat_id for hit in index.search('python OR "java', 10)] == []
+    assert [hit.chat_id for hit in index.search("OR rust", 10)] == ["chat-1"]
+
+
+def test_one_hit_per_chat_ranked_by_relevance(tmp_path):
+    index = _index(tmp_path)
+    # More matching rows than the first fetch window holds for limit=2
+    index.add_messages(
+        "noisy", [Message(role="user", content=f"pasta {n}") for n in range(20)]
+    )
+    index.add_messages("recipe", _turn("hola", "receta de pasta fresca"))
+    index.set_title("recipe", "Pasta carbonara")
+    index.add_messages("other", _turn("nada", "que ver"))
+    
+    hits = index.search("pasta", 2)
+    
+    assert sorted(hit.chat_id for hit in hits) == ["noisy", "recipe"]
+    assert hits[0].chat_id == "recipe"
+    assert hits[0].score >= hits[1].score
+    assert "**Pasta**" in hits[0].snippet
+    assert [hit.chat_id for hit in index.search("pasta", 1)] == ["recipe"]
+
+
+def test_deleted_chat_is_removed_from_results(tmp_path):
+    index = _index(tmp_path)
+    index.add_messages("chat-1", _turn("viaje a roma", "buen plan"))
+    index.set_title("chat-1", "Roma")
+    index.add_messages("chat-2", _turn("roma en verano", "calor"))
+    
+    assert index.delete_chat("chat-1")
+    
+    assert [hit.chat_id for hit in index.search("roma", 10)] == ["chat-2"]
+
+
+def test_rebuild_matches_incremental_indexing(tmp_path, monkeypatch):
+    # rebuild_search_index reads the configured storage and index paths; the
+    # forked workers inherit the patched settings
+    monkeypatch.setattr(settings, "base_dir", tmp_path / "base")
+    chat_repo, metadata_repo = ChatRepository(), MetadataRepository()
+    incremental = _index(tmp_path)
+    chats = {
+        str(uuid.uuid4()): ("Rebuild zanahoria", [_turn("zanahoria cruda", "rica")]),
+        str(uuid.uuid4()): ("Rebuild pepino", [_turn("pepino", "zanahoria"), _turn("más", "pepino")]),
+        str(uuid.uuid4()): ("Rebuild tomate", [_turn("tomate", "rebuild")])
+    }
+    for chat_id, (title, turns) in chats.items():
+        assert chat_repo.save(chat_id, [Message(role="system", content="zanahoria")])
+        metadata_repo.update(chat_id, ChatMetadata(id=chat_id, title=title))
+        incremental.set_title(chat_id, title)
+        for messages in turns:
+            assert chat_repo.append(chat_id, messages)
+            incremental.add_messages(chat_id, messages)
+    
+    assert rebuild_search_index(workers=2) == len(chats)
+    rebuilt = SearchIndex()
+    
+    def ranked(index, query):
+        # Equal scores come back in row order, which the partitions change
+        return sorted(
+            (-round(hit.score, 6), hit.chat_id, hit.snippet) for hit in index.search(query, 10)
+        )
+    
+    # The system message of the third chat is not indexed
+    assert len(ranked(rebuilt, "zanahoria")) == 2
+    for query in ("zanahoria", "pepino", "rebuild", "tomate rebuild"):
+        assert ranked(rebuilt, query) == ranked(incremental, query)
+    rebuilt.database.close_all()
+
+
+def test_search_route_answers_503_when_search_is_disabled(tmp_path):
+    chat_service = ChatService(
+        ChatRepository(chats_dir=tmp_path / "chats"),
+        MetadataRepository(
+            metadata_dir=tmp_path / "metadata",
+            legacy_file=tmp_path / "chats_metadata.json",
+            layout_lock_file=tmp_path / "metadata.lock"
+        ),
+        openai_service=None
+    )
+    app = Flask(__name__)
+    register_error_handlers(app)
+    init_search_routes(chat_service)
+    app.register_blueprint(search_bp)
+    
+    response = app.test_client().get("/api/v1/search", query_string={"q": "hola"})
+    
+    assert response.status_code == 503
+    assert "búsqueda" in response.get_json()["error"]
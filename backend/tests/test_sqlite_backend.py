@@ -0,0 +1,98 @@
+"""Tests of the SQLite storage backend and the JSON to SQLite migration."""
+import uuid
+
+from core.config import settings
+from core.locks import ChatLockManager
+from models.chat import ChatMetadata
+from models.message import Message
+from repositories.backends import migrate_json_to_sqlite
+from repositories.chat_repository import ChatRepository
+from repositories.metadata_repository import MetadataRepository
+from repositories.prompt_registry import PromptRegistry
+from repositories.sqlite_chat_repository import SQLiteChatRepository
+from repositories.sqlite_database import SQLiteDatabase
+from repositories.sqlite_metadata_repository import SQLiteMetadataRepository
+from services.chat_service import ChatService
+
+
+class _OpenAI:
+    """OpenAI service stand-in echoing the user message."""
+    
+    def call_api(self, messages, model, purpose="chat"):
+        return f"eco: {messages[-1].content}"
+    
+    def generate_title(self, messages):
+        return "Conversación de prueba"
+
+
+def _json_repos(tmp_path):
+    return ChatRepository(chats_dir=tmp_path / "chats"), MetadataRepository(
+        metadata_dir=tmp_path / "metadata",
+        legacy_file=tmp_path / "chats_metadata.json",
+        layout_lock_file=tmp_path / "metadata.lock"
+    )
+
+
+def test_chat_round_trip_on_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "title_generation_min_messages", 3)
+    database = SQLiteDatabase(tmp_path / "synapse.db")
+    service = ChatService(
+        SQLiteChatRepository(database),
+        SQLiteMetadataRepository(database),
+        _OpenAI(),
+        lock_manager=ChatLockManager(lock_dir=tmp_path / "locks"),
+        prompt_registry=PromptRegistry(prompts_dir=tmp_path / "prompts")
+    )
+    
+    chat_ids = [service.create_chat()[0] for _ in range(3)]
+    reply, timestamp, title = service.process_message(
+        chat_ids[0], "hola", settings.openai_chat_model
+    )
+    
+    assert reply == "eco: hola"
+    assert timestamp and title == "Conversación de prueba"
+    chat = service.get_chat(chat_ids[0])
+    assert [(m.role, m.content) for m in chat.messages] == [
+        ("user", "hola"), ("assistant", "eco: hola")
+    ]
+    assert chat.title == "Conversación de prueba"
+    
+    first, cursor = service.get_history_page(limit=2)
+    second, last_cursor = service.get_history_page(limit=2, cursor=cursor)
+    assert first[0].id == chat_ids[0]
+    assert {m.id for m in first + second} == set(chat_ids)
+    assert last_cursor is None
+    
+    assert service.delete_chat(chat_ids[0])
+    assert service.get_chat(chat_ids[0]) is None
+    assert not service.delete_chat(chat_ids[0])
+    assert chat_ids[0] not in {m.id for m in service.get_history()}
+
+
+def test_migrate_json_tree_to_sqlite(tmp_path):
+    chat_repo, metadata_repo = _json_repos(tmp_path)
+    chats = {}
+    for n in range(3):
+        chat_id = str(uuid.uuid4())
+        chats[chat_id] = [
+            Message(role="system", content="", prompt_ref="default@" + "0" * 16),
+            Message(role="user", content=f"pregunta {n}"),
+            Message(role="assistant", content=f"respuesta {n}")
+        ]
+        assert chat_repo.save(chat_id, chats[chat_id])
+        metadata_repo.update(chat_id, ChatMetadata(id=chat_id, title=f"Chat {n}"))
+    # Metadata of a chat whose messages were lost is still carried over
+    orphan = str(uuid.uuid4())
+    metadata_repo.update(orphan, ChatMetadata(id=orphan, title="Huérfano"))
+    database = SQLiteDatabase(tmp_path / "synapse.db")
+    
+    assert migrate_json_to_sqlite(chat_repo, metadata_repo, database) == (3, 4)
+    # Re-running replaces the same rows
+    assert migrate_json_to_sqlite(chat_repo, metadata_repo, database) == (3, 4)
+    
+    sqlite_chat_repo = SQLiteChatRepository(database)
+    sqlite_metadata_repo = SQLiteMetadataRepository(database)
+    assert sorted(sqlite_chat_repo.list_chat_ids()) == sorted(chats)
+    for chat_id, messages in chats.items():
+        assert sqlite_chat_repo.load(chat_id) == messages
+    assert sqlite_metadata_repo.load() == metadata_repo.load()
@@ -0,0 +1,50 @@
+"""Tests of the background title worker."""
+import threading
+import time
+
+from core.locks import ChatLockManager
+from models.chat import ChatMetadata
+from repositories.metadata_repository import MetadataRepository
+from services.title_service import TitleGenerationService
+
+
+class _Titles:
+    """OpenAI service stand-in returning a fixed title."""
+    
+    def __init__(self, title: str):
+        self.title = title
+        self.called = threading.Event()
+    
+    def generate_title(self, messages):
+        self.called.set()
+        return self.title
+
+
+def _metadata_repo(tmp_path) -> MetadataRepository:
+    return MetadataRepository(
+        metadata_dir=tmp_path / "metadata",
+        legacy_file=tmp_path / "chats_metadata.json",
+        layout_lock_file=tmp_path / "metadata.lock"
+    )
+
+
+def test_title_survives_concurrent_turn(tmp_path):
+    metadata_repo = _metadata_repo(tmp_path)
+    lock_manager = ChatLockManager(lock_dir=tmp_path / "locks")
+    titles = _Titles("Viaje a Roma")
+    service = TitleGenerationService(
+        titles, metadata_repo, max_workers=1, lock_manager=lock_manager
+    )
+    metadata_repo.update("chat-1", ChatMetadata(id="chat-1"))
+    
+    # A turn reads the metadata, the title is generated meanwhile, and the
+    # turn then writes back its copy with the default title
+    with lock_manager.lock("chat-1"):
+        stale = metadata_repo.get("chat-1")
+        assert service.submit("chat-1", [])
+        assert titles.called.wait(5)
+        time.sleep(0.1)
+        metadata_repo.update("chat-1", stale)
+    
+    assert service.shutdown(timeout=5)
+    assert metadata_repo.get("chat-1").title == "Viaje a Roma"
@@ -0,0 +1,48 @@
+"""Latency accounting grouped by operation and latency class."""
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List
+
+
+class LatencyTracker:
+    """Thread-safe count/mean/max latency per (operation, class).
+    
+    Classes separate outcomes with very different costs (e.g. 'upstream'
+    calls vs 'cache_hit'), so fast paths do not hide slow ones in a mean.
+    """
+    
+    def __init__(self):
+        """Initialize latency tracker."""
+        self._lock = threading.Lock()
+        # (operation, latency_class) -> [count, total_seconds, max_seconds]
+        self._samples: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    
+    def record(self, operation: str, latency_class: str, seconds: float) -> None:
+        """Record one latency sample.
+        
+        Args:
+            operation: Operation name (e.g. 'chat' or 'title')
+            latency_class: Latency class (e.g. 'upstream' or 'cache_hit')
+            seconds: Measured latency
+        """
+        with self._lock:
+            sample = self._samples[(operation, latency_class)]
+            sample[0] += 1
+            sample[1] += seconds
+            sample[2] = max(sample[2], seconds)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get latency statistics.
+        
+        Returns:
+            Dictionary of operation -> latency class -> count, mean and max
+        """
+        stats: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (operation, latency_class), (count, total, maximum) in self._samples.items():
+                stats.setdefault(operation, {})[latency_class] = {
+                    "count": count,
+                    "mean_seconds": total / count if count else 0.0,
+                    "max_seconds": maximum
+                }
+        return stats
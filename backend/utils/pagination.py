@@ -0,0 +1,64 @@
+"""Cursor and timestamp helpers for paginated endpoints."""
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Tuple
+
+
+def encode_cursor(last_updated: str, chat_id: str) -> str:
+    """Encode a history position as an opaque cursor.
+    
+    Args:
+        last_updated: last_updated of the last returned chat
+        chat_id: ID of the last returned chat
+        
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json.dumps([last_updated, chat_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor produced by ``encode_cursor``.
+    
+    Args:
+        cursor: Cursor string
+        
+    Returns:
+        Tuple of (last_updated, chat_id)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_updated, chat_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError("Cursor inválido.") from e
+    
+    if not isinstance(last_updated, str) or not isinstance(chat_id, str):
+        raise ValueError("Cursor inválido.")
+    return last_updated, chat_id
+
+
+def normalize_timestamp(value: str) -> str:
+    """Normalize an ISO timestamp to the UTC format used in metadata.
+    
+    Args:
+        value: ISO 8601 timestamp (naive values are taken as UTC)
+        
+    Returns:
+        UTC timestamp in ISO format
+        
+    Raises:
+        ValueError: If the value is not a valid ISO timestamp
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Fecha inválida: {value}") from e
+    
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
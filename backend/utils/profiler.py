@@ -0,0 +1,207 @@
+"""Request profilers.
+
+Two formats are supported:
+
+- ``speedscope``: a sampling profiler reads the request thread's stack
+  every ``PROFILING_INTERVAL_MS`` from a helper thread and writes a
+  speedscope file (open it at https://www.speedscope.app for a flamegraph).
+  Wall-clock time is measured, so waits on OpenAI or locks show up.
+- ``pstats``: a deterministic ``cProfile`` dump (``python -m pstats
+  file.prof`` or snakeviz). CPU-heavy code is measured exactly, at a higher
+  overhead. Since Python 3.12 cProfile covers every thread of the process
+  and only one can be active at a time, so a request asking for ``pstats``
+  while another is being profiled that way falls back to ``speedscope``.
+"""
+import cProfile
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.logging import get_logger
+from utils.serialization import dumps
+
+logger = get_logger(__name__)
+
+FORMATS = ("speedscope", "pstats")
+EXTENSIONS = {"speedscope": ".speedscope.json", "pstats": ".prof"}
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+# Deepest stack kept per sample (recursion beyond it is truncated)
+MAX_STACK_DEPTH = 256
+
+Frame = Tuple[str, str, int]
+
+# Held while a cProfile profiler is enabled (one per process)
+_pstats_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval."""
+    
+    def __init__(self, thread_id: int, interval: float):
+        """Initialize stack sampler.
+        
+        Args:
+            thread_id: Identifier of the thread to sample
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames: List[Frame] = []
+        self._frame_index: Dict[Frame, int] = {}
+        # Consecutive identical stacks are merged: (frame indexes, seconds)
+        self.samples: List[Tuple[Tuple[int, ...], float]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+    
+    def _frame_id(self, frame: Frame) -> int:
+        index = self._frame_index.get(frame)
+        if index is None:
+            index = self._frame_index[frame] = len(self.frames)
+            self.frames.append(frame)
+        return index
+    
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            weight, last = now - last, now
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(self._frame_id(
+                    (code.co_qualname, code.co_filename, code.co_firstlineno)
+                ))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            if self.samples and self.samples[-1][0] == key:
+                self.samples[-1] = (key, self.samples[-1][1] + weight)
+            else:
+                self.samples.append((key, weight))
+    
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        """Build a speedscope document (sampled profile, seconds).
+        
+        Args:
+            name: Profile name shown by speedscope
+            
+        Returns:
+            Speedscope file contents
+        """
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "synapse-ai",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [
+                    {"name": qualname, "file": filename, "line": line}
+                    for qualname, filename, line in self.frames
+                ]
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weight for _, weight in self.samples),
+                "samples": [list(stack) for stack, _ in self.samples],
+                "weights": [weight for _, weight in self.samples]
+            }]
+        }
+
+
+class RequestProfiler:
+    """Profiles the current request in one of the supported formats."""
+    
+    def __init__(self, fmt: str, interval: float = settings.profiling_interval_ms / 1000):
+        """Initialize request profiler.
+        
+        Args:
+            fmt: 'speedscope' or 'pstats'
+            interval: Sampling interval in seconds (speedscope)
+        """
+        self.format = fmt
+        self.interval = interval
+        self._sampler: Optional[StackSampler] = None
+        self._profile: Optional[cProfile.Profile] = None
+    
+    def start(self) -> None:
+        """Start profiling the calling thread.
+        
+        ``pstats`` falls back to ``speedscope`` (and ``format`` is updated)
+        when cProfile is already in use in this process.
+        """
+        if self.format == "pstats" and self._start_cprofile():
+            return
+        self.format = "speedscope"
+        self._sampler = StackSampler(threading.get_ident(), self.interval)
+        self._sampler.start()
+    
+    def _start_cprofile(self) -> bool:
+        """Enable cProfile if no other profile holds it.
+        
+        Returns:
+            True if cProfile was enabled
+        """
+        if not _pstats_lock.acquire(blocking=False):
+            logger.info("cProfile ocupado; perfil en formato speedscope")
+            return False
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiling tool (e.g. a debugger) owns the hook
+            _pstats_lock.release()
+            logger.info("cProfile no disponible (%s); perfil en formato speedscope", e)
+            return False
+        self._profile = profile
+        return True
+    
+    def stop(self) -> None:
+        """Stop profiling (from the thread that started it)."""
+        if self._profile:
+            try:
+                self._profile.disable()
+            finally:
+                _pstats_lock.release()
+        if self._sampler:
+            self._sampler.stop()
+    
+    def write(self, path: Path, name: str) -> bool:
+        """Write the profile.
+        
+        Args:
+            path: Target file
+            name: Profile name (speedscope)
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if self._profile:
+            try:
+                self._profile.dump_stats(str(path))
+                return True
+            except OSError as e:
+                logger.error("Error escribiendo perfil %s: %s", path, e)
+                return False
+        try:
+            path.write_bytes(dumps(self._sampler.to_speedscope(name)))
+            return True
+        except OSError as e:
+            logger.error("Error escribiendo perfil %s: %s", path, e)
+            return False
@@ -0,0 +1,138 @@
+"""Fast JSON encoding and bulk model validation.
+
+``orjson`` is used when installed (optional dependency); otherwise the
+stdlib ``json`` module produces the same compact, UTF-8 output. Message
+lists are validated and dumped with a single ``TypeAdapter`` call instead of
+one model construction per message.
+"""
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from pydantic import TypeAdapter
+
+from models.chat import ChatMetadata
+from models.message import Message
+
+try:
+    import orjson
+except ImportError:  # Optional dependency: fall back to the stdlib encoder
+    orjson = None
+
+MESSAGE_LIST_ADAPTER = TypeAdapter(List[Message])
+METADATA_MAP_ADAPTER = TypeAdapter(Dict[str, ChatMetadata])
+
+
+def dumps(
+    obj: Any,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+    native_datetime: bool = True
+) -> bytes:
+    """Encode an object as compact UTF-8 JSON.
+    
+    Args:
+        obj: JSON-serializable object
+        sort_keys: Sort object keys (canonical output)
+        default: Fallback converter for unsupported types
+        native_datetime: Let orjson encode datetimes as ISO 8601; False
+            hands them to ``default`` like the stdlib encoder does
+        
+    Returns:
+        Encoded JSON
+    """
+    if orjson is not None:
+        option = 0
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if not native_datetime:
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(obj, default=default, option=option or None)
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        sort_keys=sort_keys,
+        default=default
+    ).encode("utf-8")
+
+
+def dumps_str(
+    obj: Any,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+    native_datetime: bool = True
+) -> str:
+    """Encode an object as compact JSON text.
+    
+    Args:
+        obj: JSON-serializable object
+        sort_keys: Sort object keys (canonical output)
+        default: Fallback converter for unsupported types
+        native_datetime: See ``dumps``
+        
+    Returns:
+        Encoded JSON
+    """
+    return dumps(obj, sort_keys, default, native_datetime).decode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON.
+    
+    Args:
+        data: JSON document
+        
+    Returns:
+        Decoded object
+        
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def validate_messages(records: Iterable[Dict[str, Any]]) -> List[Message]:
+    """Validate a list of message records in one pass.
+    
+    Args:
+        records: Message dictionaries
+        
+    Returns:
+        List of messages
+        
+    Raises:
+        pydantic.ValidationError: If any record is invalid
+    """
+    return MESSAGE_LIST_ADAPTER.validate_python(records)
+
+
+def dump_messages(messages: List[Message]) -> List[Dict[str, Any]]:
+    """Dump a list of messages to dictionaries in one pass.
+    
+    Unset optional fields (``prompt_ref``) are left out, so stored records
+    and upstream requests only carry role and content.
+    
+    Args:
+        messages: List of messages
+        
+    Returns:
+        List of message dictionaries
+    """
+    return MESSAGE_LIST_ADAPTER.dump_python(messages, exclude_none=True)
+
+
+def validate_metadata(records: Dict[str, Dict[str, Any]]) -> Dict[str, ChatMetadata]:
+    """Validate a chat_id -> metadata mapping in one pass.
+    
+    Args:
+        records: Metadata dictionaries by chat id
+        
+    Returns:
+        Dictionary of chat_id -> ChatMetadata
+        
+    Raises:
+        pydantic.ValidationError: If any record is invalid
+    """
+    return METADATA_MAP_ADAPTER.validate_python(records)
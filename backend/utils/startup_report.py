@@ -0,0 +1,221 @@
+"""Startup profile of the application (``manage.py startup-report``).
+
+A fresh interpreter is started with ``-X importtime`` to import ``factory``,
+build the app and serve a first request (``/api/v1/health/ready``) through
+the Flask test client. The per-module import timings it prints are summarized
+into self time per top-level package and the slowest modules by cumulative
+time, alongside the wall time of each startup phase. The import of
+``factory`` is compared against ``STARTUP_IMPORT_BUDGET_MS``.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List
+
+from core.config import settings
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Run in the child interpreter; argv[1] is the file receiving the phase timings
+PROBE = """
+import json, sys, time
+from dotenv import load_dotenv
+load_dotenv()
+started = time.perf_counter()
+import factory
+imported = time.perf_counter()
+app = factory.create_app()
+created = time.perf_counter()
+status = app.test_client().get("/api/v1/health/ready").status_code
+served = time.perf_counter()
+with open(sys.argv[1], "w") as f:
+    json.dump({
+        "phases_ms": {
+            "import": (imported - started) * 1000,
+            "create_app": (created - imported) * 1000,
+            "first_request": (served - created) * 1000
+        },
+        "first_request_status": status,
+        "modules": len(sys.modules)
+    }, f)
+"""
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+@dataclass
+class ImportTiming:
+    """One line of ``-X importtime`` output.
+    
+    Attributes:
+        module: Module name
+        self_us: Time spent in the module itself (microseconds)
+        cumulative_us: Time including its own imports (microseconds)
+        depth: Nesting level (0 for modules imported by the probe itself)
+    """
+    
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """Parse ``-X importtime`` output.
+    
+    Args:
+        output: Standard error of the profiled interpreter
+        
+    Returns:
+        Timings in the order they were printed (a module after its imports)
+    """
+    timings = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            timings.append(ImportTiming(
+                module=module,
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                depth=(len(indent) - 1) // 2
+            ))
+    return timings
+
+
+def summarize(
+    timings: List[ImportTiming],
+    top: int = 15,
+    root_module: str = "factory"
+) -> Dict[str, Any]:
+    """Summarize import timings.
+    
+    Args:
+        timings: Parsed ``-X importtime`` lines
+        top: Entries kept in each ranking
+        root_module: Module whose cumulative time is the import budget
+            measurement
+            
+    Returns:
+        Dictionary with the total import time, the time of ``root_module``,
+        self time per top-level package and the slowest modules
+    """
+    packages: Dict[str, int] = defaultdict(int)
+    for timing in timings:
+        packages[timing.module.split(".")[0]] += timing.self_us
+    root = next(
+        (t for t in timings if t.module == root_module and t.depth == 0), None
+    )
+    slowest = sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]
+    return {
+        "total_ms": round(sum(t.self_us for t in timings) / 1000, 1),
+        "root_module": root_module,
+        "root_ms": round(root.cumulative_us / 1000, 1) if root else None,
+        "modules": len(timings),
+        "packages": [
+            {"package": name, "self_ms": round(us / 1000, 1)}
+            for name, us in sorted(packages.items(), key=lambda i: i[1], reverse=True)[:top]
+        ],
+        "slowest": [
+            {
+                "module": t.module,
+                "cumulative_ms": round(t.cumulative_us / 1000, 1),
+                "self_ms": round(t.self_us / 1000, 1)
+            }
+            for t in slowest
+        ]
+    }
+
+
+def profile_startup(
+    top: int = 15,
+    budget_ms: float = settings.startup_import_budget_ms,
+    timeout: float = 120.0
+) -> Dict[str, Any]:
+    """Profile the startup of the application in a fresh interpreter.
+    
+    Args:
+        top: Entries kept in each ranking
+        budget_ms: Import time budget of ``factory`` (0 disables the check)
+        timeout: Seconds to wait for the child interpreter
+        
+    Returns:
+        Report with the phase timings, the import summary and whether the
+        budget was exceeded
+        
+    Raises:
+        RuntimeError: If the child interpreter fails
+    """
+    fd, phases_file = tempfile.mkstemp(prefix="synapse-startup-", suffix=".json")
+    os.close(fd)
+    try:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, phases_file],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            check=False
+        )
+        # A failed startup is reported with the child's last stderr line
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"El arranque falló (código {result.returncode}): "
+                f"{result.stderr.strip().splitlines()[-1:]}"
+            )
+        with open(phases_file, encoding="utf-8") as f:
+            report = json.load(f)
+    finally:
+        os.unlink(phases_file)
+    
+    report["imports"] = summarize(parse_importtime(result.stderr), top=top)
+    measured = report["imports"]["root_ms"] or report["phases_ms"]["import"]
+    report["budget_ms"] = budget_ms
+    report["over_budget"] = bool(budget_ms) and measured > budget_ms
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a startup report as text.
+    
+    Args:
+        report: Report built by ``profile_startup``
+        
+    Returns:
+        Human readable report
+    """
+    imports = report["imports"]
+    lines = ["Fases de arranque (ms, con -X importtime):"]
+    for phase, ms in report["phases_ms"].items():
+        lines.append(f"  {phase:<16}{ms:>10.1f}")
+    lines.append(
+        f"  primera petición: HTTP {report['first_request_status']}, "
+        f"{report['modules']} módulos cargados"
+    )
+    
+    budget = f" / presupuesto {report['budget_ms']:.0f} ms" if report["budget_ms"] else ""
+    lines.append("")
+    lines.append(
+        f"Importación de {imports['root_module']}: {imports['root_ms']} ms{budget}"
+        + ("  ** EXCEDIDO **" if report["over_budget"] else "")
+    )
+    lines.append(f"Importaciones totales: {imports['total_ms']} ms ({imports['modules']} módulos)")
+    
+    lines.append("")
+    lines.append("Tiempo propio por paquete (ms):")
+    for entry in imports["packages"]:
+        lines.append(f"  {entry['package']:<32}{entry['self_ms']:>10.1f}")
+    
+    lines.append("")
+    lines.append("Módulos más lentos (acumulado / propio, ms):")
+    for entry in imports["slowest"]:
+        lines.append(
+            f"  {entry['module']:<48}{entry['cumulative_ms']:>10.1f}{entry['self_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
@@ -1,7 +1,10 @@
 """Validators for input validation."""
+import hmac
 import uuid
 from typing import Optional
 
+from core.config import settings
+
 
 def validate_chat_id(chat_id: str) -> bool:
     """Validate that chat_id is a valid UUID.
@@ -33,3 +36,17 @@ def validate_model(model: Optional[str], default_model: str, supported_models: l
     if not model or model not in supported_models:
         return default_model
     return model
+
+
+def validate_admin_token(token: Optional[str]) -> bool:
+    """Validate an admin token against ``ADMIN_TOKEN``.
+    
+    Args:
+        token: Token sent by the client (X-Admin-Token header)
+        
+    Returns:
+        True if admin access is enabled and the token matches
+    """
+    if not settings.admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), settings.admin_token.encode("utf-8"))